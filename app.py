@@ -67,10 +67,14 @@ from config import (
 )
 # Import from the correct database module (GameCockAI/database.py)
 try:
-    from .database import create_db_and_tables, get_db_stats, export_db_to_csv, reset_database
+    from .database import (create_db_and_tables, get_db_stats, export_db_to_csv, reset_database,
+                           get_connection_stats, bulk_load_mode, recount_table_statistics, export_table,
+                           compress_text_columns, get_compression_report)
 except ImportError:
     # Fallback for when running from GameCockAI directory
-    from database import create_db_and_tables, get_db_stats, export_db_to_csv, reset_database
+    from database import (create_db_and_tables, get_db_stats, export_db_to_csv, reset_database,
+                          get_connection_stats, bulk_load_mode, recount_table_statistics, export_table,
+                          compress_text_columns, get_compression_report)
 from startup import check_dependencies, check_ollama_service, check_cuda_support
 from worker import start_worker, stop_worker
 
@@ -554,6 +558,7 @@ def process_data_menu():
         print("1. Process CFTC Data")
         print("2. Process SEC Data")
         print("3. Process All Downloaded Data")
+        print("4. Run Scheduled Refresh (download, process, index)")
         print("B. Back to Main Menu")
         choice = input("Enter your choice: ").strip().lower()
 
@@ -563,11 +568,30 @@ def process_data_menu():
             process_sec_submenu()
         elif choice == '3':
             process_all_downloaded_data()
+        elif choice == '4':
+            run_scheduled_refresh()
         elif choice == 'b':
             break
         else:
             print("Invalid choice.")
 
+def run_scheduled_refresh():
+    """Run the dependency-aware refresh: parallel stages, unchanged inputs skipped."""
+    from src.refresh_scheduler import build_default_refresh_graph
+
+    include_downloads = input("Download fresh data before processing? (y/n): ").strip().lower() == 'y'
+    force = input("Force all stages to run even if inputs are unchanged? (y/n): ").strip().lower() == 'y'
+
+    scheduler = build_default_refresh_graph(TARGET_COMPANIES, include_downloads=include_downloads)
+    print(f"\nRunning {len(scheduler.stages)} refresh stages...")
+    # The load stages run without the managed indexes; the restore_indexes stage rebuilds them
+    # before the index stages
+    with bulk_load_mode(defer_indexes=True):
+        report = scheduler.run(force=force)
+    print(report.summary())
+    if not report.succeeded:
+        print("⚠️  Some stages failed; see the log for details.")
+
 def process_cftc_submenu():
     while True:
         print("\n--- Process CFTC Data ---")
@@ -824,82 +848,84 @@ def process_all_downloaded_data():
     
     logger.info("📊 Starting comprehensive data processing...")
     
-    # Process CFTC Data
-    logger.info("\n1️⃣ Processing CFTC Data...")
-    try:
-        logger.info("Processing Credit data...")
-        process_zip_files(CFTC_CREDIT_SOURCE_DIR, TARGET_COMPANIES)
+    # Indexes and statistics triggers are rebuilt once at the end instead of row by row
+    with bulk_load_mode(defer_indexes=True):
+        # Process CFTC Data
+        logger.info("\n1️⃣ Processing CFTC Data...")
+        try:
+            logger.info("Processing Credit data...")
+            process_zip_files(CFTC_CREDIT_SOURCE_DIR, TARGET_COMPANIES)
         
-        logger.info("Processing Commodities data...")
-        process_zip_files(CFTC_COMMODITIES_SOURCE_DIR, TARGET_COMPANIES)
+            logger.info("Processing Commodities data...")
+            process_zip_files(CFTC_COMMODITIES_SOURCE_DIR, TARGET_COMPANIES)
         
-        logger.info("Processing Rates data...")
-        process_zip_files(CFTC_RATES_SOURCE_DIR, TARGET_COMPANIES)
+            logger.info("Processing Rates data...")
+            process_zip_files(CFTC_RATES_SOURCE_DIR, TARGET_COMPANIES)
         
-        logger.info("Processing Equity data...")
-        process_zip_files(CFTC_EQUITY_SOURCE_DIR, TARGET_COMPANIES)
+            logger.info("Processing Equity data...")
+            process_zip_files(CFTC_EQUITY_SOURCE_DIR, TARGET_COMPANIES)
         
-        logger.info("Processing Forex data...")
-        process_zip_files(CFTC_FOREX_SOURCE_DIR, TARGET_COMPANIES)
+            logger.info("Processing Forex data...")
+            process_zip_files(CFTC_FOREX_SOURCE_DIR, TARGET_COMPANIES)
         
-        logger.info("✅ CFTC data processing complete!")
-    except Exception as e:
-        error_msg = f"❌ Error processing CFTC data: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        print(error_msg)
+            logger.info("✅ CFTC data processing complete!")
+        except Exception as e:
+            error_msg = f"❌ Error processing CFTC data: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            print(error_msg)
     
-    # Process SEC Data
-    logger.info("\n2️⃣ Processing SEC Data...")
-    try:
-        logger.info("Processing Insider Transactions...")
-        process_sec_insider_data(INSIDER_SOURCE_DIR)
+        # Process SEC Data
+        logger.info("\n2️⃣ Processing SEC Data...")
+        try:
+            logger.info("Processing Insider Transactions...")
+            process_sec_insider_data(INSIDER_SOURCE_DIR)
         
-        logger.info("Processing 13F Holdings...")
-        process_form13f_data(THRTNF_SOURCE_DIR)
+            logger.info("Processing 13F Holdings...")
+            process_form13f_data(THRTNF_SOURCE_DIR)
         
-        logger.info("Processing Exchange Metrics...")
-        process_exchange_metrics_data(EXCHANGE_SOURCE_DIR)
+            logger.info("Processing Exchange Metrics...")
+            process_exchange_metrics_data(EXCHANGE_SOURCE_DIR)
         
-        logger.info("Processing N-CEN Filings...")
-        process_ncen_data(NCEN_SOURCE_DIR)
+            logger.info("Processing N-CEN Filings...")
+            process_ncen_data(NCEN_SOURCE_DIR)
         
-        logger.info("Processing N-PORT Filings...")
-        process_nport_data(NPORT_SOURCE_DIR)
+            logger.info("Processing N-PORT Filings...")
+            process_nport_data(NPORT_SOURCE_DIR)
         
-        logger.info("Processing Form D Filings...")
-        process_formd_data(FORMD_SOURCE_DIR)
+            logger.info("Processing Form D Filings...")
+            process_formd_data(FORMD_SOURCE_DIR)
         
-        logger.info("✅ SEC data processing complete!")
-    except Exception as e:
-        error_msg = f"❌ Error processing SEC data: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        print(error_msg)
+            logger.info("✅ SEC data processing complete!")
+        except Exception as e:
+            error_msg = f"❌ Error processing SEC data: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            print(error_msg)
     
-    # Process EDGAR Filings
-    logger.info("\n3️⃣ Processing EDGAR Filings...")
-    try:
-        process_all_edgar_filings()
-        logger.info("✅ EDGAR filings processing complete!")
-    except Exception as e:
-        error_msg = f"❌ Error processing EDGAR filings: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        print(error_msg)
+        # Process EDGAR Filings
+        logger.info("\n3️⃣ Processing EDGAR Filings...")
+        try:
+            process_all_edgar_filings()
+            logger.info("✅ EDGAR filings processing complete!")
+        except Exception as e:
+            error_msg = f"❌ Error processing EDGAR filings: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            print(error_msg)
     
-    # Process FRED Data (if available)
-    logger.info("\n4️⃣ Processing FRED Data...")
-    try:
-        from config import FRED_SOURCE_DIR
-        if os.path.exists(FRED_SOURCE_DIR):
-            logger.info("FRED data directory found, processing...")
-            # Add FRED processing logic here when available
-            logger.info("FRED processing not yet implemented")
-        else:
-            logger.info("No FRED data found, skipping...")
-        logger.info("✅ FRED data processing complete!")
-    except Exception as e:
-        error_msg = f"❌ Error processing FRED data: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        print(error_msg)
+        # Process FRED Data (if available)
+        logger.info("\n4️⃣ Processing FRED Data...")
+        try:
+            from config import FRED_SOURCE_DIR
+            if os.path.exists(FRED_SOURCE_DIR):
+                logger.info("FRED data directory found, processing...")
+                # Add FRED processing logic here when available
+                logger.info("FRED processing not yet implemented")
+            else:
+                logger.info("No FRED data found, skipping...")
+            logger.info("✅ FRED data processing complete!")
+        except Exception as e:
+            error_msg = f"❌ Error processing FRED data: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            print(error_msg)
     
     completion_msg = "\n🎉 All Downloaded Data Processing Complete!"
     completion_msg += "\n📈 Your database now contains processed data from all sources."
@@ -967,8 +993,23 @@ def database_menu():
     while True:
         print("\n--- Database Menu ---")
         print("1. View Database Statistics")
-        print("2. Export Database to CSV")
+        print("2. Export Table (CSV/Parquet)")
         print("3. Reset Database")
+        print("4. View Connection Settings")
+        print("5. Recount Database Statistics")
+        print("6. Sync Columnar Analytics Store")
+        print("7. Archive Old Swap Months")
+        print("8. Compact Swap Storage")
+        print("9. Compress Filing Text")
+        print("10. Rebuild Live Swap Positions")
+        print("11. Rebuild Daily Swap Aggregates")
+        print("12. Rebuild Swap Exposure Cube")
+        print("13. Extract Derivative Disclosures")
+        print("14. Refresh Company Profiles")
+        print("15. Rebuild Filing Event Timeline")
+        print("16. Rebuild Security Holder Index")
+        print("17. Rebuild Insider Rollups")
+        print("18. Rebuild 13F Position Deltas")
         print("B. Back to Main Menu")
         choice = input("Enter your choice: ").strip().lower()
 
@@ -978,13 +1019,102 @@ def database_menu():
             for table, count in stats.items():
                 print(f"- {table}: {count} records")
         elif choice == '2':
-            output_path = input("Enter output path for CSV (e.g., export.csv): ").strip()
+            table_name = input("Enter table to export [cftc_swap_data]: ").strip() or 'cftc_swap_data'
+            output_path = input("Enter output path (.csv or .parquet, e.g., export.csv): ").strip()
             if output_path:
-                export_db_to_csv(output_path)
+                try:
+                    rows = export_table(table_name, output_path)
+                    print(f"Exported {rows} rows from {table_name} to {output_path}")
+                except (ValueError, ImportError) as e:
+                    print(f"Export failed: {e}")
         elif choice == '3':
             confirm = input("Are you sure you want to reset the database? This will delete all data. (y/n): ").strip().lower()
             if confirm == 'y':
                 reset_database()
+        elif choice == '4':
+            print("\nConnection Settings:")
+            for setting, value in get_connection_stats().items():
+                print(f"- {setting}: {value}")
+        elif choice == '5':
+            counts = recount_table_statistics()
+            print(f"\nRecounted {len(counts)} tables ({sum(counts.values())} records).")
+        elif choice == '6':
+            from src.columnar_store import COLUMNAR_AVAILABLE, get_columnar_sidecar
+            if not COLUMNAR_AVAILABLE:
+                print("Columnar store requires duckdb and pyarrow (pip install duckdb pyarrow).")
+                continue
+            sidecar = get_columnar_sidecar()
+            for table, rows in sidecar.sync().items():
+                print(f"- {table}: {rows} new rows")
+            for table, state in sidecar.status().items():
+                print(f"  {table}: {state['synced_rows']} rows, {'fresh' if state['fresh'] else 'stale'}")
+        elif choice == '7':
+            from src.swap_partitions import get_partition_manager
+            manager = get_partition_manager()
+            for month, rows in manager.archive_months().items():
+                print(f"- Archived {month}: {rows} swaps")
+            keep = input("Drop archived months older than how many months? (blank to keep all): ").strip()
+            if keep.isdigit():
+                for month in manager.apply_retention(int(keep)):
+                    print(f"- Dropped {month}")
+        elif choice == '8':
+            from src.processor_cftc_swaps import compact_swap_storage
+            report = compact_swap_storage()
+            print(f"\nRewrote {sum(report['rewritten_values'].values())} values; "
+                  f"size {report['size_before_bytes']:,} -> {report['size_after_bytes']:,} bytes")
+            for column, count in report['unparseable_numeric_values'].items():
+                print(f"- {column}: {count} values left as text (not numeric)")
+        elif choice == '9':
+            compress_text_columns()
+            for column, stats in get_compression_report().items():
+                ratio = f"{stats['ratio']}x" if stats['ratio'] else "n/a"
+                print(f"- {column}: {stats['rows']} rows, {stats['raw_bytes']:,} -> "
+                      f"{stats['stored_bytes']:,} bytes ({ratio})")
+        elif choice == '10':
+            from src.swap_lifecycle import rebuild_live_trades, get_live_trade_summary
+            result = rebuild_live_trades()
+            print(f"\nReplayed {result['events']} events ({result['terminated']} terminated trades).")
+            for row in get_live_trade_summary():
+                print(f"- {row['asset_class']}: {row['live_trades']} live trades, "
+                      f"{row['total_notional']:,.0f} notional")
+        elif choice == '11':
+            from src.swap_aggregates import refresh_daily_aggregates
+            rows = refresh_daily_aggregates()
+            print(f"\nRebuilt {rows} daily swap aggregate rows.")
+        elif choice == '12':
+            from src.exposure_cube import rebuild_exposure_cube, query_exposure_cube
+            cells = rebuild_exposure_cube()
+            print(f"\nRebuilt exposure cube with {cells} cells.")
+            for row in query_exposure_cube(['asset_class']):
+                print(f"- {row['asset_class']}: {row['trade_count']} live trades, "
+                      f"{row['total_notional']:,.0f} notional")
+        elif choice == '13':
+            from src.derivative_disclosures import extract_missing_disclosures
+            filings = extract_missing_disclosures()
+            print(f"\nExtracted derivative disclosures for {filings} filings.")
+        elif choice == '14':
+            from src.company_profiles import refresh_changed_profiles
+            profiles = refresh_changed_profiles()
+            print(f"\nRefreshed {profiles} company profiles.")
+        elif choice == '15':
+            from src.filing_events import refresh_filing_events
+            events = refresh_filing_events()
+            print(f"\nRebuilt the filing event timeline with {events} events.")
+        elif choice == '16':
+            from src.security_holders import refresh_security_holders
+            rows = refresh_security_holders()
+            print(f"\nRebuilt the security holder index with {rows} holder rows.")
+        elif choice == '17':
+            from src.insider_rollups import refresh_insider_rollups
+            rows = refresh_insider_rollups()
+            print(f"\nRebuilt {rows} insider rollup rows.")
+        elif choice == '18':
+            from src.form13f_flows import refresh_position_deltas
+            from src.security_holders import refresh_security_holders
+            built = refresh_position_deltas()
+            rows = refresh_security_holders('13f', built) if built else 0
+            print(f"\nRebuilt {sum(built.values())} 13F position deltas across {len(built)} quarters "
+                  f"({rows} holder rows).")
         elif choice == 'b':
             break
         else:
@@ -55,6 +55,15 @@ CACHE_DIR = os.path.join(ROOT_DIR, "cache")
 EMBEDDING_CACHE_DIR = os.path.join(CACHE_DIR, "embeddings")
 VECTOR_CACHE_DIR = os.path.join(CACHE_DIR, "vectors")
 
+# Shared analytics result cache (src/result_cache.py). Set ANALYTICS_CACHE_DB to a
+# file path to add an on-disk SQLite tier shared across processes and restarts.
+ANALYTICS_CACHE_DB = os.getenv("ANALYTICS_CACHE_DB", "")
+ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "512"))
+ANALYTICS_CACHE_MAX_AGE = int(os.getenv("ANALYTICS_CACHE_MAX_AGE", str(6 * 3600)))
+
+# Refresh scheduler state (per-stage input fingerprints and timings)
+REFRESH_STATE_FILE = os.path.join(CACHE_DIR, "refresh_state.json")
+
 # CFTC API Base URLs
 CFTC_BASE_URL = "https://www.cftc.gov/api/v2/"
 
@@ -72,4 +81,10 @@ CFTC_SWAP_DATA_REPOSITORY_URL = "https://www.cftc.gov/IndustryOversight/DataRepo
 
 # Legacy paths for backward compatibility (will be deprecated)
 # These point to the same locations but maintain old variable names
-ROOT_DIR_LEGACY = "./"  # For root directory imports
\ No newline at end of file
+ROOT_DIR_LEGACY = "./"  # For root directory imports
+# Columnar (Parquet) sidecar for scan-heavy analytics, queried through DuckDB
+COLUMNAR_DIR = os.path.join(DATA_DIR, "columnar")
+
+# Monthly CFTC swap partitions (one SQLite file per month, attached on demand)
+CFTC_PARTITION_DIR = os.path.join(DATA_DIR, "cftc_partitions")
+CFTC_HOT_MONTHS = int(os.getenv("CFTC_HOT_MONTHS", "12"))
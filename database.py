@@ -1,5 +1,8 @@
+import json
+import os
+from contextlib import contextmanager
 from datetime import datetime
-from sqlalchemy import create_engine, Index
+from sqlalchemy import create_engine, event, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
 import pandas as pd
@@ -8,10 +11,191 @@ import pandas as pd
 Base = declarative_base()
 
 DATABASE_URL = "sqlite:///./gamecock.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+# SQLite pragma profiles applied to every pooled connection.
+# 'default' lets readers and the ingest writer run concurrently (WAL) and only
+# fsyncs at checkpoints; 'bulk_load' trades crash durability for backfill speed.
+PRAGMA_PROFILES = {
+    'default': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,        # 64 MB page cache (negative = KiB)
+        'mmap_size': 268435456,      # 256 MB memory-mapped I/O
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    'bulk_load': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -262144,       # 256 MB page cache
+        'mmap_size': 1073741824,     # 1 GB memory-mapped I/O
+        'temp_store': 'MEMORY',
+        'busy_timeout': 30000,
+    },
+}
+PRAGMA_PROFILE = os.getenv('GAMECOCK_SQLITE_PROFILE', 'default')
+_active_pragma_profile = {'name': PRAGMA_PROFILE}
+
+
+def apply_pragmas(dbapi_connection, profile=None):
+    """Apply a pragma profile (name or dict) to a raw DB-API connection."""
+    if isinstance(profile, dict):
+        pragmas = profile
+    else:
+        pragmas = PRAGMA_PROFILES[profile or _active_pragma_profile['name']]
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
+
+
+def create_tuned_engine(url=DATABASE_URL, profile=None, **kwargs):
+    """
+    Create a SQLite engine whose connections carry the active pragma profile.
+
+    The profile is applied on connect and re-applied on checkout whenever the
+    active profile has changed (see bulk_load_mode), so pooled connections
+    never keep stale settings.
+    """
+    connect_args = kwargs.pop('connect_args', {})
+    connect_args.setdefault('check_same_thread', False)
+    new_engine = create_engine(url, connect_args=connect_args, **kwargs)
+
+    if new_engine.dialect.name != 'sqlite':
+        return new_engine
+
+    def _profile_name():
+        return profile or _active_pragma_profile['name']
+
+    @event.listens_for(new_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, _profile_name())
+        connection_record.info['pragma_profile'] = _profile_name()
+
+    @event.listens_for(new_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        if connection_record.info.get('pragma_profile') != _profile_name():
+            apply_pragmas(dbapi_connection, _profile_name())
+            connection_record.info['pragma_profile'] = _profile_name()
+
+    return new_engine
+
+
+_deferred_indexes = {'active': False}
+
+
+def restore_deferred_indexes():
+    """
+    Rebuild the managed indexes and statistics triggers dropped by
+    bulk_load_mode(defer_indexes=True), then recount. A no-op unless they
+    are currently deferred, so a refresh can restore them as soon as its
+    loads finish and the block's exit does nothing more. Returns True if
+    they were rebuilt.
+    """
+    if not _deferred_indexes['active']:
+        return False
+    create_managed_indexes()
+    install_stats_catalog(recount_all=True)
+    _deferred_indexes['active'] = False
+    return True
+
+
+@contextmanager
+def bulk_load_mode(defer_indexes=False):
+    """
+    Switch every connection checked out inside the block to the bulk-load profile.
+
+    With defer_indexes=True the managed secondary indexes and statistics
+    triggers are dropped on entry and rebuilt once on exit (followed by a
+    recount), so a backfill doesn't maintain them row by row. Work inside
+    the block that reads through those indexes can call
+    restore_deferred_indexes first.
+    """
+    previous = _active_pragma_profile['name']
+    _active_pragma_profile['name'] = 'bulk_load'
+    if defer_indexes:
+        drop_managed_indexes()
+        drop_stats_triggers()
+        _deferred_indexes['active'] = True
+    try:
+        yield
+    finally:
+        _active_pragma_profile['name'] = previous
+        if defer_indexes:
+            restore_deferred_indexes()
+        # Make the relaxed settings durable before leaving bulk mode
+        try:
+            with engine.connect() as conn:
+                conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)")
+        except Exception as e:
+            print(f"Warning: WAL checkpoint after bulk load failed: {e}")
+
+
+engine = create_tuned_engine(DATABASE_URL)
 SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
 
-from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Boolean, JSON, BigInteger
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Boolean, JSON, BigInteger, LargeBinary
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import deferred
+from sqlalchemy.types import TypeDecorator
+import sqlite3
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# One-byte codec prefix on every compressed value
+_CODEC_RAW, _CODEC_ZLIB, _CODEC_ZSTD = b'\x00', b'\x01', b'\x02'
+# Below this many bytes compression costs more than it saves
+COMPRESSION_MIN_BYTES = 64
+
+def compress_text(value):
+    """Encodes text as a codec-prefixed blob (zstd if installed, else zlib)."""
+    if value is None:
+        return None
+    raw = value.encode('utf-8')
+    if len(raw) < COMPRESSION_MIN_BYTES:
+        return _CODEC_RAW + raw
+    if zstandard is not None:
+        return _CODEC_ZSTD + zstandard.ZstdCompressor(level=6).compress(raw)
+    return _CODEC_ZLIB + zlib.compress(raw, 6)
+
+def decompress_text(value):
+    """Inverse of compress_text; plain TEXT values (not yet migrated) pass through."""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    codec, payload = value[:1], value[1:]
+    if codec == _CODEC_ZLIB:
+        return zlib.decompress(payload).decode('utf-8')
+    if codec == _CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Value was compressed with zstd; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    if codec == _CODEC_RAW:
+        return payload.decode('utf-8')
+    return value.decode('utf-8')
+
+class CompressedText(TypeDecorator):
+    """Text stored compressed as a BLOB; compressed on bind, decompressed on load."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
+@event.listens_for(Engine, "connect")
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    # Lets raw SQL read compressed bodies: WHERE decompress_text(content) LIKE '%swap%'
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('decompress_text', 1, decompress_text, deterministic=True)
 
 class SecSubmission(Base):
     __tablename__ = 'sec_submissions'
@@ -24,7 +208,7 @@ class SecSubmission(Base):
     form3_holding_reported = Column(String(1))
     form4_trans_reported = Column(String(1))
     document_type = Column(String(20), nullable=False)
-    issuercik = Column(String(10), nullable=False)
+    issuercik = Column(String(10), nullable=False, index=True)
     issuername = Column(String(150), nullable=False)
     issuertradingsymbol = Column(String(10), nullable=False)
     remarks = Column(String(2000))
@@ -179,6 +363,31 @@ class SecOwnerSignature(Base):
     ownersignaturename = Column(String(255), primary_key=True)
     ownersignaturedate = Column(DateTime, nullable=False)
 
+class SecInsiderDailyRollup(Base):
+    """Non-derivative insider transactions rolled up per issuer, day and transaction code."""
+    __tablename__ = 'sec_insider_daily_rollups'
+    __table_args__ = (
+        Index('idx_sec_insider_daily_rollups_date_code', 'trans_date', 'trans_code'),
+    )
+
+    issuercik = Column(String(10), primary_key=True)
+    trans_date = Column(String(10), primary_key=True)  # YYYY-MM-DD
+    trans_code = Column(String(1), primary_key=True)  # P purchase, S sale, A grant, ...; '' if missing
+    issuername = Column(String(150))
+    transactions = Column(Integer, nullable=False, default=0)
+    large_transactions = Column(Integer, default=0)  # shares * price above $10k
+    shares_acquired = Column(Float, default=0)
+    shares_disposed = Column(Float, default=0)
+    value_acquired = Column(Float, default=0)
+    value_disposed = Column(Float, default=0)
+    large_value_acquired = Column(Float, default=0)
+    large_value_disposed = Column(Float, default=0)
+    insiders = Column(Integer, default=0)  # Distinct reporting owners that day
+    buying_insiders = Column(Integer, default=0)
+    selling_insiders = Column(Integer, default=0)
+    buy_sell_ratio = Column(Float)  # value_acquired / value_disposed; NULL without disposals
+    refreshed_at = Column(DateTime, default=datetime.utcnow)
+
 
 
 class Form13FSubmission(Base):
@@ -264,6 +473,56 @@ class Form13FInfoTable(Base):
     voting_auth_shared = Column(Integer, nullable=True)
     voting_auth_none = Column(Integer, nullable=True)
 
+class Form13FPositionDelta(Base):
+    """Per-filer, per-CUSIP change in a 13F position against the filer's previous quarter."""
+    __tablename__ = 'form13f_position_deltas'
+    __table_args__ = (
+        Index('idx_form13f_position_deltas_cusip', 'cusip', 'quarter'),
+        Index('idx_form13f_position_deltas_cik', 'cik', 'quarter'),
+    )
+
+    quarter = Column(String(7), primary_key=True)  # YYYY-Qn of period_of_report
+    cik = Column(String(10), primary_key=True)
+    cusip = Column(String(9), primary_key=True)
+    nameofissuer = Column(String(200))
+    value = Column(BigInteger)
+    previous_value = Column(BigInteger)
+    value_change = Column(BigInteger)
+    shares = Column(BigInteger)
+    previous_shares = Column(BigInteger)
+    share_change = Column(BigInteger)
+    change_type = Column(String(10))  # new, increased, decreased, unchanged, exited
+
+class Form13FCusipFlow(Base):
+    """Net institutional flow per CUSIP and quarter, summed from form13f_position_deltas."""
+    __tablename__ = 'form13f_cusip_flows'
+    __table_args__ = (
+        Index('idx_form13f_cusip_flows_value_change', 'quarter', 'value_change'),
+    )
+
+    quarter = Column(String(7), primary_key=True)
+    cusip = Column(String(9), primary_key=True)
+    nameofissuer = Column(String(200))
+    total_value = Column(BigInteger)
+    previous_value = Column(BigInteger)
+    value_change = Column(BigInteger)
+    pct_change = Column(Float)
+    holders = Column(Integer)
+    previous_holders = Column(Integer)
+    holder_change = Column(Integer)
+    new_positions = Column(Integer)
+    exited_positions = Column(Integer)
+    increased_positions = Column(Integer)
+    decreased_positions = Column(Integer)
+    built_at = Column(DateTime, default=datetime.utcnow)
+
+class Form13FDeltaBuild(Base):
+    """13F quarters whose position deltas have been built; a filed quarter missing here is built on first use."""
+    __tablename__ = 'form13f_delta_builds'
+
+    quarter = Column(String(7), primary_key=True)
+    built_at = Column(DateTime, default=datetime.utcnow)
+
 class SecExchangeMetrics(Base):
     __tablename__ = 'sec_exchange_metrics'
     id = Column(Integer, primary_key=True, index=True)
@@ -991,13 +1250,36 @@ class Sec10KDocument(Base):
     accession_number = Column(String(25), nullable=False, index=True)
     section = Column(String(50), nullable=False)  # e.g., 'business', 'risk_factors', 'mdna'
     sequence = Column(Integer, nullable=False)  # Order of sections
-    content = Column(Text)
+    content = deferred(Column(CompressedText))  # Loaded only when accessed
     word_count = Column(Integer)
     
     __table_args__ = (
         {'sqlite_autoincrement': True}
     )
 
+class Sec10KRiskFactorDiff(Base):
+    """Year-over-year risk factor changes between two filings of a company, computed once and reused."""
+    __tablename__ = 'sec_10k_risk_factor_diffs'
+    __table_args__ = (
+        Index('idx_sec_10k_risk_factor_diffs_cik_year', 'cik', 'year'),
+    )
+
+    accession_number = Column(String(25), primary_key=True)  # Later filing
+    previous_accession_number = Column(String(25), primary_key=True)
+    cik = Column(String(10), nullable=False)
+    year = Column(Integer, nullable=False)  # Filing year of the later filing
+    previous_year = Column(Integer, nullable=False)
+    paragraphs_added = Column(Integer, default=0)
+    paragraphs_removed = Column(Integer, default=0)
+    paragraphs_retained = Column(Integer, default=0)
+    words_added = Column(Integer, default=0)
+    words_removed = Column(Integer, default=0)
+    word_count_change = Column(Integer, default=0)
+    similarity = Column(Float)  # Jaccard similarity of the paragraph sets
+    added_samples = Column(JSON)  # First few new paragraphs, truncated
+    removed_samples = Column(JSON)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
 class Sec10KFinancials(Base):
     """Stores financial statement data from 10-K/10-Q filings."""
     __tablename__ = 'sec_10k_financials'
@@ -1093,7 +1375,7 @@ class Sec8KItem(Base):
     accession_number = Column(String(25), nullable=False, index=True)
     item_number = Column(String(20), nullable=False) # e.g., '1.01', '5.02'
     item_title = Column(String(255))
-    content = Column(Text)
+    content = deferred(Column(CompressedText))  # Loaded only when accessed
     
     __table_args__ = (
         {'sqlite_autoincrement': True},
@@ -1159,6 +1441,26 @@ class Sec8KItem(Base):
     other_instrument_amt = Column(Float)
     other_instrument_brief_descripti = Column(String(250))
 
+class SecDerivativeDisclosure(Base):
+    """Derivative-disclosure features of a 10-K/10-Q/8-K filing, extracted once at ingest."""
+    __tablename__ = 'sec_derivative_disclosures'
+
+    accession_number = Column(String(25), primary_key=True)
+    cik = Column(String(10), nullable=False, index=True)
+    form_type = Column(String(10))
+    filing_date = Column(DateTime, index=True)
+    disclosure_sections = Column(Integer, default=0)  # Sections classified as derivative disclosures
+    derivative_mentions = Column(Integer, default=0)
+    swap_mentions = Column(Integer, default=0)
+    hedge_mentions = Column(Integer, default=0)
+    notional_total = Column(Float)  # Sum of the notional figures found; NULL if none
+    max_notional = Column(Float)
+    has_hedging_language = Column(Boolean, default=False)
+    hedge_designations = Column(JSON)  # e.g. ['cash_flow', 'fair_value']
+    counterparties = Column(JSON)  # Named derivative counterparties
+    sections = Column(JSON)  # Per section: section, disclosure_type, confidence_score, extracted_data, excerpt
+    extracted_at = Column(DateTime, default=datetime.utcnow)
+
 class CFTCSwap(Base):
     __tablename__ = 'cftc_swap_data'
 
@@ -1276,6 +1578,96 @@ class CFTCSwap(Base):
     physical_delivery_location_leg_1 = Column(String)
     delivery_type = Column(String)
 
+class CFTCLiveTrade(Base):
+    """Latest state of each live swap, derived from its CFTC lifecycle events (NEWT/MODI/CORR/TERM)."""
+    __tablename__ = 'cftc_live_trades'
+
+    trade_id = Column(String, primary_key=True)  # Original dissemination id (own id for NEWT)
+    dissemination_id = Column(String)  # Event that produced the current state
+    source_swap_id = Column(Integer)  # cftc_swap_data.id of that event
+    action_type = Column(String)
+    event_type = Column(String)
+    event_timestamp = Column(DateTime)
+    execution_timestamp = Column(DateTime)
+    effective_date = Column(DateTime)
+    expiration_date = Column(DateTime)
+    asset_class = Column(String, index=True)
+    product_name = Column(String)
+    cleared = Column(String)
+    platform_identifier = Column(String)
+    notional_amount_leg_1 = Column(Float)
+    notional_amount_leg_2 = Column(Float)
+    notional_currency_leg_1 = Column(String)
+    notional_currency_leg_2 = Column(String)
+    fixed_rate_leg_1 = Column(Float)
+    spread_leg_1 = Column(Float)
+    price = Column(Float)
+    underlier_id_leg_1 = Column(String, index=True)
+    underlying_asset_name = Column(String, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CFTCTerminatedTrade(Base):
+    """Tombstone of each ended swap, so lifecycle events older than its termination are treated as stale."""
+    __tablename__ = 'cftc_terminated_trades'
+
+    trade_id = Column(String, primary_key=True)
+    dissemination_id = Column(String)  # Terminating event
+    source_swap_id = Column(Integer)
+    action_type = Column(String)  # TERM, EROR or PRTO
+    event_timestamp = Column(DateTime)
+    execution_timestamp = Column(DateTime)
+    terminated_at = Column(DateTime, default=datetime.utcnow)
+
+class CFTCLifecycleWatermark(Base):
+    """Highest cftc_swap_data.id already applied to cftc_live_trades (single row)."""
+    __tablename__ = 'cftc_lifecycle_watermark'
+
+    id = Column(Integer, primary_key=True)
+    last_swap_id = Column(Integer, nullable=False, default=0)
+    applied_at = Column(DateTime)
+
+class CFTCExposureCube(Base):
+    """Live swap exposure pre-aggregated by reference entity, asset class, currency, tenor bucket and month."""
+    __tablename__ = 'cftc_exposure_cube'
+    __table_args__ = (
+        Index('idx_cftc_exposure_cube_asset_class', 'asset_class', 'currency'),
+        Index('idx_cftc_exposure_cube_month', 'month'),
+    )
+
+    # Cell keys; missing values are stored as '' so they can be part of the key
+    reference_entity = Column(String(200), primary_key=True)  # Underlier id, else underlying asset name
+    asset_class = Column(String(50), primary_key=True)
+    currency = Column(String(10), primary_key=True)  # Leg 1 notional currency
+    tenor_bucket = Column(String(10), primary_key=True)  # Original tenor, e.g. '2-5Y'
+    month = Column(String(7), primary_key=True)  # YYYY-MM of execution
+    trade_count = Column(Integer, nullable=False, default=0)
+    notional_count = Column(Integer, nullable=False, default=0)
+    notional_sum = Column(Float, nullable=False, default=0)
+    cleared_trade_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class CFTCSwapDailyAggregate(Base):
+    """Per-day swap activity by asset class, product and currency, refreshed for the days each ingest touches."""
+    __tablename__ = 'cftc_swap_daily_aggregates'
+
+    # Grouping keys; missing values are stored as '' so they can be part of the key
+    trade_date = Column(String(10), primary_key=True)  # YYYY-MM-DD of execution_timestamp
+    asset_class = Column(String(50), primary_key=True)
+    product_name = Column(String(200), primary_key=True)
+    notional_currency = Column(String(10), primary_key=True)
+    trade_count = Column(Integer, nullable=False, default=0)
+    notional_count = Column(Integer, nullable=False, default=0)  # Trades with a disclosed notional
+    notional_sum = Column(Float)
+    notional_min = Column(Float)
+    notional_max = Column(Float)
+    notional_p50 = Column(Float)
+    notional_p90 = Column(Float)
+    notional_p99 = Column(Float)
+    block_trades = Column(Integer, default=0)
+    cleared_trades = Column(Integer, default=0)
+    platform_trades = Column(Integer, default=0)
+    refreshed_at = Column(DateTime, default=datetime.utcnow)
+
 # Form D Tables
 class FormDSubmission(Base):
     __tablename__ = 'formd_submissions'
@@ -1410,49 +1802,691 @@ class FormDSignature(Base):
     signaturetitle = Column(String(100), nullable=True)
     signaturedate = Column(String(20), nullable=True)  # Store as string, convert during processing
 
+class TableStatistics(Base):
+    """Row counts and date coverage per table, kept current by insert/delete triggers."""
+    __tablename__ = 'table_statistics'
+
+    table_name = Column(String(100), primary_key=True)
+    row_count = Column(BigInteger, nullable=False, default=0)
+    date_column = Column(String(100))
+    min_date = Column(String(32))  # Raw stored value; Form D dates are free-form strings
+    max_date = Column(String(32))
+    last_ingest_at = Column(DateTime)
+    last_recount_at = Column(DateTime)
+
+# Large document bodies stored with CompressedText
+COMPRESSED_TEXT_COLUMNS = [
+    ('sec_10k_documents', 'content'),
+    ('sec_8k_items', 'content'),
+]
+
+class CFTCSwapPartition(Base):
+    """Catalog of monthly CFTC swap partitions rolled out of cftc_swap_data into their own files."""
+    __tablename__ = 'cftc_swap_partitions'
+
+    month = Column(String(7), primary_key=True)  # YYYY-MM of execution_timestamp
+    path = Column(String(500), nullable=False)
+    row_count = Column(BigInteger, nullable=False, default=0)
+    min_execution_timestamp = Column(DateTime)
+    max_execution_timestamp = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+class CompanyProfile(Base):
+    """Per-company snapshot across insider, periodic, 13F, N-PORT, N-MFP and Form D data, refreshed for the CIKs an ingest touches."""
+    __tablename__ = 'company_profiles'
+    __table_args__ = (
+        Index('idx_company_profiles_name', 'company_name'),
+        Index('idx_company_profiles_latest_filing', 'latest_filing_date'),
+    )
+
+    cik = Column(String(10), primary_key=True)  # Without zero padding, as in data_change_log
+    company_name = Column(String(255))
+    ticker_symbol = Column(String(10))
+    lei = Column(String(20))
+    insider_filings = Column(Integer, default=0)  # Forms 3/4/5 naming the company as issuer
+    periodic_filings = Column(Integer, default=0)  # 10-K/10-Q
+    current_reports = Column(Integer, default=0)  # 8-K
+    form13f_filings = Column(Integer, default=0)  # As a 13F filer
+    nport_filings = Column(Integer, default=0)
+    nmfp_filings = Column(Integer, default=0)
+    formd_filings = Column(Integer, default=0)
+    latest_filing_date = Column(DateTime)
+    latest_filings = Column(JSON)  # [{source, form_type, filing_date, accession_number}], newest first
+    insider_transactions = Column(Integer, default=0)
+    insider_purchase_value = Column(Float, default=0)  # Open-market purchases (code P)
+    insider_sale_value = Column(Float, default=0)  # Open-market sales (code S)
+    latest_insider_trade = Column(String(10))
+    insider_by_year = Column(JSON)  # {year: {transactions, purchase_value, sale_value}}
+    formd_offerings = Column(Integer, default=0)  # Original notices, amendments excluded
+    formd_offering_amount = Column(Float, default=0)
+    formd_amount_sold = Column(Float, default=0)
+    latest_formd_date = Column(String(20))
+    institutional_quarter = Column(String(7))  # YYYY-Qn of the holder figures
+    institutional_holders = Column(Integer, default=0)
+    institutional_value = Column(Float, default=0)
+    holder_cusips = Column(JSON)  # CUSIPs matched to the company by issuer name
+    top_holders = Column(JSON)  # [{cik, name, value, shares}], largest first
+    refreshed_at = Column(DateTime, default=datetime.utcnow)
+
+class CompanyProfileWatermark(Base):
+    """Highest data_change_log epoch already applied to company_profiles (single row)."""
+    __tablename__ = 'company_profile_watermark'
+
+    id = Column(Integer, primary_key=True)
+    last_epoch = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime)
+
+class FilingEvent(Base):
+    """Dated filing events per company: 8-K items, 10-K/10-Q filings, Form D notices and insider filings."""
+    __tablename__ = 'filing_events'
+    __table_args__ = (
+        Index('idx_filing_events_cik_date', 'cik', 'event_date'),
+    )
+
+    accession_number = Column(String(25), primary_key=True)
+    cik = Column(String(10), primary_key=True)  # Without zero padding; Form D notices can name several issuers
+    event_code = Column(String(20), primary_key=True)  # 8-K item number, otherwise the form type
+    source = Column(String(10), nullable=False)  # 'current', 'periodic', 'formd' or 'insider'
+    event_date = Column(String(10), nullable=False)  # YYYY-MM-DD filing date
+    description = Column(String(255))  # 8-K item title
+
+class FilingEventMonthly(Base):
+    """Monthly filing event counts per company, source and event code."""
+    __tablename__ = 'filing_event_monthly'
+    __table_args__ = (
+        Index('idx_filing_event_monthly_month', 'month'),
+    )
+
+    cik = Column(String(10), primary_key=True)
+    month = Column(String(7), primary_key=True)  # YYYY-MM
+    source = Column(String(10), primary_key=True)
+    event_code = Column(String(20), primary_key=True)
+    events = Column(Integer, nullable=False, default=0)
+
+class FilingEventBuild(Base):
+    """Event sources whose timeline has been built in full; until then a refresh or read builds the source."""
+    __tablename__ = 'filing_event_builds'
+
+    source = Column(String(10), primary_key=True)
+    built_at = Column(DateTime, default=datetime.utcnow)
+
+class SecurityHolder(Base):
+    """Holders of each security per quarter across 13F and N-PORT, keyed by CUSIP or ISIN."""
+    __tablename__ = 'security_holders'
+    __table_args__ = (
+        Index('idx_security_holders_dataset_period', 'dataset', 'period'),
+    )
+
+    id_type = Column(String(5), primary_key=True)  # 'cusip' or 'isin'
+    identifier = Column(String(12), primary_key=True)
+    period = Column(String(7), primary_key=True)  # YYYY-Qn of the report date
+    dataset = Column(String(5), primary_key=True)  # '13f' or 'nport'
+    holder_id = Column(String(50), primary_key=True)  # 13F filer CIK; N-PORT series ID, else registrant CIK
+    holder_cik = Column(String(10))
+    holder_lei = Column(String(20))
+    holder_name = Column(String(200))
+    issuer_name = Column(String(200))
+    quantity = Column(BigInteger)  # 13F shares/principal; N-PORT balance held
+    value = Column(BigInteger)
+    accession_number = Column(String(25))
+
+class SecurityHolderBuild(Base):
+    """Datasets whose holder index has been built for every quarter; until then a refresh or read builds it."""
+    __tablename__ = 'security_holder_builds'
+
+    dataset = Column(String(5), primary_key=True)
+    built_at = Column(DateTime, default=datetime.utcnow)
+
+class DataChangeLog(Base):
+    """Change-data-capture log written by ingestion; each entry's epoch is a monotonic data version."""
+    __tablename__ = 'data_change_log'
+    __table_args__ = (
+        Index('idx_data_change_log_table_epoch', 'table_name', 'epoch'),
+        Index('idx_data_change_log_key_epoch', 'key_value', 'epoch'),
+    )
+
+    epoch = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String(100), nullable=False)
+    key_type = Column(String(10))  # 'cik' or 'lei'; NULL when the batch may touch any key
+    key_value = Column(String(32))
+    row_count = Column(Integer)
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+# Record columns that identify the entity a loaded row belongs to
+CHANGE_KEY_COLUMNS = {
+    'cik': 'cik',
+    'issuercik': 'cik',
+    'rptownercik': 'cik',
+    'filer_cik': 'cik',
+    'lei': 'lei',
+    'adviser_lei': 'lei',
+    'registrant_leiid': 'lei',
+}
+# Batches touching more distinct keys than this are logged as a table-wide change
+CHANGE_LOG_MAX_KEYS = 1000
+
+# Date column tracked for min/max coverage in the statistics catalog
+STATS_DATE_COLUMNS = {
+    'sec_submissions': 'filing_date',
+    'sec_non_deriv_trans': 'trans_date',
+    'sec_deriv_trans': 'trans_date',
+    'form13f_submissions': 'filing_date',
+    'sec_exchange_metrics': 'date',
+    'ncen_submissions': 'filing_date',
+    'nport_submissions': 'filing_date',
+    'cftc_daily_swap_reports': 'report_date',
+    'nmfp_submissions': 'filing_date',
+    'sec_10k_submissions': 'filing_date',
+    'sec_8k_submissions': 'filing_date',
+    'cftc_swap_data': 'execution_timestamp',
+    'formd_submissions': 'filing_date',
+}
+
+# Secondary indexes for the hot filter/join columns used by the analytics engines
+# and entity resolver. They are kept out of the ORM metadata so bulk loads can
+# drop them and rebuild once afterwards (see bulk_load_mode).
+MANAGED_INDEXES = [
+    # (index name, table, columns)
+    ('ix_sec_submissions_issuercik_filing_date', 'sec_submissions', ('issuercik', 'filing_date')),
+    ('ix_sec_submissions_filing_date', 'sec_submissions', ('filing_date',)),
+    ('ix_sec_non_deriv_trans_trans_date', 'sec_non_deriv_trans', ('trans_date',)),
+    ('ix_form13f_submissions_cik_filing_date', 'form13f_submissions', ('cik', 'filing_date')),
+    ('ix_form13f_submissions_filing_date', 'form13f_submissions', ('filing_date',)),
+    ('ix_form13f_submissions_period', 'form13f_submissions', ('period_of_report', 'submission_type')),
+    ('ix_form13f_info_tables_cusip', 'form13f_info_tables', ('cusip', 'accession_number')),
+    ('ix_nport_submissions_cik_filing_date', 'nport_submissions', ('cik', 'filing_date')),
+    ('ix_nport_holdings_accession_number', 'nport_holdings', ('accession_number',)),
+    ('ix_nport_holdings_cusip', 'nport_holdings', ('cusip',)),
+    ('ix_formd_issuers_cik', 'formd_issuers', ('cik', 'accessionnumber')),
+    ('ix_formd_issuers_entityname', 'formd_issuers', ('entityname',)),
+    ('ix_formd_issuers_accessionnumber', 'formd_issuers', ('accessionnumber',)),
+    ('ix_formd_offerings_accessionnumber', 'formd_offerings', ('accessionnumber',)),
+    ('ix_nmfp_submissions_cik', 'nmfp_submissions', ('cik',)),
+    ('ix_nmfp_submissions_filing_date', 'nmfp_submissions', ('filing_date',)),
+    ('ix_cftc_swap_data_execution_timestamp', 'cftc_swap_data', ('execution_timestamp',)),
+    ('ix_cftc_swap_data_asset_class_execution', 'cftc_swap_data', ('asset_class', 'execution_timestamp')),
+    ('ix_cftc_swap_data_original_dissemination_id', 'cftc_swap_data', ('original_dissemination_id',)),
+]
+
+def create_managed_indexes(bind=None):
+    """Create any missing managed secondary indexes and refresh planner statistics."""
+    target = bind if bind is not None else engine
+    with target.begin() as conn:
+        for name, table, columns in MANAGED_INDEXES:
+            conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+        conn.exec_driver_sql("PRAGMA optimize")
+
+def drop_managed_indexes(bind=None):
+    """Drop the managed secondary indexes ahead of a bulk load."""
+    target = bind if bind is not None else engine
+    with target.begin() as conn:
+        for name, _, _ in MANAGED_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+
+def get_managed_index_status(bind=None):
+    """Returns a dictionary of managed index names and whether each currently exists."""
+    target = bind if bind is not None else engine
+    with target.connect() as conn:
+        existing = {row[0] for row in conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+    return {name: name in existing for name, _, _ in MANAGED_INDEXES}
+
+def _stats_tracked_tables():
+    return [name for name in Base.metadata.tables if name != TableStatistics.__tablename__]
+
+def install_stats_catalog(bind=None, recount_all=False):
+    """
+    Install the triggers that keep table_statistics current and seed missing rows.
+
+    Each insert/delete adjusts the row count in the same transaction as the
+    change itself, so the catalog never disagrees with committed data. Min/max
+    dates only widen on insert; run recount_table_statistics to tighten them
+    after deletes.
+    """
+    target = bind if bind is not None else engine
+    tables = _stats_tracked_tables()
+    with target.begin() as conn:
+        existing = set(conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'").scalars())
+        tables = [t for t in tables if t in existing]
+        for table in tables:
+            date_column = STATS_DATE_COLUMNS.get(table)
+            date_updates = ""
+            if date_column:
+                date_updates = (
+                    f", min_date = CASE WHEN NEW.{date_column} IS NOT NULL AND (min_date IS NULL OR NEW.{date_column} < min_date) "
+                    f"THEN NEW.{date_column} ELSE min_date END"
+                    f", max_date = CASE WHEN NEW.{date_column} IS NOT NULL AND (max_date IS NULL OR NEW.{date_column} > max_date) "
+                    f"THEN NEW.{date_column} ELSE max_date END"
+                )
+            conn.exec_driver_sql(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_stats_insert_{table} AFTER INSERT ON {table}
+                BEGIN
+                    UPDATE table_statistics
+                    SET row_count = row_count + 1, last_ingest_at = CURRENT_TIMESTAMP{date_updates}
+                    WHERE table_name = '{table}';
+                END
+            """)
+            conn.exec_driver_sql(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_stats_delete_{table} AFTER DELETE ON {table}
+                BEGIN
+                    UPDATE table_statistics SET row_count = row_count - 1 WHERE table_name = '{table}';
+                END
+            """)
+        seeded = set(conn.exec_driver_sql("SELECT table_name FROM table_statistics").scalars())
+    missing = tables if recount_all else [t for t in tables if t not in seeded]
+    if missing:
+        recount_table_statistics(missing, bind=target)
+
+def drop_stats_triggers(bind=None):
+    """Remove the statistics triggers ahead of a bulk load."""
+    target = bind if bind is not None else engine
+    with target.begin() as conn:
+        for table in _stats_tracked_tables():
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS trg_stats_insert_{table}")
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS trg_stats_delete_{table}")
+
+def recount_table_statistics(tables=None, bind=None):
+    """Recompute exact row counts and date coverage. Returns {table: row_count}."""
+    target = bind if bind is not None else engine
+    tables = tables or _stats_tracked_tables()
+    counts = {}
+    with target.begin() as conn:
+        for table in tables:
+            date_column = STATS_DATE_COLUMNS.get(table)
+            if date_column:
+                row_count, min_date, max_date = conn.exec_driver_sql(
+                    f"SELECT COUNT(*), MIN({date_column}), MAX({date_column}) FROM {table}").one()
+            else:
+                row_count = conn.exec_driver_sql(f"SELECT COUNT(*) FROM {table}").scalar()
+                min_date = max_date = None
+            conn.exec_driver_sql("""
+                INSERT INTO table_statistics
+                    (table_name, row_count, date_column, min_date, max_date, last_recount_at)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(table_name) DO UPDATE SET
+                    row_count = excluded.row_count,
+                    date_column = excluded.date_column,
+                    min_date = excluded.min_date,
+                    max_date = excluded.max_date,
+                    last_recount_at = excluded.last_recount_at
+            """, (table, row_count, date_column,
+                  str(min_date) if min_date is not None else None,
+                  str(max_date) if max_date is not None else None))
+            counts[table] = row_count
+    return counts
+
+def get_table_statistics(db_session=None):
+    """Returns the statistics catalog: row count, date coverage and ingest times per table."""
+    db = db_session if db_session else SessionLocal()
+    try:
+        return {
+            row.table_name: {
+                'row_count': row.row_count,
+                'date_column': row.date_column,
+                'min_date': row.min_date,
+                'max_date': row.max_date,
+                'last_ingest_at': row.last_ingest_at.isoformat() if row.last_ingest_at else None,
+                'last_recount_at': row.last_recount_at.isoformat() if row.last_recount_at else None,
+            }
+            for row in db.query(TableStatistics).order_by(TableStatistics.table_name)
+        }
+    finally:
+        if not db_session:
+            db.close()
+
+def normalize_change_key(value):
+    """Canonical form of a CIK or LEI: trimmed, upper-case, CIKs without zero padding."""
+    key = str(value).strip().upper()
+    return (key.lstrip('0') or '0') if key.isdigit() else key
+
+def record_data_change(db_session, table, records=None, row_count=None):
+    """
+    Adds change-log entries for an ingest batch to db_session.
+
+    The entries commit or roll back with the batch itself. Each CIK/LEI found
+    in records gets its own entry; a batch without identifying columns, or
+    with more than CHANGE_LOG_MAX_KEYS keys, gets one table-wide entry.
+    """
+    table_name = table if isinstance(table, str) else table.__tablename__
+    keys = {}
+    for record in records or []:
+        for column, key_type in CHANGE_KEY_COLUMNS.items():
+            value = record.get(column)
+            if value is not None and str(value).strip():
+                key = (key_type, normalize_change_key(value))
+                keys[key] = keys.get(key, 0) + 1
+    if row_count is None:
+        row_count = len(records) if records is not None else None
+
+    now = datetime.utcnow()
+    if not keys or len(keys) > CHANGE_LOG_MAX_KEYS:
+        db_session.add(DataChangeLog(table_name=table_name, row_count=row_count, changed_at=now))
+    else:
+        db_session.add_all([
+            DataChangeLog(table_name=table_name, key_type=key_type, key_value=key_value,
+                          row_count=count, changed_at=now)
+            for (key_type, key_value), count in keys.items()
+        ])
+
+def current_data_epoch(tables=None, db_session=None):
+    """Latest data epoch overall, or for the given tables. 0 before any change is logged."""
+    from sqlalchemy import func
+
+    db = db_session if db_session else SessionLocal()
+    try:
+        query = db.query(func.max(DataChangeLog.epoch))
+        if tables:
+            query = query.filter(DataChangeLog.table_name.in_(list(tables)))
+        return query.scalar() or 0
+    finally:
+        if not db_session:
+            db.close()
+
+def data_changed_since(epoch, tables=None, keys=None, db_session=None):
+    """
+    True if any of the tables (all tables if None) changed after epoch, or
+    the log was pruned after epoch.
+
+    With keys (CIKs/LEIs), only changes to those keys count, plus table-wide
+    changes whose keys were not recorded.
+    """
+    from sqlalchemy import or_
+
+    db = db_session if db_session else SessionLocal()
+    try:
+        query = db.query(DataChangeLog.epoch).filter(DataChangeLog.epoch > epoch)
+        if tables:
+            # A prune after epoch may have removed entries of the tables
+            query = query.filter(or_(DataChangeLog.table_name.in_(list(tables)),
+                                     DataChangeLog.table_name == DataChangeLog.__tablename__))
+        if keys:
+            normalized = list({normalize_change_key(key) for key in keys if key is not None})
+            query = query.filter(or_(DataChangeLog.key_value.is_(None),
+                                     DataChangeLog.key_value.in_(normalized)))
+        return query.first() is not None
+    finally:
+        if not db_session:
+            db.close()
+
+def prune_data_change_log(db_session=None):
+    """
+    Deletes change-log entries at or below the lowest epoch a watermark still
+    needs (the latest epoch when no watermark exists), keeping each table's
+    latest entry so current_data_epoch is unchanged. The prune itself is
+    logged as a change, so results cached before it are revalidated from
+    scratch. Returns the number of entries deleted.
+    """
+    from sqlalchemy import func
+
+    db = db_session if db_session else SessionLocal()
+    try:
+        watermark = db.query(func.min(CompanyProfileWatermark.last_epoch)).scalar()
+        floor = watermark if watermark is not None else current_data_epoch(db_session=db)
+        latest = (db.query(func.max(DataChangeLog.epoch)).group_by(DataChangeLog.table_name)
+                  .scalar_subquery())
+        deleted = (db.query(DataChangeLog)
+                   .filter(DataChangeLog.epoch <= floor, DataChangeLog.epoch.notin_(latest))
+                   .delete(synchronize_session=False))
+        if deleted:
+            record_data_change(db, DataChangeLog.__tablename__, row_count=deleted)
+        db.commit()
+        return deleted
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if not db_session:
+            db.close()
+
+def compress_text_columns(bind=None, batch_size=500):
+    """
+    Migrates plain-TEXT document bodies to CompressedText in batches.
+
+    Safe to re-run: only values still stored as text are rewritten. Returns
+    {'table.column': {'rows', 'raw_bytes', 'stored_bytes', 'ratio'}} for the
+    rows converted in this run.
+    """
+    target = bind if bind is not None else engine
+    report = {}
+    for table, column in COMPRESSED_TEXT_COLUMNS:
+        rows = raw_bytes = stored_bytes = 0
+        last_rowid = 0
+        while True:
+            with target.begin() as conn:
+                batch = conn.exec_driver_sql(
+                    f"SELECT rowid, {column} FROM {table} WHERE rowid > ? AND typeof({column}) = 'text' "
+                    f"ORDER BY rowid LIMIT ?", (last_rowid, batch_size)).all()
+                if not batch:
+                    break
+                updates = []
+                for rowid, value in batch:
+                    compressed = compress_text(value)
+                    raw_bytes += len(value.encode('utf-8'))
+                    stored_bytes += len(compressed)
+                    updates.append((compressed, rowid))
+                conn.exec_driver_sql(f"UPDATE {table} SET {column} = ? WHERE rowid = ?", updates)
+                rows += len(batch)
+                last_rowid = batch[-1][0]
+        report[f"{table}.{column}"] = {
+            'rows': rows,
+            'raw_bytes': raw_bytes,
+            'stored_bytes': stored_bytes,
+            'ratio': round(raw_bytes / stored_bytes, 2) if stored_bytes else None,
+        }
+    return report
+
+def get_compression_report(bind=None):
+    """Current raw vs stored size of every compressed column (decompresses each value once)."""
+    target = bind if bind is not None else engine
+    report = {}
+    with target.connect() as conn:
+        for table, column in COMPRESSED_TEXT_COLUMNS:
+            rows, stored, raw, uncompressed = conn.exec_driver_sql(f"""
+                SELECT COUNT({column}),
+                       COALESCE(SUM(length(CAST({column} AS BLOB))), 0),
+                       COALESCE(SUM(length(CAST(decompress_text({column}) AS BLOB))), 0),
+                       SUM(CASE WHEN typeof({column}) = 'text' THEN 1 ELSE 0 END)
+                FROM {table}
+            """).one()
+            report[f"{table}.{column}"] = {
+                'rows': rows,
+                'raw_bytes': raw,
+                'stored_bytes': stored,
+                'ratio': round(raw / stored, 2) if stored else None,
+                'uncompressed_rows': uncompressed or 0,
+            }
+    return report
+
 def create_db_and_tables():
     """Create database tables if they don't exist. Safe to run multiple times."""
     try:
         Base.metadata.create_all(bind=engine)
+        create_managed_indexes()
+        install_stats_catalog()
         return True
     except Exception as e:
         print(f"Error creating database tables: {e}")
         return False
 
 def get_db_stats(db_session=None):
-    """Returns a dictionary with table names and their row counts."""
+    """
+    Returns a dictionary with table names and their row counts.
+
+    Counts come from the table_statistics catalog; tables without a catalog
+    row (e.g. databases created without install_stats_catalog) are counted.
+    """
     from sqlalchemy import inspect
 
     db = db_session if db_session else SessionLocal()
     try:
         inspector = inspect(db.bind)
+        table_names = inspector.get_table_names()
+        catalog = {}
+        if TableStatistics.__tablename__ in table_names:
+            catalog = dict(db.query(TableStatistics.table_name, TableStatistics.row_count).all())
+
         stats = {}
         # Create a mapping from table names to model classes
         table_to_model = {cls.class_.__tablename__: cls for cls in Base.registry.mappers}
 
-        for table_name in inspector.get_table_names():
+        for table_name in table_names:
             model_class = table_to_model.get(table_name)
-            if model_class:
-                count = db.query(model_class.class_).count()
-                stats[table_name] = count
+            if not model_class or table_name == TableStatistics.__tablename__:
+                continue
+            if table_name in catalog:
+                stats[table_name] = catalog[table_name]
+            else:
+                stats[table_name] = db.query(model_class.class_).count()
         return stats
     finally:
         if not db_session:
             db.close()
 
-def export_db_to_csv(output_path):
-    """Exports the CFTC Swap data to a CSV file."""
-    db = SessionLocal()
+def get_connection_stats(bind=None):
+    """Returns the effective SQLite pragma settings and file statistics of a connection."""
+    target = bind if bind is not None else engine
+    pragmas = ['journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store',
+               'busy_timeout', 'page_size', 'page_count', 'freelist_count', 'wal_autocheckpoint']
+    with target.connect() as conn:
+        stats = {p: conn.exec_driver_sql(f"PRAGMA {p}").scalar() for p in pragmas}
+    stats['database_size_bytes'] = (stats['page_size'] or 0) * (stats['page_count'] or 0)
+    stats['active_profile'] = _active_pragma_profile['name']
+    return stats
+
+EXPORT_FORMATS = ('csv', 'parquet')
+
+def _filter_clauses(table, filters):
+    """Builds WHERE clauses from {column: value | [values] | (low, high)}; None bounds are open."""
+    clauses = []
+    for column_name, value in (filters or {}).items():
+        if column_name not in table.c:
+            raise ValueError(f"Unknown column '{column_name}' for table {table.name}")
+        column = table.c[column_name]
+        if isinstance(value, tuple):
+            low, high = value
+            if low is not None:
+                clauses.append(column >= low)
+            if high is not None:
+                clauses.append(column <= high)
+        elif isinstance(value, (list, set)):
+            clauses.append(column.in_(list(value)))
+        else:
+            clauses.append(column == value)
+    return clauses
+
+def get_arrow_schema(table):
+    """Maps a table's column types to a fixed Arrow schema so every row group matches."""
+    import pyarrow as pa
+
+    type_map = [
+        (BigInteger, pa.int64()), (Integer, pa.int64()), (Float, pa.float64()),
+        (Boolean, pa.bool_()), (DateTime, pa.timestamp('us')),
+    ]
+    fields = []
+    for column in table.columns:
+        arrow_type = next((t for sql_type, t in type_map if isinstance(column.type, sql_type)), pa.string())
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+def export_table(table_name, output_path, fmt=None, filters=None, chunk_size=50000, show_progress=True, bind=None):
+    """
+    Streams a table to CSV or Parquet in rowid-ordered pages.
+
+    Each page is a keyset query (rowid > last seen) so memory stays bounded by
+    chunk_size regardless of table size; Parquet output gets one row group per
+    page. Filters take {column: value | [values] | (low, high)}.
+
+    Returns the number of rows written.
+    """
+    from sqlalchemy import select, literal_column, func
+
+    table = Base.metadata.tables.get(table_name)
+    if table is None:
+        raise ValueError(f"Unknown table '{table_name}'")
+    fmt = (fmt or os.path.splitext(output_path)[1].lstrip('.') or 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}'. Use one of {EXPORT_FORMATS}")
+
+    target = bind if bind is not None else engine
+    rowid = literal_column(f"{table_name}.rowid")
+    clauses = _filter_clauses(table, filters)
+
+    parquet_writer = None
+    schema = None
+    if fmt == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+        schema = get_arrow_schema(table)
+        parquet_writer = pq.ParquetWriter(output_path, schema)
+    json_columns = [c.name for c in table.columns if isinstance(c.type, JSON)]
+
+    progress = None
+    rows_written = 0
+    last_rowid = None
     try:
-        query = db.query(CFTCSwap)
-        df = pd.read_sql(query.statement, db.bind)
-        df.to_csv(output_path, index=False)
-        print(f"Database exported to {output_path}")
+        with target.connect() as conn:
+            if show_progress:
+                from tqdm import tqdm
+                total = conn.execute(select(func.count()).select_from(table).where(*clauses)).scalar()
+                progress = tqdm(total=total, desc=f"Exporting {table_name}", unit="rows")
+            while True:
+                page_clauses = list(clauses)
+                if last_rowid is not None:
+                    page_clauses.append(rowid > last_rowid)
+                query = (select(rowid.label('_rowid'), *table.columns)
+                         .where(*page_clauses)
+                         .order_by(rowid)
+                         .limit(chunk_size))
+                rows = conn.execute(query).fetchall()
+                if not rows:
+                    break
+                last_rowid = rows[-1][0]
+                df = pd.DataFrame([row[1:] for row in rows], columns=[c.name for c in table.columns])
+                for column_name in json_columns:
+                    df[column_name] = df[column_name].map(lambda v: None if v is None else json.dumps(v))
+
+                if parquet_writer is not None:
+                    parquet_writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+                else:
+                    df.to_csv(output_path, mode='a' if rows_written else 'w', header=not rows_written, index=False)
+                rows_written += len(df)
+                if progress is not None:
+                    progress.update(len(df))
     finally:
-        db.close()
+        if progress is not None:
+            progress.close()
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+    if fmt == 'csv' and rows_written == 0:
+        # Still emit a header so empty extracts are valid CSV
+        pd.DataFrame(columns=[c.name for c in table.columns]).to_csv(output_path, index=False)
+    return rows_written
+
+def export_db_to_csv(output_path, table_name='cftc_swap_data', filters=None):
+    """Exports a table (CFTC Swap data by default) to a CSV file."""
+    rows = export_table(table_name, output_path, fmt='csv', filters=filters)
+    print(f"Exported {rows} rows from {table_name} to {output_path}")
 
 def reset_database():
-    """Drops all tables and recreates them."""
-    Base.metadata.drop_all(bind=engine)
+    """
+    Drops all tables and recreates them. The data change log is kept and
+    records the reset as a table-wide change of every table, so epochs keep
+    increasing and results cached before the reset are invalidated.
+    """
+    tables = [t for t in Base.metadata.sorted_tables if t.name != DataChangeLog.__tablename__]
+    Base.metadata.drop_all(bind=engine, tables=tables)
     Base.metadata.create_all(bind=engine)
+    create_managed_indexes()
+    install_stats_catalog()
+    db = sessionmaker(bind=engine)()
+    try:
+        for table in tables:
+            record_data_change(db, table.name, row_count=0)
+        db.commit()
+    finally:
+        db.close()
     print("Database has been reset.")
@@ -17,6 +17,9 @@ except ImportError:
 from sqlalchemy import text, func, and_, or_
 import ollama
 
+from src.form13f_flows import get_cusip_flows, latest_flow_quarter
+from src.insider_rollups import has_insider_rollups, insider_activity_screen
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -52,8 +55,8 @@ class CrossDatasetAnalyticsEngine:
         
         query_handlers = {
             'company_comprehensive_profile': self._get_company_profile_basic,
-            'institutional_flow_analysis': self._placeholder_institutional_flow,
-            'insider_activity_monitoring': self._placeholder_insider_activity,
+            'institutional_flow_analysis': self._institutional_flow_from_deltas,
+            'insider_activity_monitoring': self._insider_activity_from_rollups,
             'swap_risk_assessment': self._assess_swap_risk_basic,
             'fund_stability_analysis': self._placeholder_fund_stability,
             'company_peer_analysis': self._placeholder_peer_analysis,
@@ -101,20 +104,41 @@ class CrossDatasetAnalyticsEngine:
             "recommendation": "Load SEC and Form data to enable comprehensive company analysis"
         }
     
-    def _placeholder_institutional_flow(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Placeholder for institutional flow analysis"""
+    def _institutional_flow_from_deltas(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Institutional flow analysis from the precomputed 13F quarter-over-quarter deltas"""
+        
+        flow_quarter = latest_flow_quarter(self.db)
+        if not flow_quarter:
+            return {
+                "analysis_status": "Data source not available",
+                "required_tables": ["form13f_submissions", "form13f_info_tables"],
+                "recommendation": "Load Form 13F data to enable institutional flow analysis"
+            }
+        
+        min_position_value = params.get('min_position_value', 1000000)
         return {
-            "analysis_status": "Data source not available",
-            "required_tables": ["form13f_submissions", "form13f_info_tables"],
-            "recommendation": "Load Form 13F data to enable institutional flow analysis"
+            "flow_quarter": flow_quarter,
+            "largest_flows": get_cusip_flows(flow_quarter, min_position_value, 50, session=self.db),
+            "top_accumulated": get_cusip_flows(flow_quarter, min_position_value, 10, 'value_change', session=self.db),
+            "top_distributed": get_cusip_flows(flow_quarter, min_position_value, 10, '-value_change', session=self.db)
         }
     
-    def _placeholder_insider_activity(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Placeholder for insider activity monitoring"""
+    def _insider_activity_from_rollups(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Insider activity monitoring from the daily per-issuer insider rollups"""
+        
+        if not has_insider_rollups(self.db):
+            return {
+                "analysis_status": "Data source not available", 
+                "required_tables": ["sec_submissions", "sec_non_deriv_trans", "sec_reporting_owners"],
+                "recommendation": "Load SEC insider transaction data to enable insider activity monitoring"
+            }
+        
+        lookback_days = params.get('lookback_days', 30)
+        start_date = (datetime.now() - timedelta(days=lookback_days)).date()
         return {
-            "analysis_status": "Data source not available", 
-            "required_tables": ["sec_submissions", "sec_non_deriv_trans", "sec_reporting_owners"],
-            "recommendation": "Load SEC insider transaction data to enable insider activity monitoring"
+            "lookback_days": lookback_days,
+            "top_buying": insider_activity_screen(start_date, direction='buying', limit=25, session=self.db),
+            "top_selling": insider_activity_screen(start_date, direction='selling', limit=25, session=self.db)
         }
     
     def _assess_swap_risk_basic(self, params: Dict[str, Any]) -> Dict[str, Any]:
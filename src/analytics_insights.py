@@ -0,0 +1,193 @@
+"""
+Deferred, size-bounded AI insights for analytics results.
+
+Analytics queries return their numbers straight away. The model sees a
+compact statistical summary of the result set, not the raw rows, and runs
+on a small worker pool. Callers collect the text later by insight id, or
+get it through a callback. The prompt is capped at MAX_PROMPT_CHARS however
+large the result set is.
+"""
+
+import json
+import logging
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from numbers import Number
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+import ollama
+
+logger = logging.getLogger(__name__)
+
+INSIGHT_MODEL = 'raven-enhanced'
+MAX_PROMPT_CHARS = 8000
+SAMPLE_ROWS = 5
+MAX_TEXT_CHARS = 200
+MAX_DEPTH = 4
+MAX_TRACKED_INSIGHTS = 256
+
+PROMPT_TEMPLATE = """
+As Raven, analyze the following {query_type} results and provide insights:
+
+Query Parameters: {params}
+
+Result Summary (statistics per column plus a few sample rows): {summary}
+
+Please provide:
+1. Key findings and trends
+2. Notable patterns or anomalies
+3. Market implications
+4. Risk considerations
+5. Actionable recommendations
+
+Keep the analysis concise but thorough, suitable for financial professionals.
+"""
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, Number) and not isinstance(value, bool) and value == value
+
+
+def _column_stats(values: list) -> Dict[str, Any]:
+    present = [v for v in values if v is not None and v == v]
+    numbers = [float(v) for v in present if _is_number(v)]
+    if numbers and len(numbers) == len(present):
+        total = sum(numbers)
+        return {'count': len(numbers), 'min': min(numbers), 'max': max(numbers),
+                'mean': total / len(numbers), 'sum': total}
+    counts = Counter(str(v)[:MAX_TEXT_CHARS] for v in present)
+    return {'count': len(present), 'distinct': len(counts), 'top': counts.most_common(3)}
+
+
+def _summarize_rows(rows: list, sample_rows: int) -> Dict[str, Any]:
+    columns = list(OrderedDict.fromkeys(k for row in rows for k in row))
+    return {
+        'row_count': len(rows),
+        'columns': {column: _column_stats([row.get(column) for row in rows]) for column in columns},
+        'sample': [{k: summarize_results(v, sample_rows, MAX_DEPTH - 1) for k, v in row.items()}
+                   for row in rows[:sample_rows]],
+    }
+
+
+def summarize_results(value: Any, sample_rows: int = SAMPLE_ROWS, depth: int = 0) -> Any:
+    """
+    Bounded summary of an analytics result: row lists become a row count,
+    per-column statistics and the first sample_rows rows; long strings are
+    truncated and nesting is cut at MAX_DEPTH.
+    """
+    if isinstance(value, pd.DataFrame):
+        value = value.to_dict('records')
+    if depth >= MAX_DEPTH:
+        return f"<{type(value).__name__}>"
+    if isinstance(value, dict):
+        return {str(k): summarize_results(v, sample_rows, depth + 1) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return _summarize_rows(list(value), sample_rows)
+        if len(value) > sample_rows:
+            return {'count': len(value), 'first': [summarize_results(v, sample_rows, depth + 1)
+                                                    for v in value[:sample_rows]]}
+        return [summarize_results(v, sample_rows, depth + 1) for v in value]
+    if isinstance(value, str):
+        return value if len(value) <= MAX_TEXT_CHARS else value[:MAX_TEXT_CHARS] + '...'
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def build_insight_prompt(query_type: str, sql_results: Dict[str, Any], params: Dict[str, Any],
+                         max_chars: int = MAX_PROMPT_CHARS) -> str:
+    """Prompt for a result set, shrinking the summary until it fits in max_chars."""
+    params_json = json.dumps(params, default=str)[:MAX_TEXT_CHARS * 2]
+    for sample_rows in (SAMPLE_ROWS, 1, 0):
+        summary = json.dumps(summarize_results(sql_results, sample_rows), default=str)
+        prompt = PROMPT_TEMPLATE.format(query_type=query_type, params=params_json, summary=summary)
+        if len(prompt) <= max_chars:
+            return prompt
+    # Still too long (very many columns): keep the head of the summary
+    overflow = len(prompt) - max_chars
+    summary = summary[:max(0, len(summary) - overflow - 3)] + '...'
+    return PROMPT_TEMPLATE.format(query_type=query_type, params=params_json, summary=summary)
+
+
+class InsightGenerator:
+    """
+    Runs insight prompts on a background pool and tracks results by id. Ids
+    are random, so an id from another process or an earlier run reports
+    'unknown' rather than another query's insights.
+    """
+
+    def __init__(self, model: str = INSIGHT_MODEL, host: Optional[str] = None, max_workers: int = 2,
+                 timeout: float = 120, max_tracked: int = MAX_TRACKED_INSIGHTS):
+        self.model = model
+        self.client = ollama.Client(host=host, timeout=timeout)
+        self.max_tracked = max_tracked
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='insights')
+        self._jobs: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def generate(self, query_type: str, sql_results: Dict[str, Any], params: Dict[str, Any]) -> str:
+        """Generates insights synchronously."""
+        prompt = build_insight_prompt(query_type, sql_results, params)
+        response = self.client.chat(model=self.model, messages=[{'role': 'user', 'content': prompt}])
+        return response['message']['content']
+
+    def submit(self, query_type: str, sql_results: Dict[str, Any], params: Dict[str, Any],
+               callback: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> str:
+        """
+        Queues insight generation and returns its id. callback, if given,
+        receives (insight_id, status_dict) when generation finishes.
+        """
+        with self._lock:
+            insight_id = f"insight-{uuid.uuid4().hex}"
+            future = self._executor.submit(self.generate, query_type, sql_results, params)
+            self._jobs[insight_id] = future
+            while len(self._jobs) > self.max_tracked:
+                self._jobs.popitem(last=False)
+
+        if callback is not None:
+            def _notify(_future):
+                try:
+                    callback(insight_id, self.status(insight_id))
+                except Exception as e:
+                    logger.error(f"Insight callback failed for {insight_id}: {e}")
+            future.add_done_callback(_notify)
+        return insight_id
+
+    def status(self, insight_id: str, wait: float = 0) -> Dict[str, Any]:
+        """{'insight_id', 'status': pending|done|failed|unknown, 'insights'?, 'error'?}"""
+        with self._lock:
+            future = self._jobs.get(insight_id)
+        if future is None:
+            return {'insight_id': insight_id, 'status': 'unknown'}
+        if wait:
+            try:
+                future.result(timeout=wait)
+            except Exception:
+                pass  # Reported below
+        if not future.done():
+            return {'insight_id': insight_id, 'status': 'pending'}
+        error = future.exception()
+        if error is not None:
+            return {'insight_id': insight_id, 'status': 'failed', 'error': f"AI insight generation failed: {error}"}
+        return {'insight_id': insight_id, 'status': 'done', 'insights': future.result()}
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+_shared_generator: Optional[InsightGenerator] = None
+_shared_lock = threading.Lock()
+
+
+def get_insight_generator() -> InsightGenerator:
+    """Process-wide generator; the ollama host comes from OLLAMA_HOST as usual."""
+    global _shared_generator
+    with _shared_lock:
+        if _shared_generator is None:
+            _shared_generator = InsightGenerator()
+        return _shared_generator
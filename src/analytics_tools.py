@@ -3,18 +3,28 @@ Advanced Analytics Tools for GameCock AI
 Provides structured SQL query capabilities with RAG integration
 """
 
+import functools
 import json
 import pandas as pd
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
-from database import SessionLocal, CFTCSwap
+from database import SessionLocal, CFTCSwap, CFTCLiveTrade
 from sqlalchemy import text, func, and_, or_
-import ollama
+
+from src.columnar_store import run_routed_query
+from src.swap_aggregates import get_daily_aggregates, has_daily_aggregates
+from src.exposure_cube import CUBE_DIMENSIONS, has_exposure_cube, query_exposure_cube
+from src.result_cache import cached_tool
+from src.analytics_insights import get_insight_generator
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Tables each tool reads, for result-cache invalidation
+SWAP_HISTORY_TABLES = ('cftc_swap_data', 'cftc_swap_daily_aggregates')
+LIVE_TRADE_TABLES = ('cftc_live_trades', 'cftc_exposure_cube')
+
 # Error handling decorator for analytics tools
 def handle_analytics_errors(func):
     """Decorator to provide consistent error handling for analytics tools"""
@@ -30,11 +40,48 @@ def handle_analytics_errors(func):
             })
     return wrapper
 
+def with_deferred_insights(func):
+    """
+    Submits a fresh background insight job for each result a tool returns.
+    Placed outside @cached_tool, so cached results never carry an insight_id
+    and a cache hit (possibly written by another process) gets its own job.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        output = func(*args, **kwargs)
+        try:
+            result = json.loads(output)
+        except (TypeError, ValueError):
+            return output
+        if not isinstance(result, dict) or 'error' in result or 'sql_results' not in result:
+            return output
+        result["insight_id"] = get_insight_generator().submit(result['query_type'], result['sql_results'],
+                                                              result.get('parameters') or {})
+        result["insight_status"] = "pending"
+        return json.dumps(result, default=str)
+    return wrapper
+
+def _timeframe_days(timeframe: str) -> int:
+    """Parse timeframes like '30d', '12w', '6m' or '1y' into days (default 30)."""
+    units = {'d': 1, 'w': 7, 'm': 30, 'y': 365}
+    try:
+        value, unit = timeframe.strip().lower()[:-1], timeframe.strip().lower()[-1]
+        if unit.isdigit():
+            return int(timeframe)
+        return int(value) * units[unit]
+    except (ValueError, KeyError, AttributeError, IndexError):
+        return 30
+
 class AnalyticsEngine:
     """Main analytics engine that combines SQL queries with AI analysis"""
     
-    def __init__(self):
+    # How AI insights are produced: 'deferred' (background, collected by
+    # insight_id), 'sync' (wait for the model) or 'none'
+    INSIGHT_MODES = ('deferred', 'sync', 'none')
+    
+    def __init__(self, insight_generator=None):
         self.db = SessionLocal()
+        self.insight_generator = insight_generator
     
     def __enter__(self):
         return self
@@ -42,8 +89,15 @@ class AnalyticsEngine:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.db.close()
     
-    def execute_analytical_query(self, query_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute a structured analytical query and return results with AI insights"""
+    def execute_analytical_query(self, query_type: str, params: Dict[str, Any], insights: str = 'deferred',
+                                 on_insight=None) -> Dict[str, Any]:
+        """
+        Execute a structured analytical query and return its results at once.
+        
+        With insights='deferred' the AI insights are generated in the
+        background: the result carries an insight_id for get_analytics_insights,
+        and on_insight(insight_id, status) is called when they are ready.
+        """
         
         query_handlers = {
             'market_trends': self._analyze_market_trends,
@@ -57,21 +111,27 @@ class AnalyticsEngine:
         
         if query_type not in query_handlers:
             return {"error": f"Unknown query type: {query_type}"}
+        if insights not in self.INSIGHT_MODES:
+            return {"error": f"Unknown insights mode: {insights}"}
         
         try:
             # Execute the SQL analysis
             sql_results = query_handlers[query_type](params)
             
-            # Generate AI insights from the results
-            ai_insights = self._generate_ai_insights(query_type, sql_results, params)
-            
-            return {
+            result = {
                 "query_type": query_type,
                 "parameters": params,
                 "sql_results": sql_results,
-                "ai_insights": ai_insights,
+                "ai_insights": None,
                 "timestamp": datetime.now().isoformat()
             }
+            if insights == 'sync':
+                result["ai_insights"] = self._generate_ai_insights(query_type, sql_results, params)
+            elif insights == 'deferred':
+                generator = self.insight_generator or get_insight_generator()
+                result["insight_id"] = generator.submit(query_type, sql_results, params, on_insight)
+                result["insight_status"] = "pending"
+            return result
             
         except Exception as e:
             return {"error": f"Analytics error: {str(e)}"}
@@ -86,38 +146,37 @@ class AnalyticsEngine:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days_back)
         
-        # Base query for trend analysis
-        query = self.db.query(
-            func.date(CFTCSwap.execution_timestamp).label('trade_date'),
-            func.count(CFTCSwap.id).label('trade_count'),
-            func.sum(CFTCSwap.notional_amount).label('total_notional'),
-            func.avg(CFTCSwap.notional_amount).label('avg_notional'),
-            CFTCSwap.asset_class
-        ).filter(
-            and_(
-                CFTCSwap.execution_timestamp >= start_date,
-                CFTCSwap.execution_timestamp <= end_date
-            )
-        )
-        
-        if asset_class:
-            query = query.filter(CFTCSwap.asset_class == asset_class)
-        
-        query = query.group_by(
-            func.date(CFTCSwap.execution_timestamp),
-            CFTCSwap.asset_class
-        ).order_by(func.date(CFTCSwap.execution_timestamp))
-        
-        results = query.all()
-        
-        # Convert to DataFrame for easier analysis
-        df = pd.DataFrame([{
-            'trade_date': r.trade_date,
-            'trade_count': r.trade_count,
-            'total_notional': float(r.total_notional or 0),
-            'avg_notional': float(r.avg_notional or 0),
-            'asset_class': r.asset_class
-        } for r in results])
+        if has_daily_aggregates(self.db):
+            # Materialized per-day rows; roll products and currencies up to asset class
+            daily = get_daily_aggregates(start_date, end_date, asset_class, self.db)
+            df = daily.groupby(['trade_date', 'asset_class'], dropna=False).agg(
+                trade_count=('trade_count', 'sum'),
+                total_notional=('notional_sum', 'sum'),
+                notional_count=('notional_count', 'sum')
+            ).reset_index()
+            df['avg_notional'] = df['total_notional'] / df['notional_count'].where(df['notional_count'] > 0)
+            df = df.drop(columns='notional_count')
+            engine_used = 'daily_aggregates'
+        else:
+            # Daily aggregates per asset class; portable SQL so it can run on the columnar sidecar
+            sql = f"""
+                SELECT
+                    substr(CAST(execution_timestamp AS VARCHAR), 1, 10) AS trade_date,
+                    asset_class,
+                    COUNT(*) AS trade_count,
+                    SUM(notional_amount_leg_1) AS total_notional,
+                    AVG(notional_amount_leg_1) AS avg_notional
+                FROM cftc_swap_data
+                WHERE execution_timestamp >= :start_date AND execution_timestamp <= :end_date
+                {"AND asset_class = :asset_class" if asset_class else ""}
+                GROUP BY 1, 2
+                ORDER BY 1
+            """
+            df, engine_used = run_routed_query(sql, {
+                'start_date': start_date, 'end_date': end_date, 'asset_class': asset_class
+            }, ['cftc_swap_data'], self.db, swap_range=(start_date, end_date))
+        df['total_notional'] = df['total_notional'].fillna(0).astype(float)
+        df['avg_notional'] = df['avg_notional'].fillna(0).astype(float)
         
         # Calculate trend metrics
         trend_analysis = {}
@@ -137,16 +196,17 @@ class AnalyticsEngine:
                     'avg_daily_trades': df_summary['trade_count'].mean(),
                     'volume_volatility': df_summary['total_notional'].std(),
                     'last_7_days_growth': df_summary['volume_change'].tail(7).mean(),
-                    'peak_volume_date': df_summary.loc[df_summary['total_notional'].idxmax(), 'trade_date'].isoformat(),
+                    'peak_volume_date': df_summary.loc[df_summary['total_notional'].idxmax(), 'trade_date'],
                     'peak_volume': df_summary['total_notional'].max()
                 }
         
         return {
             'period': f"{start_date.date()} to {end_date.date()}",
-            'total_records': len(results),
+            'total_records': len(df),
             'daily_data': df.to_dict('records') if not df.empty else [],
             'trend_metrics': trend_analysis,
-            'asset_classes': df['asset_class'].unique().tolist() if not df.empty else []
+            'asset_classes': df['asset_class'].unique().tolist() if not df.empty else [],
+            'query_engine': engine_used
         }
     
     def _analyze_trading_positions(self, params: Dict[str, Any]) -> Dict[str, Any]:
@@ -155,25 +215,25 @@ class AnalyticsEngine:
         company_cik = params.get('company_cik', None)
         asset_class = params.get('asset_class', None)
         
-        # Position analysis query
+        # Position analysis over live trades (latest state, terminated trades excluded)
         query = self.db.query(
-            CFTCSwap.asset_class,
-            CFTCSwap.currency,
-            func.count(CFTCSwap.id).label('position_count'),
-            func.sum(CFTCSwap.notional_amount).label('total_exposure'),
-            func.avg(CFTCSwap.notional_amount).label('avg_position_size'),
-            func.min(CFTCSwap.notional_amount).label('min_position'),
-            func.max(CFTCSwap.notional_amount).label('max_position')
-        ).filter(CFTCSwap.notional_amount.isnot(None))
+            CFTCLiveTrade.asset_class,
+            CFTCLiveTrade.notional_currency_leg_1.label('currency'),
+            func.count(CFTCLiveTrade.trade_id).label('position_count'),
+            func.sum(CFTCLiveTrade.notional_amount_leg_1).label('total_exposure'),
+            func.avg(CFTCLiveTrade.notional_amount_leg_1).label('avg_position_size'),
+            func.min(CFTCLiveTrade.notional_amount_leg_1).label('min_position'),
+            func.max(CFTCLiveTrade.notional_amount_leg_1).label('max_position')
+        ).filter(CFTCLiveTrade.notional_amount_leg_1.isnot(None))
         
         if company_cik:
             # Note: You'll need to add company relationship to CFTC data
             pass  # Will implement once company mapping is added
             
         if asset_class:
-            query = query.filter(CFTCSwap.asset_class == asset_class)
+            query = query.filter(CFTCLiveTrade.asset_class == asset_class)
         
-        query = query.group_by(CFTCSwap.asset_class, CFTCSwap.currency)
+        query = query.group_by(CFTCLiveTrade.asset_class, CFTCLiveTrade.notional_currency_leg_1)
         results = query.all()
         
         # Calculate concentration metrics
@@ -243,104 +303,164 @@ class AnalyticsEngine:
     def _analyze_exposure(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze market exposure by various dimensions"""
         
-        # Asset class exposure analysis
-        exposure_query = self.db.query(
-            CFTCSwap.asset_class,
-            func.count(CFTCSwap.id).label('trade_count'),
-            func.sum(CFTCSwap.notional_amount).label('total_notional')
-        ).filter(CFTCSwap.notional_amount.isnot(None))
-        
-        exposure_query = exposure_query.group_by(CFTCSwap.asset_class)
-        results = exposure_query.all()
-        
-        exposure_data = []
-        total_notional = 0
-        
-        for r in results:
-            notional = float(r.total_notional or 0)
-            total_notional += notional
+        # Slice the exposure cube; dimension may name several, e.g. 'asset_class,tenor_bucket'
+        dimensions = [d.strip() for d in (params.get('dimension') or 'asset_class').split(',') if d.strip()]
+        filters = params.get('filters') or {}
+        if has_exposure_cube(self.db):
+            invalid = [d for d in dimensions if d not in CUBE_DIMENSIONS]
+            if invalid:
+                return {'error': f"Unknown dimension(s) {invalid}. Available: {', '.join(CUBE_DIMENSIONS)}"}
+            exposure_data = query_exposure_cube(dimensions, filters, session=self.db)
+            query_engine = 'exposure_cube'
+        else:
+            # Asset class exposure analysis over live trades
+            dimensions, query_engine = ['asset_class'], 'live_trades'
+            exposure_query = self.db.query(
+                CFTCLiveTrade.asset_class,
+                func.count(CFTCLiveTrade.trade_id).label('trade_count'),
+                func.sum(CFTCLiveTrade.notional_amount_leg_1).label('total_notional')
+            ).filter(CFTCLiveTrade.notional_amount_leg_1.isnot(None))
             
-            exposure_data.append({
+            exposure_query = exposure_query.group_by(CFTCLiveTrade.asset_class)
+            exposure_data = [{
                 'asset_class': r.asset_class,
                 'trade_count': r.trade_count,
-                'total_notional': notional
-            })
+                'total_notional': float(r.total_notional or 0)
+            } for r in exposure_query.all()]
+        
+        total_notional = sum(item['total_notional'] for item in exposure_data)
         
         # Calculate percentages
         for item in exposure_data:
             item['percentage_of_total'] = (item['total_notional'] / total_notional * 100) if total_notional > 0 else 0
         
-        return {
-            'exposure_by_asset_class': exposure_data,
+        result = {
+            'dimensions': dimensions,
+            'filters': filters,
+            'exposure': exposure_data,
             'total_market_notional': total_notional,
-            'asset_class_count': len(exposure_data)
+            'slice_count': len(exposure_data),
+            'query_engine': query_engine
         }
+        if dimensions == ['asset_class']:
+            result['exposure_by_asset_class'] = exposure_data
+            result['asset_class_count'] = len(exposure_data)
+        return result
     
     def _swap_market_overview(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Provide comprehensive swap market overview"""
         
         # Market size and activity
-        overview_query = self.db.query(
-            func.count(CFTCSwap.id).label('total_swaps'),
-            func.sum(CFTCSwap.notional_amount).label('total_notional'),
-            func.avg(CFTCSwap.notional_amount).label('avg_notional'),
-            func.count(func.distinct(CFTCSwap.asset_class)).label('asset_classes'),
-            func.count(func.distinct(CFTCSwap.currency)).label('currencies')
-        ).filter(CFTCSwap.notional_amount.isnot(None))
-        
-        result = overview_query.first()
+        if has_daily_aggregates(self.db):
+            daily = get_daily_aggregates(session=self.db)
+            disclosed = daily[daily['notional_count'] > 0]
+            total_swaps = int(disclosed['notional_count'].sum())
+            total_notional = float(disclosed['notional_sum'].sum())
+            result = {
+                'total_swaps': total_swaps,
+                'total_notional': total_notional,
+                'avg_notional': total_notional / total_swaps if total_swaps else 0,
+                'asset_classes': disclosed['asset_class'].nunique(),
+                'currencies': disclosed['notional_currency'].nunique()
+            }
+            engine_used = 'daily_aggregates'
+        else:
+            df, engine_used = run_routed_query("""
+                SELECT
+                    COUNT(*) AS total_swaps,
+                    SUM(notional_amount_leg_1) AS total_notional,
+                    AVG(notional_amount_leg_1) AS avg_notional,
+                    COUNT(DISTINCT asset_class) AS asset_classes,
+                    COUNT(DISTINCT notional_currency_leg_1) AS currencies
+                FROM cftc_swap_data
+                WHERE notional_amount_leg_1 IS NOT NULL
+            """, {}, ['cftc_swap_data'], self.db)
+            result = df.iloc[0]
         
         return {
             'market_overview': {
-                'total_swap_count': result.total_swaps or 0,
-                'total_notional_amount': float(result.total_notional or 0),
-                'average_swap_size': float(result.avg_notional or 0),
-                'unique_asset_classes': result.asset_classes or 0,
-                'unique_currencies': result.currencies or 0
-            }
+                'total_swap_count': int(result['total_swaps'] or 0),
+                'total_notional_amount': float(result['total_notional'] or 0),
+                'average_swap_size': float(result['avg_notional'] or 0),
+                'unique_asset_classes': int(result['asset_classes'] or 0),
+                'unique_currencies': int(result['currencies'] or 0)
+            },
+            'query_engine': engine_used
         }
     
     def _analyze_liquidity(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze market liquidity metrics"""
         
-        # Liquidity analysis placeholder
+        days = _timeframe_days(params.get('timeframe', '30d'))
+        start_date = datetime.now() - timedelta(days=days)
+        
+        # Activity, size and execution-style mix per asset class
+        if has_daily_aggregates(self.db):
+            daily = get_daily_aggregates(start_date=start_date, session=self.db)
+            df = daily.groupby('asset_class', dropna=False).agg(
+                trade_count=('trade_count', 'sum'),
+                active_days=('trade_date', 'nunique'),
+                total_notional=('notional_sum', 'sum'),
+                notional_count=('notional_count', 'sum'),
+                block_trades=('block_trades', 'sum'),
+                cleared_trades=('cleared_trades', 'sum'),
+                platform_trades=('platform_trades', 'sum')
+            ).reset_index().sort_values('trade_count', ascending=False)
+            df['avg_trade_size'] = df['total_notional'] / df['notional_count'].where(df['notional_count'] > 0)
+            df = df.astype(object).where(df.notna(), None)
+            engine_used = 'daily_aggregates'
+        else:
+            df, engine_used = run_routed_query("""
+                SELECT
+                    asset_class,
+                    COUNT(*) AS trade_count,
+                    COUNT(DISTINCT substr(CAST(execution_timestamp AS VARCHAR), 1, 10)) AS active_days,
+                    SUM(notional_amount_leg_1) AS total_notional,
+                    AVG(notional_amount_leg_1) AS avg_trade_size,
+                    SUM(CASE WHEN block_trade_election_indicator IN ('Y', 'TRUE', 'True', 'true') THEN 1 ELSE 0 END) AS block_trades,
+                    SUM(CASE WHEN cleared IN ('C', 'Y') THEN 1 ELSE 0 END) AS cleared_trades,
+                    SUM(CASE WHEN platform_identifier IS NOT NULL AND platform_identifier <> '' THEN 1 ELSE 0 END) AS platform_trades
+                FROM cftc_swap_data
+                WHERE execution_timestamp >= :start_date
+                GROUP BY asset_class
+                ORDER BY trade_count DESC
+            """, {'start_date': start_date}, ['cftc_swap_data'], self.db, swap_range=(start_date, None))
+        
+        liquidity_data = []
+        for r in df.to_dict('records'):
+            trade_count = int(r['trade_count'])
+            liquidity_data.append({
+                'asset_class': r['asset_class'],
+                'trade_count': trade_count,
+                'trades_per_day': trade_count / max(int(r['active_days']), 1),
+                'total_notional': float(r['total_notional'] or 0),
+                'avg_trade_size': float(r['avg_trade_size'] or 0),
+                'block_trade_share': float(r['block_trades'] or 0) / trade_count,
+                'cleared_share': float(r['cleared_trades'] or 0) / trade_count,
+                'platform_share': float(r['platform_trades'] or 0) / trade_count
+            })
+        
         return {
-            "liquidity_note": "Liquidity analysis will be enhanced with additional market data"
+            'timeframe_days': days,
+            'liquidity_by_asset_class': liquidity_data,
+            'total_trades': sum(item['trade_count'] for item in liquidity_data),
+            'query_engine': engine_used
         }
     
     def _generate_ai_insights(self, query_type: str, sql_results: Dict[str, Any], params: Dict[str, Any]) -> str:
-        """Generate AI-powered insights from SQL query results"""
-        
-        # Create a comprehensive prompt for the AI
-        prompt = f"""
-        As Raven, analyze the following {query_type} results and provide insights:
-
-        Query Parameters: {json.dumps(params, indent=2)}
-        
-        SQL Results: {json.dumps(sql_results, indent=2, default=str)}
-        
-        Please provide:
-        1. Key findings and trends
-        2. Notable patterns or anomalies  
-        3. Market implications
-        4. Risk considerations
-        5. Actionable recommendations
-        
-        Keep the analysis concise but thorough, suitable for financial professionals.
-        """
+        """Generate AI-powered insights from a bounded summary of the SQL results"""
         
         try:
-            response = ollama.chat(
-                model='raven-enhanced',
-                messages=[{'role': 'user', 'content': prompt}]
-            )
-            return response['message']['content']
+            generator = self.insight_generator or get_insight_generator()
+            return generator.generate(query_type, sql_results, params)
         except Exception as e:
             return f"AI insight generation failed: {str(e)}"
 
 
 # Analytics tool functions for the TOOL_MAP
 @handle_analytics_errors
+@with_deferred_insights
+@cached_tool(SWAP_HISTORY_TABLES)
 def analyze_market_trends(days_back: int = 30, asset_class: str = None):
     """Analyze market trends over a specified period"""
     try:
@@ -348,7 +468,7 @@ def analyze_market_trends(days_back: int = 30, asset_class: str = None):
             results = engine.execute_analytical_query('market_trends', {
                 'days_back': days_back,
                 'asset_class': asset_class
-            })
+            }, insights='none')
         return json.dumps(results, default=str)
     except Exception as e:
         logger.error(f"Market trends analysis failed: {str(e)}")
@@ -358,6 +478,8 @@ def analyze_market_trends(days_back: int = 30, asset_class: str = None):
         })
 
 @handle_analytics_errors
+@with_deferred_insights
+@cached_tool(LIVE_TRADE_TABLES)
 def analyze_trading_positions(company_cik: str = None, asset_class: str = None):
     """Analyze trading positions and concentrations"""
     try:
@@ -365,7 +487,7 @@ def analyze_trading_positions(company_cik: str = None, asset_class: str = None):
             results = engine.execute_analytical_query('trading_positions', {
                 'company_cik': company_cik,
                 'asset_class': asset_class
-            })
+            }, insights='none')
         return json.dumps(results, default=str)
     except Exception as e:
         logger.error(f"Trading positions analysis failed: {str(e)}")
@@ -407,13 +529,16 @@ def compare_companies(company_list: list):
         })
 
 @handle_analytics_errors
-def exposure_analysis(dimension: str = 'asset_class'):
+@with_deferred_insights
+@cached_tool(LIVE_TRADE_TABLES)
+def exposure_analysis(dimension: str = 'asset_class', filters: dict = None):
     """Analyze market exposure by various dimensions"""
     try:
         with AnalyticsEngine() as engine:
             results = engine.execute_analytical_query('exposure_analysis', {
-                'dimension': dimension
-            })
+                'dimension': dimension,
+                'filters': filters
+            }, insights='none')
         return json.dumps(results, default=str)
     except Exception as e:
         logger.error(f"Exposure analysis failed: {str(e)}")
@@ -423,11 +548,13 @@ def exposure_analysis(dimension: str = 'asset_class'):
         })
 
 @handle_analytics_errors
+@with_deferred_insights
+@cached_tool(SWAP_HISTORY_TABLES)
 def swap_market_overview():
     """Provide comprehensive swap market overview"""
     try:
         with AnalyticsEngine() as engine:
-            results = engine.execute_analytical_query('swap_overview', {})
+            results = engine.execute_analytical_query('swap_overview', {}, insights='none')
         return json.dumps(results, default=str)
     except Exception as e:
         logger.error(f"Swap market overview failed: {str(e)}")
@@ -437,13 +564,15 @@ def swap_market_overview():
         })
 
 @handle_analytics_errors
+@with_deferred_insights
+@cached_tool(SWAP_HISTORY_TABLES)
 def liquidity_analysis(timeframe: str = '30d'):
     """Analyze market liquidity metrics"""
     try:
         with AnalyticsEngine() as engine:
             results = engine.execute_analytical_query('liquidity_analysis', {
                 'timeframe': timeframe
-            })
+            }, insights='none')
         return json.dumps(results, default=str)
     except Exception as e:
         logger.error(f"Liquidity analysis failed: {str(e)}")
@@ -452,6 +581,11 @@ def liquidity_analysis(timeframe: str = '30d'):
             "suggestion": "Please check your database connection and data availability"
         })
 
+@handle_analytics_errors
+def get_analytics_insights(insight_id: str, wait_seconds: float = 0):
+    """Collect the AI insights generated in the background for an analytics result"""
+    return json.dumps(get_insight_generator().status(insight_id, wait=wait_seconds), default=str)
+
 
 # Enhanced TOOL_MAP with analytics functions
 ANALYTICS_TOOLS = {
@@ -507,7 +641,8 @@ ANALYTICS_TOOLS = {
             "parameters": {
                 "type": "object",
                 "properties": {
-                    "dimension": {"type": "string", "description": "Analysis dimension (default: 'asset_class')"}
+                    "dimension": {"type": "string", "description": "Comma-separated dimensions to group by: reference_entity, asset_class, currency, tenor_bucket, month (default: 'asset_class')"},
+                    "filters": {"type": "object", "description": "Slice to drill into, e.g. {\"asset_class\": \"IR\", \"month_from\": \"2024-01\"} (optional)"}
                 },
                 "required": []
             }
@@ -520,5 +655,20 @@ ANALYTICS_TOOLS = {
             "description": "Get comprehensive swap market overview with AI insights",
             "parameters": {"type": "object", "properties": {}}
         }
+    },
+    "get_analytics_insights": {
+        "function": get_analytics_insights,
+        "schema": {
+            "name": "get_analytics_insights",
+            "description": "Fetch the AI insights for an earlier analytics result by its insight_id",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "insight_id": {"type": "string", "description": "insight_id returned with the analytics result"},
+                    "wait_seconds": {"type": "number", "description": "Seconds to wait if still pending (default: 0)"}
+                },
+                "required": ["insight_id"]
+            }
+        }
     }
 }
@@ -0,0 +1,119 @@
+"""
+Cache invalidation driven by the data change log.
+
+Ingestion appends to data_change_log (see database.record_data_change),
+advancing a monotonic data epoch and recording which CIKs/LEIs each batch
+touched. ChangeAwareCache stores the epoch alongside every cached result and
+revalidates on read: an unchanged epoch is a hit after one indexed MAX()
+lookup, and a newer epoch only evicts the entry if the change touched the
+entry's tables and keys.
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from database import current_data_epoch, data_changed_since
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def epoch_restarted(cached_epoch: int, current_epoch: int) -> bool:
+    """
+    True when the change log is behind a cached epoch, i.e. it was dropped
+    and recreated (database reset) and its epochs restarted. Entries cached
+    before that can no longer be revalidated against it.
+    """
+    return current_epoch < cached_epoch
+
+
+class ChangeAwareCache:
+    """Bounded LRU cache whose entries stay valid until their input data changes."""
+
+    def __init__(self, tables: Optional[Iterable[str]] = None, max_size: int = 256,
+                 db_session: Optional[Session] = None):
+        self.tables = tuple(tables) if tables else None
+        self.max_size = max_size
+        self.db_session = db_session
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, Optional[Tuple[str, ...]]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def current_epoch(self) -> Optional[int]:
+        """Epoch of the cache's input tables, or None if the change log is unavailable."""
+        try:
+            return current_data_epoch(self.tables, db_session=self.db_session)
+        except SQLAlchemyError as e:
+            logger.debug(f"Change log unavailable, bypassing cache: {e}")
+            return None
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, epoch, entity_keys = entry
+        current = self.current_epoch()
+        if current is None:
+            self.misses += 1
+            return default
+        if current != epoch:
+            changed = epoch_restarted(epoch, current)
+            if not changed:
+                try:
+                    changed = data_changed_since(epoch, self.tables, entity_keys, db_session=self.db_session)
+                except SQLAlchemyError:
+                    changed = True
+            if changed:
+                del self._entries[key]
+                self.invalidations += 1
+                self.misses += 1
+                return default
+            # Newer data exists but not for this entry; revalidate at the new epoch
+            self._entries[key] = (value, current, entity_keys)
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any, entity_keys: Optional[Iterable[str]] = None,
+            epoch: Optional[int] = None) -> None:
+        """
+        Caches value as of epoch (default: now). Pass the epoch read before
+        computing the value so changes made meanwhile still invalidate it.
+        """
+        if epoch is None:
+            epoch = self.current_epoch()
+            if epoch is None:
+                return
+        self._entries[key] = (value, epoch, tuple(entity_keys) if entity_keys else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def discard(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,361 @@
+"""
+Columnar Parquet sidecar for scan-heavy analytics.
+
+Mirrors the large append-mostly tables (CFTC swaps, 13F holdings) into
+hive-partitioned Parquet files and answers aggregate queries through DuckDB.
+Queries route to the sidecar only while it is fresh - i.e. it holds exactly the
+rows SQLite holds and no change has been logged in data_change_log since the
+sync - and fall back to SQLite otherwise, so callers always get current results.
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from sqlalchemy import text
+
+from database import Base, engine as default_engine, get_arrow_schema, TableStatistics, DataChangeLog
+from src.swap_partitions import SwapPartitionManager
+
+try:
+    import duckdb
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    COLUMNAR_AVAILABLE = True
+except ImportError:
+    COLUMNAR_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+ENGINE_SIDECAR = "duckdb"
+ENGINE_SQLITE = "sqlite"
+ENGINE_PARTITIONS = "sqlite_partitions"
+
+_QUARTER_SQL = ("strftime('%Y', {col}) || '-Q' || ((CAST(strftime('%m', {col}) AS INTEGER) + 2) / 3)")
+
+
+@dataclass
+class ColumnarDataset:
+    """A table mirrored into the sidecar, partitioned by a SQLite expression."""
+    table: str
+    partition_column: str
+    partition_sql: str
+
+
+COLUMNAR_DATASETS = {
+    'cftc_swap_data': ColumnarDataset(
+        table='cftc_swap_data',
+        partition_column='month',
+        partition_sql="substr(execution_timestamp, 1, 7)",
+    ),
+    'form13f_submissions': ColumnarDataset(
+        table='form13f_submissions',
+        partition_column='quarter',
+        partition_sql=_QUARTER_SQL.format(col='filing_date'),
+    ),
+    'form13f_info_tables': ColumnarDataset(
+        table='form13f_info_tables',
+        partition_column='quarter',
+        partition_sql=("(SELECT " + _QUARTER_SQL.format(col='s.filing_date') + " FROM form13f_submissions s "
+                       "WHERE s.accession_number = form13f_info_tables.accession_number)"),
+    ),
+}
+
+# Named bind parameters (:name) -> DuckDB ($name); skips '::' casts
+_BIND_PARAM = re.compile(r'(?<![:\w]):([A-Za-z_]\w*)')
+
+
+class ColumnarSidecar:
+    """Maintains the Parquet mirror and runs queries against it with DuckDB."""
+
+    def __init__(self, root_dir: Optional[str] = None, bind=None, chunk_size: int = 100000):
+        if root_dir is None:
+            from config import COLUMNAR_DIR
+            root_dir = COLUMNAR_DIR
+        self.root_dir = root_dir
+        self.bind = bind if bind is not None else default_engine
+        self.chunk_size = chunk_size
+        self.manifest_path = os.path.join(root_dir, "manifest.json")
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Manifest and freshness
+    # ------------------------------------------------------------------
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable columnar manifest {self.manifest_path}: {e}")
+            return {}
+
+    def _save_manifest(self, manifest: Dict[str, Dict[str, Any]]):
+        os.makedirs(self.root_dir, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _source_state(self, table: str) -> Tuple[int, int]:
+        """Returns (row_count, max_rowid) for a SQLite table without scanning it."""
+        with self.bind.connect() as conn:
+            max_rowid = conn.execute(text(f"SELECT MAX(rowid) FROM {table}")).scalar() or 0
+            row_count = None
+            try:
+                row_count = conn.execute(
+                    text(f"SELECT row_count FROM {TableStatistics.__tablename__} WHERE table_name = :t"),
+                    {"t": table}).scalar()
+            except Exception:
+                pass  # No statistics catalog in this database
+            if row_count is None:
+                row_count = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+        return row_count, max_rowid
+
+    def _change_log(self, table: str, since_epoch: int = 0) -> Dict[str, Any]:
+        """
+        Summarizes the data_change_log entries for a table after since_epoch:
+        the latest epoch, the logged row total, and whether any entry has no
+        row count or the log was pruned (so the total cannot be trusted).
+        """
+        log = DataChangeLog.__tablename__
+        with self.bind.connect() as conn:
+            try:
+                row = conn.execute(text(f"""
+                    SELECT MAX(epoch), COUNT(*), SUM(row_count), COUNT(row_count), MAX(table_name = :log)
+                    FROM {log}
+                    WHERE epoch > :since AND table_name IN (:t, :log)
+                """), {"t": table, "log": log, "since": since_epoch}).one()
+            except Exception:
+                row = (None, 0, None, 0, None)  # No change log in this database
+        epoch, entries, logged_rows, counted, pruned = row
+        return {
+            'epoch': epoch or since_epoch,
+            'logged_rows': logged_rows or 0,
+            'complete': counted == entries and not pruned,
+        }
+
+    def _rows_after(self, table: str, rowid: int) -> int:
+        with self.bind.connect() as conn:
+            return conn.execute(text(f"SELECT COUNT(*) FROM {table} WHERE rowid > :r"), {"r": rowid}).scalar()
+
+    def is_fresh(self, table: str) -> bool:
+        """True when the sidecar holds exactly the rows currently in SQLite."""
+        entry = self._load_manifest().get(table)
+        if not entry or 'epoch' not in entry:
+            return False
+        row_count, max_rowid = self._source_state(table)
+        if entry['row_count'] != row_count or entry['last_rowid'] != max_rowid:
+            return False
+        # Same rows by count and rowid can still have been updated in place
+        return self._change_log(table, entry['epoch'])['epoch'] == entry['epoch']
+
+    def _only_appended(self, table: str, entry: Dict[str, Any], row_count: int) -> bool:
+        """
+        True when everything since the last sync was an append past its last
+        rowid. Deletes show up as a row count short of the synced rows plus
+        the new ones; in-place updates as logged changes beyond the new rows.
+        """
+        if 'epoch' not in entry:
+            return False  # Synced before epochs were recorded
+        new_rows = self._rows_after(table, entry['last_rowid'])
+        if entry['row_count'] + new_rows != row_count:
+            return False
+        changes = self._change_log(table, entry['epoch'])
+        return changes['complete'] and changes['logged_rows'] <= new_rows
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Per-dataset sync state, for the database menu and diagnostics."""
+        manifest = self._load_manifest()
+        report = {}
+        for table in COLUMNAR_DATASETS:
+            entry = manifest.get(table, {})
+            report[table] = {
+                'synced_rows': entry.get('row_count', 0),
+                'synced_at': entry.get('synced_at'),
+                'fresh': self.is_fresh(table) if entry else False,
+            }
+        return report
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+
+    def sync(self, tables: Optional[Sequence[str]] = None, rebuild: bool = False) -> Dict[str, int]:
+        """
+        Appends rows added since the last sync as new Parquet part files.
+
+        A table that has had deletes or in-place updates since the last sync is
+        rebuilt from scratch instead; those are told apart from appends by the
+        row count and by the rows data_change_log recorded since the synced
+        epoch. Pass rebuild=True after changes written without a log entry.
+
+        Returns {table: rows_written}.
+        """
+        if not COLUMNAR_AVAILABLE:
+            raise ImportError("Columnar sidecar requires duckdb and pyarrow (pip install duckdb pyarrow)")
+
+        with self._lock:
+            manifest = self._load_manifest()
+            written = {}
+            for table in tables or list(COLUMNAR_DATASETS):
+                dataset = COLUMNAR_DATASETS[table]
+                # Read the epoch first so a change landing mid-sync leaves the mirror stale, not wrong
+                epoch = self._change_log(table)['epoch']
+                row_count, max_rowid = self._source_state(table)
+                entry = manifest.get(table)
+                if (rebuild or not entry or max_rowid < entry['last_rowid']
+                        or not self._only_appended(table, entry, row_count)):
+                    shutil.rmtree(os.path.join(self.root_dir, table), ignore_errors=True)
+                    entry = {'row_count': 0, 'last_rowid': 0}
+
+                appended, last_rowid = self._append(dataset, entry['last_rowid'])
+                manifest[table] = {
+                    'row_count': entry['row_count'] + appended,
+                    'last_rowid': last_rowid,
+                    'epoch': epoch,
+                    'synced_at': datetime.now().isoformat(),
+                }
+                # Persist after each table so an interrupted sync keeps finished work
+                self._save_manifest(manifest)
+                written[table] = appended
+                logger.info(f"Columnar sidecar: appended {appended} rows to {table}")
+            return written
+
+    def _append(self, dataset: ColumnarDataset, after_rowid: int) -> Tuple[int, int]:
+        table = Base.metadata.tables[dataset.table]
+        schema = get_arrow_schema(table)
+        columns = ", ".join(f"{dataset.table}.{c.name}" for c in table.columns)
+        query = text(f"""
+            SELECT {dataset.table}.rowid AS _rowid,
+                   COALESCE({dataset.partition_sql}, 'unknown') AS _partition,
+                   {columns}
+            FROM {dataset.table}
+            WHERE {dataset.table}.rowid > :after
+            ORDER BY {dataset.table}.rowid
+            LIMIT :limit
+        """)
+
+        appended = 0
+        last_rowid = after_rowid
+        with self.bind.connect() as conn:
+            while True:
+                df = pd.read_sql(query, conn, params={"after": last_rowid, "limit": self.chunk_size})
+                if df.empty:
+                    break
+                first_rowid = int(df['_rowid'].iloc[0])
+                last_rowid = int(df['_rowid'].iloc[-1])
+                for partition, group in df.groupby('_partition'):
+                    self._write_part(dataset, schema, partition, first_rowid,
+                                     group.drop(columns=['_rowid', '_partition']))
+                appended += len(df)
+        return appended, last_rowid
+
+    def _write_part(self, dataset: ColumnarDataset, schema, partition: str, first_rowid: int, df: pd.DataFrame):
+        part_dir = os.path.join(self.root_dir, dataset.table, f"{dataset.partition_column}={partition}")
+        os.makedirs(part_dir, exist_ok=True)
+        for column in schema:
+            if pa.types.is_timestamp(column.type):
+                df[column.name] = pd.to_datetime(df[column.name], errors='coerce')
+            elif pa.types.is_string(column.type):
+                df[column.name] = df[column.name].map(lambda v: None if v is None or v != v else str(v))
+        arrow_table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        pq.write_table(arrow_table, os.path.join(part_dir, f"part-{first_rowid:012d}.parquet"))
+
+    # ------------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------------
+
+    def _connect(self, tables: Sequence[str]):
+        conn = duckdb.connect()
+        for table in tables:
+            dataset = COLUMNAR_DATASETS[table]
+            pattern = os.path.join(self.root_dir, table, '*', '*.parquet').replace('\\', '/')
+            conn.execute(
+                f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{pattern}', hive_partitioning = true, "
+                f"hive_types = {{'{dataset.partition_column}': VARCHAR}}, union_by_name = true)"
+            )
+        return conn
+
+    def query(self, sql: str, params: Optional[Dict[str, Any]] = None, tables: Sequence[str] = ()) -> pd.DataFrame:
+        """Runs SQL written with SQLAlchemy-style :name parameters against the Parquet mirror."""
+        # DuckDB rejects parameters the statement does not reference
+        referenced = set(_BIND_PARAM.findall(sql))
+        params = {name: value for name, value in (params or {}).items() if name in referenced}
+        conn = self._connect(tables)
+        try:
+            return conn.execute(_BIND_PARAM.sub(r'$\1', sql), params).df()
+        finally:
+            conn.close()
+
+    def can_serve(self, tables: Sequence[str]) -> bool:
+        if not COLUMNAR_AVAILABLE or not tables:
+            return False
+        if any(table not in COLUMNAR_DATASETS for table in tables):
+            return False
+        # An empty mirror has no Parquet files for DuckDB to read
+        if not all(os.path.isdir(os.path.join(self.root_dir, table)) for table in tables):
+            return False
+        return all(self.is_fresh(table) for table in tables)
+
+
+_sidecar = None
+_sidecar_lock = threading.Lock()
+
+
+def get_columnar_sidecar() -> ColumnarSidecar:
+    """Returns the process-wide sidecar rooted at config.COLUMNAR_DIR."""
+    global _sidecar
+    with _sidecar_lock:
+        if _sidecar is None:
+            _sidecar = ColumnarSidecar()
+        return _sidecar
+
+
+def run_routed_query(sql: str, params: Optional[Dict[str, Any]], tables: Sequence[str],
+                     db_session=None, sidecar: Optional[ColumnarSidecar] = None,
+                     swap_range: Tuple[Any, Any] = (None, None)) -> Tuple[pd.DataFrame, str]:
+    """
+    Runs an aggregate query on the sidecar when every table it reads is fresh there,
+    otherwise on SQLite. The SQL must be portable between the two (bind
+    parameters instead of date('now'), CAST instead of date()).
+
+    For SQL reading cftc_swap_data, swap_range is the (start, end) execution
+    window it covers (None for open ends). When start is given and archived
+    swap months overlap the window, the query runs in place over the hot
+    table and those months; without a start it reads the hot table only.
+
+    Returns (DataFrame, engine_name).
+    """
+    sidecar = sidecar or get_columnar_sidecar()
+    bind = db_session.bind if db_session is not None else sidecar.bind
+    if 'cftc_swap_data' in tables:
+        archived = SwapPartitionManager(bind=bind).query_with_archive(sql, params, *swap_range)
+        if archived is not None:
+            return archived, ENGINE_PARTITIONS
+
+    if sidecar.can_serve(tables):
+        try:
+            return sidecar.query(sql, params, tables), ENGINE_SIDECAR
+        except Exception as e:
+            logger.warning(f"Columnar sidecar query failed, falling back to SQLite: {e}")
+
+    with bind.connect() as conn:
+        return pd.read_sql(text(sql), conn, params=params or {}), ENGINE_SQLITE
+
+
+def sync_columnar_sidecar(tables: Optional[List[str]] = None, rebuild: bool = False) -> Dict[str, int]:
+    """Refresh-pipeline entry point; a no-op when duckdb/pyarrow are not installed."""
+    if not COLUMNAR_AVAILABLE:
+        logger.info("Columnar sidecar disabled: duckdb/pyarrow not installed")
+        return {}
+    return get_columnar_sidecar().sync(tables, rebuild=rebuild)
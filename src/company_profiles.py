@@ -0,0 +1,467 @@
+"""
+Materialized company profiles.
+
+company_profiles holds one row per CIK with filing counts and latest
+filings across the insider, 10-K/10-Q, 8-K, 13F, N-PORT, N-MFP and Form D
+tables, insider totals from the daily rollups, Form D raises and the
+largest 13F holders. A profile request is a primary-key lookup, and
+screens across companies are plain queries over the table.
+
+refresh_changed_profiles reads data_change_log past a watermark and
+rebuilds only the CIKs those ingests recorded. For batches logged
+without keys (more CIKs than the change log keeps), the CIKs are those
+whose filing count in the table no longer matches their profile. 13F
+position rebuilds refresh the companies matched to a CUSIP whose flow
+was rebuilt. Only the first run is a full rebuild, which runs the same
+queries over every CIK in batches.
+
+Public 13F data identifies securities by CUSIP only, so a company's
+holders are found by matching its name to the 13F issuer names.
+"""
+
+import json
+import logging
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import (SessionLocal, CompanyProfile, CompanyProfileWatermark, DataChangeLog, normalize_change_key,
+                      record_data_change)
+from src.filing_events import formd_date_sql
+from src.form13f_flows import DELTA_TABLE, FLOW_TABLE, latest_flow_quarter
+from src.insider_rollups import ROLLUP_TABLE
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TABLE = CompanyProfile.__tablename__
+LATEST_FILINGS = 10
+TOP_HOLDERS = 10
+# CIKs rebuilt and upserted per statement batch
+_BATCH_CIKS = 500
+
+# source -> (table, further joins, CIK column, accession, form type, filing date, name, ticker, LEI)
+FILING_SOURCES = {
+    'insider': ('sec_submissions t', '', 't.issuercik', 't.accession_number', 't.document_type', 't.filing_date',
+                't.issuername', 't.issuertradingsymbol', 'NULL'),
+    'periodic': ('sec_10k_submissions t', '', 't.cik', 't.accession_number', 't.form_type', 't.filing_date',
+                 't.company_name', 'NULL', 'NULL'),
+    'current': ('sec_8k_submissions t', '', 't.cik', 't.accession_number', 't.form_type', 't.filing_date',
+                't.company_name', 'NULL', 'NULL'),
+    'form13f': ('form13f_submissions t', 'LEFT JOIN form13f_coverpages c ON c.accession_number = t.accession_number',
+                't.cik', 't.accession_number', 't.submission_type', 't.filing_date', 'c.filing_manager_name',
+                'NULL', 'NULL'),
+    'nport': ('nport_submissions t', '', 't.cik', 't.accession_number', 't.submission_type', 't.filing_date',
+              't.registrant_name', 'NULL', 't.lei'),
+    'nmfp': ('nmfp_submissions t', '', 't.cik', 't.accession_number', 't.submission_type', 't.filing_date',
+             't.registrant_full_name', 'NULL', 't.registrant_leiid'),
+    'formd': ('formd_issuers t', 'JOIN formd_submissions fs ON fs.accessionnumber = t.accessionnumber',
+              't.cik', 't.accessionnumber', 'fs.submissiontype', formd_date_sql('fs.filing_date'), 't.entityname',
+              'NULL', 'NULL'),
+}
+# Profile count column per source, and the order in which sources name the company
+SOURCE_COUNT_COLUMNS = {'insider': 'insider_filings', 'periodic': 'periodic_filings', 'current': 'current_reports',
+                        'form13f': 'form13f_filings', 'nport': 'nport_filings', 'nmfp': 'nmfp_filings',
+                        'formd': 'formd_filings'}
+NAME_PRECEDENCE = ('periodic', 'current', 'insider', 'formd', 'nport', 'nmfp', 'form13f')
+
+HOLDER_TABLES = (DELTA_TABLE, FLOW_TABLE)
+# Filing table -> its source. The insider rollups are refreshed in the same ingest as
+# sec_submissions, and Form D submissions and offerings in the same batch as formd_issuers,
+# whose change-log entries carry the CIKs.
+SOURCE_TABLES = {table.split()[0]: source for source, (table, *_) in FILING_SOURCES.items()}
+PROFILE_SOURCE_TABLES = tuple(SOURCE_TABLES) + HOLDER_TABLES
+PROFILE_TABLES = PROFILE_SOURCE_TABLES + ('formd_submissions', 'formd_offerings', ROLLUP_TABLE, PROFILE_TABLE)
+
+SCREEN_ORDERS = ('insider_purchase_value', 'insider_sale_value', 'institutional_value', 'institutional_holders',
+                 'formd_amount_sold', 'latest_filing_date', 'current_reports')
+
+_ISSUER_SUFFIXES = {'INC', 'INCORPORATED', 'CORP', 'CORPORATION', 'CO', 'COMPANY', 'LTD', 'LIMITED', 'PLC', 'LLC',
+                    'LP', 'NV', 'SA', 'AG', 'THE', 'DEL', 'NEW', 'HLDGS', 'HOLDINGS', 'GROUP', 'GRP', 'COS'}
+_NAME_TOKEN = re.compile(r"[A-Z0-9]+")
+
+
+def _session_scope(session: Optional[Session]):
+    return (session, False) if session is not None else (SessionLocal(), True)
+
+
+def issuer_name_key(name: Optional[str]) -> str:
+    """Name with punctuation and corporate suffixes dropped: 'Apple Inc.' and 'APPLE INC' -> 'APPLE'."""
+    tokens = _NAME_TOKEN.findall((name or '').upper().replace('.', '').replace("'", ''))
+    while tokens and tokens[-1] in _ISSUER_SUFFIXES:
+        tokens.pop()
+    while tokens and tokens[0] == 'THE':
+        tokens.pop(0)
+    return ' '.join(tokens)
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _profile_keys(session: Session, ciks: Optional[Iterable[str]]) -> Dict[str, set]:
+    """Every stored form of the CIKs to rebuild (all CIKs on file when ciks is None), by normalized CIK."""
+    keys: Dict[str, set] = {}
+    if ciks is None:
+        for table, _, cik_column, *_ in FILING_SOURCES.values():
+            for (raw,) in session.execute(text(f"SELECT DISTINCT {cik_column} FROM {table} "
+                                               f"WHERE {cik_column} IS NOT NULL")):
+                if str(raw).strip():
+                    keys.setdefault(normalize_change_key(raw), set()).add(raw)
+        return keys
+    for cik in ciks:
+        if cik is None or not str(cik).strip():
+            continue
+        key = normalize_change_key(cik)
+        keys.setdefault(key, set()).update({str(cik).strip(), key, key.zfill(10)})
+    return keys
+
+
+# (raw, cik) pairs bound as one JSON parameter, so a batch of CIKs is a single indexed join
+_KEYS_CTE = ("profile_keys AS (SELECT json_extract(value, '$[0]') AS raw, json_extract(value, '$[1]') AS cik "
+             "FROM json_each(:keys))")
+
+
+def _filing_rows(session: Session, keys: str) -> List[Dict[str, Any]]:
+    union = '\nUNION ALL\n'.join(
+        f"SELECT k.cik, '{source}' AS source, {accession} AS accession_number, {form_type} AS form_type, "
+        f"{filing_date} AS filing_date, {name} AS name, {ticker} AS ticker, {lei} AS lei "
+        f"FROM profile_keys k JOIN {table} ON {cik_column} = k.raw {joins}"
+        for source, (table, joins, cik_column, accession, form_type, filing_date, name, ticker, lei)
+        in FILING_SOURCES.items())
+    # Per CIK: each source's latest filing and count, plus the latest filings overall
+    return [dict(row._mapping) for row in session.execute(text(f"""
+        WITH {_KEYS_CTE},
+        filings AS ({union}),
+        ranked AS (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY cik, source ORDER BY filing_date DESC) AS source_rank,
+                   ROW_NUMBER() OVER (PARTITION BY cik ORDER BY filing_date DESC) AS overall_rank,
+                   COUNT(*) OVER (PARTITION BY cik, source) AS source_filings
+            FROM filings
+        )
+        SELECT * FROM ranked WHERE source_rank = 1 OR overall_rank <= :latest
+        ORDER BY cik, overall_rank
+    """), {'keys': keys, 'latest': LATEST_FILINGS})]
+
+
+def _insider_rows(session: Session, keys: str):
+    return session.execute(text(f"""
+        WITH {_KEYS_CTE}
+        SELECT k.cik, substr(r.trans_date, 1, 4) AS year, SUM(r.transactions) AS transactions,
+               SUM(CASE WHEN r.trans_code = 'P' THEN r.value_acquired ELSE 0 END) AS purchase_value,
+               SUM(CASE WHEN r.trans_code = 'S' THEN r.value_disposed ELSE 0 END) AS sale_value,
+               MAX(r.trans_date) AS latest_trade
+        FROM profile_keys k
+        JOIN {ROLLUP_TABLE} r ON r.issuercik = k.raw
+        GROUP BY k.cik, year
+    """), {'keys': keys}).fetchall()
+
+
+def _formd_rows(session: Session, keys: str):
+    amount = "CASE WHEN o.{0} GLOB '[0-9]*' THEN CAST(o.{0} AS REAL) ELSE 0 END"
+    return session.execute(text(f"""
+        WITH {_KEYS_CTE}
+        SELECT k.cik, COUNT(*) AS offerings,
+               SUM({amount.format('totalofferingamount')}) AS offering_amount,
+               SUM({amount.format('totalamountsold')}) AS amount_sold
+        FROM profile_keys k
+        JOIN formd_issuers i ON i.cik = k.raw
+        JOIN formd_offerings o ON o.accessionnumber = i.accessionnumber
+        WHERE lower(COALESCE(o.isamendment, 'false')) NOT IN ('true', 'y', '1')
+        GROUP BY k.cik
+    """), {'keys': keys}).fetchall()
+
+
+def _issuer_cusips(session: Session, quarter: str) -> Dict[str, List[str]]:
+    """CUSIPs held in quarter by normalized issuer name."""
+    cusips: Dict[str, List[str]] = {}
+    for cusip, issuer in session.execute(text(f"SELECT cusip, nameofissuer FROM {FLOW_TABLE} WHERE quarter = :q"),
+                                         {'q': quarter}):
+        key = issuer_name_key(issuer)
+        if key:
+            cusips.setdefault(key, []).append(cusip)
+    return cusips
+
+
+def _holder_rows(session: Session, matches: List[List[str]], quarter: str):
+    """Top 13F holders in quarter per company, from (cusip, cik) matches."""
+    return session.execute(text(f"""
+        WITH matches AS (
+            SELECT json_extract(value, '$[0]') AS cusip, json_extract(value, '$[1]') AS company
+            FROM json_each(:matches)
+        ),
+        holdings AS (
+            SELECT m.company, d.cik AS holder, SUM(d.value) AS value, SUM(d.shares) AS shares
+            FROM matches m
+            JOIN {DELTA_TABLE} d ON d.cusip = m.cusip AND d.quarter = :quarter
+            WHERE d.value > 0
+            GROUP BY m.company, d.cik
+        ),
+        ranked AS (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY company ORDER BY value DESC) AS rank,
+                   COUNT(*) OVER (PARTITION BY company) AS holders,
+                   SUM(value) OVER (PARTITION BY company) AS total_value
+            FROM holdings
+        )
+        SELECT ranked.*,
+               (SELECT c.filing_manager_name FROM form13f_submissions s
+                JOIN form13f_coverpages c ON c.accession_number = s.accession_number
+                WHERE s.cik = ranked.holder ORDER BY s.filing_date DESC LIMIT 1) AS holder_name
+        FROM ranked WHERE rank <= :top
+        ORDER BY company, rank
+    """), {'matches': json.dumps(matches), 'quarter': quarter, 'top': TOP_HOLDERS}).fetchall()
+
+
+def _build_profiles(session: Session, keys: Dict[str, set], quarter: Optional[str],
+                    issuer_cusips: Dict[str, List[str]]) -> Dict[str, Dict[str, Any]]:
+    bound = json.dumps([[raw, cik] for cik, raws in keys.items() for raw in raws])
+    profiles: Dict[str, Dict[str, Any]] = {}
+    source_names: Dict[str, Dict[str, str]] = {}
+    for row in _filing_rows(session, bound):
+        profile = profiles.setdefault(row['cik'], {
+            'cik': row['cik'], 'company_name': None, 'ticker_symbol': None, 'lei': None,
+            **{column: 0 for column in SOURCE_COUNT_COLUMNS.values()},
+            'latest_filing_date': None, 'latest_filings': [],
+            'insider_transactions': 0, 'insider_purchase_value': 0.0, 'insider_sale_value': 0.0,
+            'latest_insider_trade': None, 'insider_by_year': {},
+            'formd_offerings': 0, 'formd_offering_amount': 0.0, 'formd_amount_sold': 0.0, 'latest_formd_date': None,
+            'institutional_quarter': None, 'institutional_holders': 0, 'institutional_value': 0.0,
+            'holder_cusips': [], 'top_holders': [], 'refreshed_at': datetime.utcnow(),
+        })
+        if row['source_rank'] == 1:
+            profile[SOURCE_COUNT_COLUMNS[row['source']]] = row['source_filings']
+            if row['name']:
+                source_names.setdefault(row['cik'], {})[row['source']] = row['name']
+            profile['ticker_symbol'] = profile['ticker_symbol'] or row['ticker']
+            profile['lei'] = profile['lei'] or row['lei']
+            if row['source'] == 'formd':
+                profile['latest_formd_date'] = row['filing_date']
+        if row['overall_rank'] <= LATEST_FILINGS:
+            profile['latest_filings'].append({
+                'source': row['source'], 'form_type': row['form_type'],
+                'filing_date': str(row['filing_date'])[:10] if row['filing_date'] else None,
+                'accession_number': row['accession_number']})
+            if row['overall_rank'] == 1:
+                profile['latest_filing_date'] = _as_datetime(row['filing_date'])
+
+    names = {}
+    for cik, by_source in source_names.items():
+        names[cik] = next(by_source[source] for source in NAME_PRECEDENCE if source in by_source)
+        profiles[cik]['company_name'] = names[cik]
+
+    for row in _insider_rows(session, bound):
+        profile = profiles.get(row.cik)
+        if profile is None:
+            continue
+        profile['insider_by_year'][row.year] = {'transactions': row.transactions,
+                                                'purchase_value': row.purchase_value, 'sale_value': row.sale_value}
+        profile['insider_transactions'] += row.transactions or 0
+        profile['insider_purchase_value'] += row.purchase_value or 0
+        profile['insider_sale_value'] += row.sale_value or 0
+        profile['latest_insider_trade'] = max(filter(None, [profile['latest_insider_trade'], row.latest_trade]),
+                                              default=None)
+
+    for row in _formd_rows(session, bound):
+        if row.cik in profiles:
+            profiles[row.cik].update(formd_offerings=row.offerings, formd_offering_amount=row.offering_amount,
+                                     formd_amount_sold=row.amount_sold)
+
+    matches = [[cusip, cik] for cik, name in names.items() for cusip in issuer_cusips.get(issuer_name_key(name), ())]
+    if matches:
+        for cusip, cik in matches:
+            profiles[cik].update(institutional_quarter=quarter)
+            profiles[cik]['holder_cusips'].append(cusip)
+        for row in _holder_rows(session, matches, quarter):
+            profile = profiles[row.company]
+            profile.update(institutional_holders=row.holders, institutional_value=row.total_value)
+            profile['top_holders'].append({'cik': row.holder, 'name': row.holder_name, 'value': row.value,
+                                           'shares': row.shares})
+    return profiles
+
+
+def refresh_company_profiles(ciks: Optional[Iterable[str]] = None, session: Optional[Session] = None) -> int:
+    """
+    Rebuilds the profiles of the given CIKs (any zero padding), or of every
+    CIK on file when ciks is None. CIKs with no filings left lose their
+    profile. Returns the number of profiles written.
+    """
+    session, close_session = _session_scope(session)
+    try:
+        keys = _profile_keys(session, ciks)
+        quarter = latest_flow_quarter(session)
+        issuer_cusips = _issuer_cusips(session, quarter) if quarter else {}
+        columns = [c.name for c in CompanyProfile.__table__.columns if c.name != 'cik']
+
+        built = set()
+        batches = list(keys.items())
+        for start in range(0, len(batches), _BATCH_CIKS):
+            profiles = _build_profiles(session, dict(batches[start:start + _BATCH_CIKS]), quarter, issuer_cusips)
+            if profiles:
+                statement = sqlite_insert(CompanyProfile).values(list(profiles.values()))
+                session.execute(statement.on_conflict_do_update(
+                    index_elements=['cik'], set_={column: statement.excluded[column] for column in columns}))
+            built.update(profiles)
+
+        if ciks is None:
+            stale = {row[0] for row in session.execute(text(f"SELECT cik FROM {PROFILE_TABLE}"))} - built
+        else:
+            stale = set(keys) - built
+        if stale:
+            session.query(CompanyProfile).filter(CompanyProfile.cik.in_(stale)).delete(synchronize_session=False)
+
+        if built or stale:
+            record_data_change(session, CompanyProfile, [{'cik': cik} for cik in built | stale])
+        session.commit()
+        logger.info(f"Refreshed {len(built)} company profiles ({len(stale)} removed)")
+        return len(built)
+    except Exception as e:
+        logger.error(f"Error refreshing company profiles: {e}", exc_info=True)
+        session.rollback()
+        raise
+    finally:
+        if close_session:
+            session.close()
+
+
+def _get_watermark(session: Session) -> CompanyProfileWatermark:
+    watermark = session.get(CompanyProfileWatermark, 1)
+    if watermark is None:
+        watermark = CompanyProfileWatermark(id=1, last_epoch=0)
+        session.add(watermark)
+        session.flush()
+    return watermark
+
+
+def _recounted_ciks(session: Session, sources: Iterable[str]) -> set:
+    """CIKs whose filing count in any of sources differs from the count in their profile."""
+    ciks = set()
+    for source in sources:
+        table, joins, cik_column, *_ = FILING_SOURCES[source]
+        counts: Dict[str, int] = {}
+        for raw, filings in session.execute(text(f"SELECT {cik_column}, COUNT(*) FROM {table} {joins} "
+                                                 f"WHERE {cik_column} IS NOT NULL GROUP BY {cik_column}")):
+            if str(raw).strip():
+                key = normalize_change_key(raw)
+                counts[key] = counts.get(key, 0) + filings
+        column = getattr(CompanyProfile, SOURCE_COUNT_COLUMNS[source])
+        stored = dict(session.query(CompanyProfile.cik, column).filter(column > 0).all())
+        ciks.update(cik for cik in counts.keys() | stored.keys() if counts.get(cik, 0) != stored.get(cik, 0))
+    return ciks
+
+
+def _holder_changed_ciks(session: Session, since: Optional[datetime]) -> set:
+    """
+    CIKs whose 13F holders may have changed: profiles matched to a CUSIP
+    whose latest-quarter flow was rebuilt since `since`, profiles whose name
+    matches such a CUSIP's issuer, and profiles matched in an older quarter.
+    """
+    quarter = latest_flow_quarter(session)
+    changed, issuers = set(), set()
+    if quarter:
+        for cusip, issuer in session.execute(text(
+                f"SELECT cusip, nameofissuer FROM {FLOW_TABLE} "
+                f"WHERE quarter = :q AND (:since IS NULL OR built_at IS NULL OR built_at >= :since)"),
+                {'q': quarter, 'since': since.strftime('%Y-%m-%d %H:%M:%S') if since else None}):
+            changed.add(cusip)
+            issuers.add(issuer_name_key(issuer))
+    ciks = set()
+    for cik, name, matched_quarter, cusips in session.query(
+            CompanyProfile.cik, CompanyProfile.company_name, CompanyProfile.institutional_quarter,
+            CompanyProfile.holder_cusips):
+        if ((matched_quarter and matched_quarter != quarter) or changed.intersection(cusips or ())
+                or (name and issuer_name_key(name) in issuers)):
+            ciks.add(cik)
+    return ciks
+
+
+def refresh_changed_profiles(session: Optional[Session] = None) -> int:
+    """
+    Rebuilds the profiles of CIKs changed in data_change_log since the last
+    run: the CIKs keyed in the log, the CIKs whose filing counts moved in
+    tables logged without keys, and the companies matched to rebuilt 13F
+    CUSIPs. All profiles are built on the first run. Returns the number of
+    profiles written.
+    """
+    session, close_session = _session_scope(session)
+    try:
+        watermark = _get_watermark(session)
+        changes = (session.query(DataChangeLog.epoch, DataChangeLog.table_name, DataChangeLog.key_type,
+                                 DataChangeLog.key_value)
+                   .filter(DataChangeLog.epoch > watermark.last_epoch,
+                           DataChangeLog.table_name.in_(PROFILE_SOURCE_TABLES))
+                   .all())
+        if not changes:
+            return 0
+        # Without a previous run the log may have been pruned past changes the profiles lack
+        if watermark.refreshed_at is None or session.query(CompanyProfile.cik).first() is None:
+            ciks = None
+        else:
+            ciks = {c.key_value for c in changes if c.key_type == 'cik'}
+            unkeyed = {SOURCE_TABLES[c.table_name] for c in changes
+                       if c.key_value is None and c.table_name in SOURCE_TABLES}
+            if unkeyed:
+                ciks |= _recounted_ciks(session, sorted(unkeyed))
+            if any(c.table_name in HOLDER_TABLES for c in changes):
+                ciks |= _holder_changed_ciks(session, watermark.refreshed_at)
+        written = refresh_company_profiles(ciks, session) if ciks is None or ciks else 0
+
+        watermark = _get_watermark(session)
+        watermark.last_epoch = max(c.epoch for c in changes)
+        watermark.refreshed_at = datetime.utcnow()
+        session.commit()
+        return written
+    finally:
+        if close_session:
+            session.close()
+
+
+def _profile_dict(profile: CompanyProfile) -> Dict[str, Any]:
+    return {column.name: getattr(profile, column.name) for column in CompanyProfile.__table__.columns}
+
+
+def get_company_profile(cik: str, session: Optional[Session] = None) -> Optional[Dict[str, Any]]:
+    """The stored profile of cik, built on first request; None if nothing is on file for it."""
+    session, close_session = _session_scope(session)
+    try:
+        key = normalize_change_key(cik)
+        profile = session.get(CompanyProfile, key)
+        if profile is None:
+            refresh_company_profiles([key], session)
+            profile = session.get(CompanyProfile, key)
+        return _profile_dict(profile) if profile is not None else None
+    finally:
+        if close_session:
+            session.close()
+
+
+def screen_company_profiles(order_by: str = 'insider_purchase_value', min_insider_purchase_value: float = 0,
+                            min_institutional_value: float = 0, has_formd: bool = False,
+                            filed_since=None, limit: int = 50,
+                            session: Optional[Session] = None) -> List[Dict[str, Any]]:
+    """Companies ranked by a profile column, filtered on insider, institutional and Form D figures."""
+    if order_by not in SCREEN_ORDERS:
+        raise ValueError(f"Unknown order '{order_by}'. Expected: {', '.join(SCREEN_ORDERS)}")
+    session, close_session = _session_scope(session)
+    try:
+        query = session.query(CompanyProfile)
+        if min_insider_purchase_value:
+            query = query.filter(CompanyProfile.insider_purchase_value >= min_insider_purchase_value)
+        if min_institutional_value:
+            query = query.filter(CompanyProfile.institutional_value >= min_institutional_value)
+        if has_formd:
+            query = query.filter(CompanyProfile.formd_offerings > 0)
+        if filed_since is not None:
+            query = query.filter(CompanyProfile.latest_filing_date >= _as_datetime(str(filed_since)))
+        column = getattr(CompanyProfile, order_by)
+        return [_profile_dict(p) for p in query.order_by(func.coalesce(column, 0).desc()).limit(limit)]
+    finally:
+        if close_session:
+            session.close()
@@ -0,0 +1,277 @@
+"""
+Rolling cross-asset correlation over the materialized daily datasets.
+
+Series come from tables that are already rolled up at ingest:
+- swaps:   cftc_swap_daily_aggregates, one series per asset class or product
+           ('swap:<key>'), notional or trade count per day
+- insider: sec_insider_daily_rollups, net open-market insider dollars per
+           issuer and day ('insider:<cik>')
+- 13f:     form13f_cusip_flows, net institutional value change per CUSIP
+           ('13f:<cusip>'). 13F flows are quarterly, so each quarter's flow
+           is spread evenly over its days.
+
+All series share one daily calendar (days without activity are 0). Each
+rolling window's correlation matrix is a single matrix product over the
+centred window, so the work per window is one BLAS call however many
+series there are; there are no Python loops over pairs. Full matrices
+are only kept for the latest window and the window before it; earlier
+windows are reduced to regime statistics and the top pairs' history.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from src.form13f_flows import FLOW_TABLE, quarter_label
+from src.insider_rollups import ROLLUP_TABLE
+from src.swap_aggregates import AGGREGATE_TABLE
+
+logger = logging.getLogger(__name__)
+
+SERIES_SOURCES = ('swaps', 'insider', '13f')
+SWAP_LEVELS = {'asset_class': 'asset_class', 'product': 'product_name', 'currency': 'notional_currency'}
+SWAP_MEASURES = ('notional_sum', 'trade_count')
+# Source tables per series source, for cache invalidation
+CORRELATION_TABLES = (AGGREGATE_TABLE, ROLLUP_TABLE, FLOW_TABLE)
+
+DEFAULT_WINDOW = 63  # About a quarter of trading days
+DEFAULT_STEP = 21
+DEFAULT_MAX_SERIES = 2000
+
+
+def _as_day(value) -> str:
+    if isinstance(value, (date, datetime, pd.Timestamp)):
+        return value.strftime('%Y-%m-%d')
+    return str(value)[:10]
+
+
+def _session_scope(session: Optional[Session]):
+    return (session, False) if session is not None else (SessionLocal(), True)
+
+
+def _swap_series(session: Session, start: str, end: str, level: str, measure: str) -> pd.DataFrame:
+    if level not in SWAP_LEVELS:
+        raise ValueError(f"Unknown swap level '{level}'. Expected: {', '.join(SWAP_LEVELS)}")
+    if measure not in SWAP_MEASURES:
+        raise ValueError(f"Unknown swap measure '{measure}'. Expected: {', '.join(SWAP_MEASURES)}")
+    column = SWAP_LEVELS[level]
+    df = pd.read_sql(text(f"""
+        SELECT trade_date AS day, {column} AS key, SUM(COALESCE({measure}, 0)) AS value
+        FROM {AGGREGATE_TABLE}
+        WHERE trade_date BETWEEN :start AND :end
+        GROUP BY trade_date, {column}
+    """), session.connection(), params={'start': start, 'end': end})
+    df['series'] = 'swap:' + df['key'].replace('', 'unknown').astype(str)
+    return df[['day', 'series', 'value']]
+
+
+def _insider_series(session: Session, start: str, end: str) -> pd.DataFrame:
+    df = pd.read_sql(text(f"""
+        SELECT trans_date AS day, issuercik AS key, SUM(value_acquired - value_disposed) AS value
+        FROM {ROLLUP_TABLE}
+        WHERE trans_code IN ('P', 'S') AND trans_date BETWEEN :start AND :end
+        GROUP BY trans_date, issuercik
+    """), session.connection(), params={'start': start, 'end': end})
+    df['series'] = 'insider:' + df['key'].astype(str)
+    return df[['day', 'series', 'value']]
+
+
+def _form13f_series(session: Session, calendar: pd.DatetimeIndex) -> pd.DataFrame:
+    """Wide frame of daily 13F flow rates on calendar, one column per CUSIP."""
+    df = pd.read_sql(text(f"""
+        SELECT quarter, cusip, value_change
+        FROM {FLOW_TABLE}
+        WHERE quarter BETWEEN :start AND :end AND value_change IS NOT NULL
+    """), session.connection(), params={'start': quarter_label(calendar[0]), 'end': quarter_label(calendar[-1])})
+    if df.empty:
+        return pd.DataFrame(index=calendar)
+    by_quarter = df.pivot_table(index='quarter', columns='cusip', values='value_change', aggfunc='sum', fill_value=0)
+    periods = calendar.to_period('Q')
+    day_quarters = [f"{p.year}-Q{p.quarter}" for p in periods]
+    rows = by_quarter.reindex(day_quarters, fill_value=0).to_numpy(dtype=float)
+    days_in_quarter = np.asarray((periods.end_time.normalize() - periods.start_time).days + 1, dtype=float)
+    return pd.DataFrame(rows / days_in_quarter[:, None], index=calendar,
+                        columns=['13f:' + str(c) for c in by_quarter.columns])
+
+
+def build_series_frame(sources: Sequence[str] = SERIES_SOURCES, start_date=None, end_date=None,
+                       swap_level: str = 'asset_class', swap_measure: str = 'notional_sum',
+                       max_series: int = DEFAULT_MAX_SERIES, session: Optional[Session] = None) -> pd.DataFrame:
+    """
+    Daily frame (calendar days start_date..end_date) with one float column
+    per series, keeping the max_series most active series by total
+    absolute value. Defaults to the last three years.
+    """
+    unknown = [s for s in sources if s not in SERIES_SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown series source(s) {unknown}. Expected: {', '.join(SERIES_SOURCES)}")
+    end = pd.Timestamp(_as_day(end_date or date.today()))
+    start = pd.Timestamp(_as_day(start_date or (end - timedelta(days=3 * 365))))
+    calendar = pd.date_range(start, end, freq='D')
+    start_day, end_day = _as_day(start), _as_day(end)
+
+    session, close_session = _session_scope(session)
+    try:
+        long_frames = []
+        if 'swaps' in sources:
+            long_frames.append(_swap_series(session, start_day, end_day, swap_level, swap_measure))
+        if 'insider' in sources:
+            long_frames.append(_insider_series(session, start_day, end_day))
+        wide_frames = [_form13f_series(session, calendar)] if '13f' in sources else []
+    finally:
+        if close_session:
+            session.close()
+
+    long_frames = [f for f in long_frames if not f.empty]
+    if long_frames:
+        values = pd.concat(long_frames, ignore_index=True)
+        values['day'] = pd.to_datetime(values['day'].str[:10])
+        wide_frames.append(values.pivot_table(index='day', columns='series', values='value', aggfunc='sum')
+                           .reindex(calendar, fill_value=0).fillna(0))
+    frame = pd.concat(wide_frames, axis=1) if wide_frames else pd.DataFrame(index=calendar)
+    frame = frame.astype(float)
+
+    if frame.shape[1] > max_series:
+        activity = np.abs(frame.to_numpy()).sum(axis=0)
+        keep = np.sort(np.argpartition(activity, -max_series)[-max_series:])
+        frame = frame.iloc[:, keep]
+    return frame
+
+
+def _standardize(window: np.ndarray, min_periods: int):
+    """Centred, unit-norm columns; unusable columns are zeroed and flagged False."""
+    centred = window - window.mean(axis=0)
+    scale = np.sqrt(np.einsum('ij,ij->j', centred, centred))
+    usable = (scale > 0) & (np.count_nonzero(window, axis=0) >= min_periods)
+    centred *= np.divide(1.0, scale, out=np.zeros_like(scale), where=usable)
+    return centred, usable
+
+
+def _mask(corr: np.ndarray, usable: np.ndarray) -> np.ndarray:
+    np.clip(corr, -1.0, 1.0, out=corr)
+    corr[~usable, :] = np.nan
+    corr[:, ~usable] = np.nan
+    return corr
+
+
+def correlation_matrix(window: np.ndarray, min_periods: int = 2) -> np.ndarray:
+    """
+    Pearson correlation of the columns of a (days x series) window as one
+    matrix product of the standardized window. Series with no variance or
+    fewer than min_periods non-zero days get NaN rows and columns.
+    """
+    z, usable = _standardize(window, min_periods)
+    return _mask(z.T @ z, usable)
+
+
+def _regime(z: np.ndarray, corr: np.ndarray, usable: np.ndarray) -> Dict[str, Any]:
+    # corr is the unmasked z.T @ z, so unusable series contribute zeros and
+    # the sum of all entries is the squared norm of the row sums of z
+    n_valid = int(usable.sum())
+    pairs = n_valid * (n_valid - 1) / 2
+    if not pairs:
+        return {'series': n_valid, 'mean_correlation': None, 'mean_abs_correlation': None}
+    row_sums = z.sum(axis=1)
+    off_sum = (row_sums @ row_sums - n_valid) / 2
+    off_abs = (np.abs(corr).sum() - n_valid) / 2
+    return {'series': n_valid, 'mean_correlation': float(off_sum / pairs),
+            'mean_abs_correlation': float(off_abs / pairs)}
+
+
+def rolling_correlations(frame: pd.DataFrame, window: int = DEFAULT_WINDOW, step: int = DEFAULT_STEP,
+                         min_periods: int = 5, top_pairs: int = 20) -> Dict[str, Any]:
+    """
+    Correlation matrices over rolling windows of frame, evaluated every
+    step days back from the last day. Returns per-window regime statistics,
+    the most correlated pairs in the latest window with their history at
+    each evaluated date, the pairs whose correlation moved most against the
+    previous non-overlapping window, and the latest matrix itself.
+    """
+    values = frame.to_numpy(dtype=float)
+    days, n_series = values.shape
+    if days < window or n_series < 2:
+        return {'error': f"Need at least {window} days and 2 series, got {days} days and {n_series} series"}
+
+    ends = np.arange(days - 1, window - 2, -max(1, step))[::-1]
+    names = np.asarray(frame.columns, dtype=object)
+    z, usable = _standardize(values[ends[-1] - window + 1:ends[-1] + 1], min_periods)
+    latest_raw = z.T @ z
+    latest = _mask(latest_raw.copy(), usable)
+
+    rows, cols = np.triu_indices(n_series, k=1)
+    latest_pairs = latest[rows, cols]
+    ranked = np.where(np.isfinite(latest_pairs), np.abs(latest_pairs), -1.0)
+    k = min(top_pairs, int((ranked >= 0).sum()))
+    top = np.argpartition(ranked, -k)[-k:] if k else np.array([], dtype=int)
+    top = top[np.argsort(-ranked[top])]
+    top_rows, top_cols = rows[top], cols[top]
+
+    regime, history = [], []
+    previous = None
+    previous_end = ends[-1] - window
+    for end in ends:
+        if end == ends[-1]:
+            corr, end_usable, end_z = latest_raw, usable, z
+        else:
+            end_z, end_usable = _standardize(values[end - window + 1:end + 1], min_periods)
+            corr = end_z.T @ end_z
+        regime.append({'date': frame.index[end].strftime('%Y-%m-%d'), **_regime(end_z, corr, end_usable)})
+        pair_values = np.clip(corr[top_rows, top_cols], -1.0, 1.0)
+        pair_values[~(end_usable[top_rows] & end_usable[top_cols])] = np.nan
+        history.append(pair_values)
+        if end <= previous_end:
+            previous = (corr, end_usable)  # Latest window that does not overlap the current one
+    if previous is not None:
+        previous = _mask(*previous)
+
+    result = {
+        'series_count': n_series,
+        'days': days,
+        'window': window,
+        'step': step,
+        'start_date': frame.index[0].strftime('%Y-%m-%d'),
+        'end_date': frame.index[-1].strftime('%Y-%m-%d'),
+        'regime': regime,
+        'top_pairs': [],
+        'largest_changes': [],
+    }
+    history = np.vstack(history) if history else np.empty((0, 0))
+    for position, (i, j) in enumerate(zip(top_rows, top_cols)):
+        result['top_pairs'].append({
+            'series_a': names[i], 'series_b': names[j], 'correlation': float(latest[i, j]),
+            'history': [None if np.isnan(v) else round(float(v), 4) for v in history[:, position]],
+        })
+
+    if previous is not None:
+        change = latest_pairs - previous[rows, cols]
+        moved = np.where(np.isfinite(change), np.abs(change), -1.0)
+        k = min(top_pairs, int((moved >= 0).sum()))
+        if k:
+            biggest = np.argpartition(moved, -k)[-k:]
+            for index in biggest[np.argsort(-moved[biggest])]:
+                i, j = rows[index], cols[index]
+                result['largest_changes'].append({
+                    'series_a': names[i], 'series_b': names[j], 'correlation': float(latest[i, j]),
+                    'previous_correlation': float(previous[i, j]), 'change': float(change[index])})
+
+    result['latest_matrix'] = pd.DataFrame(latest, index=frame.columns, columns=frame.columns)
+    return result
+
+
+def analyze_cross_asset_correlation(sources: Sequence[str] = SERIES_SOURCES, start_date=None, end_date=None,
+                                    swap_level: str = 'asset_class', swap_measure: str = 'notional_sum',
+                                    window: int = DEFAULT_WINDOW, step: int = DEFAULT_STEP, min_periods: int = 5,
+                                    top_pairs: int = 20, max_series: int = DEFAULT_MAX_SERIES,
+                                    session: Optional[Session] = None) -> Dict[str, Any]:
+    """Builds the series frame from the database and runs rolling_correlations over it."""
+    frame = build_series_frame(sources, start_date, end_date, swap_level, swap_measure, max_series, session)
+    logger.info(f"Correlating {frame.shape[1]} series over {frame.shape[0]} days")
+    result = rolling_correlations(frame, window, step, min_periods, top_pairs)
+    result['sources'] = list(sources)
+    return result
@@ -27,6 +27,8 @@ from sqlalchemy import text, and_, or_
 # Import existing modules
 from src.enhanced_entity_resolver import EnhancedEntityResolver, EntityProfile, IdentifierType
 from src.swap_analysis.single_party_risk_analyzer import SinglePartyRiskAnalyzer, SwapExposure, RiskLevel
+from src.derivative_disclosures import (DISCLOSURE_PATTERNS, classify_disclosure, extract_amounts,
+                                        disclosure_confidence, extract_missing_disclosures, get_filing_disclosures)
 
 logger = logging.getLogger(__name__)
 
@@ -129,39 +131,8 @@ class CrossFilingCorrelationEngine:
     def _init_disclosure_patterns(self) -> Dict[FilingType, Dict[DisclosureType, List[str]]]:
         """Initialize patterns for finding derivative disclosures in different filing types."""
         return {
-            FilingType.FORM_10K: {
-                DisclosureType.DERIVATIVE_INSTRUMENTS: [
-                    "derivative instruments", "derivatives", "swaps", "futures", "options"
-                ],
-                DisclosureType.HEDGING_ACTIVITIES: [
-                    "hedging", "hedge", "risk management", "hedge accounting"
-                ],
-                DisclosureType.CREDIT_RISK: [
-                    "credit risk", "counterparty risk", "credit exposure"
-                ],
-                DisclosureType.MARKET_RISK: [
-                    "market risk", "interest rate risk", "currency risk"
-                ],
-                DisclosureType.FAIR_VALUE: [
-                    "fair value", "mark to market", "valuation"
-                ]
-            },
-            FilingType.FORM_10Q: {
-                DisclosureType.DERIVATIVE_INSTRUMENTS: [
-                    "derivative instruments", "derivatives", "swaps"
-                ],
-                DisclosureType.HEDGING_ACTIVITIES: [
-                    "hedging", "hedge", "risk management"
-                ],
-                DisclosureType.FAIR_VALUE: [
-                    "fair value", "mark to market"
-                ]
-            },
-            FilingType.FORM_8K: {
-                DisclosureType.DERIVATIVE_INSTRUMENTS: [
-                    "derivative", "swap", "hedge", "risk management"
-                ]
-            }
+            FilingType(form): {DisclosureType(kind): keywords for kind, keywords in patterns.items()}
+            for form, patterns in DISCLOSURE_PATTERNS.items()
         }
     
     def analyze_cross_filing_correlations(self, entity_identifier: str, 
@@ -195,11 +166,8 @@ class CrossFilingCorrelationEngine:
                 logger.info(f"No filings found for {entity_name}")
                 return []
             
-            # Extract derivative disclosures from each filing
-            all_disclosures = []
-            for filing in filings:
-                disclosures = self._extract_derivative_disclosures(filing)
-                all_disclosures.extend(disclosures)
+            # Derivative disclosures extracted at ingest for all filings
+            all_disclosures = self._load_disclosures(filings)
             
             # Correlate disclosures across filings
             correlations = self._correlate_disclosures(entity_id, all_disclosures)
@@ -285,78 +253,43 @@ class CrossFilingCorrelationEngine:
             return None
     
     def _get_entity_filings(self, entity_id: str) -> List[FilingReference]:
-        """Get all relevant filings for an entity."""
+        """Get the latest 10 10-K, 20 10-Q and 20 8-K filings for an entity in one query."""
         filings = []
         
         try:
             if not self.db_session:
                 return filings
             
-            # Get 10-K filings
-            query_10k = text("""
-                SELECT accession_number, filing_date, period_of_report, company_name, form_type
-                FROM sec_10k_submissions
-                WHERE cik = :entity_id
-                ORDER BY filing_date DESC
-                LIMIT 10
-            """)
-            
-            results_10k = self.db_session.execute(query_10k, {"entity_id": entity_id}).fetchall()
-            for result in results_10k:
-                filing = FilingReference(
-                    accession_number=result.accession_number,
-                    filing_type=FilingType.FORM_10K,
-                    filing_date=result.filing_date,
-                    period_end_date=result.period_of_report,
-                    entity_id=entity_id,
-                    entity_name=result.company_name,
-                    form_type=result.form_type
-                )
-                filings.append(filing)
-            
-            # Get 10-Q filings
-            query_10q = text("""
-                SELECT accession_number, filing_date, period_of_report, company_name, form_type
-                FROM sec_10k_submissions
-                WHERE cik = :entity_id AND form_type IN ('10-Q', '10-Q/A')
-                ORDER BY filing_date DESC
-                LIMIT 20
-            """)
-            
-            results_10q = self.db_session.execute(query_10q, {"entity_id": entity_id}).fetchall()
-            for result in results_10q:
-                filing = FilingReference(
-                    accession_number=result.accession_number,
-                    filing_type=FilingType.FORM_10Q,
-                    filing_date=result.filing_date,
-                    period_end_date=result.period_of_report,
-                    entity_id=entity_id,
-                    entity_name=result.company_name,
-                    form_type=result.form_type
+            query = text("""
+                SELECT accession_number, filing_date, period_of_report, company_name, form_type, filing_type
+                FROM (
+                    SELECT f.*, ROW_NUMBER() OVER (PARTITION BY filing_type ORDER BY filing_date DESC) AS rn
+                    FROM (
+                        SELECT accession_number, filing_date, period_of_report, company_name, form_type,
+                               CASE WHEN form_type IN ('10-Q', '10-Q/A') THEN '10-Q' ELSE '10-K' END AS filing_type
+                        FROM sec_10k_submissions
+                        WHERE cik = :entity_id
+                        UNION ALL
+                        SELECT accession_number, filing_date, period_of_report, company_name, form_type,
+                               '8-K' AS filing_type
+                        FROM sec_8k_submissions
+                        WHERE cik = :entity_id
+                    ) f
                 )
-                filings.append(filing)
-            
-            # Get 8-K filings
-            query_8k = text("""
-                SELECT accession_number, filing_date, period_of_report, company_name, form_type
-                FROM sec_8k_submissions
-                WHERE cik = :entity_id
-                ORDER BY filing_date DESC
-                LIMIT 20
+                WHERE rn <= CASE filing_type WHEN '10-K' THEN 10 ELSE 20 END
+                ORDER BY filing_type, filing_date DESC
             """)
             
-            results_8k = self.db_session.execute(query_8k, {"entity_id": entity_id}).fetchall()
-            for result in results_8k:
-                filing = FilingReference(
+            for result in self.db_session.execute(query, {"entity_id": entity_id}).fetchall():
+                filings.append(FilingReference(
                     accession_number=result.accession_number,
-                    filing_type=FilingType.FORM_8K,
+                    filing_type=FilingType(result.filing_type),
                     filing_date=result.filing_date,
                     period_end_date=result.period_of_report or result.filing_date,
                     entity_id=entity_id,
                     entity_name=result.company_name,
                     form_type=result.form_type
-                )
-                filings.append(filing)
+                ))
             
             logger.info(f"Found {len(filings)} filings for entity {entity_id}")
             
@@ -365,175 +298,62 @@ class CrossFilingCorrelationEngine:
         
         return filings
     
-    def _extract_derivative_disclosures(self, filing: FilingReference) -> List[DerivativeDisclosure]:
-        """Extract derivative disclosures from a specific filing."""
+    def _load_disclosures(self, filings: List[FilingReference]) -> List[DerivativeDisclosure]:
+        """
+        Derivative disclosures of the filings from the features extracted at
+        ingest. Filings stored before extraction existed are extracted first.
+        The disclosure content is the stored excerpt, not the full section.
+        """
         disclosures = []
         
         try:
-            if not self.db_session:
+            if not self.db_session or not filings:
                 return disclosures
             
-            # Get document content based on filing type
-            if filing.filing_type == FilingType.FORM_10K:
-                query = text("""
-                    SELECT section, content
-                    FROM sec_10k_documents
-                    WHERE accession_number = :accession_number
-                    AND (content LIKE '%derivative%' OR content LIKE '%swap%' OR content LIKE '%hedge%')
-                """)
-            elif filing.filing_type == FilingType.FORM_10Q:
-                query = text("""
-                    SELECT section, content
-                    FROM sec_10k_documents
-                    WHERE accession_number = :accession_number
-                    AND (content LIKE '%derivative%' OR content LIKE '%swap%' OR content LIKE '%hedge%')
-                """)
-            elif filing.filing_type == FilingType.FORM_8K:
-                query = text("""
-                    SELECT item_number as section, content
-                    FROM sec_8k_items
-                    WHERE accession_number = :accession_number
-                    AND (content LIKE '%derivative%' OR content LIKE '%swap%' OR content LIKE '%hedge%')
-                """)
-            else:
-                return disclosures
-            
-            results = self.db_session.execute(query, {"accession_number": filing.accession_number}).fetchall()
+            accessions = [filing.accession_number for filing in filings]
+            features = get_filing_disclosures(accessions, self.db_session)
+            missing = [accession for accession in accessions if accession not in features]
+            if missing:
+                extract_missing_disclosures(missing, self.db_session)
+                features.update(get_filing_disclosures(missing, self.db_session))
             
-            for result in results:
-                # Determine disclosure type
-                disclosure_type = self._classify_disclosure_type(result.content, filing.filing_type)
-                
-                if disclosure_type:
-                    disclosure = DerivativeDisclosure(
-                        disclosure_id=f"{filing.accession_number}_{result.section}",
+            for filing in filings:
+                row = features.get(filing.accession_number)
+                for section in (row.sections or []) if row else []:
+                    disclosures.append(DerivativeDisclosure(
+                        disclosure_id=f"{filing.accession_number}_{section['section']}",
                         filing_reference=filing,
-                        disclosure_type=disclosure_type,
-                        section=result.section,
-                        content=result.content,
-                        extracted_data=self._extract_structured_data(result.content),
-                        confidence_score=self._calculate_disclosure_confidence(result.content, disclosure_type)
-                    )
-                    disclosures.append(disclosure)
+                        disclosure_type=DisclosureType(section['disclosure_type']),
+                        section=section['section'],
+                        content=section['excerpt'],
+                        extracted_data=section['extracted_data'],
+                        confidence_score=section['confidence_score'],
+                        last_updated=row.extracted_at or datetime.utcnow()
+                    ))
             
-            logger.info(f"Extracted {len(disclosures)} derivative disclosures from {filing.accession_number}")
+            logger.info(f"Loaded {len(disclosures)} derivative disclosures from {len(filings)} filings")
             
         except Exception as e:
-            logger.error(f"Error extracting derivative disclosures: {str(e)}")
+            logger.error(f"Error loading derivative disclosures: {str(e)}")
         
         return disclosures
     
+    def _extract_derivative_disclosures(self, filing: FilingReference) -> List[DerivativeDisclosure]:
+        """Extract derivative disclosures from a specific filing."""
+        return self._load_disclosures([filing])
+    
     def _classify_disclosure_type(self, content: str, filing_type: FilingType) -> Optional[DisclosureType]:
         """Classify the type of derivative disclosure."""
-        if not content:
-            return None
-        
-        content_lower = content.lower()
-        
-        # Get patterns for this filing type
-        patterns = self.disclosure_patterns.get(filing_type, {})
-        
-        # Check each disclosure type
-        for disclosure_type, keywords in patterns.items():
-            if any(keyword in content_lower for keyword in keywords):
-                return disclosure_type
-        
-        return None
+        disclosure_type = classify_disclosure(content, filing_type.value)
+        return DisclosureType(disclosure_type) if disclosure_type else None
     
     def _extract_structured_data(self, content: str) -> Dict[str, Any]:
         """Extract structured data from disclosure content."""
-        extracted_data = {}
-        
-        if not content:
-            return extracted_data
-        
-        import re
-        
-        # Extract notional amounts
-        notional_patterns = [
-            r'notional.*?(\$?[\d,]+\.?\d*)\s*(?:million|billion|thousand)?',
-            r'(\$?[\d,]+\.?\d*)\s*(?:million|billion|thousand)?.*?notional'
-        ]
-        
-        for pattern in notional_patterns:
-            matches = re.finditer(pattern, content.lower())
-            for match in matches:
-                amount_str = match.group(1).replace(',', '').replace('$', '')
-                try:
-                    amount = float(amount_str)
-                    # Check for scale indicators
-                    if 'billion' in match.group(0):
-                        amount *= 1_000_000_000
-                    elif 'million' in match.group(0):
-                        amount *= 1_000_000
-                    elif 'thousand' in match.group(0):
-                        amount *= 1_000
-                    
-                    if 'notional_amounts' not in extracted_data:
-                        extracted_data['notional_amounts'] = []
-                    extracted_data['notional_amounts'].append(amount)
-                except ValueError:
-                    continue
-        
-        # Extract fair values
-        fair_value_patterns = [
-            r'fair value.*?(\$?[\d,]+\.?\d*)\s*(?:million|billion|thousand)?',
-            r'(\$?[\d,]+\.?\d*)\s*(?:million|billion|thousand)?.*?fair value'
-        ]
-        
-        for pattern in fair_value_patterns:
-            matches = re.finditer(pattern, content.lower())
-            for match in matches:
-                amount_str = match.group(1).replace(',', '').replace('$', '')
-                try:
-                    amount = float(amount_str)
-                    if 'billion' in match.group(0):
-                        amount *= 1_000_000_000
-                    elif 'million' in match.group(0):
-                        amount *= 1_000_000
-                    elif 'thousand' in match.group(0):
-                        amount *= 1_000
-                    
-                    if 'fair_values' not in extracted_data:
-                        extracted_data['fair_values'] = []
-                    extracted_data['fair_values'].append(amount)
-                except ValueError:
-                    continue
-        
-        return extracted_data
+        return extract_amounts(content)
     
     def _calculate_disclosure_confidence(self, content: str, disclosure_type: DisclosureType) -> float:
         """Calculate confidence score for a disclosure."""
-        if not content:
-            return 0.0
-        
-        content_lower = content.lower()
-        confidence = 0.0
-        
-        # Base confidence based on disclosure type
-        base_confidence = {
-            DisclosureType.DERIVATIVE_INSTRUMENTS: 0.8,
-            DisclosureType.HEDGING_ACTIVITIES: 0.7,
-            DisclosureType.CREDIT_RISK: 0.6,
-            DisclosureType.MARKET_RISK: 0.6,
-            DisclosureType.FAIR_VALUE: 0.9,
-            DisclosureType.COLLATERAL_REQUIREMENTS: 0.5,
-            DisclosureType.CONCENTRATION_RISK: 0.5
-        }
-        
-        confidence = base_confidence.get(disclosure_type, 0.5)
-        
-        # Adjust based on content quality
-        if any(term in content_lower for term in ['notional', 'fair value', 'mark to market']):
-            confidence += 0.1
-        
-        if any(term in content_lower for term in ['million', 'billion', 'thousand']):
-            confidence += 0.1
-        
-        if len(content) > 500:  # Longer content suggests more detail
-            confidence += 0.1
-        
-        return min(confidence, 1.0)
+        return disclosure_confidence(content, disclosure_type.value)
     
     def _correlate_disclosures(self, entity_id: str, disclosures: List[DerivativeDisclosure]) -> List[CrossFilingCorrelation]:
         """Correlate disclosures across different filings."""
@@ -596,7 +416,7 @@ class CrossFilingCorrelationEngine:
             recommended_action = "Review and reconcile derivative disclosures"
         
         return CrossFilingCorrelation(
-            correlation_id=f"{entity_id}_{disclosure_type.value}_{len(correlations)}",
+            correlation_id=f"{entity_id}_{disclosure_type.value}",
             entity_id=entity_id,
             related_filings=[d.filing_reference for d in disclosures],
             disclosures=disclosures,
@@ -643,29 +463,13 @@ class CrossFilingCorrelationEngine:
         
         # Check if primary entity has derivative disclosures
         primary_filings = self._get_entity_filings(primary_entity_id)
-        primary_has_derivatives = False
-        
-        for filing in primary_filings:
-            disclosures = self._extract_derivative_disclosures(filing)
-            if disclosures:
-                primary_has_derivatives = True
-                break
-        
-        if not primary_has_derivatives:
+        if not self._load_disclosures(primary_filings):
             missing_disclosures.append(f"Primary entity {primary_entity_id} missing derivative disclosures")
         
         # Check related entities
         for relationship in related_entities:
             related_filings = self._get_entity_filings(relationship.child_entity_id)
-            related_has_derivatives = False
-            
-            for filing in related_filings:
-                disclosures = self._extract_derivative_disclosures(filing)
-                if disclosures:
-                    related_has_derivatives = True
-                    break
-            
-            if not related_has_derivatives:
+            if not self._load_disclosures(related_filings):
                 missing_disclosures.append(f"Related entity {relationship.child_entity_id} missing derivative disclosures")
         
         return missing_disclosures
@@ -26,7 +26,9 @@ from sqlalchemy import text, and_, or_
 
 # Import existing modules
 from src.enhanced_entity_resolver import EnhancedEntityResolver, EntityProfile, IdentifierType
-from src.swap_analysis.single_party_risk_analyzer import SinglePartyRiskAnalyzer, RiskLevel
+from src.swap_analysis.single_party_risk_analyzer import (SinglePartyRiskAnalyzer, RiskLevel,
+                                                          RISK_INPUT_TABLES, entity_change_keys)
+from src.change_tracking import ChangeAwareCache
 from src.cross_filing_analysis.cross_filing_correlation_engine import CrossFilingCorrelationEngine
 from src.obligation_tracking.obligation_tracking_system import ObligationTrackingSystem
 from src.credit_risk.credit_risk_tracker import CreditRiskTracker
@@ -131,7 +133,7 @@ class ExecutiveDashboard:
         self.correlation_engine = CrossFilingCorrelationEngine(db_session)
         self.obligation_tracker = ObligationTrackingSystem(db_session)
         self.credit_tracker = CreditRiskTracker(db_session)
-        self.dashboard_cache = {}
+        self.dashboard_cache = ChangeAwareCache(RISK_INPUT_TABLES, db_session=db_session)
         
         # Dashboard parameters
         self.var_confidence_level = 0.95
@@ -182,6 +184,14 @@ class ExecutiveDashboard:
             entity_id = entity_profile.entity_id
             entity_name = entity_profile.entity_name
             
+            # Dashboards are dated, so a cached one is reused only on the same day
+            cache_key = (entity_id, datetime.utcnow().date())
+            cached_dashboard = self.dashboard_cache.get(cache_key)
+            if cached_dashboard is not None:
+                logger.info(f"Using cached executive dashboard for {entity_name} (ID: {entity_id})")
+                return cached_dashboard
+            data_epoch = self.dashboard_cache.current_epoch()
+            
             logger.info(f"Generating executive dashboard for {entity_name} (ID: {entity_id})")
             
             # Get risk metrics
@@ -216,8 +226,9 @@ class ExecutiveDashboard:
                 compliance_status=compliance_status
             )
             
-            # Cache the result
-            self.dashboard_cache[entity_id] = dashboard
+            # Cache the result until the entity's input data changes
+            self.dashboard_cache.put(cache_key, dashboard, entity_keys=entity_change_keys(entity_profile),
+                                     epoch=data_epoch)
             
             logger.info(f"Executive dashboard generated for {entity_name}: "
                        f"{len(risk_metrics)} metrics, {len(active_alerts)} alerts, "
@@ -0,0 +1,365 @@
+"""
+Derivative-disclosure features extracted once per filing.
+
+The 10-K/10-Q and 8-K processors pass each filing's section text here at
+ingest, and sec_derivative_disclosures keeps one row per accession number:
+keyword mention counts, the notional and fair value figures found,
+named counterparties, hedge designations and the sections classified as
+derivative disclosures with a short excerpt. The cross-filing correlation
+engine reads these rows instead of re-running the regexes over full filing
+text on every call. Filings ingested before this table existed are filled
+in by extract_missing_disclosures.
+
+A filing without any derivative language still gets a row (with zero
+counts), so "extracted, nothing found" is distinguishable from "not yet
+extracted".
+"""
+
+import json
+import logging
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, SecDerivativeDisclosure, record_data_change
+
+logger = logging.getLogger(__name__)
+
+DISCLOSURE_TABLE = SecDerivativeDisclosure.__tablename__
+
+# Keyword battery per form family; the first matching disclosure type wins
+DISCLOSURE_PATTERNS = {
+    '10-K': {
+        'derivative_instruments': ["derivative instruments", "derivatives", "swaps", "futures", "options"],
+        'hedging_activities': ["hedging", "hedge", "risk management", "hedge accounting"],
+        'credit_risk': ["credit risk", "counterparty risk", "credit exposure"],
+        'market_risk': ["market risk", "interest rate risk", "currency risk"],
+        'fair_value': ["fair value", "mark to market", "valuation"],
+    },
+    '10-Q': {
+        'derivative_instruments': ["derivative instruments", "derivatives", "swaps"],
+        'hedging_activities': ["hedging", "hedge", "risk management"],
+        'fair_value': ["fair value", "mark to market"],
+    },
+    '8-K': {
+        'derivative_instruments': ["derivative", "swap", "hedge", "risk management"],
+    },
+}
+
+BASE_CONFIDENCE = {
+    'derivative_instruments': 0.8,
+    'hedging_activities': 0.7,
+    'credit_risk': 0.6,
+    'market_risk': 0.6,
+    'fair_value': 0.9,
+    'collateral_requirements': 0.5,
+    'concentration_risk': 0.5,
+}
+
+# Sections without one of these terms are not derivative disclosures
+RELEVANCE_TERMS = ('derivative', 'swap', 'hedge')
+
+EXCERPT_CHARS = 2000
+EXCERPT_LEAD_CHARS = 200
+
+_SCALES = (('billion', 1_000_000_000), ('million', 1_000_000), ('thousand', 1_000))
+_AMOUNT_PATTERNS = {
+    'notional_amounts': [
+        re.compile(r'notional.*?(\$?[\d,]+\.?\d*)\s*(?:million|billion|thousand)?'),
+        re.compile(r'(\$?[\d,]+\.?\d*)\s*(?:million|billion|thousand)?.*?notional'),
+    ],
+    'fair_values': [
+        re.compile(r'fair value.*?(\$?[\d,]+\.?\d*)\s*(?:million|billion|thousand)?'),
+        re.compile(r'(\$?[\d,]+\.?\d*)\s*(?:million|billion|thousand)?.*?fair value'),
+    ],
+}
+_MENTIONS = {
+    'derivative_mentions': re.compile(r'\bderivative', re.IGNORECASE),
+    'swap_mentions': re.compile(r'\bswap', re.IGNORECASE),
+    'hedge_mentions': re.compile(r'\bhedg', re.IGNORECASE),
+}
+_HEDGE_DESIGNATIONS = {
+    'cash_flow': re.compile(r'cash[- ]flow hedg', re.IGNORECASE),
+    'fair_value': re.compile(r'fair[- ]value hedg', re.IGNORECASE),
+    'net_investment': re.compile(r'net investment hedg', re.IGNORECASE),
+    'economic': re.compile(r'not designated as (?:a )?hedg|economic hedg', re.IGNORECASE),
+}
+_HEDGING_LANGUAGE = re.compile(r'hedge accounting|hedging (?:activit|relationship|instrument|program|strateg)',
+                               re.IGNORECASE)
+_COUNTERPARTY_LIST = re.compile(
+    r'counterpart(?:y|ies)\s+(?:include|includes|are|is|such as)\s+([A-Z][^.;:]{2,300})')
+_NAME_SPLIT = re.compile(r',\s*(?:and\s+)?|\s+and\s+')
+# Major swap dealers, matched only in sections that talk about counterparties
+SWAP_DEALERS = (
+    'JPMorgan', 'Goldman Sachs', 'Morgan Stanley', 'Citigroup', 'Citibank', 'Bank of America', 'Barclays',
+    'Deutsche Bank', 'BNP Paribas', 'HSBC', 'Wells Fargo', 'Credit Suisse', 'UBS', 'Societe Generale',
+    'Mizuho', 'MUFG', 'Royal Bank of Canada', 'Toronto-Dominion', 'Bank of Montreal', 'Scotiabank', 'Nomura',
+)
+_DEALER_PATTERN = re.compile('|'.join(re.escape(name) for name in SWAP_DEALERS))
+
+
+def form_family(form_type: Optional[str]) -> Optional[str]:
+    """'10-K', '10-Q' or '8-K' for a form type and its amendments, None otherwise."""
+    base = (form_type or '').upper().split('/')[0].strip()
+    if base.startswith('10-K'):
+        return '10-K'
+    if base.startswith('10-Q'):
+        return '10-Q'
+    if base.startswith('8-K'):
+        return '8-K'
+    return None
+
+
+def classify_disclosure(content: Optional[str], family: Optional[str]) -> Optional[str]:
+    """Disclosure type of a section under the family's keyword battery, None if none match."""
+    if not content:
+        return None
+    content_lower = content.lower()
+    for disclosure_type, keywords in DISCLOSURE_PATTERNS.get(family, {}).items():
+        if any(keyword in content_lower for keyword in keywords):
+            return disclosure_type
+    return None
+
+
+def extract_amounts(content: Optional[str]) -> Dict[str, List[float]]:
+    """Notional and fair value figures in content, scaled by million/billion/thousand."""
+    extracted: Dict[str, List[float]] = {}
+    if not content:
+        return extracted
+    content_lower = content.lower()
+    for key, patterns in _AMOUNT_PATTERNS.items():
+        for pattern in patterns:
+            for match in pattern.finditer(content_lower):
+                try:
+                    amount = float(match.group(1).replace(',', '').replace('$', ''))
+                except ValueError:
+                    continue
+                for word, scale in _SCALES:
+                    if word in match.group(0):
+                        amount *= scale
+                        break
+                extracted.setdefault(key, []).append(amount)
+    return extracted
+
+
+def disclosure_confidence(content: Optional[str], disclosure_type: Optional[str]) -> float:
+    """Confidence that a section is a substantive disclosure of disclosure_type."""
+    if not content:
+        return 0.0
+    content_lower = content.lower()
+    confidence = BASE_CONFIDENCE.get(disclosure_type, 0.5)
+    if any(term in content_lower for term in ['notional', 'fair value', 'mark to market']):
+        confidence += 0.1
+    if any(term in content_lower for term in ['million', 'billion', 'thousand']):
+        confidence += 0.1
+    if len(content) > 500:  # Longer content suggests more detail
+        confidence += 0.1
+    return min(confidence, 1.0)
+
+
+def extract_counterparties(content: Optional[str]) -> List[str]:
+    """Counterparties named after 'counterparties include/are/such as', plus known swap dealers."""
+    if not content or 'counterpart' not in content.lower():
+        return []
+    names = []
+    for match in _COUNTERPARTY_LIST.finditer(content):
+        for name in _NAME_SPLIT.split(match.group(1)):
+            name = name.strip(' "\'()')
+            if name[:1].isupper() and len(name) <= 80:
+                names.append(name)
+    names.extend(_DEALER_PATTERN.findall(content))
+    return list(dict.fromkeys(names))
+
+
+def _excerpt(content: str) -> str:
+    content_lower = content.lower()
+    hits = [i for i in (content_lower.find(term) for term in RELEVANCE_TERMS) if i >= 0]
+    start = max(0, min(hits) - EXCERPT_LEAD_CHARS) if hits else 0
+    return content[start:start + EXCERPT_CHARS]
+
+
+def extract_filing_features(sections: Iterable[Tuple[str, Optional[str]]], form_type: Optional[str]) -> Dict[str, Any]:
+    """Derivative-disclosure features of a filing from its (section name, text) pairs."""
+    family = form_family(form_type)
+    features: Dict[str, Any] = {name: 0 for name in _MENTIONS}
+    designations, counterparties, disclosed, notionals = set(), [], [], []
+    hedging_language = False
+
+    for section, content in sections:
+        if not content:
+            continue
+        for name, pattern in _MENTIONS.items():
+            features[name] += len(pattern.findall(content))
+        content_lower = content.lower()
+        if not any(term in content_lower for term in RELEVANCE_TERMS):
+            continue
+
+        designations.update(name for name, pattern in _HEDGE_DESIGNATIONS.items() if pattern.search(content))
+        hedging_language = hedging_language or bool(_HEDGING_LANGUAGE.search(content))
+        counterparties.extend(extract_counterparties(content))
+
+        disclosure_type = classify_disclosure(content, family)
+        if disclosure_type:
+            extracted = extract_amounts(content)
+            notionals.extend(extracted.get('notional_amounts', []))
+            disclosed.append({
+                'section': str(section),
+                'disclosure_type': disclosure_type,
+                'confidence_score': disclosure_confidence(content, disclosure_type),
+                'extracted_data': extracted,
+                'excerpt': _excerpt(content),
+            })
+
+    features.update(
+        disclosure_sections=len(disclosed),
+        notional_total=sum(notionals) if notionals else None,
+        max_notional=max(notionals) if notionals else None,
+        has_hedging_language=hedging_language or bool(designations),
+        hedge_designations=sorted(designations),
+        counterparties=list(dict.fromkeys(counterparties)),
+        sections=disclosed,
+    )
+    return features
+
+
+def store_filing_disclosures(session: Session, accession_number: str, cik: str, form_type: Optional[str],
+                             filing_date: Optional[datetime],
+                             sections: Iterable[Tuple[str, Optional[str]]]) -> SecDerivativeDisclosure:
+    """Extracts a filing's features and merges its row into session (not committed)."""
+    row = SecDerivativeDisclosure(
+        accession_number=accession_number, cik=cik, form_type=form_type, filing_date=filing_date,
+        extracted_at=datetime.utcnow(), **extract_filing_features(sections, form_type))
+    session.merge(row)
+    record_data_change(session, SecDerivativeDisclosure, [{'cik': cik}])
+    return row
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    # Raw SQL returns sqlite DateTime columns as ISO strings
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _session_scope(session: Optional[Session]):
+    return (session, False) if session is not None else (SessionLocal(), True)
+
+
+# Filings of the 10-K and 8-K processors without an extracted row
+_PENDING_FILINGS = f"""
+    SELECT accession_number, cik, form_type, filing_date, 'sec_10k_documents' AS source
+    FROM sec_10k_submissions s
+    WHERE NOT EXISTS (SELECT 1 FROM {DISCLOSURE_TABLE} d WHERE d.accession_number = s.accession_number)
+    UNION ALL
+    SELECT accession_number, cik, form_type, filing_date, 'sec_8k_items' AS source
+    FROM sec_8k_submissions s
+    WHERE NOT EXISTS (SELECT 1 FROM {DISCLOSURE_TABLE} d WHERE d.accession_number = s.accession_number)
+"""
+_SECTION_TEXT = {
+    'sec_10k_documents': "SELECT accession_number, section, decompress_text(content) AS body "
+                         "FROM sec_10k_documents WHERE accession_number IN ({keys}) ORDER BY sequence",
+    'sec_8k_items': "SELECT accession_number, item_number AS section, decompress_text(content) AS body "
+                    "FROM sec_8k_items WHERE accession_number IN ({keys}) ORDER BY id",
+}
+
+
+def extract_missing_disclosures(accession_numbers: Optional[Iterable[str]] = None,
+                                session: Optional[Session] = None, batch_size: int = 200) -> int:
+    """
+    Extracts features for stored filings that have no row yet (limited to
+    accession_numbers when given), reading section text in batches.
+    Returns the number of filings extracted.
+    """
+    session, close_session = _session_scope(session)
+    try:
+        pending = session.execute(text(_PENDING_FILINGS)).fetchall()
+        if accession_numbers is not None:
+            wanted = set(accession_numbers)
+            pending = [filing for filing in pending if filing.accession_number in wanted]
+
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            sections: Dict[str, List[Tuple[str, Optional[str]]]] = {}
+            for source, query in _SECTION_TEXT.items():
+                accessions = [f.accession_number for f in batch if f.source == source]
+                if not accessions:
+                    continue
+                params = {f"a{i}": accession for i, accession in enumerate(accessions)}
+                keys = ', '.join(f":{name}" for name in params)
+                for row in session.execute(text(query.format(keys=keys)), params):
+                    sections.setdefault(row.accession_number, []).append((row.section, row.body))
+            for filing in batch:
+                store_filing_disclosures(session, filing.accession_number, filing.cik, filing.form_type,
+                                         _as_datetime(filing.filing_date), sections.get(filing.accession_number, []))
+            session.commit()
+
+        if pending:
+            logger.info(f"Extracted derivative disclosures for {len(pending)} filings")
+        return len(pending)
+    except Exception as e:
+        logger.error(f"Error extracting derivative disclosures: {e}", exc_info=True)
+        session.rollback()
+        raise
+    finally:
+        if close_session:
+            session.close()
+
+
+def get_filing_disclosures(accession_numbers: Sequence[str],
+                           session: Optional[Session] = None) -> Dict[str, SecDerivativeDisclosure]:
+    """Stored rows for the given filings, by accession number."""
+    if not accession_numbers:
+        return {}
+    session, close_session = _session_scope(session)
+    try:
+        rows = session.query(SecDerivativeDisclosure).filter(
+            SecDerivativeDisclosure.accession_number.in_(list(accession_numbers))).all()
+        return {row.accession_number: row for row in rows}
+    finally:
+        if close_session:
+            session.close()
+
+
+def screen_derivative_disclosures(min_notional: Optional[float] = None, hedging_only: bool = False,
+                                  designation: Optional[str] = None, limit: int = 50,
+                                  session: Optional[Session] = None) -> List[Dict[str, Any]]:
+    """
+    Companies across the whole coverage universe ranked by the largest
+    notional in their latest filing with derivative disclosures, optionally
+    limited to hedgers or to one hedge designation ('cash_flow', ...).
+    Reads only the extracted features.
+    """
+    sql = f"""
+        WITH latest AS (
+            SELECT d.*, ROW_NUMBER() OVER (PARTITION BY cik ORDER BY filing_date DESC) AS rn
+            FROM {DISCLOSURE_TABLE} d
+            WHERE disclosure_sections > 0
+        )
+        SELECT cik, accession_number, form_type, filing_date, disclosure_sections, derivative_mentions,
+               swap_mentions, hedge_mentions, notional_total, max_notional, has_hedging_language,
+               hedge_designations, counterparties
+        FROM latest
+        WHERE rn = 1
+    """
+    params: Dict[str, Any] = {'limit': limit}
+    if min_notional is not None:
+        sql += " AND max_notional >= :min_notional"
+        params['min_notional'] = min_notional
+    if hedging_only:
+        sql += " AND has_hedging_language = 1"
+    if designation:
+        sql += " AND hedge_designations LIKE :designation"
+        params['designation'] = f'%"{designation}"%'
+    sql += " ORDER BY COALESCE(max_notional, 0) DESC, derivative_mentions DESC LIMIT :limit"
+
+    session, close_session = _session_scope(session)
+    try:
+        rows = [dict(row) for row in session.execute(text(sql), params).mappings()]
+    finally:
+        if close_session:
+            session.close()
+    for row in rows:
+        for column in ('hedge_designations', 'counterparties'):
+            row[column] = json.loads(row[column]) if row[column] else []
+    return rows
@@ -16,6 +16,26 @@ except ImportError:
 from sqlalchemy import text, func, and_, or_
 import ollama
 
+from src.columnar_store import run_routed_query
+from src.company_profiles import (PROFILE_TABLES, SCREEN_ORDERS, SOURCE_COUNT_COLUMNS, get_company_profile,
+                                  screen_company_profiles)
+from src.filing_events import EVENT_TABLES, regulatory_timeline
+from src.form13f_flows import get_cusip_flows, latest_flow_quarter
+from src.insider_rollups import ROLLUP_TABLE, has_insider_rollups, insider_activity_screen
+from src.market_concentration import CONCENTRATION_TABLES, DIMENSIONS, market_concentration_summary
+from src.mmf_stress import REDEMPTION_SCENARIOS, run_redemption_stress
+from src.result_cache import cached_tool
+from src.security_holders import HOLDER_INDEX_TABLES, get_security_holders, security_crowding
+from src.cross_asset_correlation import CORRELATION_TABLES, SERIES_SOURCES, analyze_cross_asset_correlation
+
+# Tables each tool reads, for result-cache invalidation
+FORM13F_TABLES = ('form13f_submissions', 'form13f_coverpages', 'form13f_info_tables',
+                  'form13f_position_deltas', 'form13f_cusip_flows')
+INSIDER_TABLES = ('sec_submissions', 'sec_non_deriv_trans', 'sec_reporting_owners', ROLLUP_TABLE)
+SWAP_TABLES = ('cftc_swap_data',)
+NMFP_TABLES = ('nmfp_submissions', 'nmfp_series_level_info', 'nmfp_sch_portfolio_securities', 'nmfp_class_level_info')
+PERIODIC_FILING_TABLES = ('sec_10k_submissions', 'sec_8k_submissions')
+
 class CrossDatasetAnalyticsEngine:
     """Advanced analytics engine for cross-dataset financial analysis"""
     
@@ -66,117 +86,50 @@ class CrossDatasetAnalyticsEngine:
             return {"error": f"Cross-dataset analytics error: {str(e)}"}
     
     def _get_company_comprehensive_profile(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Comprehensive company profile across all data sources"""
+        """Comprehensive company profile across all data sources, read from the materialized profile"""
         
         cik = params.get('cik')
-        include_subsidiaries = params.get('include_subsidiaries', True)
         
         if not cik:
             return {"error": "CIK parameter required"}
         
-        # Unified company info query
-        company_info_query = text("""
-            SELECT 
-                'SEC_SUBMISSIONS' as source,
-                issuercik as cik,
-                issuername as company_name,
-                issuertradingsymbol as ticker_symbol,
-                NULL as lei
-            FROM sec_submissions 
-            WHERE issuercik = :cik
-            LIMIT 1
-            
-            UNION ALL
-            
-            SELECT 
-                'FORM_13F' as source,
-                cik,
-                registrant_full_name as company_name,
-                NULL as ticker_symbol,
-                registrant_leiid as lei
-            FROM nmfp_submissions 
-            WHERE cik = :cik
-            LIMIT 1
-            
-            UNION ALL
-            
-            SELECT 
-                'FORM_D' as source,
-                cik,
-                entityname as company_name,
-                NULL as ticker_symbol,
-                NULL as lei
-            FROM formd_issuers 
-            WHERE cik = :cik
-            LIMIT 1
-        """)
-        
-        company_info = self.db.execute(company_info_query, {"cik": cik}).fetchall()
-        
-        # Recent filing activity
-        filing_activity_query = text("""
-            SELECT 
-                'SEC_INSIDER' as activity_type,
-                filing_date as activity_date,
-                document_type as details,
-                COUNT(*) as count
-            FROM sec_submissions 
-            WHERE issuercik = :cik 
-            AND filing_date >= date('now', '-1 year')
-            GROUP BY filing_date, document_type
-            
-            UNION ALL
-            
-            SELECT 
-                'SEC_10K_8K' as activity_type,
-                filing_date as activity_date,
-                form_type as details,
-                1 as count
-            FROM sec_10k_submissions 
-            WHERE cik = :cik 
-            AND filing_date >= date('now', '-1 year')
-            
-            UNION ALL
-            
-            SELECT 
-                'SEC_8K' as activity_type,
-                filing_date as activity_date,
-                form_type as details,
-                1 as count
-            FROM sec_8k_submissions 
-            WHERE cik = :cik 
-            AND filing_date >= date('now', '-1 year')
-            
-            ORDER BY activity_date DESC
-            LIMIT 50
-        """)
-        
-        filing_activity = self.db.execute(filing_activity_query, {"cik": cik}).fetchall()
-        
-        # Insider trading summary
-        insider_summary_query = text("""
-            SELECT 
-                COUNT(*) as total_transactions,
-                SUM(CASE WHEN snt.trans_acquired_disp_cd = 'A' THEN snt.trans_shares * snt.trans_pricepershare ELSE 0 END) as total_purchases,
-                SUM(CASE WHEN snt.trans_acquired_disp_cd = 'D' THEN snt.trans_shares * snt.trans_pricepershare ELSE 0 END) as total_sales,
-                COUNT(DISTINCT sro.rptownercik) as unique_insiders,
-                MAX(snt.trans_date) as latest_transaction_date
-            FROM sec_non_deriv_trans snt
-            JOIN sec_submissions ss ON snt.accession_number = ss.accession_number
-            JOIN sec_reporting_owners sro ON snt.accession_number = sro.accession_number
-            WHERE ss.issuercik = :cik 
-            AND snt.trans_date >= date('now', '-1 year')
-            AND snt.trans_shares IS NOT NULL 
-            AND snt.trans_pricepershare IS NOT NULL
-        """)
-        
-        insider_summary = self.db.execute(insider_summary_query, {"cik": cik}).fetchone()
+        profile = get_company_profile(cik, session=self.db)
+        if profile is None:
+            return {"error": f"No filings on file for CIK {cik}"}
         
         return {
-            "company_info": [dict(row._mapping) for row in company_info],
-            "filing_activity": [dict(row._mapping) for row in filing_activity],
-            "insider_trading_summary": dict(insider_summary._mapping) if insider_summary else {},
-            "analysis_period": "12 months"
+            "company_info": {
+                "cik": profile['cik'],
+                "company_name": profile['company_name'],
+                "ticker_symbol": profile['ticker_symbol'],
+                "lei": profile['lei']
+            },
+            "filing_activity": {
+                "filing_counts": {column: profile[column] for column in SOURCE_COUNT_COLUMNS.values()},
+                "latest_filing_date": profile['latest_filing_date'],
+                "latest_filings": profile['latest_filings']
+            },
+            "insider_trading_summary": {
+                "total_transactions": profile['insider_transactions'],
+                "total_purchases": profile['insider_purchase_value'],
+                "total_sales": profile['insider_sale_value'],
+                "latest_transaction_date": profile['latest_insider_trade'],
+                "by_year": profile['insider_by_year']
+            },
+            "institutional_holders": {
+                "quarter": profile['institutional_quarter'],
+                "holders": profile['institutional_holders'],
+                "total_value": profile['institutional_value'],
+                "cusips": profile['holder_cusips'],
+                "top_holders": profile['top_holders']
+            },
+            "form_d_offerings": {
+                "offerings": profile['formd_offerings'],
+                "total_offering_amount": profile['formd_offering_amount'],
+                "total_amount_sold": profile['formd_amount_sold'],
+                "latest_filing_date": profile['latest_formd_date']
+            },
+            "profile_refreshed_at": profile['refreshed_at']
         }
     
     def _analyze_institutional_flow(self, params: Dict[str, Any]) -> Dict[str, Any]:
@@ -186,7 +139,7 @@ class CrossDatasetAnalyticsEngine:
         min_position_value = params.get('min_position_value', 1000000)
         
         # Current quarter vs previous quarter holdings analysis
-        holdings_flow_query = text("""
+        holdings_flow_sql = """
             WITH current_quarter AS (
                 SELECT 
                     fit.cusip,
@@ -196,7 +149,7 @@ class CrossDatasetAnalyticsEngine:
                     COUNT(*) as current_positions
                 FROM form13f_info_tables fit 
                 JOIN form13f_submissions fs ON fit.accession_number = fs.accession_number
-                WHERE fs.filing_date >= date('now', '-120 days')
+                WHERE fs.filing_date >= :current_start
                 GROUP BY fit.cusip, fit.nameofissuer
             ),
             previous_quarter AS (
@@ -208,7 +161,7 @@ class CrossDatasetAnalyticsEngine:
                     COUNT(*) as previous_positions
                 FROM form13f_info_tables fit 
                 JOIN form13f_submissions fs ON fit.accession_number = fs.accession_number  
-                WHERE fs.filing_date BETWEEN date('now', '-240 days') AND date('now', '-120 days')
+                WHERE fs.filing_date BETWEEN :previous_start AND :current_start
                 GROUP BY fit.cusip, fit.nameofissuer
             )
             SELECT 
@@ -233,24 +186,48 @@ class CrossDatasetAnalyticsEngine:
             OR COALESCE(p.previous_value, 0) >= :min_value
             ORDER BY ABS(COALESCE(c.current_value, 0) - COALESCE(p.previous_value, 0)) DESC
             LIMIT 100
-        """)
+        """
         
-        holdings_flow = self.db.execute(holdings_flow_query, {
-            "min_value": min_position_value
-        }).fetchall()
+        flow_quarter = latest_flow_quarter(self.db)
+        if flow_quarter:
+            # Precomputed quarter-over-quarter flows; an indexed lookup per quarter
+            holdings_flow = pd.DataFrame([{
+                'cusip': flow['cusip'],
+                'nameofissuer': flow['nameofissuer'],
+                'current_value': flow['total_value'],
+                'previous_value': flow['previous_value'],
+                'value_change': flow['value_change'],
+                'pct_change': flow['pct_change'],
+                'current_holders': flow['holders'],
+                'previous_holders': flow['previous_holders'],
+                'holder_change': flow['holder_change'],
+                'new_positions': flow['new_positions'],
+                'exited_positions': flow['exited_positions']
+            } for flow in get_cusip_flows(flow_quarter, min_position_value, 100, session=self.db)])
+            flow_engine = 'position_deltas'
+        else:
+            # Holdings-only aggregate; runs on the columnar sidecar when it is fresh
+            now = datetime.now()
+            holdings_flow, flow_engine = run_routed_query(holdings_flow_sql, {
+                "min_value": min_position_value,
+                "current_start": now - timedelta(days=120),
+                "previous_start": now - timedelta(days=240)
+            }, ['form13f_info_tables', 'form13f_submissions'], self.db)
+            holdings_flow = holdings_flow.astype(object).where(holdings_flow.notna(), None)
         
         # Top institutional buyers and sellers
         top_movers_query = text("""
             SELECT 
                 fs.cik,
-                fs.registrant_full_name,
+                fc.filing_manager_name as registrant_full_name,
                 COUNT(DISTINCT fit.cusip) as positions_count,
                 SUM(fit.value) as total_position_value,
                 AVG(fit.value) as avg_position_size
             FROM form13f_info_tables fit
             JOIN form13f_submissions fs ON fit.accession_number = fs.accession_number
+            LEFT JOIN form13f_coverpages fc ON fc.accession_number = fs.accession_number
             WHERE fs.filing_date >= date('now', '-90 days')
-            GROUP BY fs.cik, fs.registrant_full_name
+            GROUP BY fs.cik, fc.filing_manager_name
             HAVING SUM(fit.value) >= :min_value
             ORDER BY total_position_value DESC
             LIMIT 50
@@ -261,12 +238,14 @@ class CrossDatasetAnalyticsEngine:
         }).fetchall()
         
         return {
-            "holdings_flow": [dict(row._mapping) for row in holdings_flow],
+            "holdings_flow": holdings_flow.to_dict('records'),
             "top_institutional_managers": [dict(row._mapping) for row in top_movers],
             "analysis_parameters": {
                 "timeframe_days": timeframe_days,
                 "min_position_value": min_position_value
-            }
+            },
+            "flow_quarter": flow_quarter,
+            "query_engine": flow_engine
         }
     
     def _monitor_insider_activity(self, params: Dict[str, Any]) -> Dict[str, Any]:
@@ -275,8 +254,79 @@ class CrossDatasetAnalyticsEngine:
         analysis_type = params.get('analysis_type', 'unusual_activity')
         lookback_days = params.get('lookback_days', 30)
         
-        # Unusual insider activity detection
-        unusual_activity_query = text(f"""
+        # Unusual insider activity detection, from the daily rollups once built
+        rollup_activity_query = text(f"""
+            WITH recent_insider_activity AS (
+                SELECT 
+                    issuercik, 
+                    MAX(issuername) as issuername,
+                    SUM(large_transactions) as recent_transactions,
+                    SUM(large_value_disposed) as recent_sales,
+                    SUM(large_value_acquired) as recent_purchases,
+                    SUM(insiders) as unique_insiders,
+                    SUM(selling_insiders) as selling_insiders,
+                    SUM(buying_insiders) as buying_insiders
+                FROM {ROLLUP_TABLE}
+                WHERE trans_date >= date('now', '-{lookback_days} days')
+                GROUP BY issuercik
+                HAVING SUM(large_transactions) > 0
+            ),
+            historical_avg AS (
+                SELECT 
+                    monthly_data.issuercik,
+                    AVG(monthly_transactions) as avg_monthly_transactions,
+                    AVG(monthly_sales) as avg_monthly_sales,
+                    AVG(monthly_purchases) as avg_monthly_purchases
+                FROM (
+                    SELECT 
+                        issuercik,
+                        substr(trans_date, 1, 7) as month,
+                        SUM(large_transactions) as monthly_transactions,
+                        SUM(large_value_disposed) as monthly_sales,
+                        SUM(large_value_acquired) as monthly_purchases
+                    FROM {ROLLUP_TABLE}
+                    WHERE trans_date >= date('now', '-1 year')
+                    AND trans_date < date('now', '-{lookback_days} days')
+                    GROUP BY issuercik, substr(trans_date, 1, 7)
+                    HAVING SUM(large_transactions) > 0
+                ) monthly_data
+                GROUP BY monthly_data.issuercik
+                HAVING COUNT(*) >= 3  -- At least 3 months of history
+            )
+            SELECT 
+                ria.issuercik, 
+                ria.issuername,
+                ria.recent_transactions, 
+                ha.avg_monthly_transactions,
+                CASE WHEN ha.avg_monthly_transactions > 0 THEN 
+                    ria.recent_transactions / ha.avg_monthly_transactions 
+                ELSE NULL END as transaction_ratio,
+                ria.recent_sales, 
+                ha.avg_monthly_sales,
+                CASE WHEN ha.avg_monthly_sales > 0 THEN 
+                    ria.recent_sales / ha.avg_monthly_sales 
+                ELSE NULL END as sales_ratio,
+                ria.recent_purchases,
+                ha.avg_monthly_purchases,
+                CASE WHEN ha.avg_monthly_purchases > 0 THEN 
+                    ria.recent_purchases / ha.avg_monthly_purchases 
+                ELSE NULL END as purchase_ratio,
+                ria.unique_insiders,
+                ria.selling_insiders,
+                ria.buying_insiders
+            FROM recent_insider_activity ria
+            JOIN historical_avg ha ON ria.issuercik = ha.issuercik
+            WHERE (ria.recent_transactions / ha.avg_monthly_transactions > 2.0)  -- 2x normal activity
+            OR (ria.recent_sales / ha.avg_monthly_sales > 3.0)  -- 3x normal sales
+            OR (ria.recent_purchases / ha.avg_monthly_purchases > 3.0)  -- 3x normal purchases
+            ORDER BY 
+                COALESCE(ria.recent_transactions / ha.avg_monthly_transactions, 0) + 
+                COALESCE(ria.recent_sales / ha.avg_monthly_sales, 0) + 
+                COALESCE(ria.recent_purchases / ha.avg_monthly_purchases, 0) DESC
+        """)
+
+        # Raw fallback; unique_insiders here are distinct people, not insider-days
+        raw_activity_query = text(f"""
             WITH recent_insider_activity AS (
                 SELECT 
                     ss.issuercik, 
@@ -298,7 +348,7 @@ class CrossDatasetAnalyticsEngine:
             ),
             historical_avg AS (
                 SELECT 
-                    ss.issuercik,
+                    monthly_data.issuercik,
                     AVG(monthly_transactions) as avg_monthly_transactions,
                     AVG(monthly_sales) as avg_monthly_sales,
                     AVG(monthly_purchases) as avg_monthly_purchases
@@ -318,7 +368,7 @@ class CrossDatasetAnalyticsEngine:
                     AND snt.trans_shares * snt.trans_pricepershare > 10000
                     GROUP BY ss.issuercik, strftime('%Y-%m', snt.trans_date)
                 ) monthly_data
-                GROUP BY ss.issuercik
+                GROUP BY monthly_data.issuercik
                 HAVING COUNT(*) >= 3  -- At least 3 months of history
             )
             SELECT 
@@ -353,7 +403,12 @@ class CrossDatasetAnalyticsEngine:
                 COALESCE(ria.recent_purchases / ha.avg_monthly_purchases, 0) DESC
         """)
         
-        unusual_activity = self.db.execute(unusual_activity_query).fetchall()
+        if has_insider_rollups(self.db):
+            unusual_activity = self.db.execute(rollup_activity_query).fetchall()
+            activity_engine = 'insider_rollups'
+        else:
+            unusual_activity = self.db.execute(raw_activity_query).fetchall()
+            activity_engine = 'raw_transactions'
         
         # Insider roles analysis
         insider_roles_query = text("""
@@ -367,7 +422,7 @@ class CrossDatasetAnalyticsEngine:
             FROM sec_non_deriv_trans snt
             JOIN sec_submissions ss ON snt.accession_number = ss.accession_number
             JOIN sec_reporting_owners sro ON snt.accession_number = sro.accession_number
-            WHERE snt.trans_date >= date('now', '-:lookback_days days')
+            WHERE snt.trans_date >= date('now', '-' || :lookback_days || ' days')
             AND snt.trans_shares IS NOT NULL 
             AND snt.trans_pricepershare IS NOT NULL
             GROUP BY ss.issuercik, ss.issuername, sro.rptowner_relationship
@@ -390,7 +445,8 @@ class CrossDatasetAnalyticsEngine:
                     "value_multiple": "3x normal",
                     "minimum_transaction_value": 10000
                 }
-            }
+            },
+            "query_engine": activity_engine
         }
     
     def _assess_swap_risk(self, params: Dict[str, Any]) -> Dict[str, Any]:
@@ -552,7 +608,7 @@ class CrossDatasetAnalyticsEngine:
         
         fund_flows = self.db.execute(fund_flows_query).fetchall()
         
-        return {
+        results = {
             "liquidity_metrics": [dict(row._mapping) for row in liquidity_metrics],
             "concentration_analysis": [dict(row._mapping) for row in concentration_analysis],
             "fund_flows": [dict(row._mapping) for row in fund_flows],
@@ -562,6 +618,12 @@ class CrossDatasetAnalyticsEngine:
                 "stress_scenario_applied": stress_scenario
             }
         }
+        
+        # Redemption shocks across the whole fund universe
+        if stress_scenario:
+            results["stress_test"] = run_redemption_stress(fund_category=fund_category, top_n=5, session=self.db)
+        
+        return results
     
     def _analyze_company_vs_peers(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Company peer analysis across multiple dimensions"""
@@ -628,57 +690,65 @@ class CrossDatasetAnalyticsEngine:
         }
     
     def _analyze_market_concentration(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Market concentration analysis across asset classes"""
+        """HHI, top-N share and Gini across swap asset classes and products, 13F holders and dealers"""
         
-        # Placeholder implementation - would need more specific market definition
-        return {
-            "concentration_metrics": {
-                "herfindahl_index": "Not implemented",
-                "top_4_concentration": "Not implemented", 
-                "market_participants": "Not implemented"
-            },
-            "note": "Market concentration analysis requires additional market definition parameters"
-        }
+        lookback_days = params.get('lookback_days', 730)
+        return market_concentration_summary(
+            dimensions=params.get('dimensions') or DIMENSIONS,
+            start_date=datetime.now().date() - timedelta(days=lookback_days),
+            top_n=params.get('top_n', 4),
+            min_participants=params.get('min_participants', 1),
+            limit=params.get('limit', 25),
+            session=self.db
+        )
     
     def _analyze_regulatory_timeline(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Regulatory filing timeline analysis"""
+        """Regulatory filing timeline analysis from the pre-aggregated filing events"""
         
-        # Placeholder implementation
-        return {
-            "timeline_analysis": {
-                "filing_patterns": "Not implemented",
-                "regulatory_cycles": "Not implemented",
-                "compliance_indicators": "Not implemented"
-            },
-            "note": "Regulatory timeline analysis requires additional temporal modeling"
-        }
+        try:
+            return regulatory_timeline(params.get('cik'), params.get('lookback_months', 24),
+                                       params.get('sources'), session=self.db)
+        except ValueError as e:
+            return {"error": str(e)}
     
     def _analyze_cross_asset_correlation(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Cross-asset correlation analysis"""
+        """Rolling correlation across swap, insider and 13F daily series"""
         
-        # Placeholder implementation 
-        return {
-            "correlation_analysis": {
-                "asset_correlations": "Not implemented",
-                "risk_factor_exposures": "Not implemented",
-                "volatility_clustering": "Not implemented"
-            },
-            "note": "Cross-asset correlation analysis requires additional statistical modeling"
-        }
+        lookback_days = params.get('lookback_days', 3 * 365)
+        end_date = datetime.now().date()
+        result = analyze_cross_asset_correlation(
+            sources=params.get('sources') or SERIES_SOURCES,
+            start_date=end_date - timedelta(days=lookback_days),
+            end_date=end_date,
+            swap_level=params.get('swap_level', 'asset_class'),
+            swap_measure=params.get('swap_measure', 'notional_sum'),
+            window=params.get('window', 63),
+            step=params.get('step', 21),
+            top_pairs=params.get('top_pairs', 20),
+            max_series=params.get('max_series', 2000),
+            session=self.db
+        )
+        
+        # The full matrix is only readable for a handful of series
+        latest_matrix = result.pop('latest_matrix', None)
+        if latest_matrix is not None and len(latest_matrix) <= 25:
+            rounded = latest_matrix.round(4).astype(object)
+            result['latest_matrix'] = rounded.where(latest_matrix.notna(), None).to_dict()
+        return result
     
     def _identify_data_sources(self, query_type: str) -> List[str]:
         """Identify which data sources are used for each query type"""
         
         source_mapping = {
-            'company_comprehensive_profile': ['SEC Insider Filings', 'SEC 10-K/8-K', 'Form D', 'N-MFP'],
+            'company_comprehensive_profile': ['SEC Insider Filings', 'SEC 10-K/8-K', 'Form 13F', 'N-PORT', 'N-MFP', 'Form D'],
             'institutional_flow_analysis': ['Form 13F Holdings'],
             'insider_activity_monitoring': ['SEC Insider Transactions'],
             'swap_risk_assessment': ['CFTC Swap Data'],
             'fund_stability_analysis': ['N-MFP Money Market Funds'],
             'company_peer_analysis': ['SEC 10-K/8-K Filings'],
-            'market_concentration_analysis': ['Multiple Sources'],
-            'regulatory_timeline_analysis': ['SEC Filings Timeline'],
-            'cross_asset_correlation': ['CFTC + SEC Data']
+            'market_concentration_analysis': ['CFTC Swap Aggregates', 'Form 13F Positions', 'SEC Derivative Disclosures', 'CFTC Dealer Registry'],
+            'regulatory_timeline_analysis': ['SEC 8-K Items', 'SEC 10-K/10-Q', 'Form D', 'SEC Insider Filings'],
+            'cross_asset_correlation': ['CFTC Swap Aggregates', 'SEC Insider Rollups', 'Form 13F Flows']
         }
         
         return source_mapping.get(query_type, ['Unknown'])
@@ -716,6 +786,7 @@ class CrossDatasetAnalyticsEngine:
 
 
 # Enhanced analytics functions for the TOOL_MAP
+@cached_tool(PROFILE_TABLES, entity_params=('cik',))
 def comprehensive_company_analysis(cik: str, include_subsidiaries: bool = True):
     """Multi-dimensional company analysis across all regulatory data sources"""
     with CrossDatasetAnalyticsEngine() as engine:
@@ -725,6 +796,7 @@ def comprehensive_company_analysis(cik: str, include_subsidiaries: bool = True):
         })
     return json.dumps(results, default=str)
 
+@cached_tool(FORM13F_TABLES)
 def institutional_flow_analysis(timeframe_days: int = 90, min_position_value: float = 1000000):
     """Analyze institutional money flows and position changes using Form 13F data"""
     with CrossDatasetAnalyticsEngine() as engine:
@@ -734,6 +806,21 @@ def institutional_flow_analysis(timeframe_days: int = 90, min_position_value: fl
         })
     return json.dumps(results, default=str)
 
+@cached_tool(FORM13F_TABLES)
+def institutional_accumulation_screen(quarter: str = None, direction: str = "accumulated",
+                                      limit: int = 25, min_position_value: float = 0):
+    """Screen all CUSIPs for the largest net 13F buying or selling in a quarter"""
+    order_by = {'accumulated': 'value_change', 'distributed': '-value_change',
+                'new_holders': 'holder_change'}.get(direction, 'value_change')
+    db = SessionLocal()
+    try:
+        quarter = quarter or latest_flow_quarter(db)
+        flows = get_cusip_flows(quarter, min_position_value, limit, order_by, session=db) if quarter else []
+    finally:
+        db.close()
+    return json.dumps({'quarter': quarter, 'direction': direction, 'results': flows}, default=str)
+
+@cached_tool(INSIDER_TABLES)
 def insider_activity_monitoring(analysis_type: str = "unusual_activity", lookback_days: int = 30):
     """Monitor and analyze insider trading patterns for unusual activity detection"""
     with CrossDatasetAnalyticsEngine() as engine:
@@ -743,6 +830,20 @@ def insider_activity_monitoring(analysis_type: str = "unusual_activity", lookbac
         })
     return json.dumps(results, default=str)
 
+@cached_tool(INSIDER_TABLES)
+def insider_buying_screen(lookback_days: int = 30, direction: str = "buying", min_value: float = 0,
+                          limit: int = 25):
+    """Screen all issuers for the largest open-market insider buying or selling in a recent window"""
+    start_date = (datetime.now() - timedelta(days=lookback_days)).date()
+    db = SessionLocal()
+    try:
+        results = insider_activity_screen(start_date, direction=direction, min_value=min_value,
+                                          limit=limit, session=db)
+    finally:
+        db.close()
+    return json.dumps({'start_date': start_date, 'direction': direction, 'results': results}, default=str)
+
+@cached_tool(SWAP_TABLES)
 def swap_risk_assessment(risk_dimension: str = "counterparty", aggregation_level: str = "weekly"):
     """Comprehensive CFTC swap market risk analysis and exposure assessment"""
     with CrossDatasetAnalyticsEngine() as engine:
@@ -752,6 +853,7 @@ def swap_risk_assessment(risk_dimension: str = "counterparty", aggregation_level
         })
     return json.dumps(results, default=str)
 
+@cached_tool(NMFP_TABLES)
 def fund_stability_analysis(fund_category: str = "all", stress_scenario: bool = False):
     """Money market fund liquidity and stability assessment using N-MFP data"""
     with CrossDatasetAnalyticsEngine() as engine:
@@ -761,6 +863,7 @@ def fund_stability_analysis(fund_category: str = "all", stress_scenario: bool =
         })
     return json.dumps(results, default=str)
 
+@cached_tool(PERIODIC_FILING_TABLES)
 def company_peer_analysis(cik: str, peer_selection: str = "industry"):
     """Compare company metrics against industry peers across multiple data sources"""
     with CrossDatasetAnalyticsEngine() as engine:
@@ -770,6 +873,98 @@ def company_peer_analysis(cik: str, peer_selection: str = "industry"):
         })
     return json.dumps(results, default=str)
 
+@cached_tool(CORRELATION_TABLES)
+def cross_asset_correlation(sources: List[str] = None, swap_level: str = "asset_class", window: int = 63,
+                            step: int = 21, lookback_days: int = 1095, max_series: int = 2000,
+                            top_pairs: int = 20):
+    """Rolling correlation across swap activity, insider flows and 13F flows"""
+    with CrossDatasetAnalyticsEngine() as engine:
+        results = engine.execute_cross_dataset_query('cross_asset_correlation', {
+            'sources': sources,
+            'swap_level': swap_level,
+            'window': window,
+            'step': step,
+            'lookback_days': lookback_days,
+            'max_series': max_series,
+            'top_pairs': top_pairs
+        })
+    return json.dumps(results, default=str)
+
+@cached_tool(NMFP_TABLES)
+def mmf_redemption_stress(scenario: str = "all", daily_outflow_pct: float = None, outflow_days: int = 10,
+                          horizon_days: int = 20, fund_category: str = "all", as_of: str = None):
+    """Apply redemption shocks to every money market fund and find each fund's first liquidity breach"""
+    if daily_outflow_pct is not None:
+        scenarios = {f"{daily_outflow_pct:g}%_daily": [daily_outflow_pct / 100] * outflow_days}
+    elif scenario == "all":
+        scenarios = REDEMPTION_SCENARIOS
+    elif scenario in REDEMPTION_SCENARIOS:
+        scenarios = {scenario: REDEMPTION_SCENARIOS[scenario]}
+    else:
+        return json.dumps({"error": f"Unknown scenario '{scenario}'. Expected: all, {', '.join(REDEMPTION_SCENARIOS)}"})
+    db = SessionLocal()
+    try:
+        results = run_redemption_stress(scenarios, as_of=as_of, horizon_days=horizon_days,
+                                        fund_category=fund_category, session=db)
+    finally:
+        db.close()
+    return json.dumps(results, default=str)
+
+@cached_tool(CONCENTRATION_TABLES)
+def market_concentration(dimensions: List[str] = None, lookback_days: int = 730, top_n: int = 4,
+                         min_participants: int = 1, limit: int = 25):
+    """Herfindahl-Hirschman index, top-N share and Gini per market and period"""
+    db = SessionLocal()
+    try:
+        results = market_concentration_summary(dimensions or DIMENSIONS,
+                                               datetime.now().date() - timedelta(days=lookback_days),
+                                               top_n, min_participants, limit, session=db)
+    finally:
+        db.close()
+    return json.dumps(results, default=str)
+
+@cached_tool(EVENT_TABLES, entity_params=('cik',))
+def regulatory_timeline_analysis(cik: str = None, lookback_months: int = 24, sources: List[str] = None):
+    """Monthly filing activity, event breakdown and activity bursts from the filing event timeline"""
+    with CrossDatasetAnalyticsEngine() as engine:
+        results = engine.execute_cross_dataset_query('regulatory_timeline_analysis', {
+            'cik': cik,
+            'lookback_months': lookback_months,
+            'sources': sources
+        })
+    return json.dumps(results, default=str)
+
+@cached_tool(HOLDER_INDEX_TABLES)
+def security_holder_lookup(identifier: str, quarter: str = None, datasets: List[str] = None, limit: int = 25,
+                           crowding_quarters: int = 4):
+    """Who holds a security across 13F managers and N-PORT funds, with its crowding history"""
+    db = SessionLocal()
+    try:
+        results = {
+            "holders": get_security_holders(identifier, quarter, datasets, limit, session=db),
+            "crowding": security_crowding(identifier, crowding_quarters, datasets=datasets, session=db),
+        }
+    except ValueError as e:
+        return json.dumps({"error": str(e)})
+    finally:
+        db.close()
+    return json.dumps(results, default=str)
+
+@cached_tool(PROFILE_TABLES)
+def company_profile_screen(order_by: str = "insider_purchase_value", min_insider_purchase_value: float = 0,
+                           min_institutional_value: float = 0, has_formd: bool = False, filed_since: str = None,
+                           limit: int = 50):
+    """Screen all companies on their materialized profiles"""
+    if order_by not in SCREEN_ORDERS:
+        return json.dumps({"error": f"Unknown order_by '{order_by}'. Expected: {', '.join(SCREEN_ORDERS)}"})
+    db = SessionLocal()
+    try:
+        results = screen_company_profiles(order_by, min_insider_purchase_value, min_institutional_value, has_formd,
+                                          filed_since, limit, session=db)
+    finally:
+        db.close()
+    return json.dumps(results, default=str)
+
 # Enhanced TOOL_MAP additions for cross-dataset analytics
 ENHANCED_ANALYTICS_TOOLS = {
     "comprehensive_company_analysis": {
@@ -802,6 +997,23 @@ ENHANCED_ANALYTICS_TOOLS = {
             }
         }
     },
+    "institutional_accumulation_screen": {
+        "function": institutional_accumulation_screen,
+        "schema": {
+            "name": "institutional_accumulation_screen",
+            "description": "Screen all securities for the largest quarter-over-quarter net institutional buying or selling in Form 13F holdings",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "quarter": {"type": "string", "description": "Report quarter as 'YYYY-Qn' (default: latest available)"},
+                    "direction": {"type": "string", "description": "'accumulated', 'distributed' or 'new_holders' (default: 'accumulated')"},
+                    "limit": {"type": "integer", "description": "Number of securities to return (default: 25)"},
+                    "min_position_value": {"type": "number", "description": "Minimum aggregate position value (default: 0)"}
+                },
+                "required": []
+            }
+        }
+    },
     "insider_activity_monitoring": {
         "function": insider_activity_monitoring,
         "schema": {
@@ -817,6 +1029,23 @@ ENHANCED_ANALYTICS_TOOLS = {
             }
         }
     },
+    "insider_buying_screen": {
+        "function": insider_buying_screen,
+        "schema": {
+            "name": "insider_buying_screen",
+            "description": "Screen all issuers for the largest open-market insider purchases or sales, compared with each issuer's trailing-year baseline",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "lookback_days": {"type": "integer", "description": "Window length in days (default: 30)"},
+                    "direction": {"type": "string", "description": "'buying', 'selling' or 'all' (default: 'buying')"},
+                    "min_value": {"type": "number", "description": "Minimum dollar value in the window (default: 0)"},
+                    "limit": {"type": "integer", "description": "Number of issuers to return (default: 25)"}
+                },
+                "required": []
+            }
+        }
+    },
     "swap_risk_assessment": {
         "function": swap_risk_assessment,
         "schema": {
@@ -847,6 +1076,96 @@ ENHANCED_ANALYTICS_TOOLS = {
             }
         }
     },
+    "mmf_redemption_stress": {
+        "function": mmf_redemption_stress,
+        "schema": {
+            "name": "mmf_redemption_stress",
+            "description": "Stress every money market fund with day-by-day redemption shocks using N-MFP liquid asset and holdings maturity data, reporting which funds breach daily/weekly liquidity minimums and on which day",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "scenario": {"type": "string", "description": "'moderate', 'severe', 'march_2020_prime', 'run' or 'all' (default: 'all')"},
+                    "daily_outflow_pct": {"type": "number", "description": "Custom constant daily outflow in percent of net assets; overrides scenario"},
+                    "outflow_days": {"type": "integer", "description": "Days the custom outflow lasts (default: 10)"},
+                    "horizon_days": {"type": "integer", "description": "Days to simulate (default: 20)"},
+                    "fund_category": {"type": "string", "description": "'prime', 'government', 'tax_exempt' or 'all' (default: 'all')"},
+                    "as_of": {"type": "string", "description": "Report date YYYY-MM-DD; uses the quarter of filings up to it (default: latest)"}
+                },
+                "required": []
+            }
+        }
+    },
+    "market_concentration": {
+        "function": market_concentration,
+        "schema": {
+            "name": "market_concentration",
+            "description": "Market concentration over time: Herfindahl-Hirschman index, top-N share and Gini for swap notional by asset class and product, 13F ownership per issuer, and swap dealers named as counterparties",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "dimensions": {"type": "array", "items": {"type": "string"}, "description": "'swap_asset_class', 'swap_product', 'issuer_holders', 'dealer' (default: all)"},
+                    "lookback_days": {"type": "integer", "description": "History in days (default: 730)"},
+                    "top_n": {"type": "integer", "description": "N for the top-N share (default: 4)"},
+                    "min_participants": {"type": "integer", "description": "Skip markets with fewer participants (default: 1)"},
+                    "limit": {"type": "integer", "description": "Markets listed for the latest period (default: 25)"}
+                },
+                "required": []
+            }
+        }
+    },
+    "regulatory_timeline_analysis": {
+        "function": regulatory_timeline_analysis,
+        "schema": {
+            "name": "regulatory_timeline_analysis",
+            "description": "Regulatory filing timeline for a company or the whole market: monthly counts of 8-K items, 10-K/10-Q filings, Form D notices and insider filings, the most frequent events, months of unusual activity and the latest events",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "cik": {"type": "string", "description": "Company CIK identifier (default: all companies)"},
+                    "lookback_months": {"type": "integer", "description": "Months of history (default: 24)"},
+                    "sources": {"type": "array", "items": {"type": "string"}, "description": "'current' (8-K items), 'periodic' (10-K/10-Q), 'formd', 'insider' (default: all)"}
+                },
+                "required": []
+            }
+        }
+    },
+    "security_holder_lookup": {
+        "function": security_holder_lookup,
+        "schema": {
+            "name": "security_holder_lookup",
+            "description": "Find the holders of a security by CUSIP or ISIN across Form 13F managers and N-PORT funds, with holder counts, concentration and holders entering or leaving per quarter",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "identifier": {"type": "string", "description": "9-character CUSIP or 12-character ISIN (required)"},
+                    "quarter": {"type": "string", "description": "Report quarter as 'YYYY-Qn' (default: latest with holders)"},
+                    "datasets": {"type": "array", "items": {"type": "string"}, "description": "'13f' and/or 'nport' (default: both)"},
+                    "limit": {"type": "integer", "description": "Number of holders to list (default: 25)"},
+                    "crowding_quarters": {"type": "integer", "description": "Quarters of crowding history (default: 4)"}
+                },
+                "required": ["identifier"]
+            }
+        }
+    },
+    "company_profile_screen": {
+        "function": company_profile_screen,
+        "schema": {
+            "name": "company_profile_screen",
+            "description": "Screen all companies by their profile figures: insider purchases and sales, 13F holder value, Form D raises and filing activity",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "order_by": {"type": "string", "description": "'insider_purchase_value', 'insider_sale_value', 'institutional_value', 'institutional_holders', 'formd_amount_sold', 'latest_filing_date' or 'current_reports' (default: 'insider_purchase_value')"},
+                    "min_insider_purchase_value": {"type": "number", "description": "Minimum total insider open-market purchases (default: 0)"},
+                    "min_institutional_value": {"type": "number", "description": "Minimum total 13F holder value in the latest quarter (default: 0)"},
+                    "has_formd": {"type": "boolean", "description": "Only companies with Form D offerings (default: false)"},
+                    "filed_since": {"type": "string", "description": "Only companies with a filing since YYYY-MM-DD"},
+                    "limit": {"type": "integer", "description": "Number of companies to return (default: 50)"}
+                },
+                "required": []
+            }
+        }
+    },
     "company_peer_analysis": {
         "function": company_peer_analysis,
         "schema": {
@@ -861,5 +1180,25 @@ ENHANCED_ANALYTICS_TOOLS = {
                 "required": ["cik"]
             }
         }
+    },
+    "cross_asset_correlation": {
+        "function": cross_asset_correlation,
+        "schema": {
+            "name": "cross_asset_correlation",
+            "description": "Rolling correlation matrices across daily swap activity, net insider buying and 13F institutional flows, with correlation regime, most correlated pairs and largest correlation shifts",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "sources": {"type": "array", "items": {"type": "string"}, "description": "Series sources: 'swaps', 'insider', '13f' (default: all)"},
+                    "swap_level": {"type": "string", "description": "Swap series per 'asset_class', 'product' or 'currency' (default: 'asset_class')"},
+                    "window": {"type": "integer", "description": "Rolling window in days (default: 63)"},
+                    "step": {"type": "integer", "description": "Days between evaluated windows (default: 21)"},
+                    "lookback_days": {"type": "integer", "description": "History to load in days (default: 1095)"},
+                    "max_series": {"type": "integer", "description": "Keep the most active N series (default: 2000)"},
+                    "top_pairs": {"type": "integer", "description": "Number of pairs to report (default: 20)"}
+                },
+                "required": []
+            }
+        }
     }
 }
@@ -0,0 +1,192 @@
+"""
+Exposure cube over live CFTC swaps.
+
+cftc_exposure_cube holds live trade counts and notional per cell of
+(reference entity, asset class, currency, tenor bucket, execution month).
+Lifecycle application (src/swap_lifecycle.py) passes each batch's
+before/after trade states to apply_cube_deltas, so the cube tracks
+cftc_live_trades without rescanning it. Any slice, roll-up or drill-down is
+then a GROUP BY over cube cells.
+
+Public CFTC data carries no counterparty identifiers, so the entity axis is
+the reference underlier, matched the same way the single-party risk
+analyzer matches entities.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, CFTCLiveTrade, CFTCExposureCube, record_data_change
+from src.swap_aggregates import CLEARED_VALUES
+
+logger = logging.getLogger(__name__)
+
+CUBE_TABLE = CFTCExposureCube.__tablename__
+CUBE_DIMENSIONS = ('reference_entity', 'asset_class', 'currency', 'tenor_bucket', 'month')
+CUBE_MEASURES = ('trade_count', 'notional_count', 'notional_sum', 'cleared_trade_count')
+
+# Live-trade fields a cube cell is derived from
+CUBE_SOURCE_FIELDS = ('underlier_id_leg_1', 'underlying_asset_name', 'asset_class', 'notional_currency_leg_1',
+                      'effective_date', 'execution_timestamp', 'expiration_date', 'notional_amount_leg_1', 'cleared')
+
+# (upper bound in days, label) for the original tenor; bounds allow for leap days
+TENOR_BUCKETS = ((366, '0-1Y'), (731, '1-2Y'), (1827, '2-5Y'), (3653, '5-10Y'), (10958, '10-30Y'))
+LONGEST_TENOR_BUCKET = '30Y+'
+
+Cell = Tuple[str, str, str, str, str]
+
+
+def tenor_bucket(start: Optional[datetime], end: Optional[datetime]) -> str:
+    """Bucket label for the tenor between start and end, '' if either is missing."""
+    if start is None or end is None:
+        return ''
+    days = (end - start).days
+    for limit, label in TENOR_BUCKETS:
+        if days <= limit:
+            return label
+    return LONGEST_TENOR_BUCKET
+
+
+def _field(trade, name):
+    return trade.get(name) if isinstance(trade, dict) else getattr(trade, name, None)
+
+
+def cube_cell(trade) -> Cell:
+    """Cube cell of a live trade (ORM row or dict)."""
+    start = _field(trade, 'effective_date') or _field(trade, 'execution_timestamp')
+    executed = _field(trade, 'execution_timestamp') or _field(trade, 'effective_date')
+    return (
+        (_field(trade, 'underlier_id_leg_1') or _field(trade, 'underlying_asset_name') or '').strip(),
+        _field(trade, 'asset_class') or '',
+        _field(trade, 'notional_currency_leg_1') or '',
+        tenor_bucket(start, _field(trade, 'expiration_date')),
+        executed.strftime('%Y-%m') if executed else '',
+    )
+
+
+def add_trade(deltas: Dict[Cell, List[float]], trade, sign: int = 1) -> None:
+    """Adds (sign=1) or removes (sign=-1) a trade's contribution to deltas."""
+    cell = deltas.setdefault(cube_cell(trade), [0, 0, 0.0, 0])
+    notional = _field(trade, 'notional_amount_leg_1')
+    cell[0] += sign
+    if notional is not None:
+        cell[1] += sign
+        cell[2] += sign * float(notional)
+    if _field(trade, 'cleared') in CLEARED_VALUES:
+        cell[3] += sign
+
+
+def apply_cube_deltas(session: Session, deltas: Dict[Cell, List[float]]) -> int:
+    """Adds deltas to the cube in session (not committed). Returns the number of cells touched."""
+    rows = [dict(zip(CUBE_DIMENSIONS, cell), **dict(zip(CUBE_MEASURES, measures)), updated_at=datetime.utcnow())
+            for cell, measures in deltas.items() if any(measures)]
+    if not rows:
+        return 0
+    statement = sqlite_insert(CFTCExposureCube.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(CUBE_DIMENSIONS),
+        set_={**{m: getattr(CFTCExposureCube.__table__.c, m) + statement.excluded[m] for m in CUBE_MEASURES},
+              'updated_at': statement.excluded.updated_at})
+    session.execute(statement, rows)
+    session.execute(text(f"DELETE FROM {CUBE_TABLE} WHERE trade_count <= 0"))
+    return len(rows)
+
+
+def has_exposure_cube(session: Session) -> bool:
+    """True once the cube holds cells, so readers can rely on it."""
+    return session.query(CFTCExposureCube.month).first() is not None
+
+
+def rebuild_exposure_cube(session: Optional[Session] = None, batch_size: int = 5000) -> int:
+    """Recomputes the whole cube from cftc_live_trades. Returns the number of cells."""
+    close_session = False
+    if session is None:
+        session = SessionLocal()
+        close_session = True
+    try:
+        deltas: Dict[Cell, List[float]] = {}
+        columns = [getattr(CFTCLiveTrade, name) for name in CUBE_SOURCE_FIELDS]
+        for row in session.query(*columns).yield_per(batch_size):
+            add_trade(deltas, row._asdict())
+
+        session.query(CFTCExposureCube).delete(synchronize_session=False)
+        cells = apply_cube_deltas(session, deltas)
+        record_data_change(session, CFTCExposureCube, row_count=cells)
+        session.commit()
+        logger.info(f"Rebuilt exposure cube: {cells} cells")
+        return cells
+    except Exception as e:
+        logger.error(f"Error rebuilding exposure cube: {e}", exc_info=True)
+        session.rollback()
+        raise
+    finally:
+        if close_session:
+            session.close()
+
+
+def query_exposure_cube(group_by: Sequence[str] = ('asset_class',), filters: Optional[Dict[str, Any]] = None,
+                        limit: Optional[int] = None, session: Optional[Session] = None) -> List[Dict[str, Any]]:
+    """
+    Rolls the cube up to the group_by dimensions (none gives the grand
+    total), largest notional first. filters map a dimension to a value or a
+    list of values; 'month_from' and 'month_to' bound the month inclusively.
+    A None or '' value selects cells where that attribute is missing.
+    """
+    group_by = list(group_by)
+    filters = dict(filters or {})
+    unknown = [d for d in group_by + [k for k in filters if k not in ('month_from', 'month_to')]
+               if d not in CUBE_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown cube dimension(s) {unknown}. Expected: {', '.join(CUBE_DIMENSIONS)}")
+
+    clauses, params = [], {}
+    for name, value in filters.items():
+        if name in ('month_from', 'month_to'):
+            clauses.append(f"month {'>=' if name == 'month_from' else '<='} :{name}")
+            params[name] = value
+        elif isinstance(value, (list, tuple, set)):
+            names = [f"{name}_{i}" for i in range(len(value))]
+            clauses.append(f"{name} IN ({', '.join(':' + n for n in names)})")
+            params.update({n: v or '' for n, v in zip(names, value)})
+        else:
+            clauses.append(f"{name} = :{name}")
+            params[name] = value or ''
+
+    select = ', '.join(group_by + [
+        'SUM(trade_count) AS trade_count', 'SUM(notional_count) AS notional_count',
+        'SUM(notional_sum) AS total_notional', 'SUM(cleared_trade_count) AS cleared_trade_count'])
+    sql = f"SELECT {select} FROM {CUBE_TABLE}"
+    if clauses:
+        sql += f" WHERE {' AND '.join(clauses)}"
+    if group_by:
+        sql += f" GROUP BY {', '.join(group_by)}"
+    sql += " ORDER BY total_notional DESC"
+    if limit:
+        sql += " LIMIT :limit"
+        params['limit'] = limit
+
+    close_session = False
+    if session is None:
+        session = SessionLocal()
+        close_session = True
+    try:
+        rows = [dict(row) for row in session.execute(text(sql), params).mappings()]
+    finally:
+        if close_session:
+            session.close()
+    for row in rows:
+        for dimension in group_by:
+            row[dimension] = row[dimension] or None
+        row['total_notional'] = float(row['total_notional'] or 0)
+    return [row for row in rows if row['trade_count']]
+
+
+def drill_down(path: Dict[str, Any], dimension: str, limit: Optional[int] = None,
+               session: Optional[Session] = None) -> List[Dict[str, Any]]:
+    """Breaks the slice selected by path (dimension -> value) down by one more dimension."""
+    return query_exposure_cube([dimension], path, limit, session)
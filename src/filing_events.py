@@ -0,0 +1,316 @@
+"""
+Filing event timeline per company.
+
+filing_events holds one row per dated filing event: each 8-K item, each
+10-K/10-Q, each Form D notice per issuer and each insider filing, keyed by
+the CIK without zero padding and indexed by (cik, event_date).
+filing_event_monthly holds the monthly counts per company, source and
+event code. Ingestion refreshes the events of the filings it loaded and
+recounts only the (company, month) pairs those filings touch, so a
+timeline or event-pattern request is a range read over one company's
+rows. A source is built in full the first time it is refreshed or read
+(filing_event_builds records which are), so a database upgraded with
+filings already loaded gets their history too.
+"""
+
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import (SessionLocal, FilingEvent, FilingEventBuild, FilingEventMonthly, normalize_change_key,
+                      record_data_change)
+
+logger = logging.getLogger(__name__)
+
+EVENT_TABLE = FilingEvent.__tablename__
+MONTHLY_TABLE = FilingEventMonthly.__tablename__
+
+_KEY_CHUNK = 500
+
+
+def formd_date_sql(column: str) -> str:
+    """SQL rewriting a Form D DD-MON-YYYY filing date to YYYY-MM-DD; other values pass through."""
+    return (f"CASE WHEN {column} GLOB '[0-9][0-9]-[A-Za-z][A-Za-z][A-Za-z]-[0-9][0-9][0-9][0-9]*' "
+            f"THEN printf('%s-%02d-%s', substr({column}, 8, 4), "
+            f"(instr('JANFEBMARAPRMAYJUNJULAUGSEPOCTNOVDEC', upper(substr({column}, 4, 3))) + 2) / 3, "
+            f"substr({column}, 1, 2)) ELSE substr({column}, 1, 10) END")
+
+
+def normalized_cik_sql(column: str) -> str:
+    """SQL form of normalize_change_key for numeric CIKs."""
+    return f"COALESCE(NULLIF(ltrim(trim({column}), '0'), ''), '0')"
+
+
+# source -> (table, further joins, accession, CIK, event code, event date, description)
+EVENT_SOURCES = {
+    'current': ('sec_8k_submissions s', 'LEFT JOIN sec_8k_items i ON i.accession_number = s.accession_number',
+                's.accession_number', 's.cik', 'COALESCE(i.item_number, s.form_type)',
+                'substr(s.filing_date, 1, 10)', 'i.item_title'),
+    'periodic': ('sec_10k_submissions s', '', 's.accession_number', 's.cik', 's.form_type',
+                 'substr(s.filing_date, 1, 10)', 'NULL'),
+    'formd': ('formd_submissions s', 'JOIN formd_issuers i ON i.accessionnumber = s.accessionnumber',
+              's.accessionnumber', 'i.cik', "COALESCE(s.submissiontype, 'D')", formd_date_sql('s.filing_date'),
+              'NULL'),
+    'insider': ('sec_submissions s', '', 's.accession_number', 's.issuercik', 's.document_type',
+                'substr(s.filing_date, 1, 10)', 'NULL'),
+}
+EVENT_TABLES = (EVENT_TABLE, MONTHLY_TABLE)
+
+# Months whose event count is this many standard deviations above the mean are reported as bursts
+BURST_STD = 2.0
+
+
+def _session_scope(session: Optional[Session]):
+    return (session, False) if session is not None else (SessionLocal(), True)
+
+
+def _check_sources(sources: Optional[Sequence[str]]) -> List[str]:
+    sources = list(sources or EVENT_SOURCES)
+    unknown = [s for s in sources if s not in EVENT_SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown event sources {unknown}. Expected: {', '.join(EVENT_SOURCES)}")
+    return sources
+
+
+def _load_accessions(session: Session, accession_numbers: Iterable[str]) -> None:
+    session.execute(text("DROP TABLE IF EXISTS temp.filing_event_accessions"))
+    session.execute(text("CREATE TEMP TABLE filing_event_accessions (accession_number TEXT PRIMARY KEY)"))
+    accessions = sorted({a for a in accession_numbers if a})
+    for start in range(0, len(accessions), _KEY_CHUNK):
+        session.execute(text("INSERT OR IGNORE INTO filing_event_accessions VALUES (:a)"),
+                        [{'a': a} for a in accessions[start:start + _KEY_CHUNK]])
+
+
+def _collect_months(session: Session, source: str) -> None:
+    """Adds the (cik, month) pairs of source's events in the loaded filings to temp.filing_event_months."""
+    session.execute(text(f"""
+        INSERT OR IGNORE INTO filing_event_months
+        SELECT e.cik, substr(e.event_date, 1, 7)
+        FROM filing_event_accessions a
+        JOIN {EVENT_TABLE} e ON e.accession_number = a.accession_number
+        WHERE e.source = :source
+    """), {'source': source})
+
+
+def _refresh_source(session: Session, source: str, targeted: bool) -> int:
+    table, joins, accession, cik, code, event_date, description = EVENT_SOURCES[source]
+    select = f"""
+        SELECT {accession}, {normalized_cik_sql(cik)}, {code}, :source, {event_date}, {description}
+        FROM {'filing_event_accessions a JOIN ' if targeted else ''}{table}
+             {f'ON {accession} = a.accession_number' if targeted else ''} {joins}
+        WHERE {cik} IS NOT NULL AND trim({cik}) != '' AND {code} IS NOT NULL AND {event_date} IS NOT NULL
+    """
+    insert = f"""
+        INSERT OR IGNORE INTO {EVENT_TABLE}
+            (accession_number, cik, event_code, source, event_date, description)
+        {select}
+    """
+    params = {'source': source}
+    if not targeted:
+        session.execute(text(f"DELETE FROM {EVENT_TABLE} WHERE source = :source"), params)
+        written = session.execute(text(insert), params).rowcount
+        session.execute(text(f"DELETE FROM {MONTHLY_TABLE} WHERE source = :source"), params)
+        session.execute(text(f"""
+            INSERT INTO {MONTHLY_TABLE} (cik, month, source, event_code, events)
+            SELECT cik, substr(event_date, 1, 7), source, event_code, COUNT(*)
+            FROM {EVENT_TABLE} WHERE source = :source
+            GROUP BY cik, substr(event_date, 1, 7), event_code
+        """), params)
+        return written
+
+    # Months of the replaced events and of the new ones are recounted
+    _collect_months(session, source)
+    session.execute(text(f"""
+        DELETE FROM {EVENT_TABLE}
+        WHERE source = :source AND accession_number IN (SELECT accession_number FROM filing_event_accessions)
+    """), params)
+    written = session.execute(text(insert), params).rowcount
+    _collect_months(session, source)
+    session.execute(text(f"""
+        DELETE FROM {MONTHLY_TABLE}
+        WHERE source = :source AND (cik, month) IN (SELECT cik, month FROM filing_event_months)
+    """), params)
+    session.execute(text(f"""
+        INSERT INTO {MONTHLY_TABLE} (cik, month, source, event_code, events)
+        SELECT m.cik, m.month, e.source, e.event_code, COUNT(*)
+        FROM filing_event_months m
+        JOIN {EVENT_TABLE} e ON e.cik = m.cik AND e.event_date BETWEEN m.month || '-01' AND m.month || '-31'
+        WHERE e.source = :source
+        GROUP BY m.cik, m.month, e.event_code
+    """), params)
+    return written
+
+
+def _built_sources(session: Session) -> set:
+    return {source for (source,) in session.query(FilingEventBuild.source)}
+
+
+def refresh_filing_events(source: Optional[str] = None, accession_numbers: Optional[Iterable[str]] = None,
+                          session: Optional[Session] = None) -> int:
+    """
+    Rebuilds the events of the given filings for one source ('current',
+    'periodic', 'formd' or 'insider') and recounts the months they fall
+    in. With accession_numbers None the source's events are rebuilt in
+    full; with source None every source is. A source that has never been
+    built in full is rebuilt in full instead of just the given filings.
+
+    Returns the number of events written.
+    """
+    sources = _check_sources([source] if source else None)
+    session, close_session = _session_scope(session)
+    try:
+        built = _built_sources(session) if accession_numbers is not None else set()
+        full = [s for s in sources if s not in built]
+        targeted = [s for s in sources if s in built]
+
+        written = sum(_refresh_source(session, s, False) for s in full)
+        if full:
+            record_data_change(session, FilingEvent, row_count=written)
+            statement = sqlite_insert(FilingEventBuild).values([{'source': s, 'built_at': datetime.utcnow()}
+                                                                for s in full])
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['source'], set_={'built_at': statement.excluded.built_at}))
+        if targeted:
+            _load_accessions(session, accession_numbers)
+            session.execute(text("DROP TABLE IF EXISTS temp.filing_event_months"))
+            session.execute(text("CREATE TEMP TABLE filing_event_months (cik TEXT, month TEXT, "
+                                 "PRIMARY KEY (cik, month))"))
+            targeted_written = sum(_refresh_source(session, s, True) for s in targeted)
+            ciks = [{'cik': row[0]} for row in
+                    session.execute(text("SELECT DISTINCT cik FROM filing_event_months"))]
+            session.execute(text("DROP TABLE temp.filing_event_accessions"))
+            session.execute(text("DROP TABLE temp.filing_event_months"))
+            if ciks:
+                record_data_change(session, FilingEvent, ciks, row_count=targeted_written)
+            written += targeted_written
+        session.commit()
+        logger.info(f"Refreshed {written} filing events ({', '.join(sources)})")
+        return written
+    except Exception as e:
+        logger.error(f"Error refreshing filing events: {e}", exc_info=True)
+        session.rollback()
+        raise
+    finally:
+        if close_session:
+            session.close()
+
+
+def ensure_filing_events(sources: Optional[Sequence[str]] = None, session: Optional[Session] = None) -> int:
+    """Builds in full each of the sources that has never been built. Returns the number of events written."""
+    sources = _check_sources(sources)
+    session, close_session = _session_scope(session)
+    try:
+        built = _built_sources(session)
+        return sum(refresh_filing_events(s, session=session) for s in sources if s not in built)
+    finally:
+        if close_session:
+            session.close()
+
+
+def get_filing_events(cik: str, start_date=None, end_date=None, sources: Optional[Sequence[str]] = None,
+                      limit: Optional[int] = None, session: Optional[Session] = None) -> List[Dict[str, Any]]:
+    """A company's events between start_date and end_date (inclusive), newest first."""
+    sources = _check_sources(sources)
+    session, close_session = _session_scope(session)
+    try:
+        ensure_filing_events(sources, session)
+        source_params = {f"s{i}": s for i, s in enumerate(sources)}
+        rows = session.execute(text(f"""
+            SELECT event_date, source, event_code, description, accession_number
+            FROM {EVENT_TABLE}
+            WHERE cik = :cik AND event_date BETWEEN :start AND :end
+              AND source IN ({', '.join(f':{name}' for name in source_params)})
+            ORDER BY event_date DESC, accession_number, event_code
+            {'LIMIT :limit' if limit else ''}
+        """), {'cik': normalize_change_key(cik), 'start': str(start_date or '0000')[:10],
+               'end': str(end_date or '9999')[:10], 'limit': limit, **source_params})
+        return [dict(row._mapping) for row in rows]
+    finally:
+        if close_session:
+            session.close()
+
+
+def get_monthly_event_counts(cik: Optional[str] = None, start_month: Optional[str] = None,
+                             end_month: Optional[str] = None, sources: Optional[Sequence[str]] = None,
+                             session: Optional[Session] = None) -> List[Dict[str, Any]]:
+    """Event counts per month, source and event code for one company, or summed over all companies."""
+    sources = _check_sources(sources)
+    session, close_session = _session_scope(session)
+    try:
+        ensure_filing_events(sources, session)
+        source_params = {f"s{i}": s for i, s in enumerate(sources)}
+        params = {'start': (start_month or '0000')[:7], 'end': (end_month or '9999')[:7], **source_params}
+        where = (f"month BETWEEN :start AND :end "
+                 f"AND source IN ({', '.join(f':{name}' for name in source_params)})")
+        if cik is not None:
+            where = f"cik = :cik AND {where}"
+            params['cik'] = normalize_change_key(cik)
+        rows = session.execute(text(f"""
+            SELECT month, source, event_code, SUM(events) AS events, COUNT(DISTINCT cik) AS companies
+            FROM {MONTHLY_TABLE}
+            WHERE {where}
+            GROUP BY month, source, event_code
+            ORDER BY month, source, event_code
+        """), params)
+        return [dict(row._mapping) for row in rows]
+    finally:
+        if close_session:
+            session.close()
+
+
+def _month_range(start: date, end: date) -> List[str]:
+    months, year, month = [], start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def regulatory_timeline(cik: Optional[str] = None, months: int = 24, sources: Optional[Sequence[str]] = None,
+                        recent_events: int = 25, session: Optional[Session] = None) -> Dict[str, Any]:
+    """
+    Monthly filing activity over the last `months` months for one company
+    (or all companies), the most frequent event codes, months of unusual
+    activity and, for a company, its latest events.
+    """
+    end = date.today()
+    first = end.year * 12 + end.month - 1 - (months - 1)
+    start = date(first // 12, first % 12 + 1, 1)
+    calendar = _month_range(start, end)
+    session, close_session = _session_scope(session)
+    try:
+        counts = get_monthly_event_counts(cik, calendar[0], calendar[-1], sources, session=session)
+        events = (get_filing_events(cik, start, end, sources, limit=recent_events, session=session)
+                  if cik is not None else [])
+    finally:
+        if close_session:
+            session.close()
+
+    by_month = {month: {} for month in calendar}
+    breakdown: Dict[tuple, int] = {}
+    for row in counts:
+        sources_in_month = by_month.setdefault(row['month'], {})
+        sources_in_month[row['source']] = sources_in_month.get(row['source'], 0) + row['events']
+        key = (row['source'], row['event_code'])
+        breakdown[key] = breakdown.get(key, 0) + row['events']
+    totals = np.array([sum(by_month[month].values()) for month in calendar], dtype=float)
+    threshold = totals.mean() + BURST_STD * totals.std() if totals.any() else 0.0
+
+    return {
+        'cik': normalize_change_key(cik) if cik is not None else None,
+        'period': {'start_month': calendar[0], 'end_month': calendar[-1]},
+        'total_events': int(totals.sum()),
+        'monthly_activity': [{'month': month, 'total': int(total), 'by_source': by_month[month]}
+                             for month, total in zip(calendar, totals)],
+        'event_breakdown': [{'source': source, 'event_code': code, 'events': events_count}
+                            for (source, code), events_count in sorted(breakdown.items(), key=lambda kv: -kv[1])],
+        'activity_bursts': [{'month': month, 'events': int(total)}
+                            for month, total in zip(calendar, totals) if totals.any() and total > threshold],
+        'quiet_months': int((totals == 0).sum()),
+        'recent_events': events,
+    }
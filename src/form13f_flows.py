@@ -0,0 +1,299 @@
+"""
+Quarter-over-quarter 13F position deltas and per-CUSIP net flows.
+
+When a 13F quarter is ingested, each filer's holdings are compared once
+against the same filer's previous quarter. The result is stored in
+form13f_position_deltas (one row per filer and CUSIP) and summed into
+form13f_cusip_flows (one row per CUSIP). Flow analytics and "top
+accumulated names" screens then read indexed rows instead of joining raw
+INFOTABLE rows across two quarters on every call.
+
+Conventions:
+- A quarter is the calendar quarter of period_of_report, labelled 'YYYY-Qn'.
+- Only 13F-HR filings count. A later RESTATEMENT amendment supersedes the
+  filer's earlier filings for the quarter; NEW HOLDINGS amendments add to them.
+- Put/call rows are option exposure, not holdings, and are excluded.
+- A filer's positions count as exited only if the filer has already filed
+  for the new quarter, so late filers do not show up as mass sellers.
+- form13f_delta_builds records the quarters built. A filed quarter missing
+  from it (a database upgraded with 13F history already loaded) is built
+  by the next refresh or flow read.
+"""
+
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, Form13FDeltaBuild, Form13FPositionDelta, Form13FCusipFlow, record_data_change
+
+logger = logging.getLogger(__name__)
+
+DELTA_TABLE = Form13FPositionDelta.__tablename__
+FLOW_TABLE = Form13FCusipFlow.__tablename__
+
+
+def quarter_label(value) -> str:
+    """'YYYY-Qn' for a date, datetime or 'YYYY-MM-DD...' string."""
+    if not isinstance(value, (date, datetime)):
+        value = datetime.strptime(str(value)[:10], '%Y-%m-%d')
+    return f"{value.year}-Q{(value.month - 1) // 3 + 1}"
+
+
+def _shift_quarter(quarter: str, delta: int) -> str:
+    index = int(quarter[:4]) * 4 + int(quarter[-1]) - 1 + delta
+    return f"{index // 4}-Q{index % 4 + 1}"
+
+
+def previous_quarter(quarter: str) -> str:
+    return _shift_quarter(quarter, -1)
+
+
+def _quarter_start(quarter: str) -> str:
+    return f"{quarter[:4]}-{(int(quarter[-1]) - 1) * 3 + 1:02d}-01"
+
+
+def _session_scope(session: Optional[Session]):
+    return (session, False) if session is not None else (SessionLocal(), True)
+
+
+def build_quarter_deltas(quarter: str, session: Optional[Session] = None) -> int:
+    """Rebuilds the deltas and CUSIP flows for one quarter. Returns the number of delta rows."""
+    session, close_session = _session_scope(session)
+    previous = previous_quarter(quarter)
+    params = {
+        'current': quarter,
+        'previous': previous,
+        'previous_start': _quarter_start(previous),
+        'current_start': _quarter_start(quarter),
+        'current_end': _quarter_start(_shift_quarter(quarter, 1)),
+    }
+    try:
+        session.execute(text("DROP TABLE IF EXISTS temp.form13f_quarter_positions"))
+        session.execute(text("""
+            CREATE TEMP TABLE form13f_quarter_positions AS
+            WITH hr AS (
+                SELECT fs.accession_number, fs.cik, fs.filing_date,
+                       CASE WHEN fs.period_of_report >= :current_start THEN :current ELSE :previous END AS quarter,
+                       UPPER(COALESCE(fc.amendment_type, '')) AS amendment_type
+                FROM form13f_submissions fs
+                LEFT JOIN form13f_coverpages fc ON fc.accession_number = fs.accession_number
+                WHERE fs.submission_type LIKE '13F-HR%'
+                AND fs.period_of_report >= :previous_start AND fs.period_of_report < :current_end
+            ),
+            filings AS (
+                SELECT h.accession_number, h.cik, h.quarter
+                FROM hr h
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM hr r
+                    WHERE r.cik = h.cik AND r.quarter = h.quarter AND r.amendment_type = 'RESTATEMENT'
+                    AND (r.filing_date, r.accession_number) > (h.filing_date, h.accession_number)
+                )
+            )
+            SELECT f.quarter, f.cik, fit.cusip,
+                   MAX(fit.nameofissuer) AS nameofissuer,
+                   COALESCE(SUM(fit.value), 0) AS value,
+                   COALESCE(SUM(fit.sshprnamt), 0) AS shares
+            FROM form13f_info_tables fit
+            JOIN filings f ON fit.accession_number = f.accession_number
+            WHERE fit.putcall IS NULL OR fit.putcall = ''
+            GROUP BY f.quarter, f.cik, fit.cusip
+        """), params)
+        session.execute(text(
+            "CREATE INDEX temp.idx_form13f_quarter_positions ON form13f_quarter_positions (cik, cusip, quarter)"))
+
+        session.execute(text(f"DELETE FROM {DELTA_TABLE} WHERE quarter = :current"), params)
+        rows = session.execute(text(f"""
+            INSERT INTO {DELTA_TABLE}
+                (quarter, cik, cusip, nameofissuer, value, previous_value, value_change,
+                 shares, previous_shares, share_change, change_type)
+            SELECT :current, c.cik, c.cusip, c.nameofissuer,
+                   c.value, COALESCE(p.value, 0), c.value - COALESCE(p.value, 0),
+                   c.shares, COALESCE(p.shares, 0), c.shares - COALESCE(p.shares, 0),
+                   CASE
+                       WHEN p.cik IS NULL THEN 'new'
+                       WHEN c.shares > p.shares THEN 'increased'
+                       WHEN c.shares < p.shares THEN 'decreased'
+                       ELSE 'unchanged'
+                   END
+            FROM form13f_quarter_positions c
+            LEFT JOIN form13f_quarter_positions p
+                ON p.cik = c.cik AND p.cusip = c.cusip AND p.quarter = :previous
+            WHERE c.quarter = :current
+            UNION ALL
+            SELECT :current, p.cik, p.cusip, p.nameofissuer,
+                   0, p.value, -p.value, 0, p.shares, -p.shares, 'exited'
+            FROM form13f_quarter_positions p
+            WHERE p.quarter = :previous
+            AND p.cik IN (SELECT cik FROM form13f_quarter_positions WHERE quarter = :current)
+            AND NOT EXISTS (
+                SELECT 1 FROM form13f_quarter_positions c
+                WHERE c.cik = p.cik AND c.cusip = p.cusip AND c.quarter = :current
+            )
+        """), params).rowcount
+
+        session.execute(text(f"DELETE FROM {FLOW_TABLE} WHERE quarter = :current"), params)
+        session.execute(text(f"""
+            INSERT INTO {FLOW_TABLE}
+                (quarter, cusip, nameofissuer, total_value, previous_value, value_change, pct_change,
+                 holders, previous_holders, holder_change, new_positions, exited_positions,
+                 increased_positions, decreased_positions, built_at)
+            SELECT quarter, cusip, MAX(nameofissuer),
+                   SUM(value), SUM(previous_value), SUM(value_change),
+                   CASE WHEN SUM(previous_value) > 0 THEN SUM(value_change) * 100.0 / SUM(previous_value) END,
+                   SUM(change_type <> 'exited'), SUM(change_type <> 'new'),
+                   SUM(change_type = 'new') - SUM(change_type = 'exited'),
+                   SUM(change_type = 'new'), SUM(change_type = 'exited'),
+                   SUM(change_type = 'increased'), SUM(change_type = 'decreased'),
+                   CURRENT_TIMESTAMP
+            FROM {DELTA_TABLE}
+            WHERE quarter = :current
+            GROUP BY quarter, cusip
+        """), params)
+        session.execute(text("DROP TABLE temp.form13f_quarter_positions"))
+        statement = sqlite_insert(Form13FDeltaBuild).values(quarter=quarter, built_at=datetime.utcnow())
+        session.execute(statement.on_conflict_do_update(
+            index_elements=['quarter'], set_={'built_at': statement.excluded.built_at}))
+
+        record_data_change(session, Form13FPositionDelta, row_count=rows)
+        record_data_change(session, Form13FCusipFlow)
+        session.commit()
+        logger.info(f"Built {rows} 13F position deltas for {quarter} against {previous}")
+        return rows
+    except Exception as e:
+        logger.error(f"Error building 13F position deltas for {quarter}: {e}", exc_info=True)
+        session.rollback()
+        raise
+    finally:
+        if close_session:
+            session.close()
+
+
+def _filed_quarters(session: Session) -> List[str]:
+    # One seek on the period index per quarter instead of a scan of every submission
+    quarters, start = [], ''
+    while True:
+        period = session.execute(text(
+            "SELECT period_of_report FROM form13f_submissions "
+            "WHERE period_of_report >= :start AND submission_type LIKE '13F-HR%' "
+            "ORDER BY period_of_report LIMIT 1"
+        ), {'start': start}).scalar()
+        if period is None:
+            return quarters
+        quarters.append(quarter_label(period))
+        start = _quarter_start(_shift_quarter(quarters[-1], 1))
+
+
+def _unbuilt_quarters(session: Session) -> set:
+    built = {quarter for (quarter,) in session.query(Form13FDeltaBuild.quarter)}
+    return set(_filed_quarters(session)) - built
+
+
+def refresh_position_deltas(quarters: Optional[Iterable] = None, session: Optional[Session] = None) -> Dict[str, int]:
+    """
+    Rebuilds the deltas for newly ingested quarters (dates or 'YYYY-Qn'
+    labels), or for every filed quarter when quarters is None. Each
+    following quarter that has filings is rebuilt too, because its
+    baseline changed, and so is every filed quarter never built.
+
+    Returns {quarter: delta_rows}.
+    """
+    session, close_session = _session_scope(session)
+    try:
+        filed = set(_filed_quarters(session))
+        if quarters is None:
+            targets = filed
+        else:
+            labels = {q if isinstance(q, str) and '-Q' in q else quarter_label(q) for q in quarters if q is not None}
+            targets = labels | {_shift_quarter(q, 1) for q in labels} | _unbuilt_quarters(session)
+        return {quarter: build_quarter_deltas(quarter, session) for quarter in sorted(targets & filed)}
+    finally:
+        if close_session:
+            session.close()
+
+
+def ensure_position_deltas(session: Optional[Session] = None) -> Dict[str, int]:
+    """Builds every filed quarter whose deltas have never been built. Returns {quarter: delta_rows}."""
+    session, close_session = _session_scope(session)
+    try:
+        missing = _unbuilt_quarters(session)
+        if missing:
+            logger.info(f"Building 13F position deltas for {len(missing)} quarters not yet built")
+        return {quarter: build_quarter_deltas(quarter, session) for quarter in sorted(missing)}
+    finally:
+        if close_session:
+            session.close()
+
+
+def latest_flow_quarter(session: Session) -> Optional[str]:
+    ensure_position_deltas(session)
+    return session.execute(text(f"SELECT MAX(quarter) FROM {FLOW_TABLE}")).scalar()
+
+
+def get_cusip_flows(quarter: Optional[str] = None, min_value: float = 0, limit: int = 100,
+                    order_by: str = 'abs_value_change', session: Optional[Session] = None) -> List[Dict[str, Any]]:
+    """
+    Per-CUSIP flows for a quarter (latest built by default) where either
+    side is at least min_value. order_by is 'abs_value_change',
+    'value_change' (top accumulated), '-value_change' (top distributed) or
+    'holder_change'.
+    """
+    orderings = {
+        'abs_value_change': 'ABS(value_change) DESC',
+        'value_change': 'value_change DESC',
+        '-value_change': 'value_change ASC',
+        'holder_change': 'holder_change DESC, value_change DESC',
+    }
+    if order_by not in orderings:
+        raise ValueError(f"Unknown ordering '{order_by}'. Expected one of: {', '.join(orderings)}")
+
+    session, close_session = _session_scope(session)
+    try:
+        if quarter is None:
+            quarter = latest_flow_quarter(session)
+        else:
+            ensure_position_deltas(session)
+        if quarter is None:
+            return []
+        rows = session.execute(text(f"""
+            SELECT * FROM {FLOW_TABLE}
+            WHERE quarter = :quarter AND (total_value >= :min_value OR previous_value >= :min_value)
+            ORDER BY {orderings[order_by]}
+            LIMIT :limit
+        """), {'quarter': quarter, 'min_value': min_value, 'limit': limit}).mappings().all()
+        return [dict(row) for row in rows]
+    finally:
+        if close_session:
+            session.close()
+
+
+def top_accumulated_names(quarter: Optional[str] = None, limit: int = 25, min_value: float = 0,
+                          session: Optional[Session] = None) -> List[Dict[str, Any]]:
+    """CUSIPs with the largest net institutional buying in the quarter."""
+    flows = get_cusip_flows(quarter, min_value, limit, 'value_change', session)
+    return [flow for flow in flows if flow['value_change'] > 0]
+
+
+def get_position_deltas(cusip: Optional[str] = None, cik: Optional[str] = None, quarter: Optional[str] = None,
+                        session: Optional[Session] = None) -> List[Dict[str, Any]]:
+    """Filer-level deltas for a CUSIP and/or filer, newest quarter first."""
+    clauses, params = [], {}
+    for column, value in (('cusip', cusip), ('cik', cik), ('quarter', quarter)):
+        if value is not None:
+            clauses.append(f"{column} = :{column}")
+            params[column] = value
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    session, close_session = _session_scope(session)
+    try:
+        ensure_position_deltas(session)
+        rows = session.execute(text(
+            f"SELECT * FROM {DELTA_TABLE} {where} ORDER BY quarter DESC, ABS(value_change) DESC"
+        ), params).mappings().all()
+        return [dict(row) for row in rows]
+    finally:
+        if close_session:
+            session.close()
@@ -0,0 +1,279 @@
+"""
+Daily insider transaction rollups per issuer.
+
+sec_insider_daily_rollups holds one row per issuer CIK, transaction day and
+transaction code with share and dollar totals split by acquired/disposed,
+the number of distinct reporting owners and a buy/sell value ratio.
+Ingestion refreshes only the (issuer, day) pairs touched by the loaded
+filings. Each pair is recomputed from the raw rows, so amendments and
+late filings for an old day land in the right rollup. While the rollups do
+not yet span the first to the last transaction day (first build, or a
+database upgraded with history already loaded), a refresh rebuilds every
+pair and readers stay on the raw tables.
+
+Conventions:
+- Value is trans_shares * trans_pricepershare, 0 when either is missing.
+- A transaction is "large" above LARGE_TRANSACTION_VALUE, the threshold the
+  unusual-activity monitor has always used.
+- Distinct insiders are counted per day. Summing them over a window gives
+  insider-days, not distinct people.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, SecInsiderDailyRollup, record_data_change
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_TABLE = SecInsiderDailyRollup.__tablename__
+LARGE_TRANSACTION_VALUE = 10000
+
+# Open-market purchases and sales; grants and option exercises say little about sentiment
+SCREEN_DIRECTIONS = {
+    'buying': ("trans_code = 'P'", 'value_acquired'),
+    'selling': ("trans_code = 'S'", 'value_disposed'),
+    'all': ("trans_code IN ('P', 'S')", 'value_acquired + value_disposed'),
+}
+
+_KEY_CHUNK = 500
+
+
+def _as_day(value) -> str:
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    return str(value)[:10]
+
+
+def _session_scope(session: Optional[Session]):
+    return (session, False) if session is not None else (SessionLocal(), True)
+
+
+def _load_affected_keys(session: Session, accession_numbers: Optional[Iterable[str]]) -> int:
+    """Fills temp.insider_rollup_keys with the (issuer, day) pairs to recompute."""
+    session.execute(text("DROP TABLE IF EXISTS temp.insider_rollup_keys"))
+    session.execute(text(
+        "CREATE TEMP TABLE insider_rollup_keys (issuercik TEXT, trans_date TEXT, PRIMARY KEY (issuercik, trans_date))"))
+
+    key_query = """
+        INSERT OR IGNORE INTO insider_rollup_keys
+        SELECT DISTINCT s.issuercik, substr(t.trans_date, 1, 10)
+        FROM sec_non_deriv_trans t
+        JOIN sec_submissions s ON s.accession_number = t.accession_number
+        WHERE t.trans_date IS NOT NULL
+    """
+    if accession_numbers is None:
+        session.execute(text(key_query))
+    else:
+        accessions = sorted({a for a in accession_numbers if a})
+        for start in range(0, len(accessions), _KEY_CHUNK):
+            chunk = accessions[start:start + _KEY_CHUNK]
+            params = {f"a{i}": accession for i, accession in enumerate(chunk)}
+            placeholders = ', '.join(f":{name}" for name in params)
+            session.execute(text(f"{key_query} AND t.accession_number IN ({placeholders})"), params)
+    return session.execute(text("SELECT COUNT(*) FROM insider_rollup_keys")).scalar()
+
+
+def _transaction_day(session: Session, order: str) -> Optional[str]:
+    # Walks the trans_date index and stops at the first transaction a rollup can include
+    day = session.execute(text(f"""
+        SELECT t.trans_date FROM sec_non_deriv_trans t
+        WHERE t.trans_date IS NOT NULL AND EXISTS (
+            SELECT 1 FROM sec_submissions s
+            WHERE s.accession_number = t.accession_number AND s.issuercik IS NOT NULL)
+        ORDER BY t.trans_date {order} LIMIT 1
+    """)).scalar()
+    return _as_day(day) if day is not None else None
+
+
+def _rollup_span(session: Session):
+    return session.execute(text(f"SELECT MIN(trans_date), MAX(trans_date) FROM {ROLLUP_TABLE}")).one()
+
+
+def refresh_insider_rollups(accession_numbers: Optional[Iterable[str]] = None,
+                            session: Optional[Session] = None) -> int:
+    """
+    Recomputes the rollups for every issuer and day that has a
+    non-derivative transaction in the given filings, or rebuilds all of
+    them when accession_numbers is None or the rollups do not yet reach
+    back to the first transaction day.
+
+    Returns the number of rollup rows written.
+    """
+    session, close_session = _session_scope(session)
+    try:
+        if accession_numbers is not None:
+            first, _ = _rollup_span(session)
+            oldest = _transaction_day(session, 'ASC')
+            if oldest is not None and (first is None or oldest < first):
+                logger.info("Insider rollups do not cover all transactions; rebuilding every issuer-day")
+                accession_numbers = None
+        keys = _load_affected_keys(session, accession_numbers)
+        if not keys:
+            session.execute(text("DROP TABLE temp.insider_rollup_keys"))
+            session.commit()
+            return 0
+
+        session.execute(text(f"""
+            DELETE FROM {ROLLUP_TABLE}
+            WHERE (issuercik, trans_date) IN (SELECT issuercik, trans_date FROM insider_rollup_keys)
+        """))
+        written = session.execute(text(f"""
+            INSERT INTO {ROLLUP_TABLE}
+                (issuercik, trans_date, trans_code, issuername, transactions, large_transactions,
+                 shares_acquired, shares_disposed, value_acquired, value_disposed,
+                 large_value_acquired, large_value_disposed,
+                 insiders, buying_insiders, selling_insiders, buy_sell_ratio, refreshed_at)
+            WITH trans AS (
+                SELECT s.issuercik, s.issuername, t.accession_number,
+                       substr(t.trans_date, 1, 10) AS trans_date,
+                       COALESCE(t.trans_code, '') AS trans_code,
+                       t.trans_acquired_disp_cd AS direction,
+                       COALESCE(t.trans_shares, 0) AS shares,
+                       COALESCE(t.trans_shares * t.trans_pricepershare, 0) AS value
+                FROM insider_rollup_keys k
+                JOIN sec_submissions s ON s.issuercik = k.issuercik
+                JOIN sec_non_deriv_trans t ON t.accession_number = s.accession_number
+                WHERE substr(t.trans_date, 1, 10) = k.trans_date
+            ),
+            totals AS (
+                SELECT issuercik, trans_date, trans_code, MAX(issuername) AS issuername,
+                       COUNT(*) AS transactions,
+                       SUM(value > :large) AS large_transactions,
+                       SUM(CASE WHEN direction = 'A' THEN shares ELSE 0 END) AS shares_acquired,
+                       SUM(CASE WHEN direction = 'D' THEN shares ELSE 0 END) AS shares_disposed,
+                       SUM(CASE WHEN direction = 'A' THEN value ELSE 0 END) AS value_acquired,
+                       SUM(CASE WHEN direction = 'D' THEN value ELSE 0 END) AS value_disposed,
+                       SUM(CASE WHEN direction = 'A' AND value > :large THEN value ELSE 0 END) AS large_value_acquired,
+                       SUM(CASE WHEN direction = 'D' AND value > :large THEN value ELSE 0 END) AS large_value_disposed
+                FROM trans
+                GROUP BY issuercik, trans_date, trans_code
+            ),
+            -- Owners are counted separately so joint filings do not multiply the totals
+            owners AS (
+                SELECT tr.issuercik, tr.trans_date, tr.trans_code,
+                       COUNT(DISTINCT o.rptownercik) AS insiders,
+                       COUNT(DISTINCT CASE WHEN tr.direction = 'A' THEN o.rptownercik END) AS buying_insiders,
+                       COUNT(DISTINCT CASE WHEN tr.direction = 'D' THEN o.rptownercik END) AS selling_insiders
+                FROM trans tr
+                JOIN sec_reporting_owners o ON o.accession_number = tr.accession_number
+                GROUP BY tr.issuercik, tr.trans_date, tr.trans_code
+            )
+            SELECT t.issuercik, t.trans_date, t.trans_code, t.issuername, t.transactions, t.large_transactions,
+                   t.shares_acquired, t.shares_disposed, t.value_acquired, t.value_disposed,
+                   t.large_value_acquired, t.large_value_disposed,
+                   COALESCE(o.insiders, 0), COALESCE(o.buying_insiders, 0), COALESCE(o.selling_insiders, 0),
+                   CASE WHEN t.value_disposed > 0 THEN t.value_acquired / t.value_disposed END,
+                   CURRENT_TIMESTAMP
+            FROM totals t
+            LEFT JOIN owners o
+                ON o.issuercik = t.issuercik AND o.trans_date = t.trans_date AND o.trans_code = t.trans_code
+        """), {'large': LARGE_TRANSACTION_VALUE}).rowcount
+        session.execute(text("DROP TABLE temp.insider_rollup_keys"))
+
+        record_data_change(session, SecInsiderDailyRollup, row_count=written)
+        session.commit()
+        logger.info(f"Refreshed {written} insider rollups for {keys} issuer-days")
+        return written
+    except Exception as e:
+        logger.error(f"Error refreshing insider rollups: {e}", exc_info=True)
+        session.rollback()
+        raise
+    finally:
+        if close_session:
+            session.close()
+
+
+def has_insider_rollups(session: Session) -> bool:
+    """True when the rollups span the first to the last transaction day, so readers can rely on them."""
+    first, last = _rollup_span(session)
+    if first is None:
+        return False
+    oldest, newest = _transaction_day(session, 'ASC'), _transaction_day(session, 'DESC')
+    return (oldest is None or first <= oldest) and (newest is None or newest <= last)
+
+
+def insider_activity_screen(start_date, end_date=None, direction: str = 'buying', min_value: float = 0,
+                            limit: int = 50, session: Optional[Session] = None) -> List[Dict[str, Any]]:
+    """
+    Issuers ranked by open-market insider buying or selling between
+    start_date and end_date (inclusive, default today), with the trailing
+    year before the window scaled to the window length as a baseline.
+    """
+    if direction not in SCREEN_DIRECTIONS:
+        raise ValueError(f"Unknown direction '{direction}'. Expected one of: {', '.join(SCREEN_DIRECTIONS)}")
+    code_filter, value_expr = SCREEN_DIRECTIONS[direction]
+
+    start = datetime.strptime(_as_day(start_date), '%Y-%m-%d').date()
+    end = datetime.strptime(_as_day(end_date or date.today()), '%Y-%m-%d').date()
+    params = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'baseline_start': (start - timedelta(days=365)).isoformat(),
+        'window_share': ((end - start).days + 1) / 365.0,
+        'min_value': min_value,
+        'limit': limit,
+    }
+
+    session, close_session = _session_scope(session)
+    try:
+        rows = session.execute(text(f"""
+            WITH window_activity AS (
+                SELECT issuercik, MAX(issuername) AS issuername,
+                       SUM(transactions) AS transactions,
+                       SUM({value_expr}) AS value,
+                       SUM(value_acquired) AS value_acquired,
+                       SUM(value_disposed) AS value_disposed,
+                       SUM(buying_insiders) AS buying_insider_days,
+                       SUM(selling_insiders) AS selling_insider_days,
+                       COUNT(DISTINCT trans_date) AS active_days
+                FROM {ROLLUP_TABLE}
+                WHERE trans_date BETWEEN :start AND :end AND {code_filter}
+                GROUP BY issuercik
+            ),
+            baseline AS (
+                SELECT issuercik, SUM({value_expr}) * :window_share AS expected_value
+                FROM {ROLLUP_TABLE}
+                WHERE trans_date >= :baseline_start AND trans_date < :start AND {code_filter}
+                GROUP BY issuercik
+            )
+            SELECT w.*,
+                   CASE WHEN w.value_disposed > 0 THEN w.value_acquired / w.value_disposed END AS buy_sell_ratio,
+                   b.expected_value AS baseline_value,
+                   CASE WHEN b.expected_value > 0 THEN w.value / b.expected_value END AS baseline_multiple
+            FROM window_activity w
+            LEFT JOIN baseline b ON b.issuercik = w.issuercik
+            WHERE w.value >= :min_value AND w.value > 0
+            ORDER BY w.value DESC
+            LIMIT :limit
+        """), params).mappings().all()
+        return [dict(row) for row in rows]
+    finally:
+        if close_session:
+            session.close()
+
+
+def get_issuer_insider_activity(issuercik: str, start_date=None, end_date=None,
+                                session: Optional[Session] = None) -> List[Dict[str, Any]]:
+    """Daily rollup rows for one issuer, newest day first."""
+    clauses, params = ["issuercik = :issuercik"], {'issuercik': issuercik}
+    if start_date is not None:
+        clauses.append("trans_date >= :start_date")
+        params['start_date'] = _as_day(start_date)
+    if end_date is not None:
+        clauses.append("trans_date <= :end_date")
+        params['end_date'] = _as_day(end_date)
+
+    session, close_session = _session_scope(session)
+    try:
+        rows = session.execute(text(
+            f"SELECT * FROM {ROLLUP_TABLE} WHERE {' AND '.join(clauses)} ORDER BY trans_date DESC, trans_code"
+        ), params).mappings().all()
+        return [dict(row) for row in rows]
+    finally:
+        if close_session:
+            session.close()
@@ -0,0 +1,218 @@
+"""
+Market concentration metrics over the pre-aggregated datasets.
+
+Each dimension reduces to (period, market, participant, value) rows:
+- swap_asset_class: monthly swap notional per asset class
+- swap_product:     monthly swap notional per product within each asset class
+- issuer_holders:   quarterly 13F position value per holder within each CUSIP
+- dealer:           yearly counterparty mentions in derivative disclosures,
+                    attributed to swap dealer families in the CFTC registry
+
+Public swap data carries no counterparty identifiers and the dealer
+registry carries no volumes, so dealer share is taken from the
+counterparties filers name in their derivative disclosures.
+
+Per (period, market), SQL reduces the participants to n, sum(x),
+sum(x^2), the top-N sum and sum(rank * x), and every metric follows
+from those:
+
+    HHI       = 10000 * sum(x^2) / sum(x)^2
+    top-N     = top-N sum / sum(x)
+    Gini      = 2 * sum(i * x) / (n * sum(x)) - (n + 1) / n
+
+with i the ascending rank, sum(i * x) = (n + 1) * sum(x) - sum(rank * x).
+"""
+
+import logging
+import re
+from datetime import date, timedelta
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, CFTCDerivativesDealer
+from src.derivative_disclosures import DISCLOSURE_TABLE
+from src.form13f_flows import DELTA_TABLE, quarter_label
+from src.swap_aggregates import AGGREGATE_TABLE
+
+logger = logging.getLogger(__name__)
+
+DEALER_TABLE = CFTCDerivativesDealer.__tablename__
+CONCENTRATION_TABLES = (AGGREGATE_TABLE, DELTA_TABLE, DISCLOSURE_TABLE, DEALER_TABLE)
+
+# 2023 DOJ/FTC Merger Guidelines thresholds
+HIGHLY_CONCENTRATED_HHI = 1800
+MODERATELY_CONCENTRATED_HHI = 1000
+# Markets above this count are summarized per period rather than listed
+MAX_LISTED_MARKETS = 25
+
+# (period, market, participant, value) per dimension; value is the participant's total in the market
+DIMENSION_SOURCES = {
+    'swap_asset_class': f"""
+        SELECT substr(trade_date, 1, 7) AS period, 'all' AS market, asset_class AS participant,
+               SUM(notional_sum) * 1.0 AS value
+        FROM {AGGREGATE_TABLE}
+        WHERE trade_date >= :start_date
+        GROUP BY period, asset_class
+    """,
+    'swap_product': f"""
+        SELECT substr(trade_date, 1, 7) AS period, asset_class AS market, product_name AS participant,
+               SUM(notional_sum) * 1.0 AS value
+        FROM {AGGREGATE_TABLE}
+        WHERE trade_date >= :start_date
+        GROUP BY period, asset_class, product_name
+    """,
+    'issuer_holders': f"""
+        SELECT quarter AS period, cusip AS market, cik AS participant, value * 1.0 AS value
+        FROM {DELTA_TABLE}
+        WHERE quarter >= :start_quarter
+    """,
+}
+DIMENSIONS = tuple(DIMENSION_SOURCES) + ('dealer',)
+PERIOD_LENGTH = {'swap_asset_class': 'month', 'swap_product': 'month', 'issuer_holders': 'quarter',
+                 'dealer': 'year'}
+
+_METRIC_QUERY = """
+    WITH participants AS ({source}),
+    ranked AS (
+        SELECT period, market, value,
+               ROW_NUMBER() OVER (PARTITION BY period, market ORDER BY value DESC) AS rank
+        FROM participants
+        WHERE value > 0
+    )
+    SELECT period, market, COUNT(*) AS participants, SUM(value) AS total, SUM(value * value) AS sum_sq,
+           SUM(CASE WHEN rank <= :top_n THEN value ELSE 0 END) AS top_total, SUM(rank * value) AS rank_weighted
+    FROM ranked
+    GROUP BY period, market
+"""
+
+# Words that do not identify a dealer family in legal or filer-given names
+_GENERIC_NAME_WORDS = {
+    'the', 'of', 'and', 'bank', 'banking', 'national', 'association', 'na', 'n', 'a', 'usa', 'us', 'plc', 'ag',
+    'sa', 'llc', 'lp', 'inc', 'ltd', 'limited', 'corp', 'corporation', 'co', 'company', 'group', 'holdings',
+    'international', 'global', 'securities', 'capital', 'markets', 'financial', 'europe', 'london', 'branch',
+}
+_NAME_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _session_scope(session: Optional[Session]):
+    return (session, False) if session is not None else (SessionLocal(), True)
+
+
+def dealer_family(name: Optional[str]) -> str:
+    """First distinctive word of a dealer name: 'Goldman Sachs Bank USA' -> 'goldman'."""
+    tokens = [t for t in _NAME_TOKEN.findall((name or '').lower().replace('.', '')) if t not in _GENERIC_NAME_WORDS]
+    return tokens[0] if tokens else ''
+
+
+def _finish(sums: pd.DataFrame, top_n: int) -> pd.DataFrame:
+    """Metrics from the per-market sums, one vectorized pass over all markets."""
+    n = sums['participants'].astype(float)
+    total = sums['total'].astype(float)
+    ascending_weighted = (n + 1) * total - sums['rank_weighted']
+    metrics = sums[['period', 'market', 'participants', 'total']].copy()
+    metrics['hhi'] = (10000 * sums['sum_sq'] / total ** 2).round(1)
+    metrics[f'top_{top_n}_share'] = (sums['top_total'] / total).round(4)
+    metrics['gini'] = (2 * ascending_weighted / (n * total) - (n + 1) / n).round(4)
+    metrics['level'] = np.select([metrics['hhi'] > HIGHLY_CONCENTRATED_HHI,
+                                  metrics['hhi'] >= MODERATELY_CONCENTRATED_HHI],
+                                 ['highly_concentrated', 'moderately_concentrated'], 'unconcentrated')
+    return metrics.sort_values(['period', 'market']).reset_index(drop=True)
+
+
+def _dealer_sums(session: Session, start_date: str, top_n: int) -> pd.DataFrame:
+    mentions = pd.read_sql(text(f"""
+        SELECT substr(d.filing_date, 1, 4) AS period, j.value AS counterparty, COUNT(*) AS mentions
+        FROM {DISCLOSURE_TABLE} d, json_each(d.counterparties) j
+        WHERE d.filing_date >= :start_date AND json_valid(d.counterparties)
+        GROUP BY period, counterparty
+    """), session.connection(), params={'start_date': start_date})
+    registry = pd.read_sql(text(f"SELECT legal_name FROM {DEALER_TABLE}"), session.connection())
+    families = set(registry['legal_name'].map(dealer_family)) - {''}
+    mentions['participant'] = mentions['counterparty'].map(dealer_family)
+    mentions = mentions[mentions['participant'].isin(families)]
+    if mentions.empty:
+        return pd.DataFrame(columns=['period', 'market', 'participants', 'total', 'sum_sq', 'top_total',
+                                     'rank_weighted'])
+
+    # Same reductions as _METRIC_QUERY, over the (small) mention counts
+    values = (mentions.groupby(['period', 'participant'])['mentions'].sum().astype(float)
+              .rename('value').reset_index().assign(market='registered_dealers'))
+    values['rank'] = values.groupby('period')['value'].rank(method='first', ascending=False)
+    values['sq'] = values['value'] ** 2
+    values['top'] = values['value'].where(values['rank'] <= top_n, 0.0)
+    values['weighted'] = values['rank'] * values['value']
+    return values.groupby(['period', 'market'], as_index=False).agg(
+        participants=('value', 'size'), total=('value', 'sum'), sum_sq=('sq', 'sum'),
+        top_total=('top', 'sum'), rank_weighted=('weighted', 'sum'))
+
+
+def concentration_metrics(dimension: str, start_date=None, top_n: int = 4,
+                          session: Optional[Session] = None) -> pd.DataFrame:
+    """
+    HHI, top-N share and Gini per (period, market) of a dimension since
+    start_date (default: two years back).
+    """
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"Unknown dimension '{dimension}'. Expected: {', '.join(DIMENSIONS)}")
+    start = pd.Timestamp(str(start_date or (date.today() - timedelta(days=730)))[:10])
+    session, close_session = _session_scope(session)
+    try:
+        if dimension == 'dealer':
+            sums = _dealer_sums(session, start.strftime('%Y-%m-%d'), top_n)
+        else:
+            query = _METRIC_QUERY.format(source=DIMENSION_SOURCES[dimension])
+            sums = pd.read_sql(text(query), session.connection(), params={
+                'start_date': start.strftime('%Y-%m-%d'), 'start_quarter': quarter_label(start), 'top_n': top_n})
+    finally:
+        if close_session:
+            session.close()
+    return _finish(sums, top_n)
+
+
+def _history(metrics: pd.DataFrame, top_n: int) -> list:
+    if metrics['market'].nunique() <= MAX_LISTED_MARKETS:
+        return metrics.drop(columns=['level']).to_dict('records')
+    # Many markets (e.g. one per issuer): distribution of HHI per period
+    grouped = metrics.groupby('period')
+    return (grouped.agg(markets=('market', 'size'), median_hhi=('hhi', 'median'),
+                        mean_top_share=(f'top_{top_n}_share', 'mean'), median_gini=('gini', 'median'))
+            .join(grouped['level'].value_counts().unstack(fill_value=0))
+            .round(4).reset_index().to_dict('records'))
+
+
+def market_concentration_summary(dimensions: Sequence[str] = DIMENSIONS, start_date=None, top_n: int = 4,
+                                 min_participants: int = 1, limit: int = 25,
+                                 session: Optional[Session] = None) -> Dict[str, Any]:
+    """
+    Per dimension: the latest period's markets ranked by HHI and the
+    history over time. Markets with fewer than min_participants are left
+    out (useful for issuer_holders, where thinly held CUSIPs are trivially
+    concentrated).
+    """
+    session, close_session = _session_scope(session)
+    try:
+        summary = {}
+        for dimension in dimensions:
+            metrics = concentration_metrics(dimension, start_date, top_n, session=session)
+            metrics = metrics[metrics['participants'] >= min_participants]
+            if metrics.empty:
+                summary[dimension] = {'period': PERIOD_LENGTH[dimension], 'latest_period': None,
+                                      'latest': [], 'history': []}
+                continue
+            latest_period = metrics['period'].max()
+            latest = metrics[metrics['period'] == latest_period].sort_values('hhi', ascending=False)
+            summary[dimension] = {
+                'period': PERIOD_LENGTH[dimension],
+                'latest_period': latest_period,
+                'markets': int(len(latest)),
+                'latest': latest.head(limit).to_dict('records'),
+                'history': _history(metrics, top_n),
+            }
+    finally:
+        if close_session:
+            session.close()
+    return summary
@@ -0,0 +1,264 @@
+"""
+Redemption stress simulator for money market funds from N-MFP filings.
+
+Every fund with a filing in the quarter up to as_of is stressed at once
+under each scenario. A scenario is a list of daily redemption rates, each
+a fraction of the previous day's net assets. Redemptions are paid out of
+daily liquid assets (DLA); holdings that are not daily liquid add to DLA
+on the day they mature, read from the schedule of portfolio securities.
+Weekly liquid assets (WLA) roll forward the same way, with a five-day
+look-ahead on maturities.
+
+With r the daily rates and NAV0 the starting net assets, the surviving
+share after t days is prod(1 - r[:t]), so every path has a closed form:
+
+    NAV[t] = NAV0 * survival[t]
+    DLA[t] = DLA0 + matured[t] - NAV0 * (1 - survival[t])
+
+The whole run is therefore one broadcast over (scenario, fund, day)
+arrays with no per-fund or per-day Python loop. Days are calendar days
+for both redemptions and maturities.
+"""
+
+import logging
+from datetime import timedelta
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Rule 2a-7 minimums as amended in 2023
+DAILY_LIQUID_MINIMUM = 0.25
+WEEKLY_LIQUID_MINIMUM = 0.50
+WEEKLY_LOOKAHEAD_DAYS = 5
+DEFAULT_HORIZON_DAYS = 20
+LOOKBACK_DAYS = 92  # One quarter of filings
+
+# Daily redemption rates as fractions of the previous day's net assets
+REDEMPTION_SCENARIOS = {
+    'moderate': [0.05] + [0.01] * 9,
+    'severe': [0.10] + [0.05] * 4 + [0.02] * 5,
+    # Institutional prime funds lost about 30% of assets over two weeks in March 2020
+    'march_2020_prime': [0.03] * 10,
+    'run': [0.15, 0.10, 0.10, 0.05, 0.05],
+}
+
+
+def _session_scope(session: Optional[Session]):
+    return (session, False) if session is not None else (SessionLocal(), True)
+
+
+def _as_fraction(pct: pd.Series) -> pd.Series:
+    # N-MFP percentages are reported as decimals by most filers and as 0-100 by a few
+    return pct.where(pct <= 1, pct / 100)
+
+
+def load_fund_universe(as_of=None, lookback_days: int = LOOKBACK_DAYS,
+                       session: Optional[Session] = None) -> pd.DataFrame:
+    """
+    Latest filing per series with report_date in (as_of - lookback_days,
+    as_of]: net assets and starting DLA/WLA in dollars, one row per fund.
+    as_of defaults to the latest report_date on file.
+    """
+    session, close_session = _session_scope(session)
+    try:
+        if as_of is None:
+            as_of = session.execute(text("SELECT MAX(report_date) FROM nmfp_submissions")).scalar()
+            if as_of is None:
+                return pd.DataFrame()
+        as_of = pd.Timestamp(str(as_of)[:10])
+        funds = pd.read_sql(text("""
+            SELECT accession_number, seriesid, nameofseries, registrant_full_name, report_date,
+                   money_market_fund_category, net_asset_of_series,
+                   tot_dly_liquid_asset_friday_week1, tot_wly_liquid_asset_friday_week1,
+                   pct_dly_liquid_asset_friday_week1, pct_wkly_liquid_asset_friday_week1
+            FROM (
+                SELECT ns.accession_number, ns.seriesid, ns.nameofseries, ns.registrant_full_name,
+                       date(ns.report_date) AS report_date, nsli.money_market_fund_category,
+                       nsli.net_asset_of_series,
+                       nsli.tot_dly_liquid_asset_friday_week1, nsli.tot_wly_liquid_asset_friday_week1,
+                       nsli.pct_dly_liquid_asset_friday_week1, nsli.pct_wkly_liquid_asset_friday_week1,
+                       ROW_NUMBER() OVER (PARTITION BY ns.seriesid
+                                          ORDER BY ns.report_date DESC, ns.filing_date DESC) AS rn
+                FROM nmfp_submissions ns
+                JOIN nmfp_series_level_info nsli ON ns.accession_number = nsli.accession_number
+                WHERE date(ns.report_date) > :start AND date(ns.report_date) <= :end
+            )
+            WHERE rn = 1 AND net_asset_of_series > 0
+        """), session.connection(), params={'start': (as_of - timedelta(days=lookback_days)).strftime('%Y-%m-%d'),
+                                            'end': as_of.strftime('%Y-%m-%d')})
+    finally:
+        if close_session:
+            session.close()
+
+    nav = funds['net_asset_of_series'].astype(float)
+    funds['daily_liquid'] = funds['tot_dly_liquid_asset_friday_week1'].fillna(
+        _as_fraction(funds['pct_dly_liquid_asset_friday_week1']) * nav)
+    funds['weekly_liquid'] = funds['tot_wly_liquid_asset_friday_week1'].fillna(
+        _as_fraction(funds['pct_wkly_liquid_asset_friday_week1']) * nav)
+    funds['weekly_liquid'] = funds[['weekly_liquid', 'daily_liquid']].max(axis=1)
+    return funds.drop(columns=['tot_dly_liquid_asset_friday_week1', 'tot_wly_liquid_asset_friday_week1',
+                               'pct_dly_liquid_asset_friday_week1', 'pct_wkly_liquid_asset_friday_week1'])
+
+
+def load_maturity_ladder(accession_numbers: Sequence[str], horizon_days: int,
+                         session: Optional[Session] = None) -> np.ndarray:
+    """
+    (funds x horizon_days + lookahead + 1) array of the cumulative value of
+    each filing's non-daily-liquid holdings maturing within d days, in the
+    order of accession_numbers.
+    """
+    width = horizon_days + WEEKLY_LOOKAHEAD_DAYS + 1
+    ladder = np.zeros((len(accession_numbers), width))
+    if not len(accession_numbers):
+        return ladder
+    session, close_session = _session_scope(session)
+    try:
+        session.execute(text("DROP TABLE IF EXISTS temp.mmf_stress_filings"))
+        session.execute(text("CREATE TEMP TABLE mmf_stress_filings (accession_number TEXT PRIMARY KEY)"))
+        session.execute(text("INSERT OR IGNORE INTO mmf_stress_filings VALUES (:a)"),
+                        [{'a': accession} for accession in accession_numbers])
+        # Maturity days are aggregated in SQL so only (filing, day) totals come back
+        maturities = pd.read_sql(text("""
+            SELECT nps.accession_number,
+                   MAX(0, CAST(julianday(date(nps.investment_maturity_date_wam))
+                               - julianday(date(ns.report_date)) AS INTEGER)) AS days,
+                   SUM(nps.including_value_of_any_sponsor_supp) AS value
+            FROM nmfp_sch_portfolio_securities nps
+            JOIN mmf_stress_filings f ON f.accession_number = nps.accession_number
+            JOIN nmfp_submissions ns ON ns.accession_number = nps.accession_number
+            WHERE COALESCE(nps.daily_liquid_asset_security_flag, 'N') != 'Y'
+              AND julianday(date(nps.investment_maturity_date_wam)) - julianday(date(ns.report_date)) < :width
+            GROUP BY nps.accession_number, days
+        """), session.connection(), params={'width': width})
+    finally:
+        if close_session:
+            session.close()
+
+    if not maturities.empty:
+        position = pd.Series(np.arange(len(accession_numbers)), index=list(accession_numbers))
+        rows = position.reindex(maturities['accession_number']).to_numpy()
+        np.add.at(ladder, (rows, maturities['days'].to_numpy(dtype=int)), maturities['value'].fillna(0).to_numpy())
+    return np.cumsum(ladder, axis=1)
+
+
+def simulate_redemptions(nav: np.ndarray, daily_liquid: np.ndarray, weekly_liquid: np.ndarray,
+                         matured: np.ndarray, scenarios: Dict[str, Sequence[float]],
+                         horizon_days: int = DEFAULT_HORIZON_DAYS,
+                         daily_minimum: float = DAILY_LIQUID_MINIMUM,
+                         weekly_minimum: float = WEEKLY_LIQUID_MINIMUM) -> Dict[str, np.ndarray]:
+    """
+    Liquidity paths for every (scenario, fund, day) with days 1..horizon_days.
+    matured is the cumulative maturity ladder from load_maturity_ladder.
+    Breach days are 1-based and 0 where the fund never breaches.
+    """
+    names = list(scenarios)
+    rates = np.zeros((len(names), horizon_days))
+    for i, name in enumerate(names):
+        path = np.clip(np.asarray(scenarios[name], dtype=float)[:horizon_days], 0.0, 1.0)
+        rates[i, :len(path)] = path
+    survival = np.cumprod(1.0 - rates, axis=1)[:, None, :]  # (S, 1, H)
+
+    nav = nav[None, :, None]
+    days = np.arange(1, horizon_days + 1)
+    redeemed = nav * (1.0 - survival)
+    remaining = nav * survival
+    dla = daily_liquid[None, :, None] + matured[None, :, days] - redeemed
+    # WLA gains holdings as they come within the five-day look-ahead
+    wla = (weekly_liquid[None, :, None] + matured[None, :, days + WEEKLY_LOOKAHEAD_DAYS]
+           - matured[None, :, [WEEKLY_LOOKAHEAD_DAYS]] - redeemed)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dla_ratio = np.where(remaining > 0, dla / remaining, -np.inf)
+        wla_ratio = np.where(remaining > 0, wla / remaining, -np.inf)
+
+    def first_day(breached: np.ndarray) -> np.ndarray:
+        return np.where(breached.any(axis=2), breached.argmax(axis=2) + 1, 0)
+
+    return {
+        'scenarios': np.asarray(names, dtype=object),
+        'dla_ratio': dla_ratio,
+        'wla_ratio': wla_ratio,
+        'daily_breach_day': first_day(dla_ratio < daily_minimum),
+        'weekly_breach_day': first_day(wla_ratio < weekly_minimum),
+        'exhausted_day': first_day(dla < 0),  # Redemptions exceed liquid assets
+        'min_dla_ratio': dla_ratio.min(axis=2),
+    }
+
+
+def _summarize(funds: pd.DataFrame, paths: Dict[str, np.ndarray], scenarios: Dict[str, Sequence[float]],
+               top_n: int) -> Dict[str, Any]:
+    summary = {}
+    for i, name in enumerate(paths['scenarios']):
+        daily_day = paths['daily_breach_day'][i]
+        exhausted_day = paths['exhausted_day'][i]
+        frame = funds.assign(daily_breach_day=daily_day, weekly_breach_day=paths['weekly_breach_day'][i],
+                             exhausted_day=exhausted_day, min_dla_ratio=paths['min_dla_ratio'][i].round(4))
+        breached = frame[frame['daily_breach_day'] > 0]
+        by_category = frame.groupby(frame['money_market_fund_category'].fillna('Unknown')).agg(
+            funds=('seriesid', 'size'), net_assets=('net_asset_of_series', 'sum'),
+            daily_breaches=('daily_breach_day', lambda d: int((d > 0).sum())),
+            exhausted=('exhausted_day', lambda d: int((d > 0).sum())))
+        worst = frame.assign(order=np.where(daily_day > 0, daily_day, np.inf)).sort_values(
+            ['order', 'min_dla_ratio']).head(top_n)
+        summary[name] = {
+            'daily_redemption_rates': list(scenarios[name]),
+            'funds_breaching_daily_minimum': int((daily_day > 0).sum()),
+            'funds_breaching_weekly_minimum': int((paths['weekly_breach_day'][i] > 0).sum()),
+            'funds_exhausting_liquidity': int((exhausted_day > 0).sum()),
+            'net_assets_breaching_daily_minimum': float(breached['net_asset_of_series'].sum()),
+            'median_breach_day': float(breached['daily_breach_day'].median()) if len(breached) else None,
+            'breach_day_distribution': {int(day): int(count) for day, count in
+                                        enumerate(np.bincount(daily_day)) if day and count},
+            'by_category': by_category.reset_index().to_dict('records'),
+            'most_vulnerable': worst[['seriesid', 'nameofseries', 'money_market_fund_category',
+                                      'net_asset_of_series', 'daily_breach_day', 'weekly_breach_day',
+                                      'exhausted_day', 'min_dla_ratio']].to_dict('records'),
+        }
+    return summary
+
+
+def run_redemption_stress(scenarios: Optional[Dict[str, Sequence[float]]] = None, as_of=None,
+                          horizon_days: int = DEFAULT_HORIZON_DAYS, fund_category: str = 'all',
+                          daily_minimum: float = DAILY_LIQUID_MINIMUM,
+                          weekly_minimum: float = WEEKLY_LIQUID_MINIMUM, top_n: int = 10,
+                          session: Optional[Session] = None) -> Dict[str, Any]:
+    """
+    Stress every money market fund filed in the quarter up to as_of under
+    each scenario (default REDEMPTION_SCENARIOS) and summarize first
+    liquidity breach days per scenario and fund category.
+    """
+    scenarios = scenarios or REDEMPTION_SCENARIOS
+    session, close_session = _session_scope(session)
+    try:
+        funds = load_fund_universe(as_of, session=session)
+        if fund_category != 'all' and not funds.empty:
+            funds = funds[funds['money_market_fund_category'].fillna('').str.lower()
+                          .str.contains(fund_category.lower().replace('_', ' '), regex=False)]
+        funds = funds.reset_index(drop=True)
+        if funds.empty:
+            return {'error': 'No N-MFP filings in the selected quarter', 'as_of': as_of}
+        matured = load_maturity_ladder(funds['accession_number'].tolist(), horizon_days, session=session)
+    finally:
+        if close_session:
+            session.close()
+
+    paths = simulate_redemptions(funds['net_asset_of_series'].to_numpy(dtype=float),
+                                 funds['daily_liquid'].fillna(0).to_numpy(dtype=float),
+                                 funds['weekly_liquid'].fillna(0).to_numpy(dtype=float),
+                                 matured, scenarios, horizon_days, daily_minimum, weekly_minimum)
+    logger.info(f"Stressed {len(funds)} funds under {len(scenarios)} redemption scenarios")
+    return {
+        'as_of': funds['report_date'].max(),
+        'funds': len(funds),
+        'total_net_assets': float(funds['net_asset_of_series'].sum()),
+        'horizon_days': horizon_days,
+        'thresholds': {'daily_liquid_minimum': daily_minimum, 'weekly_liquid_minimum': weekly_minimum},
+        'scenarios': _summarize(funds, paths, scenarios, top_n),
+    }
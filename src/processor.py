@@ -15,17 +15,17 @@ logger = get_processor_logger('processor')
 
 # Import database models
 try:
-    from database import SessionLocal
+    from database import SessionLocal, record_data_change
 except ImportError:
     import sys
     import os
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from database import SessionLocal
+    from database import SessionLocal, record_data_change
 
 # Import specialized processors
 from src.processor_10k import SEC10KProcessor
 from src.processor_8k import SEC8KProcessor
-from src.processor_cftc_swaps import process_all_swap_data
+from src.processor_cftc_swaps import process_all_swap_data, load_swap_transactions
 from src.processor_dtcc import DTCCProcessor
 from src.processor_ncen import process_ncen_data
 from src.processor_nport import process_nport_data
@@ -442,11 +442,9 @@ def process_sec_filings(filing_type: str, source_dir: str, **kwargs):
         return None
 
 def load_cftc_data_to_db(df, db_session=None):
-    """Load CFTC data to database."""
+    """Load CFTC swap transactions to database with typed (REAL/DATETIME) columns."""
     logging.info("Loading CFTC data to database")
-    # This would delegate to specialized CFTC processor
-    # Implementation would go here
-    pass
+    return load_swap_transactions(df, db_session)
 
 def sanitize_column_names(df):
     """Sanitize DataFrame column names."""
@@ -471,6 +469,7 @@ def load_data_to_db(data, table_name: str, db_session=None):
         # Use bulk insert for efficiency
         if records:
             db_session.bulk_insert_mappings(table_name, records)
+            record_data_change(db_session, table_name, records)
             db_session.commit()
             logger.info(f"Loaded {len(records)} records to {table_name}")
             return True
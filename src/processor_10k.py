@@ -32,8 +32,10 @@ try:
     from GameCockAI.config import DATA_DIR, EDGAR_BASE_URL, SEC_API_KEY
     from GameCockAI.database import (
         Sec10KDocument, Sec10KExhibits, Sec10KFinancials, Sec10KMetadata,
-        Sec10KSubmission, SessionLocal
+        Sec10KSubmission, SessionLocal, record_data_change
     )
+    from GameCockAI.src.derivative_disclosures import store_filing_disclosures
+    from GameCockAI.src.filing_events import refresh_filing_events
     from GameCockAI.src.logging_utils import get_processor_logger
     logger = get_processor_logger('processor_10k')
 except ImportError as e:
@@ -44,7 +46,10 @@ except ImportError as e:
 except ImportError:
     # Fallback for direct execution
     from src.logging_utils import get_processor_logger
-    from database import SessionLocal, Sec10KSubmission, Sec10KDocument, Sec10KFinancials, Sec10KExhibits, Sec10KMetadata
+    from database import (SessionLocal, Sec10KSubmission, Sec10KDocument, Sec10KFinancials, Sec10KExhibits,
+                          Sec10KMetadata, record_data_change)
+    from src.derivative_disclosures import store_filing_disclosures
+    from src.filing_events import refresh_filing_events
     from config import EDGAR_BASE_URL, SEC_API_KEY, DATA_DIR
 
 # Initialize logger
@@ -530,7 +535,14 @@ class SEC10KProcessor:
                 )
                 self.db.merge(fin_data)
             
+            # Derivative-disclosure features while the section text is in memory
+            store_filing_disclosures(self.db, metadata['accession_number'], metadata['cik'],
+                                     metadata['form_type'], metadata['filing_date'],
+                                     [(section['section'], section['content']) for section in sections])
+            
+            record_data_change(self.db, Sec10KSubmission, [{'cik': submission.cik}])
             self.db.commit()
+            refresh_filing_events('periodic', [metadata['accession_number']], self.db)
             return True
             
         except Exception as e:
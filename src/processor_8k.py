@@ -30,14 +30,18 @@ if parent_dir not in sys.path:
 # Local application imports
 try:
     from config import DATA_DIR, EDGAR_BASE_URL, SEC_API_KEY
-    from database import SessionLocal, Sec8KItem, Sec8KSubmission
+    from database import SessionLocal, Sec8KItem, Sec8KSubmission, record_data_change
+    from src.derivative_disclosures import store_filing_disclosures
+    from src.filing_events import refresh_filing_events
     logger = logging.getLogger('processor_8k')
     logger.setLevel(logging.INFO)
 except ImportError as e:
     # Fallback for direct execution or testing
     try:
         from GameCockAI.config import DATA_DIR, EDGAR_BASE_URL, SEC_API_KEY
-        from GameCockAI.database import SessionLocal, Sec8KItem, Sec8KSubmission
+        from GameCockAI.database import SessionLocal, Sec8KItem, Sec8KSubmission, record_data_change
+        from GameCockAI.src.derivative_disclosures import store_filing_disclosures
+        from GameCockAI.src.filing_events import refresh_filing_events
         logger = logging.getLogger('processor_8k')
         logger.setLevel(logging.INFO)
     except ImportError:
@@ -217,7 +221,14 @@ class SEC8KProcessor:
                 )
                 self.db.merge(item)
             
+            # Derivative-disclosure features while the item text is in memory
+            store_filing_disclosures(self.db, metadata['accession_number'], metadata['cik'],
+                                     metadata['form_type'], metadata['filing_date'],
+                                     [(item_data.get('item_number'), item_data.get('content')) for item_data in items])
+            
+            record_data_change(self.db, Sec8KSubmission, [submission_data])
             self.db.commit()
+            refresh_filing_events('current', [metadata['accession_number']], self.db)
             return True
         except Exception as e:
             self.db.rollback()
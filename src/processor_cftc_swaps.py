@@ -15,6 +15,7 @@ from typing import Any, Dict, List, Optional
 
 # Third-party imports
 import pandas as pd
+from sqlalchemy import Float, DateTime, String, text
 from sqlalchemy.orm import Session
 
 # Add parent directory to path for local imports
@@ -30,7 +31,9 @@ try:
         CFTCDerivativesClearingOrganization,
         CFTCSwapExecutionFacility,
         CFTCSwapDataRepository,
-        CFTCDailySwapReport
+        CFTCDailySwapReport,
+        CFTCSwap,
+        record_data_change
     )
     logger = logging.getLogger('processor_cftc_swaps')
     logger.setLevel(logging.INFO)
@@ -42,7 +45,9 @@ except ImportError as e:
             CFTCDerivativesClearingOrganization,
             CFTCSwapExecutionFacility,
             CFTCSwapDataRepository,
-            CFTCDailySwapReport
+            CFTCDailySwapReport,
+            CFTCSwap,
+            record_data_change
         )
         logger = logging.getLogger('processor_cftc_swaps')
         logger.setLevel(logging.INFO)
@@ -69,6 +74,9 @@ except ImportError as e:
         logger.error('Failed to import configuration: %s', e)
         raise
 
+from src.swap_aggregates import refresh_daily_aggregates
+from src.swap_lifecycle import apply_lifecycle_events
+
 # Logging is configured in logging_utils.py
 
 def process_swap_dealer_data(file_path: str, session: Optional[Session] = None) -> int:
@@ -328,6 +336,195 @@ def process_daily_swap_report_data(file_path: str, session: Optional[Session] =
         if close_session and session:
             session.close()
 
+# Public-dissemination CSV headers that don't sanitize to the model's column names
+SWAP_COLUMN_ALIASES = {
+    'dissemination_identifier': 'dissemination_id',
+    'original_dissemination_identifier': 'original_dissemination_id',
+    'action': 'action_type',
+}
+
+# Codes compared literally throughout the analytics SQL; stored trimmed and upper-cased
+SWAP_CODE_COLUMNS = [
+    'action_type', 'event_type', 'asset_class', 'cleared', 'notional_currency_leg_1',
+    'notional_currency_leg_2', 'settlement_currency_leg_1', 'settlement_currency_leg_2',
+    'block_trade_election_indicator', 'amendment_indicator', 'package_indicator',
+]
+
+LOAD_BATCH_SIZE = 10000
+
+
+def _swap_columns_by_type():
+    numeric, timestamps, strings = [], [], []
+    for column in CFTCSwap.__table__.columns:
+        if column.primary_key:
+            continue
+        if isinstance(column.type, Float):
+            numeric.append(column.name)
+        elif isinstance(column.type, DateTime):
+            timestamps.append(column.name)
+        elif isinstance(column.type, String):
+            strings.append(column.name)
+    return numeric, timestamps, strings
+
+
+def _parse_numeric(series: pd.Series) -> pd.Series:
+    """Parses CFTC amounts: thousands separators and capped notionals like '250,000,000+'."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    cleaned = series.astype(str).str.strip().str.replace(',', '', regex=False).str.rstrip('+')
+    return pd.to_numeric(cleaned, errors='coerce')
+
+
+def _parse_timestamp(series: pd.Series) -> pd.Series:
+    parsed = pd.to_datetime(series, errors='coerce', utc=True, format='ISO8601')
+    return parsed.dt.tz_convert(None)
+
+
+def normalize_swap_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts a raw CFTC swap frame to the CFTCSwap column types.
+
+    Amounts are bound as floats and timestamps as datetimes, so SQLite
+    stores REAL values and uniform ISO timestamps instead of the raw text.
+    Comparisons are then numeric and chronological rather than lexicographic.
+    Empty strings become NULL, and unknown columns are dropped.
+    """
+    df = df.copy()
+    df.columns = (df.columns.str.strip().str.lower()
+                  .str.replace(r'[^0-9a-zA-Z_]+', '_', regex=True)
+                  .str.replace(r'^_+|_+$', '', regex=True))
+    df = df.rename(columns=SWAP_COLUMN_ALIASES)
+    df = df.loc[:, ~df.columns.duplicated()]
+
+    numeric, timestamps, strings = _swap_columns_by_type()
+    df = df[[c for c in df.columns if c in set(numeric + timestamps + strings)]]
+
+    for column in df.columns:
+        if column in numeric:
+            df[column] = _parse_numeric(df[column])
+        elif column in timestamps:
+            df[column] = _parse_timestamp(df[column])
+        else:
+            values = df[column].astype('string').str.strip()
+            if column in SWAP_CODE_COLUMNS:
+                values = values.str.upper()
+            df[column] = values.replace('', pd.NA)
+    return df
+
+
+def load_swap_transactions(df: pd.DataFrame, session: Optional[Session] = None) -> int:
+    """Normalizes and bulk-inserts CFTC swap transactions. Returns the number of rows loaded."""
+    if df is None or df.empty:
+        return 0
+
+    close_session = False
+    if session is None:
+        session = SessionLocal()
+        close_session = True
+
+    try:
+        normalized = normalize_swap_frame(df)
+        records = normalized.astype(object).where(normalized.notna(), None).to_dict('records')
+        for start in range(0, len(records), LOAD_BATCH_SIZE):
+            batch = records[start:start + LOAD_BATCH_SIZE]
+            session.bulk_insert_mappings(CFTCSwap, batch)
+            record_data_change(session, CFTCSwap, row_count=len(batch))
+            session.commit()
+        logger.info(f"Loaded {len(records)} CFTC swap transactions")
+        # Fold the new lifecycle events into cftc_live_trades
+        apply_lifecycle_events(session)
+        if 'execution_timestamp' in normalized.columns:
+            refresh_daily_aggregates(normalized['execution_timestamp'].dropna().unique(), session)
+        return len(records)
+    except Exception as e:
+        logger.error(f"Error loading CFTC swap transactions: {e}", exc_info=True)
+        session.rollback()
+        raise
+    finally:
+        if close_session:
+            session.close()
+
+
+def compact_swap_storage(bind=None, vacuum: bool = True) -> Dict[str, Any]:
+    """
+    Migrates existing cftc_swap_data rows to the typed layout in place.
+
+    - Numeric text such as '1,000,000+' in REAL columns becomes REAL.
+    - 'T'/'Z' and date-only timestamps are rewritten in SQLAlchemy's
+      'YYYY-MM-DD HH:MM:SS.ffffff' form.
+    - Empty strings become NULL.
+    - Code columns are trimmed and upper-cased.
+
+    Returns the per-column rewrite counts and the file size before and after.
+    """
+    if bind is None:
+        from database import engine as bind
+    table = CFTCSwap.__tablename__
+    numeric, timestamps, strings = _swap_columns_by_type()
+
+    def database_size(conn):
+        return conn.exec_driver_sql("PRAGMA page_count").scalar() * conn.exec_driver_sql("PRAGMA page_size").scalar()
+
+    rewritten = {}
+    with bind.begin() as conn:
+        size_before = database_size(conn)
+        for column in numeric:
+            cleaned = f"rtrim(replace(trim({column}), ',', ''), '+')"
+            result = conn.execute(text(f"""
+                UPDATE {table}
+                SET {column} = CASE WHEN {cleaned} = '' THEN NULL ELSE CAST({cleaned} AS REAL) END
+                WHERE typeof({column}) = 'text'
+                AND ({cleaned} = '' OR ({cleaned} GLOB '*[0-9]*' AND {cleaned} NOT GLOB '*[^0-9.eE+-]*'))
+            """))
+            rewritten[column] = result.rowcount
+        for column in timestamps:
+            result = conn.execute(text(f"""
+                UPDATE {table}
+                SET {column} = CASE WHEN trim({column}) = '' THEN NULL
+                               ELSE strftime('%Y-%m-%d %H:%M:%S', {column}) || '.000000' END
+                WHERE typeof({column}) = 'text'
+                AND (trim({column}) = '' OR (
+                    ({column} LIKE '%T%' OR {column} LIKE '%Z' OR length({column}) = 10)
+                    AND strftime('%Y-%m-%d %H:%M:%S', {column}) IS NOT NULL))
+            """))
+            rewritten[column] = result.rowcount
+        for column in strings:
+            normalized = f"upper(trim({column}))" if column in SWAP_CODE_COLUMNS else f"trim({column})"
+            result = conn.execute(text(f"""
+                UPDATE {table}
+                SET {column} = NULLIF({normalized}, '')
+                WHERE {column} IS NOT NULL AND {column} IS NOT NULLIF({normalized}, '')
+            """))
+            rewritten[column] = result.rowcount
+
+        remaining_text = {
+            column: conn.execute(text(f"SELECT COUNT(*) FROM {table} WHERE typeof({column}) = 'text'")).scalar()
+            for column in numeric
+        }
+
+    if any(rewritten.values()):
+        # Rows were rewritten in place; log it so epoch-keyed caches and the columnar sidecar see the change
+        with Session(bind=bind) as session:
+            record_data_change(session, CFTCSwap, row_count=sum(rewritten.values()))
+            session.commit()
+
+    if vacuum:
+        with bind.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+    with bind.connect() as conn:
+        size_after = database_size(conn)
+
+    report = {
+        'rewritten_values': {column: count for column, count in rewritten.items() if count},
+        'unparseable_numeric_values': {column: count for column, count in remaining_text.items() if count},
+        'size_before_bytes': size_before,
+        'size_after_bytes': size_after,
+    }
+    logger.info(f"Compacted {table}: {sum(rewritten.values())} values rewritten, "
+                f"{size_before} -> {size_after} bytes")
+    return report
+
+
 def process_all_swap_data() -> Dict[str, int]:
     """
     Process all swap data files in their respective directories.
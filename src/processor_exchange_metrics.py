@@ -25,7 +25,7 @@ if parent_dir not in sys.path:
 
 # Local application imports
 try:
-    from database import SecExchangeMetrics, SessionLocal
+    from database import SecExchangeMetrics, SessionLocal, record_data_change
     logger = logging.getLogger('processor_exchange_metrics')
     logger.setLevel(logging.INFO)
 except ImportError as e:
@@ -100,6 +100,7 @@ def process_exchange_metrics_data(source_dir, db_session=None):
 
                             records = df.where(pd.notna(df), None).to_dict(orient='records')
                             db.bulk_insert_mappings(SecExchangeMetrics, records)
+                            record_data_change(db, SecExchangeMetrics, records)
                             logger.info(f"Loading {len(records)} records into {SecExchangeMetrics.__tablename__} from {csv_filename}")
                     db.commit()
             except Exception as e:
@@ -28,7 +28,7 @@ try:
     from database import (
         Form13FSubmission, Form13FCoverPage, Form13FOtherManager, 
         Form13FSignature, Form13FSummaryPage, Form13FOtherManager2, 
-        Form13FInfoTable, SessionLocal
+        Form13FInfoTable, SessionLocal, record_data_change
     )
     logger = logging.getLogger('processor_form13f')
     logger.setLevel(logging.INFO)
@@ -37,7 +37,7 @@ except ImportError as e:
         from GameCockAI.database import (
             Form13FSubmission, Form13FCoverPage, Form13FOtherManager,
             Form13FSignature, Form13FSummaryPage, Form13FOtherManager2,
-            Form13FInfoTable, SessionLocal
+            Form13FInfoTable, SessionLocal, record_data_change
         )
         logger = logging.getLogger('processor_form13f')
         logger.setLevel(logging.INFO)
@@ -46,6 +46,9 @@ except ImportError as e:
         logger = logging.getLogger('processor_form13f')
         logger.warning('Failed to import some database modules: %s', e)
 
+from src.form13f_flows import refresh_position_deltas
+from src.security_holders import refresh_security_holders
+
 def sanitize_column_names(df):
     """Sanitizes DataFrame column names to be valid Python identifiers."""
     df.columns = df.columns.str.strip().str.lower()
@@ -79,6 +82,7 @@ def process_form13f_data(source_dir, db_session=None):
         'voting_auth_shared', 'voting_auth_none'
     ]
 
+    loaded_quarters = set()
     try:
         for zip_file in zip_files:
             logger.info(f"Processing Form 13F file: {zip_file}")
@@ -136,11 +140,19 @@ def process_form13f_data(source_dir, db_session=None):
 
                                 records = df.where(pd.notna(df), None).to_dict(orient='records')
                                 db.bulk_insert_mappings(model, records)
+                                record_data_change(db, model, records)
                                 logger.info(f"Loading {len(records)} records into {model.__tablename__}")
+                                if model is Form13FSubmission and 'period_of_report' in df.columns:
+                                    loaded_quarters.update(df['period_of_report'].dropna())
                 db.commit()
             except Exception as e:
                 logger.error(f"Error processing file {zip_file}: {e}")
                 db.rollback()
+
+        # Compare each newly loaded quarter with the one before it, once
+        if loaded_quarters:
+            built = refresh_position_deltas(loaded_quarters, db)
+            refresh_security_holders('13f', built, db)
     finally:
         if not db_session:
             db.close()
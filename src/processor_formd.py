@@ -27,9 +27,11 @@ try:
     from config import FORMD_SOURCE_DIR
     from database import (
         FormDSubmission, FormDIssuer, FormDOffering, FormDRecipient,
-        FormDRelatedPerson, FormDSignature, SessionLocal
+        FormDRelatedPerson, FormDSignature, SessionLocal,
+        record_data_change
     )
     from src.downloader import extract_formd_filings
+    from src.filing_events import refresh_filing_events
     logger = logging.getLogger('processor_formd')
     logger.setLevel(logging.INFO)
 except ImportError as e:
@@ -37,9 +39,11 @@ except ImportError as e:
         from GameCockAI.config import FORMD_SOURCE_DIR
         from GameCockAI.database import (
             FormDSubmission, FormDIssuer, FormDOffering, FormDRecipient,
-            FormDRelatedPerson, FormDSignature, SessionLocal
+            FormDRelatedPerson, FormDSignature, SessionLocal,
+            record_data_change
         )
         from GameCockAI.src.downloader import extract_formd_filings
+        from GameCockAI.src.filing_events import refresh_filing_events
         logger = logging.getLogger('processor_formd')
         logger.setLevel(logging.INFO)
     except ImportError:
@@ -126,6 +130,9 @@ def process_formd_quarter(quarter_dir, db_session):
         logger.warning(f"No quarterly subdirectory found in {quarter_dir}")
         return
     
+    # Notices whose issuers or submission rows were loaded, for the filing event timeline
+    loaded_accessions = set()
+
     # Process each TSV file
     for file_name, model in table_map.items():
         file_path = os.path.join(quarter_subdir, file_name)
@@ -178,7 +185,11 @@ def process_formd_quarter(quarter_dir, db_session):
             # Bulk insert records
             if records:
                 db_session.bulk_insert_mappings(model, records)
+                record_data_change(db_session, model, records)
                 logger.info(f"Inserted {len(records)} records from {file_name}")
+                if model in (FormDSubmission, FormDIssuer):
+                    loaded_accessions.update(r['accessionnumber'] for r in records
+                                             if isinstance(r.get('accessionnumber'), str))
 
         except Exception as e:
             logger.error(f"Error processing {file_name}: {e}")
@@ -187,3 +198,6 @@ def process_formd_quarter(quarter_dir, db_session):
     # Commit all changes for this quarter
     db_session.commit()
     logger.info(f"Committed all changes for quarter: {os.path.basename(quarter_dir)}")
+
+    if loaded_accessions:
+        refresh_filing_events('formd', loaded_accessions, db_session)
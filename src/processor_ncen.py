@@ -14,7 +14,7 @@ import pandas as pd
 import zipfile
 from database import (
     NCENSubmission, NCENRegistrant, NCENFundReportedInfo, 
-    NCENAdviser, SessionLocal
+    NCENAdviser, SessionLocal, record_data_change
 )
 
 logger = logger
@@ -79,6 +79,7 @@ def load_data_to_db(df, model_class, table_name, db_session=None):
         
         # Bulk insert
         db.bulk_insert_mappings(model_class, records)
+        record_data_change(db, model_class, records)
         db.commit()
         
     except Exception as e:
@@ -20,7 +20,7 @@ from database import (
     NMFPLiquidAssetsDetails, NMFPSevenDayGrossYield, NMFPDlyNetAssetValuePerShars,
     NMFPLiquidityFeeReportingPer, NMFPDlyNetAssetValuePerSharc, NMFPDlyShareholderFlowReport,
     NMFPSevenDayNetYield, NMFPBeneficialRecordOwnerCat, NMFPCancelledSharesPerBusDay,
-    NMFPDispositionOfPortfolioSecurities, SessionLocal
+    NMFPDispositionOfPortfolioSecurities, SessionLocal, record_data_change
 )
 
 logger = logger
@@ -111,6 +111,7 @@ logger = get_processor_logger('processor_nmfp')
 
                                 records = df.where(pd.notna(df), None).to_dict(orient='records')
                                 db.bulk_insert_mappings(model, records)
+                                record_data_change(db, model, records)
                                 logger.info(f"Loading {len(records)} records into {model.__tablename__}")
                 db.commit()
             except Exception as e:
@@ -14,8 +14,9 @@ import pandas as pd
 import zipfile
 from database import (
     NPORTSubmission, NPORTGeneralInfo, NPORTHolding,
-    NPORTDerivative, SessionLocal
+    NPORTDerivative, SessionLocal, record_data_change
 )
+from src.security_holders import refresh_security_holders
 
 logger = logger
 
@@ -79,6 +80,7 @@ def load_data_to_db(df, model_class, table_name, db_session=None):
         
         # Bulk insert
         db.bulk_insert_mappings(model_class, records)
+        record_data_change(db, model_class, records)
         db.commit()
         
     except Exception as e:
@@ -118,6 +120,7 @@ logger = get_processor_logger('processor_nport')
         return {"processed": 0, "errors": 0}
     
     results = {"processed": 0, "errors": 0, "files": []}
+    loaded_quarters = set()
     
     for zip_file in zip_files:
         logger.info(f"Processing N-PORT file: {zip_file}")
@@ -154,6 +157,8 @@ logger = get_processor_logger('processor_nport')
                         try:
                             if 'submission' in table_name:
                                 load_data_to_db(df, NPORTSubmission, 'nport_submissions', db_session=db)
+                                if 'report_date' in df.columns:
+                                    loaded_quarters.update(pd.to_datetime(df['report_date'], errors='coerce').dropna())
                             elif 'general' in table_name or 'geninfo' in table_name:
                                 load_data_to_db(df, NPORTGeneralInfo, 'nport_general_info', db_session=db)
                             elif 'holding' in table_name:
@@ -180,5 +185,9 @@ logger = get_processor_logger('processor_nport')
             logger.error(f"Error processing N-PORT file {zip_file}: {str(e)}")
             results["errors"] += 1
     
+    # Re-index the holders of every quarter the loaded reports fall in
+    if loaded_quarters:
+        refresh_security_holders('nport', loaded_quarters, db_session)
+    
     logger.info(f"N-PORT processing completed. Processed: {results['processed']}, Errors: {results['errors']}")
     return results
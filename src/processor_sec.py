@@ -25,7 +25,8 @@ if parent_dir not in sys.path:
 try:
     from database import (
         SecSubmission, SecReportingOwner, SecNonDerivTrans, SecNonDerivHolding,
-        SecDerivTrans, SecDerivHolding, SecFootnote, SecOwnerSignature, SessionLocal
+        SecDerivTrans, SecDerivHolding, SecFootnote, SecOwnerSignature, SessionLocal,
+        record_data_change
     )
     logger = logging.getLogger('processor_sec')
     logger.setLevel(logging.INFO)
@@ -34,7 +35,8 @@ except ImportError as e:
         # Fall back to absolute import if relative import fails
         from GameCockAI.database import (
             SecSubmission, SecReportingOwner, SecNonDerivTrans, SecNonDerivHolding,
-            SecDerivTrans, SecDerivHolding, SecFootnote, SecOwnerSignature, SessionLocal
+            SecDerivTrans, SecDerivHolding, SecFootnote, SecOwnerSignature, SessionLocal,
+            record_data_change
         )
         logger = logging.getLogger('processor_sec')
         logger.setLevel(logging.INFO)
@@ -45,6 +47,9 @@ except ImportError as e:
         logger = logging.getLogger('processor_sec')
         logger.warning('Failed to import some database modules: %s', e)
 
+from src.filing_events import refresh_filing_events
+from src.insider_rollups import refresh_insider_rollups
+
 def sanitize_column_names(df):
     """Sanitizes DataFrame column names to be valid Python identifiers."""
     df.columns = df.columns.str.strip().str.lower()
@@ -74,6 +79,8 @@ def process_sec_insider_data(source_dir, db_session=None):
         'deemed_execution_date', 'excercise_date', 'expiration_date', 'ownersignaturedate'
     ]
 
+    loaded_accessions = set()
+    submitted_accessions = set()
     try:
         for zip_file in zip_files:
             logger.info(f"Processing SEC insider file: {zip_file}")
@@ -102,11 +109,22 @@ def process_sec_insider_data(source_dir, db_session=None):
                                 # Load data into the database
                                 records = df.where(pd.notna(df), None).to_dict(orient='records')
                                 db.bulk_insert_mappings(model, records)
+                                record_data_change(db, model, records)
                                 logger.info(f"Loading {len(records)} records into {model.__tablename__}")
+                                if model is SecNonDerivTrans and 'accession_number' in df.columns:
+                                    loaded_accessions.update(df['accession_number'].dropna())
+                                if model is SecSubmission and 'accession_number' in df.columns:
+                                    submitted_accessions.update(df['accession_number'].dropna())
                 db.commit()
             except Exception as e:
                 logger.error(f"Error processing file {zip_file}: {e}")
                 db.rollback()
+
+        # Roll up only the issuer-days touched by the new transactions
+        if loaded_accessions:
+            refresh_insider_rollups(loaded_accessions, db)
+        if submitted_accessions:
+            refresh_filing_events('insider', submitted_accessions, db)
     finally:
         if not db_session:
             db.close()
@@ -41,6 +41,11 @@ except ImportError:
     except ImportError:
         FinancialDocumentProcessor = DocumentType = DocumentChunk = None
 
+try:
+    from .change_tracking import ChangeAwareCache
+except ImportError:
+    from change_tracking import ChangeAwareCache
+
 # Import from the REAL database module with all tables (GameCockAI/database.py)
 from database import SessionLocal, CFTCSwap
 
@@ -109,8 +114,8 @@ class EnhancedRAGSystem:
         # Initialize database connection
         self.db_session = SessionLocal()
         
-        # Response cache
-        self.response_cache = {}
+        # Response cache; answers can draw on any table, so any data change invalidates them
+        self.response_cache = ChangeAwareCache(max_size=cache_size, db_session=self.db_session)
         self.cache_size = cache_size
         
         # Query classification patterns
@@ -183,12 +188,13 @@ class EnhancedRAGSystem:
         try:
             # Check cache first
             cache_key = self._generate_cache_key(query, context_filters)
-            if cache_key in self.response_cache:
+            cached_response = self.response_cache.get(cache_key)
+            if cached_response is not None:
                 logger.info("Cache hit for query")
                 self.metrics["cache_hits"] += 1
-                cached_response = self.response_cache[cache_key]
                 cached_response.metadata["from_cache"] = True
                 return cached_response
+            data_epoch = self.response_cache.current_epoch()
             
             # Classify query type
             query_type = self._classify_query(query)
@@ -229,7 +235,7 @@ class EnhancedRAGSystem:
             )
             
             # Cache response
-            self._cache_response(cache_key, response)
+            self._cache_response(cache_key, response, data_epoch)
             
             # Update metrics
             self._update_metrics(processing_time, True)
@@ -625,14 +631,9 @@ class EnhancedRAGSystem:
         combined = f"{query}_{json.dumps(context_filters, sort_keys=True) if context_filters else ''}"
         return hashlib.md5(combined.encode()).hexdigest()
     
-    def _cache_response(self, cache_key: str, response: RAGResponse):
-        """Cache response with size limit"""
-        if len(self.response_cache) >= self.cache_size:
-            # Remove oldest entry
-            oldest_key = next(iter(self.response_cache))
-            del self.response_cache[oldest_key]
-        
-        self.response_cache[cache_key] = response
+    def _cache_response(self, cache_key: str, response: RAGResponse, data_epoch: Optional[int] = None):
+        """Cache response with size limit, valid until the underlying data changes"""
+        self.response_cache.put(cache_key, response, epoch=data_epoch)
     
     def _update_metrics(self, processing_time: float, success: bool):
         """Update performance metrics"""
@@ -0,0 +1,439 @@
+"""
+Dependency-aware refresh scheduler for GameCock AI.
+
+A full refresh is a graph of download -> extract/ingest -> index stages rather
+than a fixed sequence of menu options. This module lets each stage declare the
+stages it depends on and the files it reads; the scheduler then runs
+independent stages concurrently, skips stages whose inputs have not changed
+since their last successful run, and records per-stage timings so the
+critical path of the nightly refresh can be inspected.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Stage kinds ---
+KIND_DOWNLOAD = "download"
+KIND_EXTRACT = "extract"
+KIND_INGEST = "ingest"
+KIND_INDEX = "index"
+
+# --- Stage statuses ---
+STAGE_COMPLETED = "completed"
+STAGE_SKIPPED = "skipped"
+STAGE_FAILED = "failed"
+STAGE_BLOCKED = "blocked"
+
+# Lock name shared by every stage that writes to the SQLite database
+DATABASE_LOCK = "database"
+
+
+@dataclass
+class Stage:
+    """A single unit of refresh work."""
+    name: str
+    func: Callable[[], Any]
+    kind: str = KIND_INGEST
+    depends_on: List[str] = field(default_factory=list)
+    after: List[str] = field(default_factory=list)  # Ordering only: waits for these without depending on them
+    inputs: List[str] = field(default_factory=list)  # Files/directories fingerprinted for change detection
+    lock: Optional[str] = None  # Stages sharing a lock name never run concurrently
+
+
+@dataclass
+class StageResult:
+    """Outcome and timing of one stage in a refresh run."""
+    name: str
+    status: str
+    kind: str = KIND_INGEST
+    started_at: Optional[datetime] = None
+    duration: float = 0.0
+    fingerprint: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+
+
+@dataclass
+class RefreshReport:
+    """Summary of a scheduler run."""
+    results: Dict[str, StageResult]
+    wall_time: float
+    critical_path: List[str]
+    critical_path_time: float
+
+    def stages_with_status(self, status: str) -> List[str]:
+        return [name for name, r in self.results.items() if r.status == status]
+
+    @property
+    def succeeded(self) -> bool:
+        return not self.stages_with_status(STAGE_FAILED) and not self.stages_with_status(STAGE_BLOCKED)
+
+    def summary(self) -> str:
+        lines = [f"Refresh finished in {self.wall_time:.1f}s"]
+        for name, r in self.results.items():
+            line = f"  {name:<28} {r.status:<10} {r.duration:8.2f}s"
+            if r.error:
+                line += f"  ({r.error})"
+            lines.append(line)
+        lines.append(
+            f"Critical path ({self.critical_path_time:.1f}s): " + " -> ".join(self.critical_path)
+        )
+        return "\n".join(lines)
+
+
+def fingerprint_paths(paths: List[str]) -> str:
+    """Hash the size and modification time of every file under the given paths."""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(path.encode('utf-8'))
+        if not os.path.exists(path):
+            digest.update(b'<missing>')
+            continue
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for file_name in sorted(files):
+                file_path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                rel_path = os.path.relpath(file_path, path)
+                digest.update(f"{rel_path}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class RefreshScheduler:
+    """Runs a graph of refresh stages in dependency order with maximal parallelism."""
+
+    def __init__(self, state_path: Optional[str] = None):
+        self.stages: Dict[str, Stage] = {}
+        self.state_path = state_path
+        self._locks: Dict[str, threading.Lock] = {}
+
+    def add_stage(self, name: str, func: Callable[[], Any], kind: str = KIND_INGEST,
+                  depends_on: Optional[List[str]] = None, inputs: Optional[List[str]] = None,
+                  lock: Optional[str] = None, after: Optional[List[str]] = None) -> Stage:
+        """Register a stage. Dependencies may be declared before the stages they name."""
+        if name in self.stages:
+            raise ValueError(f"Stage already registered: {name}")
+        stage = Stage(name=name, func=func, kind=kind, depends_on=list(depends_on or []),
+                      after=list(after or []), inputs=list(inputs or []), lock=lock)
+        self.stages[name] = stage
+        if lock and lock not in self._locks:
+            self._locks[lock] = threading.Lock()
+        return stage
+
+    def topological_order(self) -> List[str]:
+        """Return stage names in a valid execution order, raising on unknown deps or cycles."""
+        for stage in self.stages.values():
+            missing = [d for d in stage.depends_on + stage.after if d not in self.stages]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {missing}")
+
+        order, visiting, visited = [], set(), set()
+
+        def visit(name: str, path: List[str]):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle detected: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dep in self.stages[name].depends_on + self.stages[name].after:
+                visit(dep, path + [name])
+            visiting.discard(name)
+            visited.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    def run(self, max_workers: int = 4, force: bool = False,
+            only: Optional[List[str]] = None) -> RefreshReport:
+        """
+        Execute the stage graph.
+
+        Args:
+            max_workers: Maximum number of stages running at once
+            force: Run every stage even if its inputs are unchanged
+            only: Optional subset of stages to run (their upstream stages are included)
+
+        Returns:
+            RefreshReport with per-stage results and the critical path
+        """
+        order = self.topological_order()
+        if only:
+            order = [n for n in order if n in self._with_upstream(only)]
+
+        state = self._load_state()
+        results: Dict[str, StageResult] = {}
+        pending = list(order)
+        running = {}
+        run_started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while pending or running:
+                for name in list(pending):
+                    stage = self.stages[name]
+                    if any(dep not in results for dep in stage.depends_on + stage.after if dep in order):
+                        continue
+                    pending.remove(name)
+
+                    broken = [d for d in stage.depends_on
+                              if d in results and results[d].status in (STAGE_FAILED, STAGE_BLOCKED)]
+                    if broken:
+                        results[name] = StageResult(name=name, status=STAGE_BLOCKED, kind=stage.kind,
+                                                    error=f"upstream failed: {', '.join(broken)}")
+                        continue
+
+                    fingerprint = fingerprint_paths(stage.inputs) if stage.inputs else None
+                    if not force and not self._needs_run(stage, fingerprint, state, results):
+                        results[name] = StageResult(name=name, status=STAGE_SKIPPED, kind=stage.kind,
+                                                    fingerprint=fingerprint)
+                        logger.info(f"Skipping stage {name}: inputs unchanged")
+                        continue
+
+                    running[pool.submit(self._execute, stage, fingerprint)] = name
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name] = future.result()
+
+        wall_time = time.perf_counter() - run_started
+        self._save_state(state, results)
+        path, path_time = self.critical_path(results)
+        ordered = {name: results[name] for name in order if name in results}
+        return RefreshReport(results=ordered, wall_time=wall_time,
+                             critical_path=path, critical_path_time=path_time)
+
+    def critical_path(self, results: Dict[str, StageResult]):
+        """Longest chain of dependent stages by measured duration."""
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for name in self.topological_order():
+            if name not in results:
+                continue
+            deps = [d for d in self.stages[name].depends_on if d in finish]
+            slowest = max(deps, key=lambda d: finish[d], default=None)
+            finish[name] = results[name].duration + (finish[slowest] if slowest else 0.0)
+            previous[name] = slowest
+
+        if not finish:
+            return [], 0.0
+        tail = max(finish, key=finish.get)
+        path = []
+        node = tail
+        while node:
+            path.append(node)
+            node = previous[node]
+        return list(reversed(path)), finish[tail]
+
+    def _with_upstream(self, names: List[str]) -> set:
+        selected = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name in selected:
+                continue
+            selected.add(name)
+            stack.extend(self.stages[name].depends_on)
+        return selected
+
+    def _needs_run(self, stage: Stage, fingerprint: Optional[str], state: Dict[str, Any],
+                   results: Dict[str, StageResult]) -> bool:
+        """Decide whether a stage has new work to do."""
+        previous = state.get(stage.name)
+        if stage.inputs:
+            # Stages with declared inputs only rerun when those inputs change
+            return previous is None or previous.get('fingerprint') != fingerprint
+        if not stage.depends_on:
+            # Roots without inputs (e.g. downloads) always run
+            return True
+        # Derived stages rerun when anything upstream produced new output
+        return any(results[d].status == STAGE_COMPLETED for d in stage.depends_on if d in results)
+
+    def _execute(self, stage: Stage, fingerprint: Optional[str]) -> StageResult:
+        lock = self._locks.get(stage.lock) if stage.lock else None
+        if lock:
+            lock.acquire()
+        started_at = datetime.now()
+        start = time.perf_counter()
+        try:
+            logger.info(f"Starting stage {stage.name}")
+            result = stage.func()
+            status, error = STAGE_COMPLETED, None
+        except Exception as e:
+            logger.error(f"Stage {stage.name} failed: {e}", exc_info=True)
+            result, status, error = None, STAGE_FAILED, str(e)
+        finally:
+            if lock:
+                lock.release()
+        duration = time.perf_counter() - start
+        logger.info(f"Stage {stage.name} {status} in {duration:.2f}s")
+        return StageResult(name=stage.name, status=status, kind=stage.kind, started_at=started_at,
+                           duration=duration, fingerprint=fingerprint, result=result, error=error)
+
+    def _load_state(self) -> Dict[str, Any]:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read refresh state {self.state_path}: {e}")
+            return {}
+
+    def _save_state(self, state: Dict[str, Any], results: Dict[str, StageResult]):
+        for name, r in results.items():
+            if r.status != STAGE_COMPLETED:
+                continue
+            state[name] = {
+                'fingerprint': r.fingerprint,
+                'last_run': r.started_at.isoformat() if r.started_at else None,
+                'duration': round(r.duration, 3)
+            }
+        if not self.state_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+            with open(self.state_path, 'w') as f:
+                json.dump(state, f, indent=2)
+        except OSError as e:
+            logger.warning(f"Could not write refresh state {self.state_path}: {e}")
+
+
+def build_default_refresh_graph(target_companies: Optional[List[Dict]] = None,
+                                include_downloads: bool = True,
+                                state_path: Optional[str] = None) -> RefreshScheduler:
+    """
+    Build the standard GameCock refresh graph.
+
+    Downloads run in parallel; each ingest/extract stage depends on its
+    download and is fingerprinted on its source directory; vector indexing
+    and the columnar sidecar sync depend on the stages whose tables they read.
+    """
+    import config
+    from src.data_sources import cftc, sec
+    from src.processor import (process_zip_files, process_sec_insider_data, process_form13f_data,
+                               process_exchange_metrics_data, process_ncen_data, process_nport_data,
+                               process_formd_data, process_nmfp_data, process_sec_filings)
+
+    scheduler = RefreshScheduler(state_path=state_path or config.REFRESH_STATE_FILE)
+
+    def add_source(name, download_func, ingest_func, source_dir, kind=KIND_INGEST):
+        depends_on = []
+        if include_downloads and download_func is not None:
+            scheduler.add_stage(f"download_{name}", download_func, kind=KIND_DOWNLOAD)
+            depends_on.append(f"download_{name}")
+        scheduler.add_stage(f"{kind}_{name}", ingest_func, kind=kind, depends_on=depends_on,
+                            inputs=[source_dir], lock=DATABASE_LOCK)
+        return f"{kind}_{name}"
+
+    cftc_sources = [
+        ('cftc_credit', cftc.download_cftc_credit_archives, config.CFTC_CREDIT_SOURCE_DIR),
+        ('cftc_commodities', cftc.download_cftc_commodities_archives, config.CFTC_COMMODITIES_SOURCE_DIR),
+        ('cftc_rates', cftc.download_cftc_rates_archives, config.CFTC_RATES_SOURCE_DIR),
+        ('cftc_equity', cftc.download_cftc_equities_archives, config.CFTC_EQUITY_SOURCE_DIR),
+        ('cftc_forex', cftc.download_cftc_forex_archives, config.CFTC_FOREX_SOURCE_DIR),
+    ]
+    cftc_stages = [
+        add_source(name, download, lambda d=source_dir: process_zip_files(d, target_companies), source_dir)
+        for name, download, source_dir in cftc_sources
+    ]
+
+    insider_stage = add_source('insider', sec.download_insider_archives,
+                               lambda: process_sec_insider_data(config.INSIDER_SOURCE_DIR), config.INSIDER_SOURCE_DIR)
+    form13f_stage = add_source('form13f', sec.download_13F_archives,
+                               lambda: process_form13f_data(config.THRTNF_SOURCE_DIR), config.THRTNF_SOURCE_DIR)
+    add_source('exchange', sec.download_exchange_archives,
+               lambda: process_exchange_metrics_data(config.EXCHANGE_SOURCE_DIR), config.EXCHANGE_SOURCE_DIR)
+    add_source('ncen', sec.download_ncen_archives,
+               lambda: process_ncen_data(config.NCEN_SOURCE_DIR), config.NCEN_SOURCE_DIR)
+    nport_stage = add_source('nport', sec.download_nport_archives,
+                             lambda: process_nport_data(config.NPORT_SOURCE_DIR), config.NPORT_SOURCE_DIR)
+    formd_stage = add_source('formd', sec.download_formd_archives,
+                             lambda: process_formd_data(config.FORMD_SOURCE_DIR), config.FORMD_SOURCE_DIR)
+    nmfp_stage = add_source('nmfp', sec.download_nmfp_archives,
+                            lambda: process_nmfp_data(config.NMFP_SOURCE_DIR), config.NMFP_SOURCE_DIR)
+
+    # 10-K/10-Q and 8-K extraction both read the EDGAR download
+    edgar_deps = []
+    if include_downloads:
+        scheduler.add_stage('download_edgar',
+                            lambda: sec.download_edgar_filings(target_companies=target_companies),
+                            kind=KIND_DOWNLOAD)
+        edgar_deps.append('download_edgar')
+    for filing_type, name in (('10-K', 'extract_10k'), ('8-K', 'extract_8k')):
+        scheduler.add_stage(name, lambda t=filing_type: process_sec_filings(t, config.EDGAR_SOURCE_DIR),
+                            kind=KIND_EXTRACT, depends_on=edgar_deps,
+                            inputs=[config.EDGAR_SOURCE_DIR], lock=DATABASE_LOCK)
+
+    # A scheduled refresh defers the managed indexes while it loads (bulk_load_mode); the
+    # index stages read through them, so they are rebuilt once every load has finished
+    load_stages = [name for name, stage in scheduler.stages.items() if stage.kind in (KIND_INGEST, KIND_EXTRACT)]
+
+    def restore_indexes():
+        from database import restore_deferred_indexes
+        return restore_deferred_indexes()
+
+    scheduler.add_stage('restore_indexes', restore_indexes, kind=KIND_INDEX, after=load_stages,
+                        lock=DATABASE_LOCK)
+
+    def index_vectors():
+        from src.vector_integration import get_integration_manager
+        return get_integration_manager().sync_new_data("all")
+
+    scheduler.add_stage('index_vectors', index_vectors, kind=KIND_INDEX,
+                        depends_on=['extract_10k', 'extract_8k'] + cftc_stages, after=['restore_indexes'])
+
+    def sync_columnar():
+        from src.columnar_store import sync_columnar_sidecar
+        return sync_columnar_sidecar()
+
+    scheduler.add_stage('sync_columnar', sync_columnar, kind=KIND_INDEX,
+                        depends_on=cftc_stages + [form13f_stage], after=['restore_indexes'])
+
+    def index_13f_deltas():
+        # Backfills quarters loaded before the deltas existed, and their holder index rows
+        from src.form13f_flows import ensure_position_deltas
+        from src.security_holders import refresh_security_holders
+        built = ensure_position_deltas()
+        if built:
+            refresh_security_holders('13f', built)
+        return built
+
+    scheduler.add_stage('index_13f_deltas', index_13f_deltas, kind=KIND_INDEX,
+                        depends_on=[form13f_stage], after=['restore_indexes'], lock=DATABASE_LOCK)
+
+    def index_company_profiles():
+        from src.company_profiles import refresh_changed_profiles
+        return refresh_changed_profiles()
+
+    scheduler.add_stage('index_company_profiles', index_company_profiles, kind=KIND_INDEX,
+                        depends_on=[insider_stage, 'index_13f_deltas', nport_stage, formd_stage, nmfp_stage,
+                                    'extract_10k', 'extract_8k'], after=['restore_indexes'], lock=DATABASE_LOCK)
+
+    def prune_change_log():
+        from database import prune_data_change_log
+        return prune_data_change_log()
+
+    scheduler.add_stage('prune_change_log', prune_change_log, kind=KIND_INDEX,
+                        depends_on=['index_company_profiles'], lock=DATABASE_LOCK)
+    return scheduler
@@ -0,0 +1,288 @@
+"""
+Shared result cache for analytics tools.
+
+Tool results are keyed by tool name and normalized parameters. Each result is
+stored with the data epoch of the tables the tool reads (see
+database.record_data_change), so it stays valid until ingestion changes one
+of those tables. A result keyed to a CIK or LEI is only evicted by changes
+to that entity.
+
+There are two tiers:
+- memory: a bounded LRU per tool, shared by every caller in the process;
+- disk (optional): a small SQLite file, so results survive restarts and are
+  shared between processes. It is enabled by ANALYTICS_CACHE_DB in config.
+
+Results also expire after max_age_seconds, because several tools filter on
+date('now', ...) and drift as the calendar moves even when the data does not.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import data_changed_since
+from src.change_tracking import ChangeAwareCache, epoch_restarted
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_MAX_DISK_ENTRIES = 5000
+DEFAULT_MAX_AGE_SECONDS = 6 * 3600
+MAX_PAYLOAD_BYTES = 2 * 1024 * 1024
+
+
+def normalize_params(params: Dict[str, Any]) -> str:
+    """Canonical JSON for a parameter dict: sorted keys, non-JSON values as str."""
+    return json.dumps(params, sort_keys=True, default=str, separators=(',', ':'))
+
+
+def make_cache_key(tool: str, params: Dict[str, Any]) -> str:
+    return hashlib.sha256(f"{tool}|{normalize_params(params)}".encode('utf-8')).hexdigest()
+
+
+def _is_error_result(value: Any) -> bool:
+    """Tool failures are returned as JSON with an 'error' key; never cache those."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return False
+    return isinstance(value, dict) and 'error' in value
+
+
+class AnalyticsResultCache:
+    """Memory + optional SQLite cache of tool results, invalidated by data changes."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, disk_path: Optional[str] = None,
+                 max_disk_entries: int = DEFAULT_MAX_DISK_ENTRIES,
+                 max_age_seconds: Optional[float] = DEFAULT_MAX_AGE_SECONDS, db_session=None):
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self.max_disk_entries = max_disk_entries
+        self.max_age_seconds = max_age_seconds
+        self.db_session = db_session
+        self._memory: Dict[str, ChangeAwareCache] = {}
+        self._lock = threading.RLock()
+        self._disk_ready = False
+        self.disk_hits = 0
+
+    def _tool_cache(self, tool: str, tables: Optional[Iterable[str]]) -> ChangeAwareCache:
+        cache = self._memory.get(tool)
+        if cache is None:
+            cache = ChangeAwareCache(tables, max_size=self.max_entries, db_session=self.db_session)
+            self._memory[tool] = cache
+        return cache
+
+    def _disk(self) -> Optional[sqlite3.Connection]:
+        if not self.disk_path:
+            return None
+        connection = sqlite3.connect(self.disk_path, timeout=5)
+        if not self._disk_ready:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS analytics_result_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    tool TEXT NOT NULL,
+                    epoch INTEGER NOT NULL,
+                    entity_keys TEXT,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_analytics_result_cache_accessed ON analytics_result_cache (accessed_at)")
+            connection.commit()
+            self._disk_ready = True
+        return connection
+
+    def _expired(self, created_at: float) -> bool:
+        return self.max_age_seconds is not None and time.time() - created_at > self.max_age_seconds
+
+    def _disk_get(self, key: str, cache: ChangeAwareCache) -> Tuple[bool, Any, Optional[tuple], Optional[float]]:
+        connection = self._disk()
+        if connection is None:
+            return False, None, None, None
+        try:
+            row = connection.execute(
+                "SELECT epoch, entity_keys, payload, created_at FROM analytics_result_cache WHERE cache_key = ?",
+                (key,)).fetchone()
+            if row is None:
+                return False, None, None, None
+            epoch, entity_keys, payload, created_at = row
+            entity_keys = tuple(json.loads(entity_keys)) if entity_keys else None
+
+            current = cache.current_epoch()
+            stale = current is None or self._expired(created_at) or epoch_restarted(epoch, current)
+            if not stale and current != epoch:
+                try:
+                    stale = data_changed_since(epoch, cache.tables, entity_keys, db_session=self.db_session)
+                except SQLAlchemyError:
+                    stale = True
+            if stale:
+                connection.execute("DELETE FROM analytics_result_cache WHERE cache_key = ?", (key,))
+                connection.commit()
+                return False, None, None, None
+
+            connection.execute("UPDATE analytics_result_cache SET epoch = ?, accessed_at = ? WHERE cache_key = ?",
+                               (current, time.time(), key))
+            connection.commit()
+            return True, json.loads(payload), entity_keys, created_at
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Analytics result cache read failed: {e}")
+            return False, None, None, None
+        finally:
+            connection.close()
+
+    def _disk_put(self, key: str, tool: str, value: Any, epoch: int,
+                  entity_keys: Optional[tuple], created_at: float) -> None:
+        payload = json.dumps(value, default=str)
+        if len(payload) > MAX_PAYLOAD_BYTES:
+            return
+        connection = self._disk()
+        if connection is None:
+            return
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO analytics_result_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, tool, epoch, json.dumps(entity_keys) if entity_keys else None, payload, created_at, created_at))
+            connection.execute("""
+                DELETE FROM analytics_result_cache WHERE cache_key IN (
+                    SELECT cache_key FROM analytics_result_cache
+                    ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_disk_entries,))
+            connection.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Analytics result cache write failed: {e}")
+        finally:
+            connection.close()
+
+    def get(self, tool: str, params: Dict[str, Any], tables: Optional[Iterable[str]] = None,
+            default: Any = None) -> Any:
+        key = make_cache_key(tool, params)
+        with self._lock:
+            cache = self._tool_cache(tool, tables)
+            entry = cache.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if not self._expired(created_at):
+                    return value
+                cache.discard(key)
+
+            found, value, entity_keys, created_at = self._disk_get(key, cache)
+            if not found:
+                return default
+            self.disk_hits += 1
+            cache.put(key, (created_at, value), entity_keys)
+            return value
+
+    def put(self, tool: str, params: Dict[str, Any], value: Any, tables: Optional[Iterable[str]] = None,
+            entity_keys: Optional[Iterable[str]] = None, epoch: Optional[int] = None) -> None:
+        """Caches a result as of epoch; pass the epoch read before computing it."""
+        if _is_error_result(value):
+            return
+        key = make_cache_key(tool, params)
+        entity_keys = tuple(k for k in entity_keys if k) if entity_keys else None
+        with self._lock:
+            cache = self._tool_cache(tool, tables)
+            if epoch is None:
+                epoch = cache.current_epoch()
+                if epoch is None:
+                    return
+            created_at = time.time()
+            cache.put(key, (created_at, value), entity_keys, epoch=epoch)
+            self._disk_put(key, tool, value, epoch, entity_keys, created_at)
+
+    def current_epoch(self, tool: str, tables: Optional[Iterable[str]] = None) -> Optional[int]:
+        with self._lock:
+            return self._tool_cache(tool, tables).current_epoch()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            connection = self._disk()
+            if connection is not None:
+                try:
+                    connection.execute("DELETE FROM analytics_result_cache")
+                    connection.commit()
+                finally:
+                    connection.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            tools = {tool: cache.stats() for tool, cache in self._memory.items()}
+        return {
+            'tools': tools,
+            'hits': sum(s['hits'] for s in tools.values()),
+            'misses': sum(s['misses'] for s in tools.values()),
+            'disk_hits': self.disk_hits,
+            'disk_path': self.disk_path,
+        }
+
+
+_shared_cache: Optional[AnalyticsResultCache] = None
+
+
+def get_result_cache() -> AnalyticsResultCache:
+    """Process-wide cache configured from config.py."""
+    global _shared_cache
+    if _shared_cache is None:
+        try:
+            from config import ANALYTICS_CACHE_DB, ANALYTICS_CACHE_MAX_ENTRIES, ANALYTICS_CACHE_MAX_AGE
+        except ImportError:
+            ANALYTICS_CACHE_DB, ANALYTICS_CACHE_MAX_ENTRIES, ANALYTICS_CACHE_MAX_AGE = (
+                '', DEFAULT_MAX_ENTRIES, DEFAULT_MAX_AGE_SECONDS)
+        disk_path = ANALYTICS_CACHE_DB or None
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+        _shared_cache = AnalyticsResultCache(max_entries=ANALYTICS_CACHE_MAX_ENTRIES, disk_path=disk_path,
+                                             max_age_seconds=ANALYTICS_CACHE_MAX_AGE)
+    return _shared_cache
+
+
+def cached_tool(tables: Iterable[str], entity_params: Iterable[str] = (),
+                cache: Optional[AnalyticsResultCache] = None) -> Callable:
+    """
+    Caches a tool function's result by its bound arguments (defaults
+    applied, so f() and f(x=default) share an entry). tables are the tables
+    the tool reads; entity_params name arguments holding a CIK or LEI, which
+    narrow invalidation to changes for that entity.
+    """
+    tables = tuple(tables)
+    entity_params = tuple(entity_params)
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            result_cache = cache or get_result_cache()
+            try:
+                bound = signature.bind(*args, **kwargs)
+            except TypeError:
+                return func(*args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+
+            cached = result_cache.get(func.__name__, params, tables)
+            if cached is not None:
+                return cached
+
+            epoch = result_cache.current_epoch(func.__name__, tables)
+            result = func(*args, **kwargs)
+            if epoch is not None:
+                entity_keys = [str(params[name]) for name in entity_params if params.get(name)]
+                result_cache.put(func.__name__, params, result, tables, entity_keys or None, epoch)
+            return result
+
+        return wrapper
+    return decorator
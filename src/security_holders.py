@@ -0,0 +1,363 @@
+"""
+Security-holder index across 13F and N-PORT.
+
+security_holders maps each security identifier (CUSIP, and ISIN where
+N-PORT reports one) to its holders per quarter: 13F managers from
+form13f_position_deltas and N-PORT fund series from their latest report
+in the quarter, with the quantity and value held. The primary key starts
+with (id_type, identifier, period), so "who holds this security" and its
+crowding history are range reads over one security's rows instead of
+scans of form13f_info_tables and nport_holdings joined in Python.
+
+Conventions:
+- A quarter is the calendar quarter of period_of_report (13F) or
+  report_date (N-PORT), labelled 'YYYY-Qn'.
+- 13F holdings follow the position deltas: 13F-HR only, restatements
+  supersede, put/call rows excluded. Exited positions are not holdings.
+- An N-PORT series files up to three monthly reports per quarter; only
+  the latest report (and the latest amendment of it) counts.
+- N-PORT holdings carry no issuer LEI, so CUSIP and ISIN are the indexed
+  identifiers; the holding fund's LEI is kept as holder_lei.
+- 13F and N-PORT holders overlap (an adviser and its funds), so totals
+  and concentration are reported per dataset, never summed across them.
+- A dataset is built for every quarter the first time it is refreshed or
+  read with source data on file (security_holder_builds records which
+  are), so a database upgraded with filings already loaded gets their
+  history too. 13F quarters whose position deltas were never built are
+  built first.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, SecurityHolder, SecurityHolderBuild, record_data_change
+from src.form13f_flows import DELTA_TABLE, ensure_position_deltas, quarter_label
+from src.market_concentration import HIGHLY_CONCENTRATED_HHI, MODERATELY_CONCENTRATED_HHI
+
+logger = logging.getLogger(__name__)
+
+HOLDER_INDEX_TABLE = SecurityHolder.__tablename__
+DATASETS = ('13f', 'nport')
+# id_type -> identifier length; both are alphanumeric
+ID_TYPES = {'cusip': 9, 'isin': 12}
+# Source tables, for result-cache invalidation
+HOLDER_INDEX_TABLES = (HOLDER_INDEX_TABLE, DELTA_TABLE, 'form13f_submissions', 'form13f_coverpages',
+                       'nport_submissions', 'nport_holdings')
+
+
+def _quarter_sql(column: str) -> str:
+    """SQL 'YYYY-Qn' label of a YYYY-MM-DD... date column."""
+    return f"substr({column}, 1, 4) || '-Q' || ((CAST(substr({column}, 6, 2) AS INTEGER) + 2) / 3)"
+
+
+def _identifier_sql(column: str, id_type: str) -> str:
+    """SQL upper-cased identifier, NULL for blanks and placeholders such as 'N/A' or all zeros."""
+    value = f"upper(trim({column}))"
+    return (f"CASE WHEN length(trim({column})) = {ID_TYPES[id_type]} AND {value} NOT GLOB '*[^0-9A-Z]*' "
+            f"AND ltrim({value}, '0') != '' THEN {value} END")
+
+
+def _session_scope(session: Optional[Session]):
+    return (session, False) if session is not None else (SessionLocal(), True)
+
+
+def _check_datasets(datasets: Optional[Sequence[str]]) -> List[str]:
+    datasets = list(datasets or DATASETS)
+    unknown = [d for d in datasets if d not in DATASETS]
+    if unknown:
+        raise ValueError(f"Unknown datasets {unknown}. Expected: {', '.join(DATASETS)}")
+    return datasets
+
+
+def security_id_keys(identifier: str) -> List[Tuple[str, str]]:
+    """
+    Index keys for a CUSIP or ISIN. A US or Canadian ISIN embeds the
+    CUSIP, so it also matches holders indexed by CUSIP (all 13F holders).
+    """
+    value = (identifier or '').strip().upper()
+    if len(value) == ID_TYPES['isin']:
+        keys = [('isin', value)]
+        if value[:2] in ('US', 'CA'):
+            keys.append(('cusip', value[2:11]))
+        return keys
+    if len(value) == ID_TYPES['cusip']:
+        return [('cusip', value)]
+    raise ValueError(f"'{identifier}' is not a 9-character CUSIP or a 12-character ISIN")
+
+
+_BUILD_13F = f"""
+    INSERT INTO {HOLDER_INDEX_TABLE}
+        (id_type, identifier, period, dataset, holder_id, holder_cik, holder_name, issuer_name, quantity, value,
+         accession_number)
+    WITH filings AS (
+        SELECT s.cik, c.filing_manager_name AS name, s.accession_number,
+               ROW_NUMBER() OVER (PARTITION BY s.cik ORDER BY s.filing_date DESC, s.accession_number DESC) AS rn
+        FROM form13f_submissions s
+        LEFT JOIN form13f_coverpages c ON c.accession_number = s.accession_number
+        WHERE s.submission_type LIKE '13F-HR%' AND s.period_of_report >= :start AND s.period_of_report < :end
+    ),
+    positions AS (
+        SELECT {_identifier_sql('d.cusip', 'cusip')} AS identifier, d.cik, d.nameofissuer, d.shares, d.value
+        FROM {DELTA_TABLE} d
+        WHERE d.quarter = :quarter AND d.change_type != 'exited'
+    )
+    SELECT 'cusip', p.identifier, :quarter, '13f', p.cik, p.cik, f.name, MAX(p.nameofissuer), SUM(p.shares),
+           SUM(p.value), f.accession_number
+    FROM positions p
+    LEFT JOIN filings f ON f.cik = p.cik AND f.rn = 1
+    WHERE p.identifier IS NOT NULL
+    GROUP BY p.identifier, p.cik
+"""
+
+_BUILD_NPORT = f"""
+    INSERT INTO {HOLDER_INDEX_TABLE}
+        (id_type, identifier, period, dataset, holder_id, holder_cik, holder_lei, holder_name, issuer_name, quantity,
+         value, accession_number)
+    WITH reports AS (
+        SELECT accession_number, cik, lei, COALESCE(NULLIF(trim(series_id), ''), cik) AS holder_id,
+               COALESCE(NULLIF(trim(series_name), ''), registrant_name) AS holder_name,
+               ROW_NUMBER() OVER (PARTITION BY COALESCE(NULLIF(trim(series_id), ''), cik)
+                                  ORDER BY report_date DESC, filing_date DESC, accession_number DESC) AS rn
+        FROM nport_submissions
+        WHERE report_date >= :start AND report_date < :end
+    ),
+    positions AS (
+        SELECT {{identifier}} AS identifier, r.holder_id, r.cik, r.lei, r.holder_name, r.accession_number,
+               h.issuer_name, h.balance_held, h.value_usd
+        FROM reports r
+        JOIN nport_holdings h ON h.accession_number = r.accession_number
+        WHERE r.rn = 1 AND r.holder_id IS NOT NULL
+    )
+    SELECT :id_type, identifier, :quarter, 'nport', holder_id, cik, lei, holder_name, MAX(issuer_name),
+           SUM(balance_held), SUM(value_usd), accession_number
+    FROM positions
+    WHERE identifier IS NOT NULL
+    GROUP BY identifier, holder_id
+"""
+
+
+def _quarter_bounds(quarter: str) -> Dict[str, str]:
+    year, number = int(quarter[:4]), int(quarter[-1])
+    end = f"{year + 1}-01-01" if number == 4 else f"{year}-{number * 3 + 1:02d}-01"
+    return {'quarter': quarter, 'start': f"{year}-{(number - 1) * 3 + 1:02d}-01", 'end': end}
+
+
+def _build_quarter(session: Session, dataset: str, quarter: str) -> int:
+    params = _quarter_bounds(quarter)
+    session.execute(text(f"DELETE FROM {HOLDER_INDEX_TABLE} WHERE dataset = :dataset AND period = :quarter"),
+                    {'dataset': dataset, 'quarter': quarter})
+    if dataset == '13f':
+        return session.execute(text(_BUILD_13F), params).rowcount
+    # A holding reported with both a CUSIP and an ISIN is indexed under each
+    return sum(session.execute(text(_BUILD_NPORT.format(identifier=_identifier_sql(f"h.{id_type}", id_type))),
+                               {**params, 'id_type': id_type}).rowcount
+               for id_type in ID_TYPES)
+
+
+def _source_quarters(session: Session, dataset: str) -> List[str]:
+    if dataset == '13f':
+        query = f"SELECT DISTINCT quarter FROM {DELTA_TABLE}"
+    else:
+        query = (f"SELECT DISTINCT {_quarter_sql('report_date')} FROM nport_submissions "
+                 f"WHERE report_date IS NOT NULL")
+    return sorted(q for q in session.execute(text(query)).scalars() if q)
+
+
+def _built_datasets(session: Session) -> set:
+    return {dataset for (dataset,) in session.query(SecurityHolderBuild.dataset)}
+
+
+def refresh_security_holders(dataset: Optional[str] = None, quarters: Optional[Iterable] = None,
+                             session: Optional[Session] = None) -> int:
+    """
+    Rebuilds the holder index of one dataset ('13f' or 'nport') for the
+    given quarters (dates or 'YYYY-Qn' labels). With quarters None every
+    quarter in the source data is rebuilt; with dataset None both
+    datasets are. 13F rows are read from the position deltas, so refresh
+    those first; quarters whose deltas were never built are built and
+    indexed here. A dataset that has never been built for every quarter
+    is rebuilt for every quarter instead of just the given ones, and is
+    recorded as built once it had source data to index.
+
+    Returns the number of index rows written.
+    """
+    datasets = _check_datasets([dataset] if dataset else None)
+    session, close_session = _session_scope(session)
+    try:
+        built = _built_datasets(session) if quarters is not None else set()
+        written = 0
+        full = []
+        for name in datasets:
+            backfilled = ensure_position_deltas(session) if name == '13f' else {}
+            if name not in built:
+                targets = _source_quarters(session, name)
+                if targets:
+                    full.append(name)
+            else:
+                targets = sorted({q if isinstance(q, str) and '-Q' in q else quarter_label(q)
+                                  for q in quarters if q is not None} | set(backfilled))
+            written += sum(_build_quarter(session, name, quarter) for quarter in targets)
+        if full:
+            statement = sqlite_insert(SecurityHolderBuild).values([{'dataset': name, 'built_at': datetime.utcnow()}
+                                                                   for name in full])
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['dataset'], set_={'built_at': statement.excluded.built_at}))
+        record_data_change(session, SecurityHolder, row_count=written)
+        session.commit()
+        logger.info(f"Refreshed {written} security holder index rows ({', '.join(datasets)})")
+        return written
+    except Exception as e:
+        logger.error(f"Error refreshing the security holder index: {e}", exc_info=True)
+        session.rollback()
+        raise
+    finally:
+        if close_session:
+            session.close()
+
+
+def ensure_security_holders(datasets: Optional[Sequence[str]] = None, session: Optional[Session] = None) -> int:
+    """
+    Builds each dataset that has never been built for every quarter and
+    has source data, and indexes 13F quarters whose position deltas were
+    never built. Returns the rows written.
+    """
+    datasets = _check_datasets(datasets)
+    session, close_session = _session_scope(session)
+    try:
+        built = _built_datasets(session)
+        written = 0
+        for name in datasets:
+            backfilled = ensure_position_deltas(session) if name == '13f' else {}
+            if name not in built and _source_quarters(session, name):
+                written += refresh_security_holders(name, session=session)
+            elif name in built and backfilled:
+                written += refresh_security_holders(name, backfilled, session)
+        return written
+    finally:
+        if close_session:
+            session.close()
+
+
+def _key_selects(keys: List[Tuple[str, str]], columns: str, where: str = '') -> Tuple[str, Dict[str, str]]:
+    """One primary-key read per index key, combined with UNION ALL."""
+    params, selects = {}, []
+    for i, (id_type, identifier) in enumerate(keys):
+        selects.append(f"SELECT {columns} FROM {HOLDER_INDEX_TABLE} "
+                       f"WHERE id_type = :t{i} AND identifier = :i{i} {where}")
+        params.update({f"t{i}": id_type, f"i{i}": identifier})
+    return ' UNION ALL '.join(selects), params
+
+
+def _holder_rows(session: Session, keys: List[Tuple[str, str]], datasets: List[str],
+                 periods: List[str]) -> pd.DataFrame:
+    """The index rows of a security, one per (period, dataset, holder) in key order of preference."""
+    query, params = _key_selects(
+        keys, 'id_type, identifier, period, dataset, holder_id, holder_cik, holder_lei, holder_name, issuer_name, '
+              'quantity, value, accession_number',
+        f"AND period IN ({', '.join(f':p{i}' for i in range(len(periods)))}) "
+        f"AND dataset IN ({', '.join(f':d{i}' for i in range(len(datasets)))})")
+    params.update({f"p{i}": p for i, p in enumerate(periods)})
+    params.update({f"d{i}": d for i, d in enumerate(datasets)})
+    rows = pd.read_sql(text(query), session.connection(), params=params)
+    # An N-PORT holding indexed under both the ISIN and its CUSIP counts once
+    rows['key_rank'] = rows['id_type'].map({id_type: rank for rank, (id_type, _) in enumerate(keys)})
+    return (rows.sort_values('key_rank', kind='stable').drop_duplicates(['period', 'dataset', 'holder_id'])
+            .drop(columns='key_rank'))
+
+
+def _periods(session: Session, keys: List[Tuple[str, str]], count: int) -> List[str]:
+    """The security's latest count quarters with holders, newest first."""
+    query, params = _key_selects(keys, 'period')
+    return session.execute(text(f"SELECT DISTINCT period FROM ({query}) ORDER BY period DESC LIMIT :count"),
+                           {**params, 'count': count}).scalars().all()
+
+
+def get_security_holders(identifier: str, period: Optional[str] = None, datasets: Optional[Sequence[str]] = None,
+                         limit: Optional[int] = 50, session: Optional[Session] = None) -> Dict[str, Any]:
+    """
+    Holders of a CUSIP or ISIN in one quarter (default: the latest quarter
+    with holders), largest value first, with per-dataset totals.
+    """
+    keys = security_id_keys(identifier)
+    datasets = _check_datasets(datasets)
+    session, close_session = _session_scope(session)
+    try:
+        ensure_security_holders(datasets, session)
+        period = period or next(iter(_periods(session, keys, 1)), None)
+        if period is None:
+            return {'identifier': identifier, 'period': None, 'holders': [], 'totals': {}}
+        rows = _holder_rows(session, keys, datasets, [period]).sort_values('value', ascending=False)
+    finally:
+        if close_session:
+            session.close()
+
+    totals = {name: {'holders': len(group), 'quantity': int(group['quantity'].fillna(0).sum()),
+                     'value': int(group['value'].fillna(0).sum())}
+              for name, group in rows.groupby('dataset')}
+    listed = (rows.head(limit) if limit else rows).drop(columns=['period', 'issuer_name'])
+    names = rows['issuer_name'].dropna()
+    return {
+        'identifier': identifier,
+        'period': period,
+        'issuer_name': names.iloc[0] if len(names) else None,
+        'totals': totals,
+        'holders': listed.astype(object).where(listed.notna(), None).to_dict('records'),
+    }
+
+
+def _concentration(values: pd.Series, top_n: int) -> Dict[str, Any]:
+    values = values[values > 0].sort_values(ascending=False).astype(float)
+    total = values.sum()
+    if not total:
+        return {'top_share': None, 'hhi': None, 'level': None}
+    hhi = round(float(10000 * ((values / total) ** 2).sum()), 1)
+    level = ('highly_concentrated' if hhi > HIGHLY_CONCENTRATED_HHI else
+             'moderately_concentrated' if hhi >= MODERATELY_CONCENTRATED_HHI else 'unconcentrated')
+    return {'top_share': round(float(values.head(top_n).sum() / total), 4), 'hhi': hhi, 'level': level}
+
+
+def security_crowding(identifier: str, periods: int = 4, top_n: int = 10, datasets: Optional[Sequence[str]] = None,
+                      session: Optional[Session] = None) -> Dict[str, Any]:
+    """
+    Crowding of a security over its latest quarters, per dataset: holder
+    count, total quantity and value, the top_n holders' share of value,
+    HHI, and holders entering and leaving against the quarter before.
+    """
+    keys = security_id_keys(identifier)
+    datasets = _check_datasets(datasets)
+    session, close_session = _session_scope(session)
+    try:
+        ensure_security_holders(datasets, session)
+        # One extra quarter is read as the baseline of the oldest reported one
+        quarters = sorted(_periods(session, keys, periods + 1))
+        rows = _holder_rows(session, keys, datasets, quarters) if quarters else None
+    finally:
+        if close_session:
+            session.close()
+    if rows is None:
+        return {'identifier': identifier, 'periods': []}
+
+    history = []
+    previous = {}
+    for quarter in quarters:
+        current = rows[rows['period'] == quarter]
+        by_dataset = {}
+        for name in datasets:
+            group = current[current['dataset'] == name]
+            holders = set(group['holder_id'])
+            entry = {'holders': len(holders), 'quantity': int(group['quantity'].fillna(0).sum()),
+                     'value': int(group['value'].fillna(0).sum()),
+                     **_concentration(group['value'].fillna(0), top_n)}
+            if name in previous:
+                entry['new_holders'] = len(holders - previous[name])
+                entry['exited_holders'] = len(previous[name] - holders)
+            previous[name] = holders
+            by_dataset[name] = entry
+        history.append({'period': quarter, **by_dataset})
+    return {'identifier': identifier, 'top_n': top_n, 'periods': history[-periods:]}
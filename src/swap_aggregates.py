@@ -0,0 +1,204 @@
+"""
+Materialized daily aggregates for CFTC swap data.
+
+cftc_swap_daily_aggregates holds one row per trade date, asset class,
+product and notional currency. Ingestion refreshes only the days present in
+each loaded batch. Each of those days is recomputed from the raw rows, so
+percentiles stay exact. Trend and overview analytics read these few hundred
+rows instead of scanning cftc_swap_data.
+
+Days already moved to monthly partitions keep their aggregates, because an
+incremental refresh only rewrites days that still have rows in the hot
+table. The first build, and any refresh while the aggregates do not reach
+back to the oldest swap, backfills every day including archived months.
+Readers use the aggregates only while they span all swap history.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, CFTCSwapDailyAggregate, record_data_change
+from src.swap_partitions import PARTITION_TABLE, SwapPartitionManager
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_TABLE = CFTCSwapDailyAggregate.__tablename__
+GROUP_COLUMNS = ['trade_date', 'asset_class', 'product_name', 'notional_currency']
+BLOCK_TRADE_VALUES = ('Y', 'TRUE', 'True', 'true')
+CLEARED_VALUES = ('C', 'Y')
+
+
+def _as_day(value) -> str:
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return value.strftime('%Y-%m-%d')
+    return str(value)[:10]
+
+
+def _aggregate_day(rows: pd.DataFrame) -> List[Dict[str, Any]]:
+    for column in GROUP_COLUMNS[1:]:
+        rows[column] = rows[column].fillna('')
+    rows['is_block'] = rows['block_trade_election_indicator'].isin(BLOCK_TRADE_VALUES)
+    rows['is_cleared'] = rows['cleared'].isin(CLEARED_VALUES)
+    rows['on_platform'] = rows['platform_identifier'].fillna('') != ''
+
+    grouped = rows.groupby(GROUP_COLUMNS, sort=False)
+    notional = grouped['notional_amount_leg_1']
+    frame = pd.DataFrame({
+        'trade_count': grouped.size(),
+        'notional_count': notional.count(),
+        'notional_sum': notional.sum(min_count=1),
+        'notional_min': notional.min(),
+        'notional_max': notional.max(),
+        'notional_p50': notional.quantile(0.5),
+        'notional_p90': notional.quantile(0.9),
+        'notional_p99': notional.quantile(0.99),
+        'block_trades': grouped['is_block'].sum(),
+        'cleared_trades': grouped['is_cleared'].sum(),
+        'platform_trades': grouped['on_platform'].sum(),
+    }).reset_index()
+    frame['refreshed_at'] = datetime.utcnow()
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+_ROW_COLUMNS = ("substr(execution_timestamp, 1, 10) AS trade_date, asset_class, product_name, "
+                "notional_currency_leg_1 AS notional_currency, notional_amount_leg_1, "
+                "block_trade_election_indicator, cleared, platform_identifier")
+
+
+def _swap_span(session: Session):
+    """(first, last) trade day across the hot table and the archived months; (None, None) without swaps."""
+    hot = session.execute(text("SELECT MIN(execution_timestamp), MAX(execution_timestamp) FROM cftc_swap_data")).one()
+    archived = session.execute(text(f"SELECT MIN(min_execution_timestamp), MAX(max_execution_timestamp) "
+                                    f"FROM {PARTITION_TABLE}")).one()
+    firsts = [_as_day(value) for value in (hot[0], archived[0]) if value is not None]
+    lasts = [_as_day(value) for value in (hot[1], archived[1]) if value is not None]
+    return min(firsts, default=None), max(lasts, default=None)
+
+
+def _aggregate_span(session: Session):
+    return session.execute(text(f"SELECT MIN(trade_date), MAX(trade_date) FROM {AGGREGATE_TABLE}")).one()
+
+
+def _covers_history(session: Session) -> bool:
+    """True when the aggregates reach back to the oldest swap on file."""
+    built_first, _ = _aggregate_span(session)
+    first, _ = _swap_span(session)
+    return built_first is not None and (first is None or built_first <= first)
+
+
+def _all_days(session: Session, archived_months: set) -> List[str]:
+    days = set(session.execute(text(
+        "SELECT DISTINCT substr(execution_timestamp, 1, 10) FROM cftc_swap_data "
+        "WHERE execution_timestamp IS NOT NULL"
+    )).scalars().all())
+    # Archived months are read one day at a time anyway, so list their calendar days
+    for month in archived_months:
+        day = datetime.strptime(f"{month}-01", '%Y-%m-%d')
+        while day.strftime('%Y-%m') == month:
+            days.add(day.strftime('%Y-%m-%d'))
+            day += timedelta(days=1)
+    return list(days)
+
+
+def refresh_daily_aggregates(days: Optional[Iterable] = None, session: Optional[Session] = None) -> int:
+    """
+    Recomputes the aggregates for the given trade days, or for every swap
+    day (hot table and archived months) when days is None. Days given
+    without rows left are kept as they are. When the aggregates do not yet
+    reach back to the oldest swap, every day is backfilled instead of just
+    the given ones.
+
+    Returns the number of aggregate rows written.
+    """
+    close_session = False
+    if session is None:
+        session = SessionLocal()
+        close_session = True
+
+    try:
+        manager = SwapPartitionManager(bind=session.get_bind())
+        archived_months = {partition['month'] for partition in manager.list_partitions()}
+        if days is not None and not _covers_history(session):
+            logger.info("Daily swap aggregates do not cover all swap history; backfilling every day")
+            days = None
+        if days is None:
+            days = _all_days(session, archived_months)
+        days = sorted({_as_day(day) for day in days if day is not None and not pd.isna(day)})
+
+        written = 0
+        for day in days:
+            next_day = (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+            if day[:7] in archived_months:
+                rows = manager.query_swaps(day, next_day, columns=_ROW_COLUMNS)
+            else:
+                rows = pd.read_sql(text(f"""
+                    SELECT {_ROW_COLUMNS}
+                    FROM cftc_swap_data
+                    WHERE execution_timestamp >= :day AND execution_timestamp < :next_day
+                """), session.connection(), params={'day': day, 'next_day': next_day})
+            if rows.empty:
+                continue
+            rows['notional_amount_leg_1'] = pd.to_numeric(rows['notional_amount_leg_1'], errors='coerce')
+
+            records = _aggregate_day(rows)
+            session.query(CFTCSwapDailyAggregate).filter(
+                CFTCSwapDailyAggregate.trade_date == day).delete(synchronize_session=False)
+            session.bulk_insert_mappings(CFTCSwapDailyAggregate, records)
+            written += len(records)
+
+        if written:
+            record_data_change(session, CFTCSwapDailyAggregate, row_count=written)
+        session.commit()
+        if days:
+            logger.info(f"Refreshed {written} daily swap aggregates for {len(days)} days")
+        return written
+    except Exception as e:
+        logger.error(f"Error refreshing daily swap aggregates: {e}", exc_info=True)
+        session.rollback()
+        raise
+    finally:
+        if close_session:
+            session.close()
+
+
+def has_daily_aggregates(session: Session) -> bool:
+    """True when the aggregates span every swap day on file, so readers can rely on them."""
+    built_first, built_last = _aggregate_span(session)
+    if built_first is None:
+        return False
+    first, last = _swap_span(session)
+    return (first is None or built_first <= first) and (last is None or last <= built_last)
+
+
+def get_daily_aggregates(start_date=None, end_date=None, asset_class: Optional[str] = None,
+                         session: Optional[Session] = None) -> pd.DataFrame:
+    """Aggregate rows for start_date <= trade_date <= end_date, '' keys returned as None."""
+    close_session = False
+    if session is None:
+        session = SessionLocal()
+        close_session = True
+    try:
+        clauses, params = [], {}
+        if start_date is not None:
+            clauses.append("trade_date >= :start_date")
+            params['start_date'] = _as_day(start_date)
+        if end_date is not None:
+            clauses.append("trade_date <= :end_date")
+            params['end_date'] = _as_day(end_date)
+        if asset_class:
+            clauses.append("asset_class = :asset_class")
+            params['asset_class'] = asset_class
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        df = pd.read_sql(text(f"SELECT * FROM {AGGREGATE_TABLE} {where} ORDER BY trade_date"),
+                         session.connection(), params=params)
+        for column in GROUP_COLUMNS[1:]:
+            df[column] = df[column].astype(object).where(df[column] != '', None)
+        return df
+    finally:
+        if close_session:
+            session.close()
@@ -30,9 +30,30 @@ from src.enhanced_entity_resolver import EnhancedEntityResolver, EntityProfile,
 from src.data_sources.cftc import download_all_swap_data
 from src.data_sources.dtcc import download_dtcc_swap_data
 from src.data_sources.sec import download_edgar_filings
+from src.change_tracking import ChangeAwareCache
+from src.exposure_cube import query_exposure_cube
 
 logger = logging.getLogger(__name__)
 
+# Tables a risk profile is built from; a change to any of them for the
+# entity (or a table-wide change) invalidates its cached profile
+RISK_INPUT_TABLES = (
+    'cftc_live_trades',
+    'sec_10k_submissions',
+    'sec_8k_submissions',
+    'nport_submissions',
+    'nport_holdings',
+    'nport_derivatives',
+)
+
+def entity_change_keys(entity_profile: EntityProfile) -> List[str]:
+    """CIK/LEI values that identify an entity in the data change log."""
+    keys = [entity_profile.entity_id]
+    identifiers = entity_profile.primary_identifiers
+    if isinstance(identifiers, dict):
+        keys.extend(v for k, v in identifiers.items() if k in ('cik', 'lei') and v)
+    return keys
+
 class RiskLevel(Enum):
     """Risk level classifications"""
     LOW = "low"
@@ -143,8 +164,8 @@ class SinglePartyRiskAnalyzer:
         """Initialize the single party risk analyzer."""
         self.db_session = db_session
         self.entity_resolver = EnhancedEntityResolver(db_session)
-        self.exposure_cache = {}
-        self.risk_cache = {}
+        self.exposure_cache = ChangeAwareCache(RISK_INPUT_TABLES, db_session=db_session)
+        self.risk_cache = ChangeAwareCache(RISK_INPUT_TABLES, db_session=db_session)
         
         # Risk thresholds
         self.high_risk_threshold = 0.8  # 80% of credit limit
@@ -176,11 +197,21 @@ class SinglePartyRiskAnalyzer:
             
             entity_id = entity_profile.entity_id
             entity_name = entity_profile.entity_name
+            change_keys = entity_change_keys(entity_profile)
+            
+            cached_profile = self.risk_cache.get(entity_id)
+            if cached_profile is not None:
+                logger.info(f"Using cached risk profile for {entity_name} (ID: {entity_id})")
+                return cached_profile
+            data_epoch = self.risk_cache.current_epoch()
             
             logger.info(f"Analyzing single party risk for {entity_name} (ID: {entity_id})")
             
             # Aggregate all swap exposures
-            all_exposures = self._aggregate_all_swap_exposures(entity_id)
+            all_exposures = self.exposure_cache.get(entity_id)
+            if all_exposures is None:
+                all_exposures = self._aggregate_all_swap_exposures(entity_id)
+                self.exposure_cache.put(entity_id, all_exposures, entity_keys=change_keys, epoch=data_epoch)
             
             if not all_exposures:
                 logger.info(f"No swap exposures found for {entity_name}")
@@ -197,8 +228,8 @@ class SinglePartyRiskAnalyzer:
                 entity_id, entity_name, all_exposures, risk_triggers, obligations
             )
             
-            # Cache the result
-            self.risk_cache[entity_id] = risk_profile
+            # Cache the result until the entity's input data changes
+            self.risk_cache.put(entity_id, risk_profile, entity_keys=change_keys, epoch=data_epoch)
             
             logger.info(f"Risk analysis completed for {entity_name}: "
                        f"${risk_profile.total_notional_exposure:,.0f} total exposure, "
@@ -244,8 +275,9 @@ class SinglePartyRiskAnalyzer:
             if not self.db_session:
                 return exposures
             
-            # Query CFTC swap data for the entity
-            # Note: This would need to be enhanced based on actual CFTC data structure
+            # Public CFTC data is anonymized, so the entity is matched as the
+            # reference underlier. Live trades hold each swap's latest state
+            # with terminated trades removed.
             query = text("""
                 SELECT 
                     dissemination_id,
@@ -258,14 +290,14 @@ class SinglePartyRiskAnalyzer:
                     execution_timestamp,
                     effective_date,
                     expiration_date,
-                    cleared,
-                    counterparty_type
-                FROM cftc_swap_data
-                WHERE (counterparty_1_id = :entity_id OR counterparty_2_id = :entity_id)
-                AND action_type = 'NEW'
+                    cleared
+                FROM cftc_live_trades
+                WHERE underlier_id_leg_1 = :entity_id
+                   OR underlying_asset_name LIKE :entity_pattern
             """)
             
-            results = self.db_session.execute(query, {"entity_id": entity_id}).fetchall()
+            results = self.db_session.execute(
+                query, {"entity_id": entity_id, "entity_pattern": f"%{entity_id}%"}).fetchall()
             
             for result in results:
                 # Determine swap type
@@ -333,12 +365,13 @@ class SinglePartyRiskAnalyzer:
                     s.accession_number,
                     s.filing_date,
                     d.section,
-                    d.content
+                    decompress_text(d.content) AS content
                 FROM sec_10k_submissions s
                 JOIN sec_10k_documents d ON s.accession_number = d.accession_number
                 WHERE s.cik = :entity_id
                 AND d.section IN ('risk_factors', 'mdna', 'financial_statements')
-                AND (d.content LIKE '%derivative%' OR d.content LIKE '%swap%' OR d.content LIKE '%hedge%')
+                AND (decompress_text(d.content) LIKE '%derivative%' OR decompress_text(d.content) LIKE '%swap%'
+                     OR decompress_text(d.content) LIKE '%hedge%')
                 ORDER BY s.filing_date DESC
                 LIMIT 50
             """)
@@ -756,6 +789,29 @@ class SinglePartyRiskAnalyzer:
         
         return summary
     
+    def get_exposure_slices(self, entity_id: str, group_by: Tuple[str, ...] = ('asset_class', 'tenor_bucket'),
+                            filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Live CFTC exposure of an entity (as reference underlier) rolled up
+        from the exposure cube, e.g. by asset class and tenor bucket.
+        
+        Args:
+            entity_id: Underlier id or name, as stored in cftc_live_trades
+            group_by: Cube dimensions to group by
+            filters: Further cube filters to drill into
+            
+        Returns:
+            Slices with trade counts and total notional, largest first
+        """
+        if not self.db_session:
+            return []
+        try:
+            return query_exposure_cube(group_by, {**(filters or {}), 'reference_entity': entity_id},
+                                       session=self.db_session)
+        except Exception as e:
+            logger.error(f"Error slicing exposure cube for {entity_id}: {str(e)}")
+            return []
+    
     def get_risk_summary_for_entity(self, entity_identifier: str) -> str:
         """
         Get a quick risk summary for an entity.
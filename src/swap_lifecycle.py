@@ -0,0 +1,250 @@
+"""
+Live-trade state for CFTC swap lifecycle events.
+
+cftc_swap_data is an append-only stream of dissemination events. Each trade
+starts with NEWT and may later be modified (MODI), corrected (CORR), revalued
+(VALU) or ended (TERM, EROR, PRTO). This module folds that stream into
+cftc_live_trades: one row per trade holding its latest state, with ended
+trades removed. An ended trade leaves a tombstone in cftc_terminated_trades
+with its termination time, so a late event older than the termination is
+stale rather than bringing the trade back. Events are applied incrementally
+from a watermark, so each ingest batch costs time proportional to the batch,
+not the history. The exposure cube (src/exposure_cube.py) is updated from the
+same before/after states in the same transaction.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import (SessionLocal, CFTCSwap, CFTCLiveTrade, CFTCLifecycleWatermark, CFTCExposureCube,
+                      CFTCTerminatedTrade, record_data_change)
+from src.exposure_cube import (CUBE_SOURCE_FIELDS, add_trade, apply_cube_deltas, has_exposure_cube,
+                               rebuild_exposure_cube)
+from src.swap_partitions import SwapPartitionManager
+
+logger = logging.getLogger(__name__)
+
+# Actions that end a trade; anything else carries the trade's full current state
+TERMINATING_ACTIONS = {'TERM', 'EROR', 'PRTO'}
+
+LIVE_TRADE_FIELDS = [
+    c.name for c in CFTCLiveTrade.__table__.columns
+    if c.name in CFTCSwap.__table__.columns and c.name != 'dissemination_id'
+]
+
+APPLY_BATCH_SIZE = 5000
+_LOOKUP_CHUNK = 500
+
+
+def trade_key(original_dissemination_id: Optional[str], dissemination_id: Optional[str]) -> Optional[str]:
+    """Events reference their trade by original dissemination id; a NEWT is its own original."""
+    return (original_dissemination_id or '').strip() or dissemination_id
+
+
+def _event_time(event) -> datetime:
+    return event.event_timestamp or event.execution_timestamp or datetime.min
+
+
+def _get_watermark(session: Session) -> CFTCLifecycleWatermark:
+    watermark = session.get(CFTCLifecycleWatermark, 1)
+    if watermark is None:
+        watermark = CFTCLifecycleWatermark(id=1, last_swap_id=0)
+        session.add(watermark)
+        session.flush()
+    return watermark
+
+
+def _state_time(state: Dict[str, Any]) -> datetime:
+    return state['event_timestamp'] or state['execution_timestamp'] or datetime.min
+
+
+def _current_states(session: Session, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Recorded event time and cube fields of each live trade in keys, and the
+    termination time of each ended one (flagged 'terminated').
+    """
+    columns = [CFTCLiveTrade.trade_id, CFTCLiveTrade.event_timestamp] + [
+        getattr(CFTCLiveTrade, name) for name in CUBE_SOURCE_FIELDS]
+    tombstone_columns = [CFTCTerminatedTrade.trade_id, CFTCTerminatedTrade.event_timestamp,
+                         CFTCTerminatedTrade.execution_timestamp]
+    states = {}
+    for start in range(0, len(keys), _LOOKUP_CHUNK):
+        chunk = keys[start:start + _LOOKUP_CHUNK]
+        for row in session.query(*columns).filter(CFTCLiveTrade.trade_id.in_(chunk)):
+            states[row.trade_id] = dict(row._asdict(), terminated=False)
+        for row in session.query(*tombstone_columns).filter(CFTCTerminatedTrade.trade_id.in_(chunk)):
+            states[row.trade_id] = dict(row._asdict(), terminated=True)
+    return states
+
+
+def _apply_events(session: Session, events: List[Any], stats: Dict[str, int]) -> None:
+    """Folds one batch of events into the live trades, tombstones and cube; the caller commits."""
+    latest = {}
+    for event in events:
+        key = trade_key(event.original_dissemination_id, event.dissemination_id)
+        if key is None:
+            continue
+        current = latest.get(key)
+        if current is None or (_event_time(event), event.id) >= (_event_time(current), current.id):
+            latest[key] = event
+
+    existing = _current_states(session, list(latest))
+    upserts, terminations, tombstones, revived, cube_deltas = [], [], [], [], {}
+    for key, event in latest.items():
+        current = existing.get(key)
+        if current is not None and _event_time(event) < _state_time(current):
+            stats['stale'] += 1
+            continue
+        if current is not None and not current['terminated']:
+            add_trade(cube_deltas, current, -1)
+        if (event.action_type or '').upper() in TERMINATING_ACTIONS:
+            terminations.append(key)
+            tombstones.append({'trade_id': key, 'dissemination_id': event.dissemination_id,
+                               'source_swap_id': event.id, 'action_type': event.action_type,
+                               'event_timestamp': event.event_timestamp,
+                               'execution_timestamp': event.execution_timestamp,
+                               'terminated_at': datetime.utcnow()})
+            continue
+        if current is not None and current['terminated']:
+            revived.append(key)
+        row = {field: getattr(event, field) for field in LIVE_TRADE_FIELDS}
+        row.update(trade_id=key, dissemination_id=event.dissemination_id,
+                   source_swap_id=event.id, updated_at=datetime.utcnow())
+        upserts.append(row)
+        add_trade(cube_deltas, row)
+
+    if upserts:
+        statement = sqlite_insert(CFTCLiveTrade.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=['trade_id'],
+            set_={name: statement.excluded[name] for name in upserts[0] if name != 'trade_id'})
+        session.execute(statement, upserts)
+    for start in range(0, len(terminations), _LOOKUP_CHUNK):
+        session.query(CFTCLiveTrade).filter(
+            CFTCLiveTrade.trade_id.in_(terminations[start:start + _LOOKUP_CHUNK])
+        ).delete(synchronize_session=False)
+    if tombstones:
+        statement = sqlite_insert(CFTCTerminatedTrade.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=['trade_id'],
+            set_={name: statement.excluded[name] for name in tombstones[0] if name != 'trade_id'})
+        session.execute(statement, tombstones)
+    # A trade with an event newer than its termination is live again
+    for start in range(0, len(revived), _LOOKUP_CHUNK):
+        session.query(CFTCTerminatedTrade).filter(
+            CFTCTerminatedTrade.trade_id.in_(revived[start:start + _LOOKUP_CHUNK])
+        ).delete(synchronize_session=False)
+
+    cube_cells = apply_cube_deltas(session, cube_deltas)
+    if upserts or terminations:
+        record_data_change(session, CFTCLiveTrade, row_count=len(upserts) + len(terminations))
+    if cube_cells:
+        record_data_change(session, CFTCExposureCube, row_count=cube_cells)
+
+    stats['events'] += len(events)
+    stats['upserted'] += len(upserts)
+    stats['terminated'] += len(terminations)
+
+
+def apply_lifecycle_events(session: Optional[Session] = None, batch_size: int = APPLY_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Applies every swap event past the watermark to cftc_live_trades.
+
+    Within a batch only the latest event per trade matters. An event older
+    than the state already recorded for its trade (late delivery), including
+    its termination, is ignored, so replaying or reordering batches
+    converges to the same state.
+
+    Returns counts of events read, trades upserted, trades terminated and
+    stale events ignored.
+    """
+    close_session = False
+    if session is None:
+        session = SessionLocal()
+        close_session = True
+
+    stats = {'events': 0, 'upserted': 0, 'terminated': 0, 'stale': 0}
+    try:
+        # Deltas need a complete base: build the cube once for existing live trades
+        if not has_exposure_cube(session) and session.query(CFTCLiveTrade.trade_id).first() is not None:
+            rebuild_exposure_cube(session)
+
+        while True:
+            watermark = _get_watermark(session)
+            events = (session.query(CFTCSwap)
+                      .filter(CFTCSwap.id > watermark.last_swap_id)
+                      .order_by(CFTCSwap.id)
+                      .limit(batch_size)
+                      .all())
+            if not events:
+                break
+
+            _apply_events(session, events, stats)
+            watermark.last_swap_id = events[-1].id
+            watermark.applied_at = datetime.utcnow()
+            session.commit()
+            session.expunge_all()
+
+        if stats['events']:
+            logger.info(f"Applied {stats['events']} swap lifecycle events: {stats}")
+        return stats
+    except Exception as e:
+        logger.error(f"Error applying swap lifecycle events: {e}", exc_info=True)
+        session.rollback()
+        raise
+    finally:
+        if close_session:
+            session.close()
+
+
+def rebuild_live_trades(session: Optional[Session] = None) -> Dict[str, int]:
+    """
+    Discards the live-trade state and replays the full event history: the
+    archived swap months first, then the hot table.
+    """
+    close_session = False
+    if session is None:
+        session = SessionLocal()
+        close_session = True
+    try:
+        session.query(CFTCLiveTrade).delete(synchronize_session=False)
+        session.query(CFTCTerminatedTrade).delete(synchronize_session=False)
+        session.query(CFTCExposureCube).delete(synchronize_session=False)
+        _get_watermark(session).last_swap_id = 0
+        session.commit()
+
+        stats = {'events': 0, 'upserted': 0, 'terminated': 0, 'stale': 0}
+        for events in SwapPartitionManager(bind=session.get_bind()).iter_archived_swaps(APPLY_BATCH_SIZE):
+            _apply_events(session, [CFTCSwap(**event) for event in events], stats)
+            session.commit()
+        for name, count in apply_lifecycle_events(session).items():
+            stats[name] += count
+        return stats
+    finally:
+        if close_session:
+            session.close()
+
+
+def get_live_trade_summary(session: Optional[Session] = None) -> List[Dict[str, Any]]:
+    """Live trade count and notional per asset class."""
+    from sqlalchemy import func
+
+    close_session = False
+    if session is None:
+        session = SessionLocal()
+        close_session = True
+    try:
+        rows = (session.query(CFTCLiveTrade.asset_class,
+                              func.count(CFTCLiveTrade.trade_id),
+                              func.sum(CFTCLiveTrade.notional_amount_leg_1))
+                .group_by(CFTCLiveTrade.asset_class)
+                .all())
+        return [{'asset_class': asset_class, 'live_trades': count, 'total_notional': float(notional or 0)}
+                for asset_class, count, notional in rows]
+    finally:
+        if close_session:
+            session.close()
@@ -0,0 +1,341 @@
+"""
+Monthly partitions for CFTC swap data.
+
+cftc_swap_data stays the hot table that ingest writes to and analytics read.
+Months older than the hot window are rolled out into one SQLite file per
+month, recorded in cftc_swap_partitions. Range queries attach only the month
+files that overlap the requested window, and retention drops a month by
+deleting its file instead of DELETE + VACUUM on the main database.
+
+Aggregate SQL written against cftc_swap_data (columnar_store.run_routed_query)
+runs through query_with_archive whenever its bounded window overlaps an
+archived month: the months are attached behind a temp view of the same name,
+so archiving never hides history from analytics and the SQL still runs
+inside SQLite.
+"""
+
+import logging
+import os
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+from sqlalchemy import DateTime, create_engine, text
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+
+from database import CFTCSwap, CFTCSwapPartition, engine as default_engine, record_data_change
+
+logger = logging.getLogger(__name__)
+
+SWAP_TABLE = CFTCSwap.__tablename__
+PARTITION_TABLE = CFTCSwapPartition.__tablename__
+
+# SQLite allows 10 attached databases per connection by default
+ATTACH_BATCH_SIZE = 8
+
+DateLike = Union[str, date, datetime]
+
+
+def _shift_month(month: str, delta: int) -> str:
+    year, mon = int(month[:4]), int(month[5:7])
+    index = year * 12 + (mon - 1) + delta
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _month_bounds(month: str) -> Tuple[str, str]:
+    """Half-open [start, end) timestamp strings for a YYYY-MM month."""
+    return f"{month}-01", f"{_shift_month(month, 1)}-01"
+
+
+def _as_bound(value: Optional[DateLike]) -> Optional[str]:
+    # Stored timestamps are 'YYYY-MM-DD HH:MM:SS[.ffffff]', so string bounds compare correctly
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+class SwapPartitionManager:
+    """Rolls old months out of cftc_swap_data and queries across partitions."""
+
+    def __init__(self, partition_dir: Optional[str] = None, bind=None):
+        if partition_dir is None:
+            from config import CFTC_PARTITION_DIR
+            partition_dir = CFTC_PARTITION_DIR
+        self.partition_dir = partition_dir
+        self.bind = bind if bind is not None else default_engine
+        self._table_ddl = str(CreateTable(CFTCSwap.__table__).compile(dialect=sqlite.dialect())).strip()
+
+    def partition_path(self, month: str) -> str:
+        return os.path.join(self.partition_dir, f"cftc_swap_{month.replace('-', '_')}.db")
+
+    def list_partitions(self) -> List[Dict[str, Any]]:
+        with self.bind.connect() as conn:
+            rows = conn.execute(text(
+                f"SELECT month, path, row_count, min_execution_timestamp, max_execution_timestamp, archived_at "
+                f"FROM {PARTITION_TABLE} ORDER BY month"
+            )).mappings().all()
+        return [dict(row) for row in rows]
+
+    # ------------------------------------------------------------------
+    # Rollover and retention
+    # ------------------------------------------------------------------
+
+    def archive_months(self, hot_months: Optional[int] = None, before_month: Optional[str] = None) -> Dict[str, int]:
+        """
+        Moves every month older than the hot window into its partition file.
+
+        The cutoff is before_month (YYYY-MM) if given, else the current month
+        minus hot_months (config.CFTC_HOT_MONTHS). Re-archiving a month merges
+        by primary key, so an interrupted run can simply be repeated.
+
+        Returns {month: rows_moved}.
+        """
+        if before_month is None:
+            if hot_months is None:
+                from config import CFTC_HOT_MONTHS
+                hot_months = CFTC_HOT_MONTHS
+            before_month = _shift_month(date.today().strftime('%Y-%m'), -hot_months)
+        cutoff, _ = _month_bounds(before_month)
+
+        with self.bind.connect() as conn:
+            months = conn.execute(text(f"""
+                SELECT substr(execution_timestamp, 1, 7) AS month
+                FROM {SWAP_TABLE}
+                WHERE execution_timestamp < :cutoff
+                GROUP BY month
+                ORDER BY month
+            """), {"cutoff": cutoff}).scalars().all()
+
+        moved = {}
+        for month in months:
+            moved[month] = self._archive_month(month)
+            logger.info(f"Archived {moved[month]} swaps for {month} to {self.partition_path(month)}")
+        return moved
+
+    def _archive_month(self, month: str) -> int:
+        os.makedirs(self.partition_dir, exist_ok=True)
+        path = self.partition_path(month)
+        start, end = _month_bounds(month)
+        window = {"start": start, "end": end}
+
+        with self.bind.connect() as conn:
+            conn.exec_driver_sql("ATTACH DATABASE ? AS part", (path,))
+            try:
+                conn.exec_driver_sql(self._table_ddl.replace(
+                    f"CREATE TABLE {SWAP_TABLE}", f"CREATE TABLE IF NOT EXISTS part.{SWAP_TABLE}", 1))
+                conn.exec_driver_sql(
+                    f"CREATE INDEX IF NOT EXISTS part.idx_{SWAP_TABLE}_execution_timestamp "
+                    f"ON {SWAP_TABLE} (execution_timestamp)")
+
+                # Copy first and commit, so the rows exist in the partition before they leave main
+                moved = conn.execute(text(f"""
+                    INSERT OR REPLACE INTO part.{SWAP_TABLE}
+                    SELECT * FROM main.{SWAP_TABLE}
+                    WHERE execution_timestamp >= :start AND execution_timestamp < :end
+                """), window).rowcount
+                row_count, min_ts, max_ts = conn.execute(text(
+                    f"SELECT COUNT(*), MIN(execution_timestamp), MAX(execution_timestamp) FROM part.{SWAP_TABLE}"
+                )).one()
+                conn.execute(text(f"""
+                    INSERT INTO main.{PARTITION_TABLE}
+                        (month, path, row_count, min_execution_timestamp, max_execution_timestamp, archived_at)
+                    VALUES (:month, :path, :row_count, :min_ts, :max_ts, CURRENT_TIMESTAMP)
+                    ON CONFLICT(month) DO UPDATE SET
+                        path = excluded.path,
+                        row_count = excluded.row_count,
+                        min_execution_timestamp = excluded.min_execution_timestamp,
+                        max_execution_timestamp = excluded.max_execution_timestamp,
+                        archived_at = excluded.archived_at
+                """), {"month": month, "path": path, "row_count": row_count, "min_ts": min_ts, "max_ts": max_ts})
+                conn.commit()
+
+                deleted = conn.execute(text(f"""
+                    DELETE FROM main.{SWAP_TABLE}
+                    WHERE execution_timestamp >= :start AND execution_timestamp < :end
+                """), window).rowcount
+                # The hot table shrank; cached results and mirrors of it must see that
+                with Session(bind=conn) as session:
+                    record_data_change(session, CFTCSwap, row_count=deleted)
+                    session.flush()
+                conn.commit()
+            finally:
+                conn.rollback()
+                conn.exec_driver_sql("DETACH DATABASE part")
+        return moved
+
+    def drop_month(self, month: str) -> bool:
+        """Drops an archived month by deleting its file. Returns False if it was not archived."""
+        with self.bind.begin() as conn:
+            path = conn.execute(text(f"SELECT path FROM {PARTITION_TABLE} WHERE month = :month"),
+                                {"month": month}).scalar()
+            if path is None:
+                return False
+            conn.execute(text(f"DELETE FROM {PARTITION_TABLE} WHERE month = :month"), {"month": month})
+        if os.path.exists(path):
+            os.remove(path)
+        logger.info(f"Dropped swap partition {month}")
+        return True
+
+    def apply_retention(self, keep_months: int) -> List[str]:
+        """Drops archived months older than keep_months before the current month."""
+        oldest_kept = _shift_month(date.today().strftime('%Y-%m'), -keep_months)
+        dropped = [p['month'] for p in self.list_partitions() if p['month'] < oldest_kept]
+        for month in dropped:
+            self.drop_month(month)
+        return dropped
+
+    # ------------------------------------------------------------------
+    # Querying
+    # ------------------------------------------------------------------
+
+    def _partitions_in_range(self, start: Optional[str], end: Optional[str]) -> List[Tuple[str, str]]:
+        clauses, params = [], {}
+        if start is not None:
+            clauses.append("month >= :start_month")
+            params["start_month"] = start[:7]
+        if end is not None:
+            clauses.append("month <= :end_month")
+            params["end_month"] = end[:7]
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.bind.connect() as conn:
+            rows = conn.execute(text(f"SELECT month, path FROM {PARTITION_TABLE} {where} ORDER BY month"),
+                                params).all()
+        return [(month, path) for month, path in rows if os.path.exists(path)]
+
+    def query_swaps(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None,
+                    where: Optional[str] = None, params: Optional[Dict[str, Any]] = None,
+                    columns: str = "*") -> pd.DataFrame:
+        """
+        Returns swaps with start <= execution_timestamp < end across the hot
+        table and every archived month in range; months outside the range are
+        never opened. `where` is an extra SQL predicate using :name parameters.
+        """
+        start, end = _as_bound(start), _as_bound(end)
+        predicates, bound = [], dict(params or {})
+        if start is not None:
+            predicates.append("execution_timestamp >= :range_start")
+            bound["range_start"] = start
+        if end is not None:
+            predicates.append("execution_timestamp < :range_end")
+            bound["range_end"] = end
+        if where:
+            predicates.append(f"({where})")
+        where_sql = f" WHERE {' AND '.join(predicates)}" if predicates else ""
+
+        sources = ["main"]
+        partitions = self._partitions_in_range(start, end)
+        frames = []
+        with self.bind.connect() as conn:
+            # The hot table goes with the first batch; later batches are partitions only
+            for offset in range(0, max(len(partitions), 1), ATTACH_BATCH_SIZE):
+                batch = partitions[offset:offset + ATTACH_BATCH_SIZE]
+                aliases = [f"p{i}" for i in range(len(batch))]
+                for alias, (_, path) in zip(aliases, batch):
+                    conn.exec_driver_sql(f"ATTACH DATABASE ? AS {alias}", (path,))
+                try:
+                    schemas = (sources if offset == 0 else []) + aliases
+                    if not schemas:
+                        continue
+                    union_sql = " UNION ALL ".join(
+                        f"SELECT {columns} FROM {schema}.{SWAP_TABLE}{where_sql}" for schema in schemas)
+                    frames.append(pd.read_sql(text(union_sql), conn, params=bound))
+                finally:
+                    conn.rollback()
+                    for alias in aliases:
+                        conn.exec_driver_sql(f"DETACH DATABASE {alias}")
+
+        frames = [frame for frame in frames if not frame.empty] or frames[:1]
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def iter_archived_swaps(self, batch_size: int = 5000) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yields every archived swap as column dicts (timestamps as datetimes),
+        in batches, month by month in id order. Used to replay history that
+        no longer lives in the hot table.
+        """
+        timestamps = [c.name for c in CFTCSwap.__table__.columns if isinstance(c.type, DateTime)]
+        for partition in self.list_partitions():
+            if not os.path.exists(partition['path']):
+                continue
+            month_engine = create_engine(f"sqlite:///{partition['path']}")
+            try:
+                with month_engine.connect() as conn:
+                    for chunk in pd.read_sql(text(f"SELECT * FROM {SWAP_TABLE} ORDER BY id"), conn,
+                                             chunksize=batch_size):
+                        records = chunk.astype(object).where(chunk.notna(), None).to_dict('records')
+                        for record in records:
+                            for column in timestamps:
+                                if isinstance(record[column], str):
+                                    record[column] = datetime.fromisoformat(record[column])
+                        yield records
+            finally:
+                month_engine.dispose()
+
+    def query_with_archive(self, sql: str, params: Optional[Dict[str, Any]] = None,
+                           start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> Optional[pd.DataFrame]:
+        """
+        Runs SQL that reads cftc_swap_data over the hot table plus every
+        archived month overlapping [start, end] (inclusive; end None is
+        open). The months are attached and a temp view named cftc_swap_data
+        unions them with main's table, so the SQL runs in place, unchanged,
+        with the partitions' execution_timestamp indexes. Months beyond the
+        attach limit are copied, for the window only, into a temp table the
+        view also reads.
+
+        Returns None when no archived month overlaps or start is None (an
+        unbounded window would read all of history), i.e. the hot table
+        alone answers the query.
+        """
+        start, end = _as_bound(start), _as_bound(end)
+        if start is None:
+            return None
+        partitions = self._partitions_in_range(start, end)
+        if not partitions:
+            return None
+        # The newest months are attached for the query; older ones are copied
+        overflow, attached = partitions[:-ATTACH_BATCH_SIZE], partitions[-ATTACH_BATCH_SIZE:]
+        # Copy through the end of end's month, so the SQL's own bound decides inclusiveness. The open
+        # end is a full date: the column's numeric affinity would turn '9999' into an integer.
+        window = {"start": start, "end": _month_bounds(end[:7])[1] if end is not None else "9999-12-31"}
+        sources = [f"main.{SWAP_TABLE}"]
+
+        with self.bind.connect() as conn:
+            aliases = []
+            try:
+                if overflow:
+                    conn.exec_driver_sql(f"CREATE TEMP TABLE archived_swap_overflow AS "
+                                         f"SELECT * FROM main.{SWAP_TABLE} WHERE 0")
+                    for _, path in overflow:
+                        conn.exec_driver_sql("ATTACH DATABASE ? AS overflow", (path,))
+                        try:
+                            conn.execute(text(f"""
+                                INSERT INTO temp.archived_swap_overflow
+                                SELECT * FROM overflow.{SWAP_TABLE}
+                                WHERE execution_timestamp >= :start AND execution_timestamp < :end
+                            """), window)
+                            conn.commit()  # Only the temp table was written
+                        finally:
+                            conn.rollback()
+                            conn.exec_driver_sql("DETACH DATABASE overflow")
+                    sources.append("temp.archived_swap_overflow")
+
+                for i, (_, path) in enumerate(attached):
+                    conn.exec_driver_sql(f"ATTACH DATABASE ? AS p{i}", (path,))
+                    aliases.append(f"p{i}")
+                sources.extend(f"{alias}.{SWAP_TABLE}" for alias in aliases)
+                # Unqualified names resolve to temp first, so the view shadows main's table
+                conn.exec_driver_sql(f"CREATE TEMP VIEW {SWAP_TABLE} AS " +
+                                     " UNION ALL ".join(f"SELECT * FROM {source}" for source in sources))
+                return pd.read_sql(text(sql), conn, params=params or {})
+            finally:
+                conn.rollback()
+                conn.exec_driver_sql(f"DROP VIEW IF EXISTS temp.{SWAP_TABLE}")
+                conn.exec_driver_sql("DROP TABLE IF EXISTS temp.archived_swap_overflow")
+                for alias in aliases:
+                    conn.exec_driver_sql(f"DETACH DATABASE {alias}")
+
+
+def get_partition_manager() -> SwapPartitionManager:
+    return SwapPartitionManager()
@@ -1,23 +1,127 @@
 """
 Temporal Analysis Tools for GameCock AI
 Specialized tools for analyzing how management views and risk factors change over time.
+
+Sections and filing dates for a company set and year range come back from a
+single joined query. Year-over-year risk factor diffs are stored in
+sec_10k_risk_factor_diffs the first time they are computed and reused after.
+8-K event patterns are read from the filing event timeline (filing_events).
 """
 
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+import re
+from typing import Dict, List, Any, Optional, Sequence, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, desc, asc
-from database import SessionLocal, Sec10KDocument, Sec8KItem, Sec10KSubmission, Sec8KSubmission
+from database import (SessionLocal, Sec10KDocument, Sec8KItem, Sec10KSubmission, Sec8KSubmission,
+                      Sec10KRiskFactorDiff, record_data_change)
+from src.filing_events import get_filing_events
 
 logger = logging.getLogger(__name__)
 
+# Forms whose risk factors are compared year over year
+ANNUAL_FORM_TYPES = ('10-K', '10-K405', '10-KT')
+DIFF_SAMPLE_PARAGRAPHS = 3
+DIFF_SAMPLE_CHARS = 300
+DIFF_FIELDS = ('accession_number', 'previous_accession_number', 'year', 'previous_year', 'paragraphs_added',
+               'paragraphs_removed', 'paragraphs_retained', 'words_added', 'words_removed', 'word_count_change',
+               'similarity', 'added_samples', 'removed_samples')
+
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+
+def _truncate(content: Optional[str], limit: int) -> str:
+    content = content or ''
+    return content[:limit] + "..." if len(content) > limit else content
+
+
+def _paragraphs(content: Optional[str]) -> Dict[str, str]:
+    """Normalized paragraph -> original text, in document order. Falls back to lines without blank-line breaks."""
+    content = content or ''
+    parts = _PARAGRAPH_BREAK.split(content)
+    if len(parts) == 1:
+        parts = content.splitlines()
+    paragraphs = {}
+    for part in parts:
+        text = ' '.join(part.split())
+        if text:
+            paragraphs.setdefault(text.lower(), text)
+    return paragraphs
+
+
+def diff_risk_factors(previous: Optional[str], current: Optional[str]) -> Dict[str, Any]:
+    """Paragraph-level changes between two risk factor sections."""
+    before, after = _paragraphs(previous), _paragraphs(current)
+    added = [after[key] for key in after if key not in before]
+    removed = [before[key] for key in before if key not in after]
+    retained = len(after) - len(added)
+    union = len(before) + len(added)
+    return {
+        'paragraphs_added': len(added),
+        'paragraphs_removed': len(removed),
+        'paragraphs_retained': retained,
+        'words_added': sum(len(p.split()) for p in added),
+        'words_removed': sum(len(p.split()) for p in removed),
+        'word_count_change': len((current or '').split()) - len((previous or '').split()),
+        'similarity': retained / union if union else 1.0,
+        'added_samples': [_truncate(p, DIFF_SAMPLE_CHARS) for p in added[:DIFF_SAMPLE_PARAGRAPHS]],
+        'removed_samples': [_truncate(p, DIFF_SAMPLE_CHARS) for p in removed[:DIFF_SAMPLE_PARAGRAPHS]],
+    }
+
+
 class TemporalAnalysisEngine:
     """Engine for analyzing how SEC filing content changes over time."""
     
     def __init__(self, db_session: Optional[Session] = None):
         self.db = db_session if db_session else SessionLocal()
     
+    def _load_sections(self, company_ciks: Sequence[str], sections: Sequence[str], start_year: int, end_year: int,
+                       form_types: Optional[Sequence[str]] = None, with_content: bool = True) -> list:
+        """
+        Sections of the companies' filings dated start_year..end_year with
+        their filing dates, in one joined query ordered by company, filing
+        date and section sequence. Each row has cik, accession_number,
+        filing_date, section, word_count and (with_content) content.
+        """
+        columns = [Sec10KSubmission.cik, Sec10KSubmission.accession_number, Sec10KSubmission.filing_date,
+                   Sec10KDocument.section, Sec10KDocument.word_count]
+        if with_content:
+            columns.append(Sec10KDocument.content)
+        conditions = [
+            Sec10KSubmission.cik.in_(list(company_ciks)),
+            Sec10KDocument.section.in_(list(sections)),
+            Sec10KSubmission.filing_date >= datetime(start_year, 1, 1),
+            Sec10KSubmission.filing_date < datetime(end_year + 1, 1, 1),
+        ]
+        if form_types:
+            conditions.append(Sec10KSubmission.form_type.in_(list(form_types)))
+        return self.db.query(*columns).join(
+            Sec10KDocument, Sec10KDocument.accession_number == Sec10KSubmission.accession_number
+        ).filter(and_(*conditions)).order_by(
+            Sec10KSubmission.cik, Sec10KSubmission.filing_date.asc(), Sec10KDocument.sequence
+        ).all()
+    
+    @staticmethod
+    def _yearly_breakdown(rows: list) -> Dict[int, Dict[str, Any]]:
+        """Groups section rows by filing year."""
+        breakdown = {}
+        for row in rows:
+            year = row.filing_date.year
+            if year not in breakdown:
+                breakdown[year] = {
+                    'filing_count': 0,
+                    'total_words': 0,
+                    'content_samples': [],
+                    'filing_dates': []
+                }
+            
+            breakdown[year]['filing_count'] += 1
+            breakdown[year]['total_words'] += row.word_count or 0
+            breakdown[year]['content_samples'].append(_truncate(row.content, 500))
+            breakdown[year]['filing_dates'].append(row.filing_date.strftime('%Y-%m-%d'))
+        return breakdown
+    
     def analyze_risk_evolution(self, company_cik: str, years: Optional[List[int]] = None) -> Dict[str, Any]:
         """
         Analyze how risk factors have evolved over time for a company.
@@ -34,42 +138,11 @@ class TemporalAnalysisEngine:
                 current_year = datetime.now().year
                 years = list(range(current_year - 4, current_year + 1))
             
-            # Get all risk factor sections for the company
-            risk_sections = self.db.query(Sec10KDocument).join(
-                Sec10KSubmission, Sec10KDocument.accession_number == Sec10KSubmission.accession_number
-            ).filter(
-                and_(
-                    Sec10KSubmission.cik == company_cik,
-                    Sec10KDocument.section == 'risk_factors',
-                    Sec10KSubmission.filing_date >= datetime(years[0], 1, 1),
-                    Sec10KSubmission.filing_date <= datetime(years[-1], 12, 31)
-                )
-            ).order_by(Sec10KSubmission.filing_date.asc()).all()
-            
+            risk_sections = self._load_sections([company_cik], ['risk_factors'], years[0], years[-1])
             if not risk_sections:
                 return {"error": f"No risk factor data found for CIK {company_cik}"}
             
-            # Analyze risk content by year
-            risk_analysis = {}
-            for section in risk_sections:
-                filing_date = self.db.query(Sec10KSubmission.filing_date).filter(
-                    Sec10KSubmission.accession_number == section.accession_number
-                ).scalar()
-                
-                year = filing_date.year
-                if year not in risk_analysis:
-                    risk_analysis[year] = {
-                        'filing_count': 0,
-                        'total_words': 0,
-                        'content_samples': [],
-                        'filing_dates': []
-                    }
-                
-                risk_analysis[year]['filing_count'] += 1
-                risk_analysis[year]['total_words'] += section.word_count or 0
-                risk_analysis[year]['content_samples'].append(section.content[:500] + "..." if len(section.content) > 500 else section.content)
-                risk_analysis[year]['filing_dates'].append(filing_date.strftime('%Y-%m-%d'))
-            
+            risk_analysis = self._yearly_breakdown(risk_sections)
             return {
                 'company_cik': company_cik,
                 'analysis_period': f"{years[0]}-{years[-1]}",
@@ -98,42 +171,11 @@ class TemporalAnalysisEngine:
                 current_year = datetime.now().year
                 years = list(range(current_year - 4, current_year + 1))
             
-            # Get all MD&A sections for the company
-            mdna_sections = self.db.query(Sec10KDocument).join(
-                Sec10KSubmission, Sec10KDocument.accession_number == Sec10KSubmission.accession_number
-            ).filter(
-                and_(
-                    Sec10KSubmission.cik == company_cik,
-                    Sec10KDocument.section == 'mdna',
-                    Sec10KSubmission.filing_date >= datetime(years[0], 1, 1),
-                    Sec10KSubmission.filing_date <= datetime(years[-1], 12, 31)
-                )
-            ).order_by(Sec10KSubmission.filing_date.asc()).all()
-            
+            mdna_sections = self._load_sections([company_cik], ['mdna'], years[0], years[-1])
             if not mdna_sections:
                 return {"error": f"No MD&A data found for CIK {company_cik}"}
             
-            # Analyze MD&A content by year
-            mdna_analysis = {}
-            for section in mdna_sections:
-                filing_date = self.db.query(Sec10KSubmission.filing_date).filter(
-                    Sec10KSubmission.accession_number == section.accession_number
-                ).scalar()
-                
-                year = filing_date.year
-                if year not in mdna_analysis:
-                    mdna_analysis[year] = {
-                        'filing_count': 0,
-                        'total_words': 0,
-                        'content_samples': [],
-                        'filing_dates': []
-                    }
-                
-                mdna_analysis[year]['filing_count'] += 1
-                mdna_analysis[year]['total_words'] += section.word_count or 0
-                mdna_analysis[year]['content_samples'].append(section.content[:500] + "..." if len(section.content) > 500 else section.content)
-                mdna_analysis[year]['filing_dates'].append(filing_date.strftime('%Y-%m-%d'))
-            
+            mdna_analysis = self._yearly_breakdown(mdna_sections)
             return {
                 'company_cik': company_cik,
                 'analysis_period': f"{years[0]}-{years[-1]}",
@@ -158,33 +200,14 @@ class TemporalAnalysisEngine:
             Dictionary with comparative risk analysis
         """
         try:
-            comparison_data = {}
-            
-            for cik in company_ciks:
-                # Get risk factors for this company in this year
-                risk_sections = self.db.query(Sec10KDocument).join(
-                    Sec10KSubmission, Sec10KDocument.accession_number == Sec10KSubmission.accession_number
-                ).filter(
-                    and_(
-                        Sec10KSubmission.cik == cik,
-                        Sec10KDocument.section == 'risk_factors',
-                        Sec10KSubmission.filing_date >= datetime(year, 1, 1),
-                        Sec10KSubmission.filing_date <= datetime(year, 12, 31)
-                    )
-                ).all()
-                
-                if risk_sections:
-                    comparison_data[cik] = {
-                        'filing_count': len(risk_sections),
-                        'total_words': sum(section.word_count or 0 for section in risk_sections),
-                        'content_samples': [section.content[:300] + "..." if len(section.content) > 300 else section.content for section in risk_sections]
-                    }
-                else:
-                    comparison_data[cik] = {
-                        'filing_count': 0,
-                        'total_words': 0,
-                        'content_samples': []
-                    }
+            comparison_data = {cik: {'filing_count': 0, 'total_words': 0, 'content_samples': []}
+                               for cik in company_ciks}
+            for section in self._load_sections(company_ciks, ['risk_factors'], year, year):
+                data = comparison_data.setdefault(section.cik, {'filing_count': 0, 'total_words': 0,
+                                                                'content_samples': []})
+                data['filing_count'] += 1
+                data['total_words'] += section.word_count or 0
+                data['content_samples'].append(_truncate(section.content, 300))
             
             return {
                 'comparison_year': year,
@@ -197,6 +220,98 @@ class TemporalAnalysisEngine:
             logger.error(f"Error comparing risk factors: {e}")
             return {"error": str(e)}
     
+    def get_risk_factor_changes(self, company_ciks: List[str], years: Optional[List[int]] = None) -> Dict[str, Any]:
+        """
+        Year-over-year risk factor changes between consecutive annual filings.
+        
+        Diffs already in sec_10k_risk_factor_diffs are reused; only new
+        filing pairs have their section text loaded and compared, and those
+        results are stored.
+        
+        Args:
+            company_ciks: List of company CIK identifiers
+            years: Years whose filings are compared with the filing before them (default: last 5 years)
+        
+        Returns:
+            Dictionary with per-company lists of yearly changes
+        """
+        try:
+            if not years:
+                current_year = datetime.now().year
+                years = list(range(current_year - 4, current_year + 1))
+            years = sorted(years)
+            
+            # Latest annual filing per company and year, one year back for the first comparison
+            filings: Dict[str, Dict[int, str]] = {}
+            for row in self._load_sections(company_ciks, ['risk_factors'], years[0] - 1, years[-1],
+                                           form_types=ANNUAL_FORM_TYPES, with_content=False):
+                filings.setdefault(row.cik, {})[row.filing_date.year] = row.accession_number
+            
+            pairs: Dict[Tuple[str, str], Tuple[str, int, int]] = {}
+            for cik, by_year in filings.items():
+                filing_years = sorted(by_year)
+                for previous_year, year in zip(filing_years, filing_years[1:]):
+                    if year in years:
+                        pairs[(by_year[year], by_year[previous_year])] = (cik, year, previous_year)
+            
+            stored = {}
+            if pairs:
+                stored = {(d.accession_number, d.previous_accession_number):
+                          {field: getattr(d, field) for field in DIFF_FIELDS}
+                          for d in self.db.query(Sec10KRiskFactorDiff).filter(
+                              Sec10KRiskFactorDiff.cik.in_(list(filings)))}
+            missing = [pair for pair in pairs if pair not in stored]
+            if missing:
+                stored.update(self._store_risk_factor_diffs(missing, pairs))
+            
+            companies = {cik: {'changes': []} for cik in company_ciks}
+            for pair, (cik, _, _) in sorted(pairs.items(), key=lambda item: item[1]):
+                companies.setdefault(cik, {'changes': []})['changes'].append(stored[pair])
+            for data in companies.values():
+                data['summary'] = self._generate_risk_change_summary(data['changes'])
+            
+            return {
+                'analysis_period': f"{years[0]}-{years[-1]}",
+                'companies': companies,
+                'diffs_computed': len(missing),
+                'diffs_reused': len(pairs) - len(missing),
+            }
+            
+        except Exception as e:
+            logger.error(f"Error analyzing risk factor changes: {e}")
+            return {"error": str(e)}
+    
+    def _store_risk_factor_diffs(self, pairs: List[Tuple[str, str]],
+                                 details: Dict[Tuple[str, str], Tuple[str, int, int]]) -> Dict[Tuple[str, str], Dict]:
+        """Computes and saves diffs for (accession, previous accession) pairs, loading their text in one query."""
+        accessions = {accession for pair in pairs for accession in pair}
+        texts: Dict[str, List[str]] = {}
+        for accession_number, content in self.db.query(
+                Sec10KDocument.accession_number, Sec10KDocument.content).filter(
+                and_(Sec10KDocument.accession_number.in_(list(accessions)),
+                     Sec10KDocument.section == 'risk_factors')).order_by(Sec10KDocument.sequence):
+            texts.setdefault(accession_number, []).append(content or '')
+        
+        rows = []
+        for pair in pairs:
+            accession_number, previous_accession_number = pair
+            cik, year, previous_year = details[pair]
+            rows.append(dict(
+                accession_number=accession_number, previous_accession_number=previous_accession_number,
+                cik=cik, year=year, previous_year=previous_year,
+                **diff_risk_factors('\n\n'.join(texts.get(previous_accession_number, [])),
+                                    '\n\n'.join(texts.get(accession_number, [])))))
+        try:
+            self.db.add_all([Sec10KRiskFactorDiff(computed_at=datetime.utcnow(), **row) for row in rows])
+            record_data_change(self.db, Sec10KRiskFactorDiff, rows)
+            self.db.commit()
+        except Exception as e:
+            # The diffs are still returned; they are recomputed next time
+            logger.warning(f"Could not store risk factor diffs: {e}")
+            self.db.rollback()
+        return {(row['accession_number'], row['previous_accession_number']):
+                {field: row[field] for field in DIFF_FIELDS} for row in rows}
+    
     def analyze_8k_event_patterns(self, company_cik: str, months: int = 12) -> Dict[str, Any]:
         """
         Analyze patterns in 8-K filings (events) for a company.
@@ -211,38 +326,44 @@ class TemporalAnalysisEngine:
         try:
             cutoff_date = datetime.now() - timedelta(days=months * 30)
             
-            # Get all 8-K items for the company
-            items = self.db.query(Sec8KItem).join(
-                Sec8KSubmission, Sec8KItem.accession_number == Sec8KSubmission.accession_number
-            ).filter(
-                and_(
-                    Sec8KSubmission.cik == company_cik,
-                    Sec8KSubmission.filing_date >= cutoff_date
-                )
-            ).order_by(Sec8KSubmission.filing_date.desc()).all()
+            # 8-K items from the filing event timeline, a range read over the company's events
+            events = get_filing_events(company_cik, start_date=cutoff_date.strftime('%Y-%m-%d'),
+                                       sources=['current'], session=self.db)
             
-            if not items:
+            if not events:
                 return {"error": f"No 8-K data found for CIK {company_cik} in the last {months} months"}
             
-            # Analyze by item type
+            # Analyze by item type; events come newest first
             item_analysis = {}
-            for item in items:
-                item_type = item.item_number
+            example_keys = []
+            for event in events:
+                item_type = event['event_code']
                 if item_type not in item_analysis:
                     item_analysis[item_type] = {
                         'count': 0,
-                        'title': item.item_title,
+                        'title': event['description'],
                         'recent_examples': []
                     }
                 
                 item_analysis[item_type]['count'] += 1
-                if len(item_analysis[item_type]['recent_examples']) < 3:
-                    item_analysis[item_type]['recent_examples'].append(item.content[:200] + "..." if len(item.content) > 200 else item.content)
+                if item_analysis[item_type]['count'] <= 3:
+                    example_keys.append((event['accession_number'], item_type))
+            
+            # Item text only for the examples shown
+            contents = {}
+            if example_keys:
+                for item in self.db.query(Sec8KItem).filter(
+                    Sec8KItem.accession_number.in_({accession for accession, _ in example_keys})
+                ).all():
+                    contents[(item.accession_number, item.item_number)] = item.content or ''
+            for key in example_keys:
+                if key in contents:
+                    item_analysis[key[1]]['recent_examples'].append(_truncate(contents[key], 200))
             
             return {
                 'company_cik': company_cik,
                 'analysis_period_months': months,
-                'total_events': len(items),
+                'total_events': len(events),
                 'item_breakdown': item_analysis,
                 'summary': self._generate_8k_pattern_summary(item_analysis)
             }
@@ -313,6 +434,18 @@ class TemporalAnalysisEngine:
                f"Company {most_comprehensive} has the most comprehensive risk discussion ({max_words} words). " \
                f"Average filings per company: {sum(data['filing_count'] for data in comparison_data.values()) / len(companies_with_data):.1f}."
     
+    def _generate_risk_change_summary(self, changes: List[Dict[str, Any]]) -> str:
+        """Generate a summary of year-over-year risk factor changes."""
+        if not changes:
+            return "No consecutive annual filings with risk factors to compare."
+        
+        largest = min(changes, key=lambda change: change['similarity'])
+        return f"{len(changes)} year-over-year comparison(s). " \
+               f"Largest change: {largest['previous_year']} → {largest['year']} " \
+               f"({largest['paragraphs_added']} paragraphs added, {largest['paragraphs_removed']} removed, " \
+               f"{largest['similarity']:.0%} similar). " \
+               f"Net word change over the period: {sum(change['word_count_change'] for change in changes):+d}."
+    
     def _generate_8k_pattern_summary(self, item_analysis: Dict) -> str:
         """Generate a summary of 8-K event patterns."""
         if not item_analysis:
@@ -394,6 +527,29 @@ def compare_company_risks(company_ciks: List[str], year: int) -> str:
     
     return response
 
+def analyze_risk_factor_changes(company_ciks: List[str], years: Optional[List[int]] = None) -> str:
+    """Summarize year-over-year risk factor changes for one or more companies."""
+    if isinstance(company_ciks, str):
+        company_ciks = [company_ciks]
+    engine = TemporalAnalysisEngine()
+    result = engine.get_risk_factor_changes(company_ciks, years)
+    
+    if 'error' in result:
+        return f"Error: {result['error']}"
+    
+    # Format for RAG system
+    response = f"Risk Factor Changes ({result['analysis_period']}):\n\n"
+    for cik, data in result['companies'].items():
+        response += f"Company {cik}: {data['summary']}\n"
+        for change in data['changes']:
+            response += f"  {change['previous_year']} → {change['year']}: " \
+                        f"+{change['paragraphs_added']} / -{change['paragraphs_removed']} paragraphs, " \
+                        f"{change['word_count_change']:+d} words, {change['similarity']:.0%} similar\n"
+            for sample in change['added_samples']:
+                response += f"    New: {sample}\n"
+    
+    return response
+
 def analyze_company_events(company_cik: str, months: int = 12) -> str:
     """Analyze 8-K event patterns for a company."""
     engine = TemporalAnalysisEngine()
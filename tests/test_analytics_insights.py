@@ -0,0 +1,161 @@
+"""
+Tests for deferred, size-bounded AI insights against a stub model server.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.analytics_insights import (InsightGenerator, MAX_PROMPT_CHARS, build_insight_prompt,
+                                    summarize_results)
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, create_tuned_engine
+from src.analytics_tools import AnalyticsEngine, swap_market_overview
+from src.result_cache import AnalyticsResultCache
+
+MODEL_DELAY = 0.5
+LARGE_RESULT = {
+    'asset_class_exposure': [
+        {'asset_class': f"CLASS{i % 7}", 'total_notional': float(i * 1000), 'trade_count': i,
+         'description': 'x' * 500}
+        for i in range(20000)
+    ],
+    'query_engine': 'sqlite',
+}
+
+
+class StubModelHandler(BaseHTTPRequestHandler):
+    prompts = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        StubModelHandler.prompts.append(body['messages'][0]['content'])
+        time.sleep(MODEL_DELAY)
+        payload = json.dumps({
+            'model': body['model'], 'created_at': '2024-01-01T00:00:00Z', 'done': True,
+            'message': {'role': 'assistant', 'content': 'Stub insight'},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAnalyticsInsights(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), StubModelHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.host = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubModelHandler.prompts = []
+        self.generator = InsightGenerator(host=self.host, timeout=10)
+
+    def tearDown(self):
+        self.generator.shutdown()
+
+    def test_summary_is_bounded_statistics(self):
+        summary = summarize_results(LARGE_RESULT)
+        exposure = summary['asset_class_exposure']
+        self.assertEqual(exposure['row_count'], 20000)
+        self.assertEqual(exposure['columns']['trade_count']['max'], 19999)
+        self.assertEqual(exposure['columns']['asset_class']['distinct'], 7)
+        self.assertEqual(len(exposure['sample']), 5)
+        self.assertLessEqual(len(build_insight_prompt('exposure_analysis', LARGE_RESULT, {})), MAX_PROMPT_CHARS)
+
+    def test_results_return_before_deferred_insights(self):
+        delivered = threading.Event()
+        received = {}
+
+        def on_insight(insight_id, status):
+            received.update(status)
+            delivered.set()
+
+        with AnalyticsEngine(insight_generator=self.generator) as engine:
+            engine._analyze_exposure = lambda params: LARGE_RESULT
+            started = time.perf_counter()
+            result = engine.execute_analytical_query('exposure_analysis', {}, on_insight=on_insight)
+            elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, MODEL_DELAY)
+        self.assertEqual(result['insight_status'], 'pending')
+        self.assertIsNone(result['ai_insights'])
+
+        status = self.generator.status(result['insight_id'], wait=10)
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual(status['insights'], 'Stub insight')
+        self.assertTrue(delivered.wait(5))
+        self.assertEqual(received['insight_id'], result['insight_id'])
+        self.assertEqual(len(StubModelHandler.prompts), 1)
+        self.assertLessEqual(len(StubModelHandler.prompts[0]), MAX_PROMPT_CHARS)
+
+    def test_sync_and_disabled_modes(self):
+        with AnalyticsEngine(insight_generator=self.generator) as engine:
+            engine._analyze_exposure = lambda params: {'rows': []}
+            self.assertEqual(engine.execute_analytical_query('exposure_analysis', {}, insights='sync')['ai_insights'],
+                             'Stub insight')
+            result = engine.execute_analytical_query('exposure_analysis', {}, insights='none')
+        self.assertNotIn('insight_id', result)
+        self.assertEqual(len(StubModelHandler.prompts), 1)
+
+    def test_cached_results_get_a_fresh_insight_job(self):
+        test_dir = tempfile.mkdtemp()
+        engine = create_tuned_engine(f"sqlite:///{os.path.join(test_dir, 'insights.db')}")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        disk_path = os.path.join(test_dir, 'analytics_cache.db')
+        try:
+            with patch('src.analytics_tools.get_insight_generator', return_value=self.generator), \
+                    patch.object(AnalyticsEngine, '_swap_market_overview', lambda engine, params: {'rows': []}):
+                with patch('src.result_cache.get_result_cache',
+                           return_value=AnalyticsResultCache(db_session=session, disk_path=disk_path)):
+                    first = json.loads(swap_market_overview())
+                # Another process reading the same disk cache
+                with patch('src.result_cache.get_result_cache',
+                           return_value=AnalyticsResultCache(db_session=session, disk_path=disk_path)):
+                    second = json.loads(swap_market_overview())
+
+            self.assertEqual(first['timestamp'], second['timestamp'])
+            self.assertNotEqual(first['insight_id'], second['insight_id'])
+            self.assertEqual(self.generator.status(second['insight_id'], wait=10)['status'], 'done')
+            cached = AnalyticsResultCache(db_session=session, disk_path=disk_path).get('swap_market_overview', {})
+            self.assertNotIn('insight_id', json.loads(cached))
+        finally:
+            session.close()
+            engine.dispose()
+            shutil.rmtree(test_dir, ignore_errors=True)
+
+    def test_unreachable_model_reports_failure(self):
+        generator = InsightGenerator(host='http://127.0.0.1:9', timeout=2)
+        try:
+            insight_id = generator.submit('exposure_analysis', {'rows': []}, {})
+            status = generator.status(insight_id, wait=10)
+        finally:
+            generator.shutdown()
+        self.assertEqual(status['status'], 'failed')
+        self.assertEqual(generator.status('insight-missing')['status'], 'unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -21,7 +21,7 @@ sys.path.append(root_dir)      # Add root/ to path for other dependencies
 
 import database
 # Import from the correct database module (GameCockAI/database.py)
-from database import create_db_and_tables, SessionLocal
+from database import Base, create_db_and_tables, create_tuned_engine, SessionLocal
 
 class BaseIntegrationTest(unittest.TestCase):
     """Base class for integration tests with database setup and teardown."""
@@ -126,3 +126,19 @@ class BaseIntegrationTest(unittest.TestCase):
             zf.writestr('SUBMISSION.tsv', pd.DataFrame(submission_data).to_csv(sep='\t', index=False))
             zf.writestr('HOLDING.tsv', pd.DataFrame(holdings_data).to_csv(sep='\t', index=False))
         return nport_zip_path
+
+
+class TunedDatabaseTest(unittest.TestCase):
+    """Base class for tests that each get a fresh database file on a tuned engine, with every table created."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.engine = create_tuned_engine(f"sqlite:///{os.path.join(self.test_dir, 'test.db')}")
+        Base.metadata.create_all(bind=self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        self.session = self.Session()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
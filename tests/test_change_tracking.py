@@ -0,0 +1,123 @@
+"""
+Tests for the data change log and change-aware caching.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import database
+from database import (CompanyProfileWatermark, DataChangeLog, record_data_change,
+                      current_data_epoch, data_changed_since, prune_data_change_log)
+from src.change_tracking import ChangeAwareCache
+from src.processor_cftc_swaps import load_swap_transactions
+from tests.test_base import TunedDatabaseTest
+
+
+class TestChangeTracking(TunedDatabaseTest):
+
+    def _ingest(self, table, records=None, row_count=None):
+        record_data_change(self.session, table, records, row_count)
+        self.session.commit()
+        return current_data_epoch(db_session=self.session)
+
+    def test_keys_are_recorded_per_entity(self):
+        self.assertEqual(current_data_epoch(db_session=self.session), 0)
+        self._ingest('form13f_submissions', [{'cik': '0000320193'}, {'cik': '320193'}, {'cik': '789019'}])
+        entries = {(e.key_type, e.key_value): e.row_count for e in self.session.query(DataChangeLog)}
+        self.assertEqual(entries, {('cik', '320193'): 2, ('cik', '789019'): 1})
+
+        self.assertTrue(data_changed_since(0, keys=['0000320193'], db_session=self.session))
+        self.assertFalse(data_changed_since(0, keys=['1018724'], db_session=self.session))
+        self.assertFalse(data_changed_since(0, tables=['nport_holdings'], db_session=self.session))
+
+    def test_batches_without_keys_are_table_wide(self):
+        epoch = self._ingest('cftc_swap_data', row_count=500)
+        self.assertTrue(data_changed_since(0, keys=['1018724'], db_session=self.session))
+        self.assertFalse(data_changed_since(epoch, db_session=self.session))
+
+        with patch.object(database, 'CHANGE_LOG_MAX_KEYS', 2):
+            self._ingest('nport_submissions', [{'cik': str(i)} for i in range(3)])
+        latest = self.session.query(DataChangeLog).order_by(DataChangeLog.epoch.desc()).first()
+        self.assertIsNone(latest.key_value)
+        self.assertEqual(latest.row_count, 3)
+
+    def test_cache_survives_unrelated_changes(self):
+        cache = ChangeAwareCache(tables=['form13f_submissions'], db_session=self.session)
+        cache.put('apple', 'profile', entity_keys=['320193'])
+        self._ingest('form13f_submissions', [{'cik': '789019'}])
+        self._ingest('nport_submissions')
+        self.assertEqual(cache.get('apple'), 'profile')
+
+        self._ingest('form13f_submissions', [{'cik': '0000320193'}])
+        self.assertIsNone(cache.get('apple'))
+        self.assertEqual(cache.stats()['invalidations'], 1)
+
+    def test_cache_is_bounded_and_bypassed_without_change_log(self):
+        cache = ChangeAwareCache(max_size=2, db_session=self.session)
+        for key in ('a', 'b', 'c'):
+            cache.put(key, key.upper())
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('a'))
+
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE data_change_log")
+        self.assertIsNone(cache.get('b'))
+
+    def test_entries_older_than_a_recreated_log_are_invalid(self):
+        for _ in range(3):
+            self._ingest('cftc_swap_data')
+        cache = ChangeAwareCache(tables=['cftc_swap_data'], db_session=self.session)
+        cache.put('exposure', 'before reset')
+        # A recreated change log restarts at epoch 1, below the cached epoch
+        self.session.query(DataChangeLog).delete()
+        self.session.commit()
+        self.assertEqual(self._ingest('cftc_swap_data'), 1)
+        self.assertIsNone(cache.get('exposure'))
+
+    def test_reset_keeps_epochs_increasing(self):
+        epoch = self._ingest('cftc_swap_data')
+        cache = ChangeAwareCache(tables=['cftc_swap_data'], db_session=self.session)
+        cache.put('exposure', 'before reset')
+        self.session.close()
+        with patch.object(database, 'engine', self.engine):
+            database.reset_database()
+        self.session = self.Session()
+        cache.db_session = self.session
+        self.assertGreater(current_data_epoch(['cftc_swap_data'], db_session=self.session), epoch)
+        self.assertIsNone(cache.get('exposure'))
+
+    def test_prune_keeps_watermarked_and_latest_entries(self):
+        first = self._ingest('cftc_swap_data')
+        self._ingest('nport_submissions', [{'cik': '1'}])
+        cache = ChangeAwareCache(tables=['cftc_swap_data'], db_session=self.session)
+        cache.put('exposure', 'before prune')
+        watermark = self._ingest('cftc_swap_data')
+        after = self._ingest('sec_submissions', [{'issuercik': '2'}])
+        self.session.add(CompanyProfileWatermark(id=1, last_epoch=watermark))
+        self.session.commit()
+
+        self.assertEqual(prune_data_change_log(self.session), 1)
+        remaining = [epoch for (epoch,) in self.session.query(DataChangeLog.epoch).order_by(DataChangeLog.epoch)]
+        self.assertNotIn(first, remaining)
+        self.assertEqual(remaining[:3], [first + 1, watermark, after])
+        self.assertEqual(current_data_epoch(['cftc_swap_data'], db_session=self.session), watermark)
+        # Entries cached before the prune cannot be revalidated against the remaining log
+        self.assertTrue(data_changed_since(watermark, ['nport_submissions'], db_session=self.session))
+        self.assertIsNone(cache.get('exposure'))
+        self.assertEqual(prune_data_change_log(self.session), 0)
+
+    def test_swap_ingest_advances_epoch(self):
+        raw = pd.DataFrame({'dissemination_id': ['1', '2'], 'action_type': ['NEWT', 'NEWT']})
+        load_swap_transactions(raw, self.session)
+        tables = {name for (name,) in self.session.query(DataChangeLog.table_name)}
+        self.assertEqual(tables, {'cftc_swap_data', 'cftc_live_trades', 'cftc_exposure_cube'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+"""
+Tests for the columnar Parquet sidecar and analytics query routing.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import install_stats_catalog, record_data_change, CFTCSwap
+from src import columnar_store
+from src.columnar_store import (ColumnarSidecar, COLUMNAR_AVAILABLE, ENGINE_SIDECAR, ENGINE_SQLITE,
+                                run_routed_query)
+from tests.test_base import TunedDatabaseTest
+
+SUMMARY_SQL = """
+    SELECT asset_class, COUNT(*) AS trades, SUM(notional_amount_leg_1) AS notional
+    FROM cftc_swap_data
+    WHERE execution_timestamp >= :start
+    GROUP BY asset_class
+    ORDER BY asset_class
+"""
+
+
+@unittest.skipUnless(COLUMNAR_AVAILABLE, "duckdb/pyarrow not installed")
+class TestColumnarSidecar(TunedDatabaseTest):
+
+    def setUp(self):
+        super().setUp()
+        install_stats_catalog(self.engine)
+        self.sidecar = ColumnarSidecar(os.path.join(self.test_dir, 'columnar'), bind=self.engine, chunk_size=4)
+        self.now = datetime.now().replace(microsecond=0)
+        self._add_swaps([('IR', 100.0, 1), ('IR', 50.0, 2), ('CR', 25.0, 3),
+                         ('CR', 10.0, 40), ('EQ', 5.0, 45), ('IR', 75.0, 70)])
+
+    def tearDown(self):
+        columnar_store._sidecar = None
+        super().tearDown()
+
+    def _add_swaps(self, rows):
+        session = self.Session()
+        for asset_class, notional, days_ago in rows:
+            session.add(CFTCSwap(asset_class=asset_class, notional_amount_leg_1=notional,
+                                 notional_currency_leg_1='USD',
+                                 execution_timestamp=self.now - timedelta(days=days_ago)))
+        session.commit()
+        session.close()
+
+    def _summary(self):
+        return run_routed_query(SUMMARY_SQL, {'start': self.now - timedelta(days=50)},
+                                ['cftc_swap_data'], sidecar=self.sidecar)
+
+    def test_sync_partitions_by_month(self):
+        written = self.sidecar.sync(['cftc_swap_data'])
+        self.assertEqual(written['cftc_swap_data'], 6)
+        partitions = os.listdir(os.path.join(self.test_dir, 'columnar', 'cftc_swap_data'))
+        self.assertTrue(all(p.startswith('month=') for p in partitions))
+        self.assertTrue(self.sidecar.is_fresh('cftc_swap_data'))
+
+    def test_routes_to_sidecar_when_fresh_with_same_results(self):
+        sqlite_df, engine_used = self._summary()
+        self.assertEqual(engine_used, ENGINE_SQLITE)
+
+        self.sidecar.sync(['cftc_swap_data'])
+        sidecar_df, engine_used = self._summary()
+        self.assertEqual(engine_used, ENGINE_SIDECAR)
+        self.assertEqual(sidecar_df['asset_class'].tolist(), sqlite_df['asset_class'].tolist())
+        self.assertEqual(sidecar_df['trades'].tolist(), sqlite_df['trades'].tolist())
+        self.assertEqual(sidecar_df['notional'].tolist(), sqlite_df['notional'].tolist())
+
+    def test_stale_sidecar_falls_back_then_appends(self):
+        self.sidecar.sync(['cftc_swap_data'])
+        self._add_swaps([('FX', 1.0, 0)])
+        self.assertFalse(self.sidecar.is_fresh('cftc_swap_data'))
+        df, engine_used = self._summary()
+        self.assertEqual(engine_used, ENGINE_SQLITE)
+        self.assertIn('FX', df['asset_class'].tolist())
+
+        self.assertEqual(self.sidecar.sync(['cftc_swap_data'])['cftc_swap_data'], 1)
+        df, engine_used = self._summary()
+        self.assertEqual(engine_used, ENGINE_SIDECAR)
+        self.assertIn('FX', df['asset_class'].tolist())
+
+    def test_deletes_trigger_rebuild(self):
+        self.sidecar.sync(['cftc_swap_data'])
+        session = self.Session()
+        session.query(CFTCSwap).filter(CFTCSwap.asset_class == 'EQ').delete()
+        session.commit()
+        session.close()
+        self.assertEqual(self.sidecar.sync(['cftc_swap_data'])['cftc_swap_data'], 5)
+        df, engine_used = self._summary()
+        self.assertEqual(engine_used, ENGINE_SIDECAR)
+        self.assertNotIn('EQ', df['asset_class'].tolist())
+
+    def test_delete_and_insert_triggers_rebuild(self):
+        self.sidecar.sync(['cftc_swap_data'])
+        session = self.Session()
+        session.query(CFTCSwap).filter(CFTCSwap.asset_class == 'EQ').delete()
+        session.commit()
+        session.close()
+        self._add_swaps([('FX', 1.0, 0)])
+        self.assertEqual(self.sidecar.sync(['cftc_swap_data'])['cftc_swap_data'], 6)
+        df, engine_used = self._summary()
+        self.assertEqual(engine_used, ENGINE_SIDECAR)
+        self.assertNotIn('EQ', df['asset_class'].tolist())
+
+    def test_logged_update_in_place_triggers_rebuild(self):
+        self.sidecar.sync(['cftc_swap_data'])
+        session = self.Session()
+        updated = session.query(CFTCSwap).filter(CFTCSwap.asset_class == 'CR').update(
+            {CFTCSwap.notional_amount_leg_1: 1000.0}, synchronize_session=False)
+        record_data_change(session, CFTCSwap, row_count=updated)
+        session.commit()
+        session.close()
+        self.assertFalse(self.sidecar.is_fresh('cftc_swap_data'))
+        self.assertEqual(self._summary()[1], ENGINE_SQLITE)
+
+        self.assertEqual(self.sidecar.sync(['cftc_swap_data'])['cftc_swap_data'], 6)
+        df, engine_used = self._summary()
+        self.assertEqual(engine_used, ENGINE_SIDECAR)
+        self.assertEqual(df.set_index('asset_class').loc['CR', 'notional'], 2000.0)
+
+    def test_logged_append_stays_incremental(self):
+        self.sidecar.sync(['cftc_swap_data'])
+        self._add_swaps([('FX', 1.0, 0)])
+        session = self.Session()
+        record_data_change(session, CFTCSwap, row_count=1)
+        session.commit()
+        session.close()
+        self.assertEqual(self.sidecar.sync(['cftc_swap_data'])['cftc_swap_data'], 1)
+        self.assertTrue(self.sidecar.is_fresh('cftc_swap_data'))
+
+    def test_analytics_engine_uses_sidecar(self):
+        from src.analytics_tools import AnalyticsEngine
+
+        self.sidecar.sync(['cftc_swap_data'])
+        columnar_store._sidecar = self.sidecar
+        analytics = AnalyticsEngine.__new__(AnalyticsEngine)
+        analytics.db = self.Session()
+        try:
+            overview = analytics._swap_market_overview({})
+            trends = analytics._analyze_market_trends({'days_back': 30})
+            liquidity = analytics._analyze_liquidity({'timeframe': '90d'})
+        finally:
+            analytics.db.close()
+        self.assertEqual(overview['query_engine'], ENGINE_SIDECAR)
+        self.assertEqual(overview['market_overview']['total_swap_count'], 6)
+        self.assertEqual(overview['market_overview']['unique_asset_classes'], 3)
+        self.assertEqual(trends['query_engine'], ENGINE_SIDECAR)
+        self.assertEqual(sum(row['trade_count'] for row in trends['daily_data']), 3)
+        self.assertEqual(liquidity['total_trades'], 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
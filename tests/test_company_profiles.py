@@ -0,0 +1,184 @@
+"""
+Tests for the materialized company profiles.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from database import (CompanyProfile, CompanyProfileWatermark, DataChangeLog,
+                      Sec10KSubmission, SecSubmission, record_data_change)
+from src.company_profiles import (get_company_profile, issuer_name_key, refresh_changed_profiles,
+                                  refresh_company_profiles, screen_company_profiles)
+from tests.test_base import TunedDatabaseTest
+
+
+class TestCompanyProfiles(TunedDatabaseTest):
+
+    def _insider_filing(self, accession, cik, name, filing_date, ticker='ACME'):
+        self.session.add(SecSubmission(accession_number=accession, filing_date=filing_date,
+                                       period_of_report=filing_date, document_type='4', issuercik=cik,
+                                       issuername=name, issuertradingsymbol=ticker))
+
+    def _company(self):
+        # Insider filings store the CIK zero-padded, EDGAR filings without padding
+        self._insider_filing('I-1', '0000000042', 'ACME CORP', datetime(2024, 1, 5))
+        self._insider_filing('I-2', '0000000042', 'ACME CORP', datetime(2024, 2, 5))
+        self.session.add(Sec10KSubmission(accession_number='K-1', cik='42', company_name='Acme Corporation',
+                                          form_type='10-K', filing_date=datetime(2024, 3, 1),
+                                          period_of_report=datetime(2023, 12, 31)))
+        self.session.execute(text("""
+            INSERT INTO sec_insider_daily_rollups (issuercik, trans_date, trans_code, transactions,
+                                                   value_acquired, value_disposed)
+            VALUES ('0000000042', '2023-06-01', 'P', 2, 1000, 0), ('0000000042', '2024-01-04', 'S', 1, 0, 500),
+                   ('0000000042', '2024-01-05', 'P', 1, 250, 0)
+        """))
+        self.session.execute(text("""
+            INSERT INTO formd_submissions (accessionnumber, filing_date, submissiontype)
+            VALUES ('D-1', '15-APR-2024', 'D'), ('D-2', '01-MAY-2024', 'D/A')
+        """))
+        self.session.execute(text("""
+            INSERT INTO formd_issuers (formd_issuer_sk, accessionnumber, cik, entityname)
+            VALUES (1, 'D-1', '0000000042', 'Acme Corp'), (2, 'D-2', '0000000042', 'Acme Corp')
+        """))
+        self.session.execute(text("""
+            INSERT INTO formd_offerings (formd_offering_sk, accessionnumber, isamendment, totalofferingamount,
+                                         totalamountsold)
+            VALUES (1, 'D-1', 'false', '5000000', '2000000'), (2, 'D-2', 'true', '5000000', '3000000')
+        """))
+        # Two 13F holders of Acme's CUSIP and one of an unrelated issuer
+        self.session.execute(text("""
+            INSERT INTO form13f_cusip_flows (quarter, cusip, nameofissuer, total_value)
+            VALUES ('2024-Q1', 'ACME00001', 'ACME CORP', 900), ('2024-Q1', 'OTHER0001', 'ACME MINING LTD', 50)
+        """))
+        self.session.execute(text("""
+            INSERT INTO form13f_position_deltas (quarter, cik, cusip, value, shares)
+            VALUES ('2024-Q1', '7', 'ACME00001', 600, 60), ('2024-Q1', '8', 'ACME00001', 300, 30),
+                   ('2024-Q1', '8', 'OTHER0001', 50, 5)
+        """))
+        self.session.execute(text("INSERT INTO form13f_delta_builds (quarter) VALUES ('2024-Q1')"))
+        self.session.execute(text("""
+            INSERT INTO form13f_submissions (accession_number, filing_date, submission_type, cik, period_of_report)
+            VALUES ('F-7', '2024-05-10', '13F-HR', '7', '2024-03-31')
+        """))
+        self.session.execute(text("""
+            INSERT INTO form13f_coverpages (accession_number, report_calendar_or_quarter, filing_manager_name,
+                                            report_type, provide_info_for_instruction5)
+            VALUES ('F-7', '2024-03-31', 'Big Fund LP', '13F HOLDINGS REPORT', 'N')
+        """))
+        self.session.commit()
+
+    def test_issuer_name_key(self):
+        self.assertEqual(issuer_name_key('Apple Inc.'), issuer_name_key('APPLE INC'))
+        self.assertEqual(issuer_name_key('The Walt Disney Co'), 'WALT DISNEY')
+        self.assertEqual(issuer_name_key(None), '')
+
+    def test_profile_combines_sources(self):
+        self._company()
+        profile = get_company_profile('0000000042', session=self.session)
+
+        self.assertEqual(profile['cik'], '42')
+        self.assertEqual((profile['company_name'], profile['ticker_symbol']), ('Acme Corporation', 'ACME'))
+        self.assertEqual((profile['insider_filings'], profile['periodic_filings'], profile['formd_filings']),
+                         (2, 1, 2))
+        # Form D dates are normalized so they sort with the other sources
+        self.assertEqual(profile['latest_filings'][0], {'source': 'formd', 'form_type': 'D/A',
+                                                        'filing_date': '2024-05-01', 'accession_number': 'D-2'})
+        self.assertEqual(profile['latest_filings'][2]['accession_number'], 'K-1')
+        self.assertEqual((profile['insider_transactions'], profile['insider_purchase_value'],
+                          profile['insider_sale_value']), (4, 1250, 500))
+        self.assertEqual(profile['insider_by_year']['2023']['purchase_value'], 1000)
+        self.assertEqual(profile['latest_insider_trade'], '2024-01-05')
+        # The amendment is not a separate raise
+        self.assertEqual((profile['formd_offerings'], profile['formd_amount_sold']), (1, 2000000))
+        self.assertEqual((profile['institutional_holders'], profile['institutional_value']), (2, 900))
+        self.assertEqual(profile['holder_cusips'], ['ACME00001'])
+        self.assertEqual(profile['top_holders'][0], {'cik': '7', 'name': 'Big Fund LP', 'value': 600, 'shares': 60})
+
+        self.assertIsNone(get_company_profile('999', session=self.session))
+
+    def test_changed_ciks_only(self):
+        self._company()
+        self._insider_filing('I-9', '0000000099', 'OTHER INC', datetime(2024, 1, 1), ticker='OTH')
+        record_data_change(self.session, SecSubmission, [{'issuercik': '0000000099'}])
+        self.session.commit()
+        # The first run builds every profile, including the 13F filer's
+        self.assertEqual(refresh_changed_profiles(session=self.session), 3)
+        stamp = self.session.get(CompanyProfile, '99').refreshed_at
+
+        self._insider_filing('I-3', '0000000042', 'ACME CORP', datetime(2024, 6, 1))
+        record_data_change(self.session, SecSubmission, [{'issuercik': '0000000042'}])
+        self.session.commit()
+        self.assertEqual(refresh_changed_profiles(session=self.session), 1)
+        self.session.expire_all()
+        self.assertEqual(self.session.get(CompanyProfile, '42').insider_filings, 3)
+        self.assertEqual(self.session.get(CompanyProfile, '99').refreshed_at, stamp)
+
+        last_epoch = self.session.get(CompanyProfileWatermark, 1).last_epoch
+        self.assertEqual(last_epoch, self.session.query(DataChangeLog.epoch).filter(
+            DataChangeLog.table_name == 'sec_submissions').order_by(DataChangeLog.epoch.desc()).first()[0])
+        self.assertEqual(refresh_changed_profiles(session=self.session), 0)
+
+        # A CIK whose filings are gone loses its profile
+        self.session.execute(text("DELETE FROM sec_submissions WHERE issuercik = '0000000099'"))
+        record_data_change(self.session, SecSubmission, [{'issuercik': '99'}])
+        self.session.commit()
+        refresh_changed_profiles(session=self.session)
+        self.assertIsNone(self.session.get(CompanyProfile, '99'))
+
+    def test_unkeyed_and_13f_changes_stay_targeted(self):
+        self._company()
+        self._insider_filing('I-9', '0000000099', 'OTHER INC', datetime(2024, 1, 1), ticker='OTH')
+        self.session.commit()
+        refresh_company_profiles(session=self.session)
+        record_data_change(self.session, SecSubmission, row_count=0)
+        self.session.commit()
+        refresh_changed_profiles(session=self.session)
+        stamp = self.session.get(CompanyProfile, '99').refreshed_at
+
+        # A batch logged without keys refreshes only the CIKs whose filing counts moved
+        self._insider_filing('I-3', '0000000042', 'ACME CORP', datetime(2024, 6, 1))
+        record_data_change(self.session, SecSubmission, row_count=1)
+        self.session.commit()
+        self.assertEqual(refresh_changed_profiles(session=self.session), 1)
+        self.session.expire_all()
+        self.assertEqual(self.session.get(CompanyProfile, '42').insider_filings, 3)
+
+        # A new 13F quarter refreshes the companies matched to its CUSIPs
+        self.session.execute(text("""
+            INSERT INTO form13f_cusip_flows (quarter, cusip, nameofissuer, total_value)
+            VALUES ('2024-Q2', 'ACME00001', 'ACME CORP', 700)
+        """))
+        self.session.execute(text("""
+            INSERT INTO form13f_position_deltas (quarter, cik, cusip, value, shares)
+            VALUES ('2024-Q2', '7', 'ACME00001', 700, 70)
+        """))
+        record_data_change(self.session, 'form13f_position_deltas', row_count=1)
+        self.session.commit()
+        self.assertEqual(refresh_changed_profiles(session=self.session), 1)
+        self.session.expire_all()
+        acme = self.session.get(CompanyProfile, '42')
+        self.assertEqual((acme.institutional_quarter, acme.institutional_value), ('2024-Q2', 700))
+        self.assertEqual(self.session.get(CompanyProfile, '99').refreshed_at, stamp)
+
+    def test_screen(self):
+        self._company()
+        self._insider_filing('I-9', '0000000099', 'OTHER INC', datetime(2024, 1, 1), ticker='OTH')
+        self.session.commit()
+        refresh_company_profiles(session=self.session)
+
+        ranked = screen_company_profiles('institutional_value', session=self.session)
+        self.assertEqual((len(ranked), ranked[0]['cik']), (3, '42'))
+        self.assertEqual([p['cik'] for p in screen_company_profiles(has_formd=True, session=self.session)], ['42'])
+        self.assertEqual(screen_company_profiles(min_insider_purchase_value=5000, session=self.session), [])
+        with self.assertRaises(ValueError):
+            screen_company_profiles('cik', session=self.session)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests for compressed document bodies.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import (Base, Sec10KDocument, Sec8KItem, compress_text, decompress_text,
+                      compress_text_columns, get_compression_report)
+
+BODY = "The Company uses interest rate swaps to hedge its floating rate debt. " * 200
+
+
+class TestCompressedText(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.test_dir, 'docs.db')}")
+        Base.metadata.create_all(bind=self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_codec_round_trip(self):
+        for value in (None, "", "short", BODY, "unicode ✓ " * 50):
+            self.assertEqual(decompress_text(compress_text(value)), value)
+        self.assertEqual(decompress_text("legacy plain text"), "legacy plain text")
+        self.assertLess(len(compress_text(BODY)), len(BODY) // 10)
+
+    def test_orm_stores_compressed_and_defers_body(self):
+        session = self.Session()
+        session.add(Sec10KDocument(accession_number='A1', section='risk_factors', sequence=1,
+                                   content=BODY, word_count=2400))
+        session.commit()
+        session.close()
+
+        with self.engine.connect() as conn:
+            kind, stored = conn.exec_driver_sql(
+                "SELECT typeof(content), length(content) FROM sec_10k_documents").one()
+        self.assertEqual(kind, 'blob')
+        self.assertLess(stored, len(BODY) // 10)
+
+        session = self.Session()
+        doc = session.query(Sec10KDocument).one()
+        self.assertNotIn('content', doc.__dict__)  # Metadata query leaves the body unloaded
+        self.assertEqual(doc.word_count, 2400)
+        self.assertEqual(doc.content, BODY)
+        session.close()
+
+    def test_raw_sql_can_search_bodies(self):
+        session = self.Session()
+        session.add(Sec8KItem(accession_number='A2', item_number='1.01', content=BODY))
+        session.commit()
+        session.close()
+        with self.engine.connect() as conn:
+            matches = conn.exec_driver_sql(
+                "SELECT COUNT(*) FROM sec_8k_items WHERE decompress_text(content) LIKE '%swaps%'").scalar()
+        self.assertEqual(matches, 1)
+
+    def test_migration_compresses_existing_rows(self):
+        with self.engine.begin() as conn:
+            for i in range(5):
+                conn.exec_driver_sql(
+                    "INSERT INTO sec_10k_documents (accession_number, section, sequence, content) "
+                    "VALUES (?, 'mdna', ?, ?)", (f"A{i}", i, BODY))
+        report = compress_text_columns(self.engine, batch_size=2)
+        migrated = report['sec_10k_documents.content']
+        self.assertEqual(migrated['rows'], 5)
+        self.assertGreater(migrated['ratio'], 10)
+        self.assertEqual(compress_text_columns(self.engine)['sec_10k_documents.content']['rows'], 0)
+
+        current = get_compression_report(self.engine)['sec_10k_documents.content']
+        self.assertEqual(current['uncompressed_rows'], 0)
+        self.assertEqual(current['raw_bytes'], len(BODY) * 5)
+
+        session = self.Session()
+        self.assertEqual(session.query(Sec10KDocument).first().content, BODY)
+        session.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
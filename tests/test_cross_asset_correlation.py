@@ -0,0 +1,85 @@
+"""
+Tests for rolling cross-asset correlation over the daily swap, insider and 13F series.
+"""
+
+import os
+import sys
+import time
+import unittest
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from database import CFTCSwapDailyAggregate, SecInsiderDailyRollup, Form13FCusipFlow
+from src.cross_asset_correlation import build_series_frame, correlation_matrix, rolling_correlations
+from tests.test_base import TunedDatabaseTest
+
+
+class TestCrossAssetCorrelation(TunedDatabaseTest):
+
+    def test_matrix_matches_pandas(self):
+        rng = np.random.default_rng(7)
+        window = rng.normal(size=(90, 12))
+        window[:, 3] = 0  # No variance
+        expected = pd.DataFrame(window).corr().to_numpy()
+        np.testing.assert_allclose(correlation_matrix(window), expected, atol=1e-10, equal_nan=True)
+
+    def test_rolling_reports_pairs_and_shifts(self):
+        rng = np.random.default_rng(11)
+        days = pd.date_range('2023-01-01', periods=200, freq='D')
+        base = rng.normal(size=200)
+        frame = pd.DataFrame({'a': base, 'b': base + rng.normal(scale=0.1, size=200),
+                              'c': rng.normal(size=200)}, index=days)
+        # c mirrors a only in the last window
+        frame.iloc[-50:, 2] = -base[-50:]
+        result = rolling_correlations(frame, window=50, step=25, min_periods=5, top_pairs=2)
+
+        self.assertEqual(result['end_date'], '2023-07-19')
+        self.assertEqual(len(result['regime']), 7)
+        top = result['top_pairs'][0]
+        self.assertEqual((top['series_a'], top['series_b']), ('a', 'c'))
+        self.assertAlmostEqual(top['correlation'], -1.0)
+        self.assertEqual(len(top['history']), 7)
+        shift = result['largest_changes'][0]
+        self.assertEqual((shift['series_a'], shift['series_b']), ('a', 'c'))
+        self.assertLess(shift['change'], -0.8)
+
+    def test_thousands_of_series_run_in_seconds(self):
+        rng = np.random.default_rng(3)
+        frame = pd.DataFrame(rng.normal(size=(1000, 2000)), index=pd.date_range('2022-01-01', periods=1000))
+        started = time.perf_counter()
+        result = rolling_correlations(frame, window=63, step=21)
+        self.assertLess(time.perf_counter() - started, 30)
+        self.assertEqual(len(result['regime']), 45)
+        self.assertEqual(len(result['top_pairs']), 20)
+
+    def test_frame_from_materialized_tables(self):
+        start = date(2024, 1, 1)
+        for offset in range(10):
+            day = (start + timedelta(days=offset)).isoformat()
+            self.session.add(CFTCSwapDailyAggregate(trade_date=day, asset_class='IR', product_name='Swap',
+                                                    notional_currency='USD', trade_count=1, notional_sum=offset))
+        self.session.add(SecInsiderDailyRollup(issuercik='111', trans_date='2024-01-03', trans_code='P',
+                                               value_acquired=500.0, value_disposed=0.0))
+        self.session.add(SecInsiderDailyRollup(issuercik='111', trans_date='2024-01-03', trans_code='A',
+                                               value_acquired=900.0, value_disposed=0.0))
+        self.session.add(Form13FCusipFlow(quarter='2024-Q1', cusip='123456789', value_change=9100))
+        self.session.commit()
+
+        frame = build_series_frame(start_date='2024-01-01', end_date='2024-01-10', session=self.session)
+        self.assertEqual(sorted(frame.columns), ['13f:123456789', 'insider:111', 'swap:IR'])
+        self.assertEqual(len(frame), 10)
+        self.assertEqual(frame['insider:111'].sum(), 500.0)  # Grants are not open-market flow
+        self.assertAlmostEqual(frame['13f:123456789'].iloc[0], 100.0)  # 91 days in 2024-Q1
+        self.assertEqual(frame['swap:IR'].iloc[-1], 9.0)
+
+        narrowed = build_series_frame(start_date='2024-01-01', end_date='2024-01-10', max_series=1,
+                                      session=self.session)
+        self.assertEqual(list(narrowed.columns), ['13f:123456789'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Tests for the tuned SQLite engine factory and pragma profiles.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import (create_tuned_engine, get_connection_stats, bulk_load_mode, PRAGMA_PROFILES,
+                      Base, create_managed_indexes, get_managed_index_status, restore_deferred_indexes)
+
+
+class TestTunedEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.engine = create_tuned_engine(f"sqlite:///{os.path.join(self.test_dir, 'tuned.db')}")
+        self.original_engine = database.engine
+        database.engine = self.engine
+
+    def tearDown(self):
+        database.engine = self.original_engine
+        self.engine.dispose()
+        import shutil
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_default_profile_applied_on_connect(self):
+        stats = get_connection_stats(self.engine)
+        self.assertEqual(stats['journal_mode'], 'wal')
+        self.assertEqual(stats['synchronous'], 1)  # NORMAL
+        self.assertEqual(stats['cache_size'], PRAGMA_PROFILES['default']['cache_size'])
+        self.assertEqual(stats['temp_store'], 2)  # MEMORY
+        self.assertEqual(stats['active_profile'], 'default')
+
+    def test_bulk_load_mode_switches_and_restores(self):
+        get_connection_stats(self.engine)  # Warm a pooled connection with the default profile
+        with bulk_load_mode():
+            stats = get_connection_stats(self.engine)
+            self.assertEqual(stats['synchronous'], 0)  # OFF
+            self.assertEqual(stats['cache_size'], PRAGMA_PROFILES['bulk_load']['cache_size'])
+        self.assertEqual(get_connection_stats(self.engine)['synchronous'], 1)
+
+    def test_bulk_load_mode_defers_managed_indexes(self):
+        Base.metadata.create_all(bind=self.engine)
+        create_managed_indexes(self.engine)
+        with bulk_load_mode(defer_indexes=True):
+            self.assertFalse(any(get_managed_index_status(self.engine).values()))
+        self.assertTrue(all(get_managed_index_status(self.engine).values()))
+
+    def test_deferred_indexes_restored_inside_the_block(self):
+        Base.metadata.create_all(bind=self.engine)
+        create_managed_indexes(self.engine)
+        self.assertFalse(restore_deferred_indexes())
+        with bulk_load_mode(defer_indexes=True):
+            self.assertTrue(restore_deferred_indexes())
+            self.assertTrue(all(get_managed_index_status(self.engine).values()))
+            self.assertFalse(restore_deferred_indexes())
+        self.assertTrue(all(get_managed_index_status(self.engine).values()))
+
+    def test_explicit_profile(self):
+        engine = create_tuned_engine(f"sqlite:///{os.path.join(self.test_dir, 'bulk.db')}",
+                                     profile='bulk_load')
+        try:
+            self.assertEqual(get_connection_stats(engine)['synchronous'], 0)
+        finally:
+            engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Tests for derivative-disclosure features extracted at ingest and read by the cross-filing engine.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from database import Sec10KSubmission, Sec10KDocument, Sec8KSubmission, SecDerivativeDisclosure
+from src.derivative_disclosures import (extract_filing_features, extract_missing_disclosures,
+                                        screen_derivative_disclosures)
+from src.processor_8k import SEC8KProcessor
+from src.cross_filing_analysis.cross_filing_correlation_engine import CrossFilingCorrelationEngine, DisclosureType
+from tests.test_base import TunedDatabaseTest
+
+HEDGING_NOTE = (
+    "We use interest rate swaps designated as cash flow hedges under hedge accounting. "
+    "The notional amount of these swaps was $250 million at year end. "
+    "Our counterparties include JPMorgan Chase Bank, Barclays and Wells Fargo."
+)
+
+
+class TestDerivativeDisclosures(TunedDatabaseTest):
+
+    def _add_10k(self, accession, cik, year, risk_text, form_type='10-K'):
+        self.session.add(Sec10KSubmission(accession_number=accession, cik=cik, company_name=f"Co {cik}",
+                                          form_type=form_type, filing_date=datetime(year, 2, 1),
+                                          period_of_report=datetime(year - 1, 12, 31)))
+        self.session.add(Sec10KDocument(accession_number=accession, section='quantitative_disclosures',
+                                        sequence=1, content=risk_text, word_count=len(risk_text.split())))
+        self.session.commit()
+
+    def test_features_of_a_hedging_note(self):
+        features = extract_filing_features([('note_8', HEDGING_NOTE), ('business', 'We sell widgets.')], '10-K')
+        self.assertEqual(features['disclosure_sections'], 1)
+        self.assertEqual(features['swap_mentions'], 2)
+        self.assertEqual(features['max_notional'], 250_000_000)
+        self.assertEqual(features['hedge_designations'], ['cash_flow'])
+        self.assertTrue(features['has_hedging_language'])
+        self.assertIn('Barclays', features['counterparties'])
+        self.assertIn('JPMorgan Chase Bank', features['counterparties'])
+        self.assertEqual(features['sections'][0]['disclosure_type'], 'derivative_instruments')
+
+    def test_8k_ingest_stores_features(self):
+        processor = SEC8KProcessor(db_session=self.session)
+        saved = processor.save_to_database(
+            {'accession_number': '0000000001-24-000001', 'cik': '0000000001', 'company_name': 'Co',
+             'form_type': '8-K', 'filing_date': datetime(2024, 5, 1)},
+            [{'item_number': '1.01', 'item_title': 'Item 1.01', 'content': HEDGING_NOTE}])
+        self.assertTrue(saved)
+        row = self.session.get(SecDerivativeDisclosure, '0000000001-24-000001')
+        self.assertEqual((row.disclosure_sections, row.sections[0]['section']), (1, '1.01'))
+
+    def test_backfill_marks_filings_without_disclosures(self):
+        self._add_10k('0000000002-23-000001', '0000000002', 2023, HEDGING_NOTE)
+        self._add_10k('0000000003-23-000001', '0000000003', 2023, "We sell widgets.")
+        self.assertEqual(extract_missing_disclosures(session=self.session), 2)
+        self.assertEqual(extract_missing_disclosures(session=self.session), 0)
+        self.assertEqual(self.session.get(SecDerivativeDisclosure, '0000000003-23-000001').disclosure_sections, 0)
+
+        screen = screen_derivative_disclosures(designation='cash_flow', session=self.session)
+        self.assertEqual([row['cik'] for row in screen], ['0000000002'])
+        self.assertEqual(screen[0]['hedge_designations'], ['cash_flow'])
+
+    def test_correlation_engine_reads_precomputed_features(self):
+        self._add_10k('0000000004-22-000001', '0000000004', 2022, HEDGING_NOTE)
+        self._add_10k('0000000004-23-000001', '0000000004', 2023, HEDGING_NOTE.replace('$250', '$900'))
+        self._add_10k('0000000004-23-000002', '0000000004', 2023, HEDGING_NOTE, form_type='10-Q')
+        extract_missing_disclosures(session=self.session)
+
+        engine = CrossFilingCorrelationEngine(self.session)
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(self.engine, 'before_cursor_execute', listener)
+        try:
+            filings = engine._get_entity_filings('0000000004')
+            disclosures = engine._load_disclosures(filings)
+        finally:
+            event.remove(self.engine, 'before_cursor_execute', listener)
+
+        self.assertEqual(len(statements), 2)  # Filings, then their stored features
+        self.assertEqual(sorted(f.filing_type.value for f in filings), ['10-K', '10-K', '10-Q'])
+        self.assertEqual(len(disclosures), 3)
+        self.assertEqual(disclosures[0].disclosure_type, DisclosureType.DERIVATIVE_INSTRUMENTS)
+
+        correlations = engine._correlate_disclosures('0000000004', disclosures)
+        self.assertEqual([c.correlation_type for c in correlations], ['inconsistent'])
+
+
+if __name__ == '__main__':
+    unittest.main()
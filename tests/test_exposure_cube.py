@@ -0,0 +1,101 @@
+"""
+Tests for the incrementally maintained swap exposure cube.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import CFTCSwap, CFTCLiveTrade, CFTCExposureCube
+from src.exposure_cube import (tenor_bucket, query_exposure_cube, drill_down, rebuild_exposure_cube)
+from src.swap_lifecycle import apply_lifecycle_events
+from tests.test_base import TunedDatabaseTest
+
+
+def _event(dissemination_id, action, day, original=None, notional=None, asset_class='IR', currency='USD',
+           underlier='ACME', years=5, cleared='C'):
+    executed = datetime(2024, 5, day)
+    return CFTCSwap(dissemination_id=dissemination_id, original_dissemination_id=original,
+                    action_type=action, asset_class=asset_class, notional_amount_leg_1=notional,
+                    notional_currency_leg_1=currency, underlier_id_leg_1=underlier, cleared=cleared,
+                    execution_timestamp=executed, event_timestamp=executed, effective_date=executed,
+                    expiration_date=executed.replace(year=executed.year + years))
+
+
+class TestExposureCube(TunedDatabaseTest):
+
+    def _apply(self, *events):
+        self.session.add_all(events)
+        self.session.commit()
+        apply_lifecycle_events(self.session)
+
+    def _cells(self):
+        return {tuple(getattr(c, d) for d in ('reference_entity', 'asset_class', 'currency', 'tenor_bucket', 'month')):
+                (c.trade_count, c.notional_sum) for c in self.session.query(CFTCExposureCube)}
+
+    def test_tenor_buckets(self):
+        start = datetime(2024, 1, 1)
+        self.assertEqual(tenor_bucket(start, datetime(2024, 6, 1)), '0-1Y')
+        self.assertEqual(tenor_bucket(start, datetime(2034, 1, 1)), '5-10Y')
+        self.assertEqual(tenor_bucket(start, datetime(2064, 1, 1)), '30Y+')
+        self.assertEqual(tenor_bucket(None, datetime(2030, 1, 1)), '')
+
+    def test_lifecycle_keeps_cube_in_step_with_live_trades(self):
+        self._apply(_event('A', 'NEWT', 1, notional=100.0),
+                    _event('B', 'NEWT', 2, notional=50.0, currency='EUR', years=1),
+                    _event('C', 'NEWT', 3, notional=30.0, asset_class='CR', underlier='GLOBEX'))
+        self.assertEqual(self._cells()[('ACME', 'IR', 'USD', '2-5Y', '2024-05')], (1, 100.0))
+
+        # Modification moves A to another tenor; termination removes B's cell
+        self._apply(_event('A2', 'MODI', 4, original='A', notional=120.0, years=10),
+                    _event('B2', 'TERM', 5, original='B'))
+        cells = self._cells()
+        self.assertNotIn(('ACME', 'IR', 'USD', '2-5Y', '2024-05'), cells)
+        self.assertNotIn(('ACME', 'IR', 'EUR', '0-1Y', '2024-05'), cells)
+        self.assertEqual(cells[('ACME', 'IR', 'USD', '5-10Y', '2024-05')], (1, 120.0))
+
+        incremental = cells
+        rebuild_exposure_cube(self.session)
+        self.assertEqual(self._cells(), incremental)
+        self.assertEqual(sum(count for count, _ in incremental.values()),
+                         self.session.query(CFTCLiveTrade).count())
+
+    def test_roll_up_and_drill_down(self):
+        self._apply(_event('A', 'NEWT', 1, notional=100.0),
+                    _event('B', 'NEWT', 2, notional=50.0, currency='EUR'),
+                    _event('C', 'NEWT', 3, notional=30.0, asset_class='CR', underlier='GLOBEX', cleared=None),
+                    _event('D', 'NEWT', 4, notional=None))
+
+        total = query_exposure_cube([], session=self.session)
+        self.assertEqual((total[0]['trade_count'], total[0]['notional_count'], total[0]['total_notional']),
+                         (4, 3, 180.0))
+
+        by_class = query_exposure_cube(['asset_class'], session=self.session)
+        self.assertEqual([(r['asset_class'], r['total_notional']) for r in by_class], [('IR', 150.0), ('CR', 30.0)])
+        self.assertEqual(by_class[1]['cleared_trade_count'], 0)
+
+        by_currency = drill_down({'asset_class': 'IR', 'reference_entity': 'ACME'}, 'currency', session=self.session)
+        self.assertEqual([(r['currency'], r['trade_count']) for r in by_currency], [('USD', 2), ('EUR', 1)])
+        self.assertEqual(query_exposure_cube(['month'], {'month_from': '2024-06'}, session=self.session), [])
+
+        with self.assertRaises(ValueError):
+            query_exposure_cube(['counterparty'], session=self.session)
+
+    def test_existing_live_trades_seed_the_cube(self):
+        self.session.add(CFTCLiveTrade(trade_id='X', asset_class='FX', notional_amount_leg_1=10.0,
+                                       notional_currency_leg_1='JPY', underlying_asset_name='YEN BASKET'))
+        self.session.commit()
+        self._apply(_event('A', 'NEWT', 1, notional=100.0))
+        classes = {r['asset_class']: r['trade_count'] for r in query_exposure_cube(session=self.session)}
+        self.assertEqual(classes, {'FX': 1, 'IR': 1})
+        fx = query_exposure_cube(['reference_entity', 'tenor_bucket', 'month'], {'asset_class': 'FX'},
+                                 session=self.session)
+        self.assertEqual((fx[0]['reference_entity'], fx[0]['tenor_bucket'], fx[0]['month']),
+                         ('YEN BASKET', None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Tests for the filing event timeline.
+"""
+
+import os
+import sys
+import unittest
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from database import FilingEvent, FilingEventMonthly, Sec8KItem, Sec8KSubmission, Sec10KSubmission, SecSubmission
+from src.filing_events import (get_filing_events, get_monthly_event_counts, refresh_filing_events,
+                               regulatory_timeline)
+from tests.test_base import TunedDatabaseTest
+
+
+class TestFilingEvents(TunedDatabaseTest):
+
+    def _8k(self, accession, filing_date, items, cik='42'):
+        self.session.add(Sec8KSubmission(accession_number=accession, cik=cik, company_name='Acme', form_type='8-K',
+                                         filing_date=filing_date))
+        for number in items:
+            self.session.add(Sec8KItem(accession_number=accession, item_number=number, item_title=f"Item {number}",
+                                       content=f"{number} text"))
+
+    def _monthly(self, cik):
+        return {(row.month, row.source, row.event_code): row.events
+                for row in self.session.query(FilingEventMonthly).filter_by(cik=cik)}
+
+    def test_sources_and_monthly_counts(self):
+        self._8k('8K-1', datetime(2024, 1, 10), ['2.02', '9.01'])
+        self._8k('8K-2', datetime(2024, 1, 25), ['2.02'])
+        self._8k('8K-3', datetime(2024, 2, 3), [])
+        self.session.add(Sec10KSubmission(accession_number='10K-1', cik='0000000042', company_name='Acme',
+                                          form_type='10-K', filing_date=datetime(2024, 2, 20),
+                                          period_of_report=datetime(2023, 12, 31)))
+        self.session.add(SecSubmission(accession_number='F4-1', filing_date=datetime(2024, 1, 12),
+                                       period_of_report=datetime(2024, 1, 10), document_type='4',
+                                       issuercik='0000000042', issuername='Acme', issuertradingsymbol='ACME'))
+        self.session.execute(text("INSERT INTO formd_submissions (accessionnumber, filing_date, submissiontype) "
+                                  "VALUES ('D-1', '05-FEB-2024', 'D')"))
+        self.session.execute(text("INSERT INTO formd_issuers (accessionnumber, cik, entityname) "
+                                  "VALUES ('D-1', '0000000042', 'Acme'), ('D-1', '0000000077', 'Acme Fund')"))
+        self.session.commit()
+
+        self.assertEqual(refresh_filing_events(session=self.session), 8)
+        self.assertEqual(self._monthly('42'), {
+            ('2024-01', 'current', '2.02'): 2, ('2024-01', 'current', '9.01'): 1, ('2024-02', 'current', '8-K'): 1,
+            ('2024-02', 'periodic', '10-K'): 1, ('2024-01', 'insider', '4'): 1, ('2024-02', 'formd', 'D'): 1,
+        })
+        # Co-issuers of a Form D notice each get the event
+        self.assertEqual(self._monthly('77'), {('2024-02', 'formd', 'D'): 1})
+
+        events = get_filing_events('0000000042', '2024-01-01', '2024-01-31', session=self.session)
+        self.assertEqual([(e['event_date'], e['event_code']) for e in events],
+                         [('2024-01-25', '2.02'), ('2024-01-12', '4'), ('2024-01-10', '2.02'), ('2024-01-10', '9.01')])
+        self.assertEqual(events[0]['description'], 'Item 2.02')
+
+        market = get_monthly_event_counts(start_month='2024-02', sources=['formd'], session=self.session)
+        self.assertEqual(market, [{'month': '2024-02', 'source': 'formd', 'event_code': 'D', 'events': 2,
+                                   'companies': 2}])
+
+    def test_targeted_refresh_recounts_touched_months(self):
+        self._8k('8K-1', datetime(2024, 1, 10), ['2.02'])
+        self._8k('8K-2', datetime(2024, 3, 10), ['5.02'])
+        self._8k('8K-9', datetime(2024, 1, 15), ['1.01'], cik='99')
+        self.session.commit()
+        refresh_filing_events('current', session=self.session)
+
+        # An amended item list for 8K-1 and a new filing in the same month
+        self.session.query(Sec8KItem).filter_by(accession_number='8K-1').delete()
+        self.session.add(Sec8KItem(accession_number='8K-1', item_number='7.01', item_title='Item 7.01'))
+        self._8k('8K-4', datetime(2024, 1, 30), ['2.02'])
+        self.session.commit()
+        self.assertEqual(refresh_filing_events('current', ['8K-1', '8K-4'], session=self.session), 2)
+
+        self.assertEqual(self._monthly('42'), {('2024-01', 'current', '7.01'): 1, ('2024-01', 'current', '2.02'): 1,
+                                               ('2024-03', 'current', '5.02'): 1})
+        self.assertEqual(self._monthly('99'), {('2024-01', 'current', '1.01'): 1})
+        self.assertEqual(self.session.query(FilingEvent).count(), 4)
+
+    def test_history_is_built_on_first_refresh_or_read(self):
+        # Filings loaded before the timeline existed
+        self._8k('8K-1', datetime(2024, 1, 10), ['2.02'])
+        self._8k('8K-2', datetime(2024, 2, 10), ['5.02'])
+        self.session.commit()
+        events = get_filing_events('42', sources=['current'], session=self.session)
+        self.assertEqual([e['accession_number'] for e in events], ['8K-2', '8K-1'])
+
+        # The first targeted refresh of another source builds that source in full
+        self.session.add(Sec10KSubmission(accession_number='10K-1', cik='42', company_name='Acme', form_type='10-K',
+                                          filing_date=datetime(2023, 3, 1), period_of_report=datetime(2022, 12, 31)))
+        self.session.add(Sec10KSubmission(accession_number='10K-2', cik='42', company_name='Acme', form_type='10-K',
+                                          filing_date=datetime(2024, 3, 1), period_of_report=datetime(2023, 12, 31)))
+        self.session.commit()
+        self.assertEqual(refresh_filing_events('periodic', ['10K-2'], session=self.session), 2)
+        self.assertEqual(self._monthly('42')[('2023-03', 'periodic', '10-K')], 1)
+
+    def test_regulatory_timeline(self):
+        today = date.today()
+        this_month = datetime(today.year, today.month, 1)
+        self._8k('8K-1', this_month, ['2.02', '5.02', '8.01', '9.01'])
+        self.session.commit()
+        refresh_filing_events(session=self.session)
+
+        timeline = regulatory_timeline('0000000042', months=12, session=self.session)
+        self.assertEqual(len(timeline['monthly_activity']), 12)
+        self.assertEqual(timeline['monthly_activity'][-1]['by_source'], {'current': 4})
+        self.assertEqual((timeline['total_events'], timeline['quiet_months']), (4, 11))
+        self.assertEqual(timeline['activity_bursts'], [{'month': this_month.strftime('%Y-%m'), 'events': 4}])
+        self.assertEqual(len(timeline['recent_events']), 4)
+        with self.assertRaises(ValueError):
+            regulatory_timeline(sources=['13f'], session=self.session)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Tests for precomputed 13F quarter-over-quarter position deltas.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Form13FSubmission, Form13FCoverPage, Form13FInfoTable
+from src.form13f_flows import (quarter_label, previous_quarter, refresh_position_deltas, ensure_position_deltas,
+                               get_cusip_flows, get_position_deltas, top_accumulated_names)
+from tests.test_base import TunedDatabaseTest
+
+
+class TestForm13FFlows(TunedDatabaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self._filing('A1', 'A', datetime(2024, 3, 31), {'X': 100, 'Y': 50})
+        self._filing('B1', 'B', datetime(2024, 3, 31), {'X': 10})
+        self._filing('A2', 'A', datetime(2024, 6, 30), {'X': 150, 'Z': 20})
+        self._filing('C2', 'C', datetime(2024, 6, 30), {'X': 5})
+        self.session.commit()
+
+    def _filing(self, accession, cik, period, holdings, filed=None, amendment_type=None, putcall=None):
+        self.session.add(Form13FSubmission(accession_number=accession, cik=cik, submission_type='13F-HR',
+                                           filing_date=filed or period, period_of_report=period))
+        self.session.add(Form13FCoverPage(accession_number=accession, report_calendar_or_quarter=period,
+                                          amendment_type=amendment_type, filing_manager_name=cik,
+                                          report_type='13F HOLDINGS REPORT', provide_info_for_instruction5='N'))
+        for sk, (cusip, shares) in enumerate(holdings.items()):
+            self.session.add(Form13FInfoTable(accession_number=accession, infotable_sk=sk, cusip=cusip,
+                                              nameofissuer=f"Issuer {cusip}", value=shares * 10, sshprnamt=shares,
+                                              sshprnamttype='SH', investmentdiscretion='SOLE', putcall=putcall))
+
+    def test_quarter_labels(self):
+        self.assertEqual(quarter_label(datetime(2024, 6, 30)), '2024-Q2')
+        self.assertEqual(quarter_label('2023-12-31 00:00:00'), '2023-Q4')
+        self.assertEqual(previous_quarter('2024-Q1'), '2023-Q4')
+
+    def test_deltas_classify_position_changes(self):
+        self.assertEqual(refresh_position_deltas(session=self.session), {'2024-Q1': 3, '2024-Q2': 4})
+        deltas = {(d['cik'], d['cusip']): d for d in get_position_deltas(quarter='2024-Q2', session=self.session)}
+        self.assertEqual({key: d['change_type'] for key, d in deltas.items()}, {
+            ('A', 'X'): 'increased', ('A', 'Z'): 'new', ('A', 'Y'): 'exited', ('C', 'X'): 'new'})
+        self.assertEqual(deltas[('A', 'Y')]['share_change'], -50)
+        # B has not filed for Q2 yet, so its Q1 holdings are not treated as exits
+        self.assertNotIn(('B', 'X'), deltas)
+
+        flows = {f['cusip']: f for f in get_cusip_flows(session=self.session)}
+        self.assertEqual(flows['X']['value_change'], 550)
+        self.assertEqual((flows['X']['holders'], flows['X']['previous_holders'], flows['X']['holder_change']),
+                         (2, 1, 1))
+        self.assertEqual(flows['Y']['exited_positions'], 1)
+        self.assertEqual([f['cusip'] for f in top_accumulated_names(session=self.session)], ['X', 'Z'])
+
+    def test_restatement_supersedes_and_options_are_excluded(self):
+        self._filing('A2R', 'A', datetime(2024, 6, 30), {'X': 90}, filed=datetime(2024, 8, 15),
+                     amendment_type='RESTATEMENT')
+        self._filing('C2N', 'C', datetime(2024, 6, 30), {'W': 7}, filed=datetime(2024, 8, 15),
+                     amendment_type='NEW HOLDINGS')
+        self._filing('C2P', 'C', datetime(2024, 6, 30), {'P': 1000}, putcall='Put')
+        self.session.commit()
+        refresh_position_deltas(['2024-Q2'], self.session)
+        deltas = {(d['cik'], d['cusip']): d['change_type']
+                  for d in get_position_deltas(quarter='2024-Q2', session=self.session)}
+        self.assertEqual(deltas, {('A', 'X'): 'decreased', ('A', 'Y'): 'exited', ('C', 'X'): 'new',
+                                  ('C', 'W'): 'new'})
+
+    def test_new_quarter_rebuilds_following_quarter(self):
+        refresh_position_deltas(session=self.session)
+        self._filing('B1A', 'B', datetime(2024, 3, 31), {'Y': 40}, filed=datetime(2024, 5, 1))
+        self.session.commit()
+        rebuilt = refresh_position_deltas([datetime(2024, 3, 31)], self.session)
+        self.assertEqual(sorted(rebuilt), ['2024-Q1', '2024-Q2'])
+        self.assertEqual(get_cusip_flows('2024-Q1', session=self.session)[0]['cusip'], 'X')
+
+    def test_quarters_loaded_before_the_deltas_are_built_on_first_use(self):
+        # Quarters already on disk are built by the first flow read, once
+        self.assertEqual([f['cusip'] for f in top_accumulated_names(session=self.session)], ['X', 'Z'])
+        self.assertEqual(ensure_position_deltas(self.session), {})
+
+        # A targeted refresh also picks up any filed quarter never built
+        self._filing('A3', 'A', datetime(2023, 12, 31), {'X': 80})
+        self._filing('A4', 'A', datetime(2024, 9, 30), {'X': 160})
+        self.session.commit()
+        self.assertEqual(sorted(refresh_position_deltas(['2024-Q3'], self.session)), ['2023-Q4', '2024-Q3'])
+        self.assertEqual(get_position_deltas(cik='A', quarter='2023-Q4', session=self.session)[0]['change_type'],
+                         'new')
+
+
+if __name__ == '__main__':
+    unittest.main()
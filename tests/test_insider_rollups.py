@@ -0,0 +1,115 @@
+"""
+Tests for the daily insider transaction rollups.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import SecSubmission, SecReportingOwner, SecNonDerivTrans, SecInsiderDailyRollup
+from src.insider_rollups import (get_issuer_insider_activity, has_insider_rollups, insider_activity_screen,
+                                 refresh_insider_rollups)
+from tests.test_base import TunedDatabaseTest
+
+
+class TestInsiderRollups(TunedDatabaseTest):
+
+    def setUp(self):
+        super().setUp()
+        # Joint filing by two owners: one purchase and one sale on the same day
+        self._filing('F1', '111', ['O1', 'O2'], [('2024-03-01', 'P', 'A', 1000, 20.0),
+                                                   ('2024-03-01', 'S', 'D', 100, 50.0)])
+        self._filing('F2', '111', ['O3'], [('2024-03-01', 'P', 'A', 500, 20.0)])
+        self._filing('F3', '222', ['O4'], [('2024-03-02', 'S', 'D', 10000, 30.0)])
+        self.session.commit()
+
+    def _filing(self, accession, issuercik, owners, transactions):
+        first_day = datetime.strptime(transactions[0][0], '%Y-%m-%d')
+        self.session.add(SecSubmission(accession_number=accession, filing_date=first_day,
+                                       period_of_report=first_day, document_type='4', issuercik=issuercik,
+                                       issuername=f"Issuer {issuercik}", issuertradingsymbol=f"T{issuercik}"))
+        for owner in owners:
+            self.session.add(SecReportingOwner(accession_number=accession, rptownercik=owner,
+                                               rptownername=owner, rptowner_relationship='Director',
+                                               rptowner_street1='1 Main St', rptowner_city='City',
+                                               rptowner_state='NY', rptowner_zipcode='10001'))
+        for sk, (day, code, direction, shares, price) in enumerate(transactions):
+            self.session.add(SecNonDerivTrans(accession_number=accession, nonderiv_trans_sk=sk,
+                                              security_title='Common Stock',
+                                              trans_date=datetime.strptime(day, '%Y-%m-%d'),
+                                              trans_code=code, trans_acquired_disp_cd=direction,
+                                              trans_shares=shares, trans_pricepershare=price,
+                                              direct_indirect_ownership='D'))
+
+    def _rollups(self):
+        return {(r.issuercik, r.trans_date, r.trans_code): r for r in self.session.query(SecInsiderDailyRollup)}
+
+    def test_full_rebuild_totals_and_distinct_insiders(self):
+        self.assertEqual(refresh_insider_rollups(session=self.session), 3)
+        rollups = self._rollups()
+
+        purchases = rollups[('111', '2024-03-01', 'P')]
+        # Two owners on F1 must not double the totals
+        self.assertEqual(purchases.transactions, 2)
+        self.assertEqual(purchases.shares_acquired, 1500)
+        self.assertEqual(purchases.value_acquired, 30000)
+        self.assertEqual(purchases.large_transactions, 1)
+        self.assertEqual((purchases.insiders, purchases.buying_insiders, purchases.selling_insiders), (3, 3, 0))
+        self.assertIsNone(purchases.buy_sell_ratio)
+
+        sales = rollups[('111', '2024-03-01', 'S')]
+        self.assertEqual((sales.value_disposed, sales.large_transactions, sales.selling_insiders), (5000, 0, 2))
+        self.assertEqual(rollups[('222', '2024-03-02', 'S')].large_value_disposed, 300000)
+
+    def test_incremental_refresh_recomputes_touched_issuer_days(self):
+        refresh_insider_rollups(session=self.session)
+        self._filing('F4', '111', ['O5'], [('2024-03-01', 'P', 'A', 100, 20.0)])
+        self.session.commit()
+
+        self.assertEqual(refresh_insider_rollups(['F4'], self.session), 2)
+        rollups = self._rollups()
+        self.assertEqual(rollups[('111', '2024-03-01', 'P')].value_acquired, 32000)
+        self.assertEqual(rollups[('111', '2024-03-01', 'P')].insiders, 4)
+        self.assertEqual(len(rollups), 3)
+        self.assertEqual(refresh_insider_rollups(['unknown'], self.session), 0)
+
+    def test_first_refresh_backfills_and_readers_wait_for_coverage(self):
+        self.assertFalse(has_insider_rollups(self.session))
+        # An ingest of one new filing into a database with history builds every issuer-day
+        self._filing('F6', '333', ['O6'], [('2024-04-01', 'P', 'A', 10, 5.0)])
+        self.session.commit()
+        self.assertEqual(refresh_insider_rollups(['F6'], self.session), 4)
+        self.assertTrue(has_insider_rollups(self.session))
+
+        # Loaded but not yet rolled up: readers fall back until the refresh
+        self._filing('F7', '333', ['O6'], [('2024-04-02', 'S', 'D', 10, 5.0)])
+        self.session.commit()
+        self.assertFalse(has_insider_rollups(self.session))
+        self.assertEqual(refresh_insider_rollups(['F7'], self.session), 1)
+        self.assertTrue(has_insider_rollups(self.session))
+
+    def test_screen_ranks_against_trailing_baseline(self):
+        self._filing('F5', '222', ['O4'], [('2023-09-01', 'S', 'D', 100, 30.0)])
+        self.session.commit()
+        refresh_insider_rollups(session=self.session)
+
+        selling = insider_activity_screen('2024-03-01', '2024-03-31', direction='selling', session=self.session)
+        self.assertEqual([row['issuercik'] for row in selling], ['222', '111'])
+        self.assertEqual(selling[0]['value'], 300000)
+        self.assertAlmostEqual(selling[0]['baseline_value'], 3000 * 31 / 365.0)
+        self.assertIsNone(selling[1]['baseline_multiple'])
+
+        buying = insider_activity_screen('2024-03-01', '2024-03-31', min_value=50000, session=self.session)
+        self.assertEqual(buying, [])
+        with self.assertRaises(ValueError):
+            insider_activity_screen('2024-03-01', direction='sideways', session=self.session)
+
+        history = get_issuer_insider_activity('222', start_date='2024-01-01', session=self.session)
+        self.assertEqual([row['trans_date'] for row in history], ['2024-03-02'])
+
+
+if __name__ == '__main__':
+    unittest.main()
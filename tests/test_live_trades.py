@@ -0,0 +1,101 @@
+"""
+Tests for the event-sourced CFTC live-trade table.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from database import CFTCSwap, CFTCLiveTrade, CFTCTerminatedTrade
+from src.processor_cftc_swaps import load_swap_transactions
+from src.swap_lifecycle import apply_lifecycle_events, rebuild_live_trades
+from tests.test_base import TunedDatabaseTest
+
+
+def _event(dissemination_id, action, hour, original=None, notional=None):
+    return CFTCSwap(dissemination_id=dissemination_id, original_dissemination_id=original,
+                    action_type=action, asset_class='IR', notional_amount_leg_1=notional,
+                    event_timestamp=datetime(2024, 5, 1, hour))
+
+
+class TestLiveTrades(TunedDatabaseTest):
+
+    def _add(self, *events):
+        session = self.Session()
+        session.add_all(events)
+        session.commit()
+        session.close()
+
+    def _live(self):
+        session = self.Session()
+        rows = {t.trade_id: t.notional_amount_leg_1 for t in session.query(CFTCLiveTrade)}
+        session.close()
+        return rows
+
+    def test_latest_state_wins_and_terminations_are_removed(self):
+        self._add(_event('A', 'NEWT', 1, notional=100.0),
+                  _event('B', 'NEWT', 1, notional=50.0),
+                  _event('A2', 'MODI', 2, original='A', notional=150.0),
+                  _event('B2', 'TERM', 3, original='B'))
+        stats = apply_lifecycle_events(self.Session(), batch_size=2)
+        self.assertEqual(stats['events'], 4)
+        self.assertEqual(self._live(), {'A': 150.0})
+
+    def test_incremental_batches_and_stale_events(self):
+        self._add(_event('A', 'NEWT', 1, notional=100.0), _event('A3', 'CORR', 5, original='A', notional=120.0))
+        apply_lifecycle_events(self.Session())
+        # A late MODI older than the applied correction must not overwrite it
+        self._add(_event('A2', 'MODI', 3, original='A', notional=999.0))
+        stats = apply_lifecycle_events(self.Session())
+        self.assertEqual(stats, {'events': 1, 'upserted': 0, 'terminated': 0, 'stale': 1})
+        self.assertEqual(self._live(), {'A': 120.0})
+        self.assertEqual(apply_lifecycle_events(self.Session())['events'], 0)
+
+    def test_late_event_after_termination_is_stale(self):
+        self._add(_event('A', 'NEWT', 1, notional=100.0), _event('A3', 'TERM', 5, original='A'))
+        apply_lifecycle_events(self.Session())
+        # The trade ended at hour 5; a MODI from hour 3 arriving later must not revive it
+        self._add(_event('A2', 'MODI', 3, original='A', notional=999.0))
+        stats = apply_lifecycle_events(self.Session())
+        self.assertEqual(stats, {'events': 1, 'upserted': 0, 'terminated': 0, 'stale': 1})
+        self.assertEqual(self._live(), {})
+        rebuild_live_trades(self.Session())
+        self.assertEqual(self._live(), {})
+
+        # An event newer than the termination does bring it back
+        self._add(_event('A4', 'CORR', 7, original='A', notional=130.0))
+        apply_lifecycle_events(self.Session())
+        self.assertEqual(self._live(), {'A': 130.0})
+        session = self.Session()
+        self.assertEqual(session.query(CFTCTerminatedTrade).count(), 0)
+        session.close()
+
+    def test_rebuild_matches_incremental_state(self):
+        self._add(_event('A', 'NEWT', 1, notional=10.0), _event('B', 'NEWT', 2, notional=20.0))
+        apply_lifecycle_events(self.Session())
+        self._add(_event('A2', 'EROR', 4, original='A'))
+        apply_lifecycle_events(self.Session())
+        incremental = self._live()
+        rebuild_live_trades(self.Session())
+        self.assertEqual(self._live(), incremental)
+        self.assertEqual(incremental, {'B': 20.0})
+
+    def test_ingest_updates_live_trades(self):
+        raw = pd.DataFrame({
+            'dissemination_id': ['1', '2', '3'],
+            'original_dissemination_id': ['', '', '1'],
+            'action_type': ['NEWT', 'NEWT', 'TERM'],
+            'event_timestamp': ['2024-05-01T09:00:00Z', '2024-05-01T09:30:00Z', '2024-05-01T10:00:00Z'],
+            'notional_amount_leg_1': ['1,000', '2,000', ''],
+        })
+        load_swap_transactions(raw, self.Session())
+        self.assertEqual(self._live(), {'2': 2000.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Tests for HHI, top-N share and Gini concentration metrics.
+"""
+
+import os
+import sys
+import time
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sqlalchemy import text
+
+from database import CFTCSwapDailyAggregate, CFTCDerivativesDealer, SecDerivativeDisclosure
+from src.market_concentration import concentration_metrics, dealer_family, market_concentration_summary
+from tests.test_base import TunedDatabaseTest
+
+
+def _gini(values):
+    values = np.asarray(values, dtype=float)
+    return np.abs(values[:, None] - values[None, :]).sum() / (2 * len(values) ** 2 * values.mean())
+
+
+class TestMarketConcentration(TunedDatabaseTest):
+
+    def _positions(self, rows):
+        self.session.execute(text("INSERT INTO form13f_position_deltas (quarter, cik, cusip, value) "
+                                  "VALUES (:quarter, :cik, :cusip, :value)"), rows)
+        self.session.commit()
+
+    def test_swap_asset_class_metrics(self):
+        for day, asset_class, notional in [('2024-01-02', 'IR', 400), ('2024-01-03', 'IR', 200),
+                                           ('2024-01-02', 'CR', 300), ('2024-01-02', 'EQ', 100),
+                                           ('2024-02-01', 'IR', 50)]:
+            self.session.add(CFTCSwapDailyAggregate(trade_date=day, asset_class=asset_class, product_name='P',
+                                                    notional_currency='USD', trade_count=1, notional_sum=notional))
+        self.session.commit()
+
+        metrics = concentration_metrics('swap_asset_class', '2024-01-01', top_n=1, session=self.session)
+        january = metrics.iloc[0]
+        self.assertEqual((january['period'], january['participants'], january['total']), ('2024-01', 3, 1000))
+        self.assertEqual(january['hhi'], 4600.0)
+        self.assertEqual(january['top_1_share'], 0.6)
+        self.assertAlmostEqual(january['gini'], _gini([600, 300, 100]), places=4)
+        self.assertEqual(january['level'], 'highly_concentrated')
+        # A single participant is a monopoly with no inequality among participants
+        self.assertEqual((metrics.iloc[1]['hhi'], metrics.iloc[1]['gini']), (10000.0, 0.0))
+
+    def test_issuer_holders_match_brute_force(self):
+        rng = np.random.default_rng(2)
+        rows = []
+        for cusip in range(40):
+            for cik in range(int(rng.integers(1, 30))):
+                rows.append({'quarter': '2024-Q1', 'cik': str(cik), 'cusip': f"C{cusip:08d}",
+                             'value': int(rng.integers(0, 10_000))})
+        self._positions(rows)
+
+        metrics = concentration_metrics('issuer_holders', '2024-01-01', session=self.session).set_index('market')
+        for cusip in ('C00000000', 'C00000017'):
+            values = np.array([r['value'] for r in rows if r['cusip'] == cusip and r['value'] > 0], dtype=float)
+            shares = np.sort(values / values.sum())[::-1]
+            row = metrics.loc[cusip]
+            self.assertEqual(row['participants'], len(values))
+            self.assertAlmostEqual(row['hhi'], 10000 * (shares ** 2).sum(), places=1)
+            self.assertAlmostEqual(row['top_4_share'], shares[:4].sum(), places=4)
+            self.assertAlmostEqual(row['gini'], _gini(values), places=4)
+
+        # Forty issuers are summarized per quarter rather than listed
+        summary = market_concentration_summary(['issuer_holders'], '2024-01-01', min_participants=5,
+                                               limit=3, session=self.session)['issuer_holders']
+        self.assertEqual(len(summary['latest']), 3)
+        self.assertEqual(summary['history'][0]['markets'], summary['markets'])
+        self.assertIn('median_hhi', summary['history'][0])
+
+    def test_dealer_share_from_disclosed_counterparties(self):
+        self.assertEqual(dealer_family('Goldman Sachs Bank USA'), 'goldman')
+        self.assertEqual(dealer_family('Bank of America, N.A.'), dealer_family('Bank of America'))
+        for name, dealer_id in [('Goldman Sachs Bank USA', 'SD1'), ('JPMorgan Chase Bank, N.A.', 'SD2')]:
+            self.session.add(CFTCDerivativesDealer(legal_name=name, dftc_swap_dealer_id=dealer_id))
+        for i, counterparties in enumerate([['JPMorgan Chase Bank', 'Goldman Sachs'], ['JPMorgan'],
+                                            ['JPMorgan', 'Acme Lending']]):
+            self.session.add(SecDerivativeDisclosure(accession_number=f"A-{i}", cik=str(i), form_type='10-K',
+                                                     filing_date=datetime(2024, 3, 1), counterparties=counterparties))
+        self.session.commit()
+
+        row = concentration_metrics('dealer', '2023-01-01', top_n=1, session=self.session).iloc[0]
+        self.assertEqual((row['period'], row['participants'], row['total']), ('2024', 2, 4))
+        self.assertEqual((row['hhi'], row['top_1_share']), (6250.0, 0.75))
+
+    def test_large_holdings_table_in_seconds(self):
+        rng = np.random.default_rng(9)
+        n = 200_000
+        self._positions([{'quarter': '2024-Q1', 'cik': str(cik), 'cusip': f"C{cusip:08d}", 'value': int(value)}
+                         for cik, cusip, value in zip(np.arange(n) % 5000, np.arange(n) // 50,
+                                                      rng.integers(1, 10**11, n))])
+        started = time.perf_counter()
+        metrics = concentration_metrics('issuer_holders', '2024-01-01', session=self.session)
+        self.assertLess(time.perf_counter() - started, 15)
+        self.assertEqual((len(metrics), metrics['participants'].sum()), (4000, n))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Tests for the money market fund redemption stress simulator.
+"""
+
+import os
+import sys
+import time
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from database import NMFPSubmission, NMFPSeriesLevelInfo, NMFPSchPortfolioSecurities
+from src.mmf_stress import run_redemption_stress, simulate_redemptions
+from tests.test_base import TunedDatabaseTest
+
+REPORT_DATE = datetime(2024, 3, 31)
+
+
+class TestMMFStress(TunedDatabaseTest):
+
+    def _fund(self, accession, seriesid, category, daily_pct, weekly_pct, report_date=REPORT_DATE, holdings=()):
+        self.session.add(NMFPSubmission(accession_number=accession, filing_date=report_date + timedelta(days=5),
+                                        submission_type='N-MFP3', report_date=report_date, filer_cik='1',
+                                        seriesid=seriesid, nameofseries=f"Fund {seriesid}",
+                                        total_share_classes_in_series=1, final_filing_flag='N'))
+        self.session.add(NMFPSeriesLevelInfo(accession_number=accession, feeder_fund_flag='N', master_fund_flag='N',
+                                             money_market_fund_category=category, average_portfolio_maturity=30,
+                                             average_life_maturity=60, total_value_other_assets=0,
+                                             total_value_liabilities=0, net_asset_of_series=100.0,
+                                             seven_day_gross_yield=0.05,
+                                             pct_dly_liquid_asset_friday_week1=daily_pct,
+                                             pct_wkly_liquid_asset_friday_week1=weekly_pct))
+        for security_id, (days, value, daily_flag) in enumerate(holdings):
+            self.session.add(NMFPSchPortfolioSecurities(
+                accession_number=accession, security_id=security_id, name_of_issuer='Issuer', title_of_issuer='CP',
+                investment_maturity_date_wam=report_date + timedelta(days=days), security_demand_feature_flag='N',
+                security_guarantee_flag='N', security_enhancements_flag='N',
+                including_value_of_any_sponsor_supp=value, excluding_value_of_any_sponsor_supp=value,
+                percentage_of_money_market_fund_net=value / 100, daily_liquid_asset_security_flag=daily_flag))
+
+    def test_closed_form_matches_day_by_day_walk(self):
+        rates = [0.08, 0.05, 0.03, 0.0, 0.02]
+        matured = np.cumsum(np.array([[0, 0, 6.0, 0, 0, 3.0, 0, 0, 0, 0, 0]]), axis=1)
+        paths = simulate_redemptions(np.array([100.0]), np.array([30.0]), np.array([55.0]), matured,
+                                     {'test': rates}, horizon_days=5)
+        nav, dla = 100.0, 30.0
+        for day, rate in enumerate(rates, start=1):
+            redemption = nav * rate
+            nav -= redemption
+            dla += matured[0, day] - matured[0, day - 1] - redemption
+            self.assertAlmostEqual(paths['dla_ratio'][0, 0, day - 1], dla / nav)
+        self.assertEqual(paths['daily_breach_day'][0, 0], 1)  # 22/92 on day one
+
+    def test_universe_breach_days(self):
+        # Same starting DLA; the second fund has paper maturing on day 2
+        self._fund('A-1', 'S1', 'Prime', 0.30, 0.55)
+        self._fund('B-1', 'S2', 'Government', 0.30, 0.55, holdings=[(2, 20.0, 'N'), (1, 30.0, 'Y')])
+        # Superseded filing for S1 and a filing outside the quarter
+        self._fund('A-0', 'S1', 'Prime', 0.90, 0.95, report_date=datetime(2024, 2, 29))
+        self._fund('C-0', 'S3', 'Prime', 0.01, 0.01, report_date=datetime(2023, 9, 30))
+        self.session.commit()
+
+        result = run_redemption_stress({'steady': [0.05] * 10}, horizon_days=10, session=self.session)
+        self.assertEqual(result['funds'], 2)
+        summary = result['scenarios']['steady']
+        days = {row['seriesid']: row['daily_breach_day'] for row in summary['most_vulnerable']}
+        self.assertEqual(days['S1'], 2)  # (30 - 9.75) / 90.25 < 25%
+        self.assertGreater(days['S2'], 2)
+        self.assertEqual(summary['breach_day_distribution'][2], 1)
+
+        prime_only = run_redemption_stress({'steady': [0.05] * 10}, fund_category='prime', session=self.session)
+        self.assertEqual(prime_only['funds'], 1)
+
+    def test_full_universe_in_seconds(self):
+        rng = np.random.default_rng(5)
+        funds, horizon = 5000, 60
+        matured = np.cumsum(rng.uniform(0, 1, size=(funds, horizon + 6)), axis=1)
+        scenarios = {f"s{i}": rng.uniform(0, 0.05, size=horizon) for i in range(20)}
+        started = time.perf_counter()
+        paths = simulate_redemptions(rng.uniform(50, 500, funds), rng.uniform(10, 100, funds),
+                                     rng.uniform(20, 200, funds), matured, scenarios, horizon_days=horizon)
+        self.assertLess(time.perf_counter() - started, 10)
+        self.assertEqual(paths['daily_breach_day'].shape, (20, funds))
+
+
+if __name__ == '__main__':
+    unittest.main()
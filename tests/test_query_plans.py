@@ -0,0 +1,102 @@
+"""
+Query plan checks for the analytics access paths.
+
+Runs the CrossDatasetAnalyticsEngine handlers against an empty database with
+the managed secondary indexes, captures every statement they issue and fails
+if EXPLAIN QUERY PLAN shows a full scan of a base table.
+"""
+
+import os
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, create_tuned_engine, create_managed_indexes, get_managed_index_status
+from src.enhanced_analytics_tools import CrossDatasetAnalyticsEngine
+
+FULL_SCAN = re.compile(r'^SCAN (\S+)$')
+TABLE_REFERENCE = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+
+
+class TestAnalyticsQueryPlans(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.test_dir = tempfile.mkdtemp()
+        cls.engine = create_tuned_engine(f"sqlite:///{os.path.join(cls.test_dir, 'plans.db')}")
+        Base.metadata.create_all(bind=cls.engine)
+        create_managed_indexes(cls.engine)
+        cls.Session = sessionmaker(bind=cls.engine)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+        shutil.rmtree(cls.test_dir, ignore_errors=True)
+
+    def _capture_statements(self, handler_name, params):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                statements.append((statement, parameters))
+
+        event.listen(self.engine, "before_cursor_execute", record)
+        analytics = CrossDatasetAnalyticsEngine.__new__(CrossDatasetAnalyticsEngine)
+        analytics.db = self.Session()
+        try:
+            getattr(analytics, handler_name)(params)
+        finally:
+            analytics.db.close()
+            event.remove(self.engine, "before_cursor_execute", record)
+        return statements
+
+    def _full_scans(self, statement, parameters):
+        with self.engine.connect() as conn:
+            plan = [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        # Plans name tables by alias; scans of CTEs and subqueries are not table scans
+        base_tables = set()
+        for table, alias in TABLE_REFERENCE.findall(statement):
+            if table in Base.metadata.tables:
+                base_tables.update({table, alias})
+        return [detail for detail in plan
+                if (m := FULL_SCAN.match(detail)) and m.group(1) in base_tables]
+
+    def _assert_no_full_scans(self, handler_name, params):
+        statements = self._capture_statements(handler_name, params)
+        self.assertTrue(statements, f"{handler_name} issued no queries")
+        for statement, parameters in statements:
+            scans = self._full_scans(statement, parameters)
+            self.assertEqual(scans, [], f"{handler_name} full scan {scans} in:\n{statement}")
+
+    def test_managed_indexes_exist(self):
+        self.assertTrue(all(get_managed_index_status(self.engine).values()))
+
+    def test_company_profile_uses_indexes(self):
+        self._assert_no_full_scans('_get_company_comprehensive_profile', {'cik': '0000320193'})
+
+    def test_institutional_flow_uses_indexes(self):
+        self._assert_no_full_scans('_analyze_institutional_flow', {})
+
+    def test_insider_monitoring_uses_indexes(self):
+        self._assert_no_full_scans('_monitor_insider_activity', {'lookback_days': 30})
+
+    def test_swap_risk_uses_indexes(self):
+        self._assert_no_full_scans('_assess_swap_risk', {})
+
+    def test_peer_analysis_uses_indexes(self):
+        self._assert_no_full_scans('_analyze_company_vs_peers', {'cik': '0000320193'})
+
+    def test_regulatory_timeline_uses_indexes(self):
+        self._assert_no_full_scans('_analyze_regulatory_timeline', {'cik': '0000320193'})
+        self._assert_no_full_scans('_analyze_regulatory_timeline', {'lookback_months': 12})
+
+
+if __name__ == '__main__':
+    unittest.main()
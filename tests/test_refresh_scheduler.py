@@ -0,0 +1,139 @@
+"""
+Tests for the dependency-aware refresh scheduler.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.refresh_scheduler import (
+    RefreshScheduler, STAGE_COMPLETED, STAGE_SKIPPED, STAGE_FAILED, STAGE_BLOCKED, KIND_DOWNLOAD
+)
+
+
+class TestRefreshScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.test_dir, 'state.json')
+        self.source_dir = os.path.join(self.test_dir, 'source')
+        os.makedirs(self.source_dir)
+        with open(os.path.join(self.source_dir, 'a.zip'), 'w') as f:
+            f.write('first')
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _recorder(self, name, delay=0.0):
+        def func():
+            time.sleep(delay)
+            self.calls.append(name)
+            return name
+        return func
+
+    def test_independent_stages_run_in_parallel(self):
+        scheduler = RefreshScheduler(state_path=self.state_path)
+        scheduler.add_stage('a', self._recorder('a', 0.3), kind=KIND_DOWNLOAD)
+        scheduler.add_stage('b', self._recorder('b', 0.3), kind=KIND_DOWNLOAD)
+        report = scheduler.run(max_workers=2)
+        self.assertLess(report.wall_time, 0.55)
+        self.assertEqual(report.stages_with_status(STAGE_COMPLETED), ['a', 'b'])
+
+    def test_dependencies_run_in_order(self):
+        scheduler = RefreshScheduler()
+        scheduler.add_stage('index', self._recorder('index'), depends_on=['ingest'])
+        scheduler.add_stage('ingest', self._recorder('ingest'), depends_on=['download'])
+        scheduler.add_stage('download', self._recorder('download'))
+        scheduler.run()
+        self.assertEqual(self.calls, ['download', 'ingest', 'index'])
+
+    def test_unchanged_inputs_are_skipped(self):
+        def build():
+            scheduler = RefreshScheduler(state_path=self.state_path)
+            scheduler.add_stage('ingest', self._recorder('ingest'), inputs=[self.source_dir])
+            scheduler.add_stage('index', self._recorder('index'), depends_on=['ingest'])
+            return scheduler
+
+        first = build().run()
+        self.assertEqual(first.results['ingest'].status, STAGE_COMPLETED)
+
+        second = build().run()
+        self.assertEqual(second.results['ingest'].status, STAGE_SKIPPED)
+        self.assertEqual(second.results['index'].status, STAGE_SKIPPED)
+
+        with open(os.path.join(self.source_dir, 'b.zip'), 'w') as f:
+            f.write('second')
+        third = build().run()
+        self.assertEqual(third.results['ingest'].status, STAGE_COMPLETED)
+        self.assertEqual(third.results['index'].status, STAGE_COMPLETED)
+
+        forced = build().run(force=True)
+        self.assertEqual(forced.results['ingest'].status, STAGE_COMPLETED)
+
+    def test_failure_blocks_dependents(self):
+        def boom():
+            raise RuntimeError("download failed")
+
+        scheduler = RefreshScheduler()
+        scheduler.add_stage('download', boom)
+        scheduler.add_stage('ingest', self._recorder('ingest'), depends_on=['download'])
+        scheduler.add_stage('other', self._recorder('other'))
+        report = scheduler.run()
+        self.assertEqual(report.results['download'].status, STAGE_FAILED)
+        self.assertEqual(report.results['ingest'].status, STAGE_BLOCKED)
+        self.assertEqual(report.results['other'].status, STAGE_COMPLETED)
+        self.assertFalse(report.succeeded)
+
+    def test_ordering_only_stage_is_not_blocked(self):
+        def boom():
+            raise RuntimeError("load failed")
+
+        scheduler = RefreshScheduler()
+        scheduler.add_stage('load', boom)
+        scheduler.add_stage('restore', self._recorder('restore'), after=['load'])
+        scheduler.add_stage('index', self._recorder('index'), after=['restore'])
+        report = scheduler.run()
+        self.assertEqual(report.results['load'].status, STAGE_FAILED)
+        self.assertEqual(report.results['restore'].status, STAGE_COMPLETED)
+        self.assertEqual(self.calls, ['restore', 'index'])
+
+    def test_ordering_only_stage_waits(self):
+        scheduler = RefreshScheduler()
+        scheduler.add_stage('load', self._recorder('load', 0.2))
+        scheduler.add_stage('restore', self._recorder('restore'), after=['load'])
+        scheduler.run(max_workers=2)
+        self.assertEqual(self.calls, ['load', 'restore'])
+
+    def test_cycle_detection(self):
+        scheduler = RefreshScheduler()
+        scheduler.add_stage('a', self._recorder('a'), depends_on=['b'])
+        scheduler.add_stage('b', self._recorder('b'), depends_on=['a'])
+        with self.assertRaises(ValueError):
+            scheduler.run()
+
+    def test_critical_path(self):
+        scheduler = RefreshScheduler()
+        scheduler.add_stage('slow_download', self._recorder('slow_download', 0.2))
+        scheduler.add_stage('fast_download', self._recorder('fast_download'))
+        scheduler.add_stage('ingest', self._recorder('ingest'),
+                            depends_on=['slow_download', 'fast_download'])
+        report = scheduler.run()
+        self.assertEqual(report.critical_path, ['slow_download', 'ingest'])
+        self.assertGreaterEqual(report.critical_path_time, 0.2)
+
+    def test_shared_lock_serializes_stages(self):
+        scheduler = RefreshScheduler()
+        scheduler.add_stage('a', self._recorder('a', 0.2), lock='database')
+        scheduler.add_stage('b', self._recorder('b', 0.2), lock='database')
+        report = scheduler.run(max_workers=2)
+        self.assertGreaterEqual(report.wall_time, 0.4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Tests for the shared analytics result cache.
+"""
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DataChangeLog, record_data_change
+from src.result_cache import AnalyticsResultCache, cached_tool, make_cache_key
+from tests.test_base import TunedDatabaseTest
+
+SWAP_TABLES = ('cftc_swap_data',)
+
+
+class TestResultCache(TunedDatabaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.disk_path = os.path.join(self.test_dir, 'analytics_cache.db')
+
+    def _ingest(self, table, records=None):
+        record_data_change(self.session, table, records, row_count=1)
+        self.session.commit()
+
+    def _cache(self, **kwargs):
+        return AnalyticsResultCache(db_session=self.session, **kwargs)
+
+    def test_keys_normalize_parameter_order(self):
+        self.assertEqual(make_cache_key('t', {'a': 1, 'b': [1, 2]}), make_cache_key('t', {'b': [1, 2], 'a': 1}))
+        self.assertNotEqual(make_cache_key('t', {'a': 1}), make_cache_key('u', {'a': 1}))
+
+    def test_decorated_tool_reruns_only_after_its_tables_change(self):
+        cache = self._cache()
+        calls = []
+
+        @cached_tool(SWAP_TABLES, cache=cache)
+        def exposure(dimension='asset_class'):
+            calls.append(dimension)
+            return json.dumps({'dimension': dimension, 'run': len(calls)})
+
+        first = exposure()
+        self.assertEqual(exposure(dimension='asset_class'), first)
+        self.assertEqual(len(calls), 1)
+
+        self._ingest('nport_holdings')
+        self.assertEqual(exposure(), first)
+        self._ingest('cftc_swap_data')
+        self.assertNotEqual(exposure(), first)
+        self.assertEqual(len(calls), 2)
+
+    def test_entity_results_survive_other_entities_changes(self):
+        cache = self._cache()
+        tables = ('sec_submissions',)
+        cache.put('profile', {'cik': '320193'}, 'apple', tables, entity_keys=['320193'])
+        self._ingest('sec_submissions', [{'issuercik': '789019'}])
+        self.assertEqual(cache.get('profile', {'cik': '320193'}, tables), 'apple')
+        self._ingest('sec_submissions', [{'issuercik': '0000320193'}])
+        self.assertIsNone(cache.get('profile', {'cik': '320193'}, tables))
+
+    def test_errors_are_not_cached(self):
+        cache = self._cache()
+        cache.put('tool', {}, json.dumps({'error': 'boom'}), SWAP_TABLES)
+        self.assertIsNone(cache.get('tool', {}, SWAP_TABLES))
+
+    def test_disk_tier_is_shared_and_bounded(self):
+        writer = self._cache(disk_path=self.disk_path, max_disk_entries=2)
+        for i in range(3):
+            writer.put('tool', {'i': i}, f"result {i}", SWAP_TABLES)
+
+        reader = self._cache(disk_path=self.disk_path)
+        self.assertIsNone(reader.get('tool', {'i': 0}, SWAP_TABLES))
+        self.assertEqual(reader.get('tool', {'i': 2}, SWAP_TABLES), 'result 2')
+        self.assertEqual(reader.stats()['disk_hits'], 1)
+
+        self._ingest('cftc_swap_data')
+        self.assertIsNone(self._cache(disk_path=self.disk_path).get('tool', {'i': 1}, SWAP_TABLES))
+
+    def test_disk_entries_from_before_a_log_reset_are_invalid(self):
+        for _ in range(3):
+            self._ingest('cftc_swap_data')
+        self._cache(disk_path=self.disk_path).put('tool', {}, 'before reset', SWAP_TABLES)
+        self.session.query(DataChangeLog).delete()
+        self.session.commit()
+        self._ingest('cftc_swap_data')
+        self.assertIsNone(self._cache(disk_path=self.disk_path).get('tool', {}, SWAP_TABLES))
+
+    def test_entries_expire_after_max_age(self):
+        cache = self._cache(max_age_seconds=-1)
+        cache.put('tool', {}, 'value', SWAP_TABLES)
+        self.assertIsNone(cache.get('tool', {}, SWAP_TABLES))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+"""
+Tests for the security-holder index across 13F and N-PORT.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from database import (Form13FCoverPage, Form13FInfoTable, Form13FSubmission, NPORTHolding, NPORTSubmission,
+                      SecurityHolder, SecurityHolderBuild)
+from src.security_holders import (get_security_holders, refresh_security_holders, security_crowding,
+                                  security_id_keys)
+from tests.test_base import TunedDatabaseTest
+
+ACME_CUSIP = '00206R102'
+ACME_ISIN = 'US00206R1023'
+
+
+class TestSecurityHolders(TunedDatabaseTest):
+
+    def _13f(self, rows):
+        self.session.execute(text("""
+            INSERT INTO form13f_position_deltas (quarter, cik, cusip, nameofissuer, value, shares, change_type)
+            VALUES (:quarter, :cik, :cusip, 'ACME CORP', :value, :shares, :change_type)
+        """), rows)
+        self.session.execute(text("INSERT OR IGNORE INTO form13f_delta_builds (quarter) VALUES (:quarter)"), rows)
+
+    def _nport(self, accession, series, report_date, holdings, filing_date=None):
+        self.session.add(NPORTSubmission(accession_number=accession, cik='900', lei='LEI900', series_id=series,
+                                         series_name=f"Fund {series}", registrant_name='Trust',
+                                         report_date=report_date, filing_date=filing_date or report_date))
+        for cusip, isin, balance, value in holdings:
+            self.session.add(NPORTHolding(accession_number=accession, issuer_name='Acme Corp', cusip=cusip,
+                                          isin=isin, balance_held=balance, value_usd=value))
+
+    def _fixture(self):
+        self._13f([
+            {'quarter': '2024-Q1', 'cik': '7', 'cusip': ACME_CUSIP, 'value': 600, 'shares': 60, 'change_type': 'new'},
+            {'quarter': '2024-Q1', 'cik': '8', 'cusip': ACME_CUSIP, 'value': 400, 'shares': 40, 'change_type': 'new'},
+            {'quarter': '2024-Q2', 'cik': '7', 'cusip': ACME_CUSIP, 'value': 900, 'shares': 80,
+             'change_type': 'increased'},
+            {'quarter': '2024-Q2', 'cik': '8', 'cusip': ACME_CUSIP, 'value': 0, 'shares': 0, 'change_type': 'exited'},
+            {'quarter': '2024-Q2', 'cik': '9', 'cusip': ACME_CUSIP, 'value': 100, 'shares': 10, 'change_type': 'new'},
+        ])
+        self.session.execute(text("""
+            INSERT INTO form13f_submissions (accession_number, filing_date, submission_type, cik, period_of_report)
+            VALUES ('F-7', '2024-08-10', '13F-HR', '7', '2024-06-30')
+        """))
+        self.session.execute(text("""
+            INSERT INTO form13f_coverpages (accession_number, report_calendar_or_quarter, filing_manager_name,
+                                            report_type, provide_info_for_instruction5)
+            VALUES ('F-7', '2024-06-30', 'Big Fund LP', '13F HOLDINGS REPORT', 'N')
+        """))
+        # Series S1 files monthly; only its last report of the quarter counts
+        self._nport('N-1', 'S1', datetime(2024, 4, 30), [(ACME_CUSIP, ACME_ISIN, 5, 50)])
+        self._nport('N-2', 'S1', datetime(2024, 6, 30), [(ACME_CUSIP, ACME_ISIN, 7, 70), ('N/A', None, 1, 1)])
+        # Series S2 reports only the ISIN
+        self._nport('N-3', 'S2', datetime(2024, 6, 30), [(None, ACME_ISIN, 3, 30)])
+        self.session.commit()
+
+    def test_identifier_keys(self):
+        self.assertEqual(security_id_keys(' 00206r102 '), [('cusip', ACME_CUSIP)])
+        self.assertEqual(security_id_keys(ACME_ISIN), [('isin', ACME_ISIN), ('cusip', ACME_CUSIP)])
+        self.assertEqual(security_id_keys('GB0002634946'), [('isin', 'GB0002634946')])
+        with self.assertRaises(ValueError):
+            security_id_keys('ACME')
+
+    def test_holders_across_datasets(self):
+        self._fixture()
+        self.assertEqual(refresh_security_holders(session=self.session), 7)
+        # Placeholders such as 'N/A' are not indexed
+        self.assertEqual(self.session.query(SecurityHolder).filter_by(dataset='nport', id_type='cusip').count(), 1)
+
+        holders = get_security_holders(ACME_CUSIP, session=self.session)
+        self.assertEqual((holders['period'], holders['issuer_name']), ('2024-Q2', 'ACME CORP'))
+        self.assertEqual(holders['totals'], {'13f': {'holders': 2, 'quantity': 90, 'value': 1000},
+                                             'nport': {'holders': 1, 'quantity': 7, 'value': 70}})
+        top = holders['holders'][0]
+        self.assertEqual((top['holder_id'], top['holder_name'], top['accession_number']), ('7', 'Big Fund LP', 'F-7'))
+
+        # The ISIN also matches CUSIP-indexed holders, and a position indexed under both counts once
+        by_isin = get_security_holders(ACME_ISIN, '2024-Q2', session=self.session)
+        self.assertEqual(by_isin['totals']['nport'], {'holders': 2, 'quantity': 10, 'value': 100})
+        self.assertEqual(by_isin['totals']['13f']['holders'], 2)
+        fund = [h for h in by_isin['holders'] if h['holder_id'] == 'S1'][0]
+        self.assertEqual((fund['holder_lei'], fund['accession_number']), ('LEI900', 'N-2'))
+
+        self.assertEqual(get_security_holders('999999999', session=self.session)['holders'], [])
+
+    def test_targeted_refresh_and_crowding(self):
+        self._fixture()
+        refresh_security_holders(session=self.session)
+
+        # An amended N-PORT report replaces the series' holdings for the quarter
+        self._nport('N-2A', 'S1', datetime(2024, 6, 30), [(ACME_CUSIP, ACME_ISIN, 9, 90)],
+                    filing_date=datetime(2024, 8, 1))
+        self.session.commit()
+        refresh_security_holders('nport', [datetime(2024, 6, 30)], session=self.session)
+        fund = self.session.get(SecurityHolder, ('cusip', ACME_CUSIP, '2024-Q2', 'nport', 'S1'))
+        self.assertEqual((fund.quantity, fund.accession_number), (9, 'N-2A'))
+        self.assertEqual(self.session.query(SecurityHolder).filter_by(dataset='13f').count(), 4)
+
+        crowding = security_crowding(ACME_CUSIP, periods=1, top_n=1, session=self.session)
+        latest = crowding['periods']
+        self.assertEqual(len(latest), 1)
+        self.assertEqual(latest[0]['period'], '2024-Q2')
+        self.assertEqual(latest[0]['13f'], {'holders': 2, 'quantity': 90, 'value': 1000, 'top_share': 0.9,
+                                            'hhi': 8200.0, 'level': 'highly_concentrated', 'new_holders': 1,
+                                            'exited_holders': 1})
+        self.assertEqual(latest[0]['nport']['holders'], 1)
+        with self.assertRaises(ValueError):
+            security_crowding(ACME_CUSIP, datasets=['13d'], session=self.session)
+
+    def test_existing_quarters_are_built_on_first_read_or_refresh(self):
+        # Filings loaded before the index existed
+        self._fixture()
+        holders = get_security_holders(ACME_CUSIP, '2024-Q1', datasets=['13f'], session=self.session)
+        self.assertEqual(holders['totals'], {'13f': {'holders': 2, 'quantity': 100, 'value': 1000}})
+        self.assertEqual(self.session.query(SecurityHolder).filter_by(dataset='nport').count(), 0)
+
+        # The first targeted refresh of the other dataset builds every quarter
+        self._nport('N-4', 'S3', datetime(2023, 12, 31), [(ACME_CUSIP, ACME_ISIN, 2, 20)])
+        self.session.commit()
+        refresh_security_holders('nport', ['2024-Q2'], session=self.session)
+        self.assertIsNotNone(self.session.get(SecurityHolder, ('cusip', ACME_CUSIP, '2023-Q4', 'nport', 'S3')))
+        crowding = security_crowding(ACME_CUSIP, periods=3, datasets=['nport'], session=self.session)
+        self.assertEqual([p['period'] for p in crowding['periods']], ['2023-Q4', '2024-Q1', '2024-Q2'])
+
+    def test_13f_history_is_indexed_from_raw_filings(self):
+        # Raw 13F filings only: no position deltas were ever built
+        for accession, cik, shares in (('F-1', '7', 60), ('F-2', '8', 40)):
+            self.session.add(Form13FSubmission(accession_number=accession, cik=cik, submission_type='13F-HR',
+                                               filing_date=datetime(2024, 5, 10),
+                                               period_of_report=datetime(2024, 3, 31)))
+            self.session.add(Form13FCoverPage(accession_number=accession,
+                                              report_calendar_or_quarter=datetime(2024, 3, 31),
+                                              filing_manager_name=f"Fund {cik}", report_type='13F HOLDINGS REPORT',
+                                              provide_info_for_instruction5='N'))
+            self.session.add(Form13FInfoTable(accession_number=accession, infotable_sk=1, cusip=ACME_CUSIP,
+                                              nameofissuer='ACME CORP', value=shares * 10, sshprnamt=shares,
+                                              sshprnamttype='SH', investmentdiscretion='SOLE'))
+        self.session.commit()
+
+        # With no source data yet, N-PORT is not recorded as built
+        holders = get_security_holders(ACME_CUSIP, session=self.session)
+        self.assertEqual((holders['period'], holders['totals']), ('2024-Q1', {'13f': {'holders': 2, 'quantity': 100,
+                                                                                      'value': 1000}}))
+        self.assertEqual([b.dataset for b in self.session.query(SecurityHolderBuild)], ['13f'])
+
+        # A later quarter loaded without its deltas is built and indexed on the next read
+        self.session.add(Form13FSubmission(accession_number='F-3', cik='7', submission_type='13F-HR',
+                                           filing_date=datetime(2024, 8, 10), period_of_report=datetime(2024, 6, 30)))
+        self.session.add(Form13FInfoTable(accession_number='F-3', infotable_sk=1, cusip=ACME_CUSIP,
+                                          nameofissuer='ACME CORP', value=700, sshprnamt=70, sshprnamttype='SH',
+                                          investmentdiscretion='SOLE'))
+        self.session.commit()
+        self.assertEqual(get_security_holders(ACME_CUSIP, session=self.session)['period'], '2024-Q2')
+
+
+if __name__ == '__main__':
+    unittest.main()
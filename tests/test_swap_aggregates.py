@@ -0,0 +1,128 @@
+"""
+Tests for the materialized daily swap aggregates.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from database import CFTCSwap, CFTCSwapDailyAggregate
+from src.processor_cftc_swaps import load_swap_transactions
+from src.swap_aggregates import get_daily_aggregates, has_daily_aggregates, refresh_daily_aggregates
+from src.swap_partitions import SwapPartitionManager
+from tests.test_base import TunedDatabaseTest
+
+
+class TestSwapAggregates(TunedDatabaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.today = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def _add_swaps(self, rows):
+        session = self.Session()
+        for asset_class, notional, days_ago, cleared in rows:
+            session.add(CFTCSwap(asset_class=asset_class, product_name='Swap', notional_amount_leg_1=notional,
+                                 notional_currency_leg_1='USD', cleared=cleared,
+                                 execution_timestamp=self.today - timedelta(days=days_ago)))
+        session.commit()
+        session.close()
+
+    def _day(self, days_ago):
+        return (self.today - timedelta(days=days_ago)).strftime('%Y-%m-%d')
+
+    def test_refresh_computes_exact_day_statistics(self):
+        self._add_swaps([('IR', float(n), 1, 'C' if n % 2 else 'N') for n in range(1, 101)]
+                        + [('IR', None, 1, None), (None, 7.0, 2, None)])
+        session = self.Session()
+        self.assertEqual(refresh_daily_aggregates(session=session), 2)
+        daily = get_daily_aggregates(session=session).set_index('trade_date')
+        session.close()
+
+        ir = daily.loc[self._day(1)]
+        self.assertEqual((ir['trade_count'], ir['notional_count'], ir['cleared_trades']), (101, 100, 50))
+        self.assertEqual(ir['notional_sum'], 5050.0)
+        self.assertEqual((ir['notional_min'], ir['notional_max']), (1.0, 100.0))
+        self.assertAlmostEqual(ir['notional_p50'], 50.5)
+        self.assertAlmostEqual(ir['notional_p90'], pd.Series(range(1, 101)).quantile(0.9))
+        self.assertIsNone(daily.loc[self._day(2)]['asset_class'])
+
+    def test_refresh_only_rewrites_given_days(self):
+        self._add_swaps([('IR', 10.0, 1, None), ('CR', 20.0, 2, None)])
+        session = self.Session()
+        refresh_daily_aggregates(session=session)
+        session.query(CFTCSwap).delete()  # e.g. rolled out to a partition
+        session.commit()
+        self._add_swaps([('IR', 5.0, 1, None)])
+        self.assertEqual(refresh_daily_aggregates([self._day(1), self._day(2)], session), 1)
+        daily = get_daily_aggregates(session=session).set_index('trade_date')
+        session.close()
+        self.assertEqual(daily.loc[self._day(1)]['notional_sum'], 5.0)
+        self.assertEqual(daily.loc[self._day(2)]['notional_sum'], 20.0)  # No hot rows left; kept
+
+    def test_first_build_backfills_history_including_archived_months(self):
+        self._add_swaps([('IR', 10.0, 100, None), ('CR', 20.0, 2, None)])
+        manager = SwapPartitionManager(os.path.join(self.test_dir, 'partitions'), bind=self.engine)
+        manager.archive_months(before_month=(self.today - timedelta(days=60)).strftime('%Y-%m'))
+        session = self.Session()
+        self.assertFalse(has_daily_aggregates(session))
+
+        # An ingest refresh of one new day builds every day, archived ones too
+        self._add_swaps([('IR', 5.0, 1, None)])
+        self.assertEqual(refresh_daily_aggregates([self._day(1)], session), 3)
+        self.assertTrue(has_daily_aggregates(session))
+        self.assertEqual(get_daily_aggregates(session=session)['trade_date'].tolist(),
+                         [self._day(100), self._day(2), self._day(1)])
+
+        # Swaps past the last aggregated day are not covered until refreshed
+        self._add_swaps([('IR', 1.0, 0, None)])
+        self.assertFalse(has_daily_aggregates(session))
+        self.assertEqual(refresh_daily_aggregates([self._day(0)], session), 1)
+        self.assertTrue(has_daily_aggregates(session))
+        session.close()
+
+    def test_ingest_refreshes_affected_days(self):
+        raw = pd.DataFrame({
+            'dissemination_id': ['1', '2'],
+            'asset_class': ['IR', 'IR'],
+            'execution_timestamp': [self.today.isoformat(), self.today.isoformat()],
+            'notional_amount_leg_1': ['1,000', '3,000'],
+        })
+        load_swap_transactions(raw, self.Session())
+        session = self.Session()
+        row = session.query(CFTCSwapDailyAggregate).one()
+        session.close()
+        self.assertEqual((row.trade_count, row.notional_sum, row.notional_p50), (2, 4000.0, 2000.0))
+
+    def test_analytics_match_raw_queries(self):
+        from src.analytics_tools import AnalyticsEngine
+
+        self._add_swaps([('IR', 100.0, 1, 'C'), ('IR', 50.0, 2, None), ('CR', 25.0, 3, 'Y'),
+                         ('CR', None, 3, None), ('EQ', 5.0, 45, None)])
+        analytics = AnalyticsEngine.__new__(AnalyticsEngine)
+        analytics.db = self.Session()
+        try:
+            def run():
+                return (analytics._swap_market_overview({}),
+                        analytics._analyze_market_trends({'days_back': 30}),
+                        analytics._analyze_liquidity({'timeframe': '90d'}))
+            raw = run()
+            refresh_daily_aggregates(session=analytics.db)
+            materialized = run()
+        finally:
+            analytics.db.close()
+
+        self.assertEqual(materialized[0]['query_engine'], 'daily_aggregates')
+        self.assertEqual(materialized[0]['market_overview'], raw[0]['market_overview'])
+        self.assertEqual(materialized[1]['trend_metrics'], raw[1]['trend_metrics'])
+        by_class = lambda result: sorted(result['liquidity_by_asset_class'], key=lambda r: r['asset_class'])
+        self.assertEqual(by_class(materialized[2]), by_class(raw[2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
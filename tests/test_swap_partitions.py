@@ -0,0 +1,137 @@
+"""
+Tests for monthly CFTC swap partitions.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import install_stats_catalog, get_db_stats, CFTCLiveTrade, CFTCSwap, DataChangeLog
+from src.columnar_store import ENGINE_PARTITIONS, ENGINE_SQLITE, run_routed_query
+from src.swap_lifecycle import rebuild_live_trades
+from src.swap_partitions import SwapPartitionManager
+from tests.test_base import TunedDatabaseTest
+
+MONTHLY_SQL = """
+    SELECT substr(execution_timestamp, 1, 7) AS month, COUNT(*) AS trades
+    FROM cftc_swap_data
+    WHERE execution_timestamp >= :start_date
+    GROUP BY 1 ORDER BY 1
+"""
+
+
+class TestSwapPartitions(TunedDatabaseTest):
+
+    def setUp(self):
+        super().setUp()
+        install_stats_catalog(self.engine)
+        self.manager = SwapPartitionManager(os.path.join(self.test_dir, 'partitions'), bind=self.engine)
+
+        session = self.Session()
+        for month, count in (('2024-01', 3), ('2024-02', 2), ('2024-03', 4), ('2024-04', 1)):
+            for day in range(1, count + 1):
+                session.add(CFTCSwap(asset_class='IR', dissemination_id=f"{month}-{day}",
+                                     execution_timestamp=datetime.strptime(f"{month}-{day:02d} 12:00", "%Y-%m-%d %H:%M")))
+        session.commit()
+        session.close()
+
+    def test_archive_moves_old_months_out_of_hot_table(self):
+        moved = self.manager.archive_months(before_month='2024-03')
+        self.assertEqual(moved, {'2024-01': 3, '2024-02': 2})
+        self.assertEqual(get_db_stats(self.Session())['cftc_swap_data'], 5)
+        partitions = self.manager.list_partitions()
+        self.assertEqual([p['month'] for p in partitions], ['2024-01', '2024-02'])
+        self.assertTrue(all(os.path.exists(p['path']) for p in partitions))
+
+    def test_query_spans_hot_table_and_partitions(self):
+        self.manager.archive_months(before_month='2024-03')
+        everything = self.manager.query_swaps()
+        self.assertEqual(len(everything), 10)
+
+        window = self.manager.query_swaps(start='2024-02-01', end='2024-03-03')
+        self.assertEqual(sorted(window['dissemination_id']), ['2024-02-1', '2024-02-2', '2024-03-1', '2024-03-2'])
+
+        filtered = self.manager.query_swaps(start=datetime(2024, 1, 1), where="dissemination_id = :d",
+                                            params={'d': '2024-01-3'}, columns='dissemination_id')
+        self.assertEqual(filtered['dissemination_id'].tolist(), ['2024-01-3'])
+
+    def test_archive_is_logged_as_a_change(self):
+        self.manager.archive_months(before_month='2024-03')
+        session = self.Session()
+        entries = session.query(DataChangeLog.table_name, DataChangeLog.row_count).all()
+        session.close()
+        self.assertEqual(entries, [('cftc_swap_data', 3), ('cftc_swap_data', 2)])
+
+    def test_routed_queries_include_archived_months(self):
+        self.manager.archive_months(before_month='2024-03')
+        session = self.Session()
+        df, engine_used = run_routed_query(MONTHLY_SQL, {'start_date': datetime(2024, 2, 1)},
+                                           ['cftc_swap_data'], session, swap_range=(datetime(2024, 2, 1), None))
+        self.assertEqual(engine_used, ENGINE_PARTITIONS)
+        self.assertEqual(df.values.tolist(), [['2024-02', 2], ['2024-03', 4], ['2024-04', 1]])
+
+        # Windows inside the hot table run on it directly
+        _, engine_used = run_routed_query(MONTHLY_SQL, {'start_date': datetime(2024, 3, 1)},
+                                          ['cftc_swap_data'], session, swap_range=(datetime(2024, 3, 1), None))
+        self.assertEqual(engine_used, ENGINE_SQLITE)
+        session.close()
+
+    def test_archived_queries_run_in_place(self):
+        self.manager.archive_months(before_month='2024-04')
+        params = {'start_date': '2024-01-01'}
+        # An unbounded window is left to the hot table
+        self.assertIsNone(self.manager.query_with_archive(MONTHLY_SQL, params))
+
+        # With one attach slot, the two older months go through the temp overflow table
+        with patch('src.swap_partitions.ATTACH_BATCH_SIZE', 1):
+            df = self.manager.query_with_archive(MONTHLY_SQL, params, '2024-01-01')
+        self.assertEqual(df.values.tolist(), [['2024-01', 3], ['2024-02', 2], ['2024-03', 4], ['2024-04', 1]])
+        # The view, overflow table and attachments do not outlive the query
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.exec_driver_sql("SELECT COUNT(*) FROM cftc_swap_data").scalar(), 1)
+            self.assertLessEqual({row[1] for row in conn.exec_driver_sql("PRAGMA database_list")}, {'main', 'temp'})
+
+    def test_rebuild_replays_archived_months(self):
+        session = self.Session()
+        session.add(CFTCSwap(dissemination_id='2024-04-T', original_dissemination_id='2024-01-1', action_type='TERM',
+                             execution_timestamp=datetime(2024, 4, 20, 12)))
+        session.commit()
+        self.manager.archive_months(before_month='2024-03')
+        stats = rebuild_live_trades(session)
+        self.assertEqual(stats['events'], 11)
+        live = {trade_id for (trade_id,) in session.query(CFTCLiveTrade.trade_id)}
+        self.assertEqual(len(live), 9)
+        self.assertIn('2024-01-2', live)
+        self.assertNotIn('2024-01-1', live)
+        session.close()
+
+    def test_partitions_outside_range_are_not_opened(self):
+        self.manager.archive_months(before_month='2024-03')
+        os.remove(self.manager.partition_path('2024-01'))  # Would fail if it were attached
+        window = self.manager.query_swaps(start='2024-02-01', end='2024-03-01')
+        self.assertEqual(len(window), 2)
+
+    def test_rearchive_is_idempotent(self):
+        self.manager.archive_months(before_month='2024-02')
+        self.manager.archive_months(before_month='2024-02')
+        self.assertEqual(self.manager.list_partitions()[0]['row_count'], 3)
+        self.assertEqual(len(self.manager.query_swaps()), 10)
+
+    def test_drop_month_and_retention(self):
+        self.manager.archive_months(before_month='2024-04')
+        self.assertTrue(self.manager.drop_month('2024-01'))
+        self.assertFalse(self.manager.drop_month('2024-01'))
+        self.assertFalse(os.path.exists(self.manager.partition_path('2024-01')))
+        self.assertEqual(len(self.manager.query_swaps()), 7)
+
+        dropped = self.manager.apply_retention(keep_months=0)
+        self.assertEqual(dropped, ['2024-02', '2024-03'])
+        self.assertEqual(len(self.manager.query_swaps()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
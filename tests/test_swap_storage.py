@@ -0,0 +1,84 @@
+"""
+Tests for typed CFTC swap loading and the storage compaction migration.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from database import CFTCSwap
+from src.processor_cftc_swaps import normalize_swap_frame, load_swap_transactions, compact_swap_storage
+from tests.test_base import TunedDatabaseTest
+
+
+class TestSwapStorage(TunedDatabaseTest):
+
+    def _storage_types(self, column):
+        with self.engine.connect() as conn:
+            return set(conn.exec_driver_sql(f"SELECT DISTINCT typeof({column}) FROM cftc_swap_data").scalars())
+
+    def test_normalize_raw_frame(self):
+        raw = pd.DataFrame({
+            'Dissemination Identifier': ['1', '2'],
+            'Action type': [' newt', 'TERM'],
+            'Asset Class': ['ir', 'CR'],
+            'Execution Timestamp': ['2024-05-01T12:30:00Z', ''],
+            'Notional amount-Leg 1': ['250,000,000+', ''],
+            'Unmapped column': ['x', 'y'],
+        })
+        df = normalize_swap_frame(raw)
+        self.assertNotIn('unmapped_column', df.columns)
+        self.assertEqual(df['dissemination_id'].tolist(), ['1', '2'])
+        self.assertEqual(df['action_type'].tolist(), ['NEWT', 'TERM'])
+        self.assertEqual(df['notional_amount_leg_1'].iloc[0], 250000000.0)
+        self.assertTrue(pd.isna(df['notional_amount_leg_1'].iloc[1]))
+        self.assertEqual(df['execution_timestamp'].iloc[0], pd.Timestamp('2024-05-01 12:30:00'))
+        self.assertTrue(pd.isna(df['execution_timestamp'].iloc[1]))
+
+    def test_loaded_values_are_stored_typed(self):
+        raw = pd.DataFrame({
+            'dissemination_id': ['1', '2', '3'],
+            'notional_amount_leg_1': ['9,000', '10,000', '100'],
+            'execution_timestamp': ['2024-05-01T09:00:00Z', '2024-05-01T10:00:00Z', '2024-04-30'],
+        })
+        self.assertEqual(load_swap_transactions(raw, self.Session()), 3)
+        self.assertEqual(self._storage_types('notional_amount_leg_1'), {'real'})
+
+        session = self.Session()
+        # Numeric, not lexicographic: '9,000' < '10,000'
+        largest = session.query(CFTCSwap).order_by(CFTCSwap.notional_amount_leg_1.desc()).first()
+        self.assertEqual(largest.dissemination_id, '2')
+        recent = session.query(CFTCSwap).filter(CFTCSwap.execution_timestamp >= datetime(2024, 5, 1)).count()
+        self.assertEqual(recent, 2)
+        session.close()
+
+    def test_compaction_migrates_text_rows(self):
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql("""
+                INSERT INTO cftc_swap_data (dissemination_id, asset_class, notional_amount_leg_1,
+                                            execution_timestamp, product_name)
+                VALUES ('1', ' ir ', '1,500,000+', '2024-05-01T12:00:00Z', ''),
+                       ('2', 'CR', 'n/a', '2024-05-02', 'CDS')
+            """)
+        report = compact_swap_storage(self.engine, vacuum=False)
+        self.assertEqual(report['rewritten_values']['notional_amount_leg_1'], 1)
+        self.assertEqual(report['unparseable_numeric_values'], {'notional_amount_leg_1': 1})
+
+        session = self.Session()
+        first = session.query(CFTCSwap).filter_by(dissemination_id='1').one()
+        self.assertEqual(first.notional_amount_leg_1, 1500000.0)
+        self.assertEqual(first.execution_timestamp, datetime(2024, 5, 1, 12, 0))
+        self.assertEqual(first.asset_class, 'IR')
+        self.assertIsNone(first.product_name)
+        second = session.query(CFTCSwap).filter_by(dissemination_id='2').one()
+        self.assertEqual(second.execution_timestamp, datetime(2024, 5, 2))
+        session.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
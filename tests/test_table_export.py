@@ -0,0 +1,76 @@
+"""
+Tests for streaming table export.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from database import export_table, Form13FSubmission
+from tests.test_base import TunedDatabaseTest
+
+
+class TestTableExport(TunedDatabaseTest):
+
+    def setUp(self):
+        super().setUp()
+        session = self.Session()
+        for i in range(25):
+            session.add(Form13FSubmission(accession_number=f"ACC{i:03d}", cik=str(i % 3),
+                                          filing_date=datetime(2024, 1, 1 + i), submission_type='13F-HR',
+                                          period_of_report=datetime(2023, 12, 31)))
+        session.commit()
+        session.close()
+
+    def _export(self, name, **kwargs):
+        path = os.path.join(self.test_dir, name)
+        rows = export_table('form13f_submissions', path, chunk_size=7, show_progress=False,
+                            bind=self.engine, **kwargs)
+        return rows, path
+
+    def test_csv_export_pages_through_all_rows(self):
+        rows, path = self._export('all.csv')
+        df = pd.read_csv(path, dtype={'cik': str})
+        self.assertEqual(rows, 25)
+        self.assertEqual(len(df), 25)
+        self.assertEqual(df['accession_number'].tolist(), [f"ACC{i:03d}" for i in range(25)])
+
+    def test_filters(self):
+        rows, path = self._export('filtered.csv', filters={
+            'cik': ['0', '1'], 'filing_date': (datetime(2024, 1, 10), None)})
+        df = pd.read_csv(path, dtype={'cik': str})
+        self.assertEqual(rows, len(df))
+        self.assertTrue(set(df['cik']) <= {'0', '1'})
+        self.assertTrue((pd.to_datetime(df['filing_date']) >= datetime(2024, 1, 10)).all())
+
+    def test_empty_result_writes_header(self):
+        rows, path = self._export('empty.csv', filters={'cik': 'none'})
+        self.assertEqual(rows, 0)
+        self.assertIn('accession_number', pd.read_csv(path).columns)
+
+    def test_rejects_unknown_table_and_format(self):
+        with self.assertRaises(ValueError):
+            export_table('no_such_table', os.path.join(self.test_dir, 'x.csv'), bind=self.engine)
+        with self.assertRaises(ValueError):
+            self._export('x.xlsx')
+        with self.assertRaises(ValueError):
+            self._export('x.csv', filters={'no_such_column': 1})
+
+    def test_parquet_export_row_groups(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+        rows, path = self._export('all.parquet')
+        parquet_file = pq.ParquetFile(path)
+        self.assertEqual(parquet_file.metadata.num_rows, 25)
+        self.assertEqual(parquet_file.num_row_groups, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
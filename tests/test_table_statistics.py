@@ -0,0 +1,78 @@
+"""
+Tests for the trigger-maintained table statistics catalog.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import (install_stats_catalog, recount_table_statistics,
+                      get_table_statistics, get_db_stats, bulk_load_mode, Form13FSubmission)
+from tests.test_base import TunedDatabaseTest
+
+
+class TestTableStatistics(TunedDatabaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.original_engine = database.engine
+        database.engine = self.engine
+
+    def tearDown(self):
+        database.engine = self.original_engine
+        super().tearDown()
+
+    def _add_submissions(self, dates, prefix='A'):
+        session = self.Session()
+        for i, filing_date in enumerate(dates):
+            session.add(Form13FSubmission(accession_number=f"{prefix}{i}", cik='1', filing_date=filing_date,
+                                           submission_type='13F-HR', period_of_report=filing_date))
+        session.commit()
+        session.close()
+
+    def test_triggers_track_inserts_and_deletes(self):
+        install_stats_catalog(self.engine)
+        self._add_submissions([datetime(2024, 3, 31), datetime(2023, 12, 31), datetime(2024, 6, 30)])
+
+        session = self.Session()
+        details = get_table_statistics(session)['form13f_submissions']
+        self.assertEqual(details['row_count'], 3)
+        self.assertTrue(details['min_date'].startswith('2023-12-31'))
+        self.assertTrue(details['max_date'].startswith('2024-06-30'))
+        self.assertIsNotNone(details['last_ingest_at'])
+
+        session.query(Form13FSubmission).filter_by(accession_number='A0').delete()
+        session.commit()
+        self.assertEqual(get_db_stats(session)['form13f_submissions'], 2)
+        self.assertNotIn('table_statistics', get_db_stats(session))
+        session.close()
+
+    def test_existing_rows_seeded_on_install(self):
+        self._add_submissions([datetime(2024, 1, 1), datetime(2024, 2, 1)])
+        install_stats_catalog(self.engine)
+        details = get_table_statistics(self.Session())['form13f_submissions']
+        self.assertEqual(details['row_count'], 2)
+        self.assertIsNotNone(details['last_recount_at'])
+
+    def test_recount_corrects_drift(self):
+        install_stats_catalog(self.engine)
+        self._add_submissions([datetime(2024, 1, 1)])
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql("UPDATE table_statistics SET row_count = 99 WHERE table_name = 'form13f_submissions'")
+        counts = recount_table_statistics(['form13f_submissions'], bind=self.engine)
+        self.assertEqual(counts['form13f_submissions'], 1)
+        self.assertEqual(get_db_stats(self.Session())['form13f_submissions'], 1)
+
+    def test_bulk_load_recounts_after_deferred_triggers(self):
+        install_stats_catalog(self.engine)
+        with bulk_load_mode(defer_indexes=True):
+            self._add_submissions([datetime(2024, 1, 1), datetime(2024, 2, 1)], prefix='B')
+        self.assertEqual(get_db_stats(self.Session())['form13f_submissions'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Tests for batched section loading and stored risk factor diffs in TemporalAnalysisEngine.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from database import Sec10KSubmission, Sec10KDocument, Sec10KRiskFactorDiff
+from src.temporal_analysis_tools import TemporalAnalysisEngine, diff_risk_factors
+from tests.test_base import TunedDatabaseTest
+
+RISKS = {
+    2021: "Competition may hurt margins.\n\nWe depend on key suppliers.",
+    2022: "Competition may hurt margins.\n\nWe depend on key suppliers.\n\nInflation raises our costs.",
+    2023: "Competition may hurt margins.\n\nInflation raises our costs.\n\nCyber attacks could disrupt operations.",
+}
+
+
+class TestTemporalBatching(TunedDatabaseTest):
+
+    def setUp(self):
+        super().setUp()
+        for cik in ('0000000001', '0000000002'):
+            for year, risks in RISKS.items():
+                accession = f"{cik}-{year % 100}-000001"
+                self.session.add(Sec10KSubmission(accession_number=accession, cik=cik, company_name=f"Co {cik}",
+                                                  form_type='10-K', filing_date=datetime(year, 3, 1),
+                                                  period_of_report=datetime(year - 1, 12, 31)))
+                self.session.add(Sec10KDocument(accession_number=accession, section='risk_factors', sequence=1,
+                                                content=risks, word_count=len(risks.split())))
+                self.session.add(Sec10KDocument(accession_number=accession, section='mdna', sequence=2,
+                                                content=f"MD&A {year}", word_count=2))
+        self.session.commit()
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        self.temporal = TemporalAnalysisEngine(db_session=self.session)
+
+    def tearDown(self):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+        super().tearDown()
+
+    def _count(self, conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith('SELECT'):
+            self.statements.append(statement)
+
+    def test_evolution_and_comparison_cost_one_query(self):
+        result = self.temporal.analyze_risk_evolution('0000000001', [2021, 2022, 2023])
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(result['total_filings'], 3)
+        self.assertEqual(result['yearly_breakdown'][2022]['filing_dates'], ['2022-03-01'])
+
+        self.statements.clear()
+        comparison = self.temporal.compare_risk_factors_across_companies(['0000000001', '0000000002', '9'], 2023)
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(comparison['comparison_data']['0000000002']['filing_count'], 1)
+        self.assertEqual(comparison['comparison_data']['9']['filing_count'], 0)
+
+    def test_risk_factor_diffs_are_stored_and_reused(self):
+        first = self.temporal.get_risk_factor_changes(['0000000001', '0000000002'], [2022, 2023])
+        self.assertEqual((first['diffs_computed'], first['diffs_reused']), (4, 0))
+        self.assertEqual(self.session.query(Sec10KRiskFactorDiff).count(), 4)
+
+        change = first['companies']['0000000001']['changes'][1]
+        self.assertEqual((change['previous_year'], change['year']), (2022, 2023))
+        self.assertEqual((change['paragraphs_added'], change['paragraphs_removed']), (1, 1))
+        self.assertEqual(change['added_samples'], ['Cyber attacks could disrupt operations.'])
+
+        self.statements.clear()
+        second = self.temporal.get_risk_factor_changes(['0000000001', '0000000002'], [2022, 2023])
+        self.assertEqual((second['diffs_computed'], second['diffs_reused']), (0, 4))
+        self.assertEqual(second['companies'], first['companies'])
+        self.assertEqual(len(self.statements), 2)  # Filing list and stored diffs; no section text
+
+    def test_diff_ignores_whitespace_and_case(self):
+        diff = diff_risk_factors("Rates  may RISE.\n\nOld risk.", "rates may rise.\n\nNew risk.")
+        self.assertEqual((diff['paragraphs_retained'], diff['paragraphs_added'], diff['paragraphs_removed']),
+                         (1, 1, 1))
+        self.assertAlmostEqual(diff['similarity'], 1 / 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -66,7 +66,8 @@ try:
         analyze_risk_evolution, 
         analyze_management_view_evolution, 
         compare_company_risks, 
-        analyze_company_events
+        analyze_company_events,
+        analyze_risk_factor_changes
     )
     TEMPORAL_ANALYSIS_AVAILABLE = True
 except ImportError as e:
@@ -88,7 +89,7 @@ except ImportError as e:
 
 # Import from the correct database module (GameCockAI/database.py)
 try:
-    from database import get_db_stats, export_db_to_csv
+    from database import get_db_stats, export_db_to_csv, get_table_statistics
     DATABASE_AVAILABLE = True
 except ImportError as e:
     logger.warning(f"⚠️ Database not available: {e}")
@@ -97,6 +98,8 @@ except ImportError as e:
         return {"error": "Database not available"}
     def export_db_to_csv(path):
         return {"error": "Database not available"}
+    def get_table_statistics():
+        return {}
 
 try:
     from config import (
@@ -484,6 +487,7 @@ def get_database_statistics():
         
         return json.dumps({
             "database_statistics": stats,
+            "table_details": get_table_statistics(),
             "message": "Database statistics retrieved successfully",
             "timestamp": str(datetime.now())
         })
@@ -640,6 +644,21 @@ def create_temporal_analysis_tools():
                 }
             }
         },
+        "analyze_risk_factor_changes": {
+            "function": analyze_risk_factor_changes,
+            "schema": {
+                "name": "analyze_risk_factor_changes",
+                "description": "Shows year-over-year changes in risk factors (paragraphs added and removed, word count change, similarity) between consecutive annual filings for one or more companies.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "company_ciks": {"type": "array", "items": {"type": "string"}, "description": "CIK identifiers of the companies to analyze."},
+                        "years": {"type": "array", "items": {"type": "integer"}, "description": "Optional years to compare with the prior filing. If not provided, covers the last 5 years."}
+                    },
+                    "required": ["company_ciks"]
+                }
+            }
+        },
         "analyze_company_events": {
             "function": analyze_company_events,
             "schema": {